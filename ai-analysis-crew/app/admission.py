@@ -0,0 +1,306 @@
+"""Admission control for crew analyses: bounded in-flight jobs with tiered queuing.
+
+Every analysis start (crew-analysis upload, keyword search, /analyze-part, the
+pending poller, stuck-job restarts) goes through ``run_analysis_background``,
+which waits here for a slot before doing any work. Without it every start ran
+immediately and queued invisibly on CREW_EXECUTOR.
+
+- Per process at most CREW_MAX_IN_FLIGHT jobs run (default: CREW_ANALYSIS_WORKERS).
+- With Redis configured, at most CREW_CLUSTER_MAX_IN_FLIGHT run across all
+  instances (0 = no cluster limit). Slots are a sorted set of expiring leases,
+  renewed while the job runs, so a dead instance frees its slots.
+- Waiting jobs are ordered by enqueue time minus a tier head start
+  (enterprise 600s, pro 180s, free 0): paying tiers go first, and a free job
+  that has waited longer than the head start is not overtaken. The same score
+  orders the local queue and the shared Redis queue.
+- ``queue_position`` reports a waiting job's place for the status endpoints.
+- ``backlog_retry_after`` tells the create endpoints to answer 429 with
+  Retry-After once CREW_ADMISSION_MAX_QUEUE jobs are waiting.
+
+Env:
+  CREW_MAX_IN_FLIGHT           jobs per process (default CREW_ANALYSIS_WORKERS)
+  CREW_CLUSTER_MAX_IN_FLIGHT   jobs across instances via Redis (default 0 = off)
+  CREW_ADMISSION_MAX_QUEUE     waiting jobs before new requests get 429 (default 50)
+  CREW_ADMISSION_AVG_JOB_SEC   initial job duration estimate for Retry-After (default 180)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds of head start per tier (see module docstring).
+TIER_HEAD_START_SEC: dict[str, float] = {"enterprise": 600.0, "pro": 180.0, "free": 0.0}
+
+QUEUE_KEY = "crew:admission:queue"
+QUEUE_SEEN_KEY = "crew:admission:queue_seen"
+INFLIGHT_KEY = "crew:admission:inflight"
+SLOT_TTL_SEC = 300
+SLOT_RENEW_SEC = 60
+POLL_SEC = 2.0
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+MAX_IN_FLIGHT = _env_int(
+    "CREW_MAX_IN_FLIGHT", _env_int("CREW_ANALYSIS_WORKERS", 2, lo=1, hi=256), lo=1, hi=256
+)
+CLUSTER_MAX_IN_FLIGHT = _env_int("CREW_CLUSTER_MAX_IN_FLIGHT", 0, lo=0, hi=10000)
+MAX_QUEUE = _env_int("CREW_ADMISSION_MAX_QUEUE", 50, lo=1, hi=100000)
+
+# Drop stale queue entries / slots of dead instances, then grant the slot if
+# this job is within the free slots by queue order. Returns -1 when granted,
+# else the job's 0-based position in the shared queue.
+_ADMIT_LUA = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[5]))
+for _, m in ipairs(stale) do
+  redis.call('ZREM', KEYS[1], m)
+  redis.call('ZREM', KEYS[2], m)
+end
+redis.call('ZADD', KEYS[1], 'NX', ARGV[3], ARGV[2])
+redis.call('ZADD', KEYS[2], now, ARGV[2])
+local free = tonumber(ARGV[4]) - redis.call('ZCARD', KEYS[3])
+local rank = redis.call('ZRANK', KEYS[1], ARGV[2])
+if rank < free then
+  redis.call('ZREM', KEYS[1], ARGV[2])
+  redis.call('ZREM', KEYS[2], ARGV[2])
+  redis.call('ZADD', KEYS[3], now + tonumber(ARGV[6]), ARGV[2])
+  return -1
+end
+return rank
+"""
+
+
+def normalize_tier(tier: Optional[str]) -> str:
+    t = (tier or "").strip().lower()
+    if t in TIER_HEAD_START_SEC:
+        return t
+    if t in ("professional", "business"):
+        return "pro"
+    return "free"
+
+
+def _redis() -> Any:
+    if CLUSTER_MAX_IN_FLIGHT <= 0:
+        return None
+    from .redis_client import get_redis, is_redis_configured
+
+    return get_redis() if is_redis_configured() else None
+
+
+@dataclass(order=True)
+class _Waiter:
+    score: float
+    seq: int
+    job_id: str = field(compare=False)
+    tier: str = field(compare=False)
+
+
+@dataclass
+class AdmissionTicket:
+    job_id: str
+    tier: str
+    queued_at: float
+    admitted_at: Optional[float] = None
+    cluster: bool = False
+    _renew: Optional[asyncio.Task] = None
+
+    @property
+    def waited_sec(self) -> float:
+        return (self.admitted_at or time.time()) - self.queued_at
+
+
+class AdmissionController:
+    """Process-wide admission state. One instance: ``admission`` below."""
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._running: set[str] = set()
+        self._waiting: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._avg_job_sec = float(_env_int("CREW_ADMISSION_AVG_JOB_SEC", 180, lo=10, hi=3600))
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _local_position(self, job_id: str) -> Optional[int]:
+        ahead = sorted(self._waiting)
+        for i, w in enumerate(ahead):
+            if w.job_id == job_id:
+                return i
+        return None
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based place in the queue, or None when the job is not waiting (sync)."""
+        r = _redis()
+        if r is not None:
+            # The status request may land on a different instance than the worker.
+            try:
+                rank = r.zrank(QUEUE_KEY, job_id)
+                if rank is not None:
+                    return int(rank) + 1
+            except Exception as e:
+                logger.debug("admission: cluster queue_position failed: %s", e)
+        pos = self._local_position(job_id)
+        return None if pos is None else pos + 1
+
+    def backlog_retry_after(self) -> Optional[int]:
+        """Seconds to advertise in Retry-After when the backlog is full, else None (sync)."""
+        queued, slots = self.waiting, self.max_in_flight
+        r = _redis()
+        if r is not None:
+            try:
+                queued = max(queued, int(r.zcard(QUEUE_KEY)))
+                slots = CLUSTER_MAX_IN_FLIGHT
+            except Exception as e:
+                logger.debug("admission: cluster backlog check failed: %s", e)
+        if queued < MAX_QUEUE:
+            return None
+        return max(5, math.ceil((queued + 1) / max(1, slots) * self._avg_job_sec))
+
+    def _try_cluster(self, ticket: AdmissionTicket, score: float) -> Optional[int]:
+        """-1 granted, else position in the shared queue; None when Redis is not in use."""
+        r = _redis()
+        if r is None:
+            return None
+        try:
+            rank = r.eval(
+                _ADMIT_LUA,
+                3,
+                QUEUE_KEY,
+                QUEUE_SEEN_KEY,
+                INFLIGHT_KEY,
+                time.time(),
+                ticket.job_id,
+                score,
+                CLUSTER_MAX_IN_FLIGHT,
+                SLOT_TTL_SEC,
+                SLOT_TTL_SEC,
+            )
+            return int(rank)
+        except Exception as e:
+            logger.warning("admission: cluster slot check failed (%s); using the local limit only", e)
+            return None
+
+    async def _renew_cluster_slot(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(SLOT_RENEW_SEC)
+            r = _redis()
+            if r is None:
+                return
+            try:
+                await asyncio.to_thread(r.zadd, INFLIGHT_KEY, {job_id: time.time() + SLOT_TTL_SEC}, xx=True)
+            except Exception as e:
+                logger.debug("admission: slot renewal failed for %s: %s", job_id[:8], e)
+
+    async def acquire(self, job_id: str, tier: Optional[str] = None, on_queued: Any = None) -> AdmissionTicket:
+        """
+        Wait for a slot. ``on_queued(position)`` is awaited once if the job has to
+        wait, so the caller can tell the client. Cancellation leaves the queue.
+        """
+        tier = normalize_tier(tier)
+        now = time.time()
+        ticket = AdmissionTicket(job_id=job_id, tier=tier, queued_at=now)
+        waiter = _Waiter(now - TIER_HEAD_START_SEC[tier], next(self._seq), job_id, tier)
+        heapq.heappush(self._waiting, waiter)
+        reported = False
+        try:
+            while True:
+                pos = self._local_position(job_id) or 0
+                if self.in_flight + pos < self.max_in_flight:
+                    rank = await asyncio.to_thread(self._try_cluster, ticket, waiter.score)
+                    if rank is None or rank < 0:
+                        ticket.cluster = rank is not None
+                        break
+                    pos = rank
+                if not reported and on_queued is not None:
+                    reported = True
+                    await on_queued(pos + 1)
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), POLL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            await self._leave_queue(waiter)
+            raise
+
+        self._waiting.remove(waiter)
+        heapq.heapify(self._waiting)
+        self._running.add(job_id)
+        ticket.admitted_at = time.time()
+        if ticket.cluster:
+            ticket._renew = asyncio.create_task(self._renew_cluster_slot(job_id))
+        if ticket.waited_sec >= 1:
+            logger.info(
+                "Admitted crew job %s (%s) after %.0fs in queue", job_id[:8], tier, ticket.waited_sec
+            )
+        self._changed.set()
+        return ticket
+
+    async def _leave_queue(self, waiter: _Waiter) -> None:
+        if waiter in self._waiting:
+            self._waiting.remove(waiter)
+            heapq.heapify(self._waiting)
+        self._changed.set()
+        r = _redis()
+        if r is not None:
+            try:
+                await asyncio.to_thread(r.zrem, QUEUE_KEY, waiter.job_id)
+            except Exception as e:
+                logger.debug("admission: leaving cluster queue failed: %s", e)
+
+    async def release(self, ticket: Optional[AdmissionTicket]) -> None:
+        if ticket is None or ticket.job_id not in self._running:
+            return
+        self._running.discard(ticket.job_id)
+        if ticket.admitted_at is not None:
+            # Moving average of run time for Retry-After estimates.
+            self._avg_job_sec = 0.8 * self._avg_job_sec + 0.2 * (time.time() - ticket.admitted_at)
+        if ticket._renew is not None:
+            ticket._renew.cancel()
+            ticket._renew = None
+        self._changed.set()
+        if ticket.cluster:
+            r = _redis()
+            if r is not None:
+                try:
+                    await asyncio.to_thread(r.zrem, INFLIGHT_KEY, ticket.job_id)
+                except Exception as e:
+                    logger.debug("admission: releasing cluster slot failed: %s", e)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "cluster_max_in_flight": CLUSTER_MAX_IN_FLIGHT,
+            "max_queue": MAX_QUEUE,
+            "avg_job_sec": round(self._avg_job_sec),
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,277 @@
+"""Result cache for keyword-only analyses (docs/sql/crew_analysis_cache.sql).
+
+Popular keyword searches (common OEM part numbers) produce nearly the same
+report for the same country, region and currency. ``run_analysis_background``
+looks up a fingerprint of the normalized query plus those three before queuing
+the crew; on a hit the job is completed from the cached report and PDF (the
+PDF object in Storage is shared, not re-rendered), which takes well under a
+second. Completed keyword jobs write their result back, and are added to the
+near-duplicate index in app/semantic_cache.py.
+
+Staleness: an entry is served only while it is younger than
+ANALYSIS_CACHE_TTL_HOURS and was produced with the current exchange-rate table
+version and report schema version; anything else is a miss and the fresh run
+overwrites it.
+
+Opt-out: a request can pass ``force_fresh``, and a user can set
+``preferences.always_fresh_results`` on their profile. Credits follow
+ANALYSIS_CACHE_CREDIT_POLICY: "charge" (default) keeps the credit charged at
+request time, "free" refunds it on a hit.
+
+Best effort like job_checkpoints: without the table, every lookup misses.
+
+Env:
+  ANALYSIS_CACHE_ENABLED        1/0 (default 1)
+  ANALYSIS_CACHE_TTL_HOURS      max age of a served entry (default 72)
+  ANALYSIS_CACHE_CREDIT_POLICY  charge | free (default charge)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from .job_checkpoints import PDF, REPORT, JobCheckpoints
+
+logger = logging.getLogger(__name__)
+
+CACHE_TABLE = "crew_analysis_cache"
+FINGERPRINT_VERSION = 1
+CREDIT_POLICIES = ("charge", "free")
+
+_TOKEN_SPLIT_RE = re.compile(r"[^\w]+")
+# "04E-115-561" and "04e115561" are the same part number
+_PART_SEPARATOR_RE = re.compile(r"(?<=[a-z0-9])[./-](?=[a-z0-9])")
+
+_warned = False
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+def analysis_cache_enabled() -> bool:
+    flag = (os.getenv("ANALYSIS_CACHE_ENABLED") or "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def cache_ttl() -> timedelta:
+    return timedelta(hours=_env_int("ANALYSIS_CACHE_TTL_HOURS", 72, lo=1, hi=24 * 90))
+
+
+def credit_policy() -> str:
+    policy = (os.getenv("ANALYSIS_CACHE_CREDIT_POLICY") or "charge").strip().lower()
+    return policy if policy in CREDIT_POLICIES else "charge"
+
+
+def _get_supabase() -> Any:
+    from .api.supabase_admin import get_supabase_admin
+
+    return get_supabase_admin()
+
+
+def _warn_once(action: str, err: Exception) -> None:
+    global _warned
+    if not _warned:
+        _warned = True
+        logger.warning("Analysis cache unavailable (%s: %s); keyword jobs run the full crew", action, err)
+    else:
+        logger.debug("Analysis cache %s failed: %s", action, err)
+
+
+def normalize_query(keywords: str) -> str:
+    """Case, punctuation, part-number separators and word order do not change the fingerprint."""
+    text = unicodedata.normalize("NFKC", keywords or "").casefold()
+    text = _PART_SEPARATOR_RE.sub("", text)
+    tokens = sorted({t for t in _TOKEN_SPLIT_RE.split(text) if t})
+    return " ".join(tokens)
+
+
+def query_fingerprint(
+    keywords: str,
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+) -> str:
+    parts = (
+        f"v{FINGERPRINT_VERSION}",
+        normalize_query(keywords),
+        (user_country or "").strip().upper(),
+        (user_region or "").strip().casefold(),
+        (user_currency or "").strip().upper(),
+    )
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _rates_version() -> int:
+    from .currency_rates import current_rates
+
+    return current_rates().version
+
+
+def user_wants_fresh(user_id: Optional[str]) -> bool:
+    """Profile opt-out (preferences.always_fresh_results) from cached results (sync)."""
+    if not user_id:
+        return False
+    try:
+        res = (
+            _get_supabase()
+            .table("profiles")
+            .select("preferences")
+            .eq("id", user_id)
+            .limit(1)
+            .execute()
+        )
+    except Exception as e:
+        logger.debug("Analysis cache: preference lookup failed for %s: %s", user_id, e)
+        return False
+    prefs = (res.data or [{}])[0].get("preferences")
+    return isinstance(prefs, dict) and bool(prefs.get("always_fresh_results"))
+
+
+@dataclass
+class CachedAnalysis:
+    fingerprint: str
+    source_job_id: Optional[str]
+    created_at: Optional[str]
+    payload: dict[str, Any]
+
+    def as_checkpoints(self, job_id: str) -> JobCheckpoints:
+        """Report and PDF stages as if this job had produced them (not persisted)."""
+        from .report_delivery import ReportPdf, refresh_email_url
+
+        report = self.payload.get("report") or {}
+        pdf = dict(self.payload.get("pdf") or {})
+        relinked = refresh_email_url(
+            ReportPdf(
+                filename=pdf.get("filename") or "report.pdf",
+                data=b"",
+                public_url=pdf.get("public_url"),
+                object_path=pdf.get("object_path"),
+            )
+        )
+        pdf["email_url"] = relinked.email_url
+        return JobCheckpoints(job_id=job_id, stages={REPORT: dict(report), PDF: pdf})
+
+
+def lookup_cached_analysis(
+    keywords: str,
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+) -> Optional[CachedAnalysis]:
+    """Fresh cache entry for this exact query, or None (sync; call via asyncio.to_thread)."""
+    if not keywords or not analysis_cache_enabled():
+        return None
+    return fetch_cached_analysis(query_fingerprint(keywords, user_country, user_region, user_currency))
+
+
+def fetch_cached_analysis(fingerprint: str, *, fresh_only: bool = True) -> Optional[CachedAnalysis]:
+    """
+    Cache entry by fingerprint. With ``fresh_only`` (serving a result) stale
+    entries are misses and a hit is counted; without it any complete entry is
+    returned (seeding a new crew run with a prior report).
+    """
+    from .report_schema import SCHEMA_VERSION
+
+    try:
+        res = (
+            _get_supabase()
+            .table(CACHE_TABLE)
+            .select("fingerprint,source_job_id,created_at,rates_version,schema_version,payload,hit_count")
+            .eq("fingerprint", fingerprint)
+            .limit(1)
+            .execute()
+        )
+    except Exception as e:
+        _warn_once("lookup", e)
+        return None
+    row = (res.data or [None])[0]
+    if not row:
+        return None
+    payload = row.get("payload") if isinstance(row.get("payload"), dict) else {}
+    if not (payload.get("report") or {}).get("text") or not (payload.get("pdf") or {}).get("public_url"):
+        return None
+    created = row.get("created_at") or ""
+    cached = CachedAnalysis(
+        fingerprint=fingerprint,
+        source_job_id=row.get("source_job_id"),
+        created_at=created,
+        payload=payload,
+    )
+    if not fresh_only:
+        return cached
+
+    try:
+        created_at = datetime.fromisoformat(created.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    if datetime.now(timezone.utc) - created_at > cache_ttl():
+        return None
+    if row.get("rates_version") != _rates_version() or row.get("schema_version") != SCHEMA_VERSION:
+        return None
+
+    try:
+        _get_supabase().table(CACHE_TABLE).update(
+            {
+                "hit_count": int(row.get("hit_count") or 0) + 1,
+                "last_hit_at": datetime.now(timezone.utc).isoformat(),
+            }
+        ).eq("fingerprint", fingerprint).execute()
+    except Exception as e:
+        logger.debug("Analysis cache: hit count update failed: %s", e)
+    return cached
+
+
+def store_cached_analysis(
+    job_id: str,
+    keywords: str,
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+    report: dict[str, Any],
+    pdf: dict[str, Any],
+) -> bool:
+    """Upsert a completed keyword job's report and uploaded PDF (sync)."""
+    if not keywords or not analysis_cache_enabled() or not report.get("text") or not pdf.get("public_url"):
+        return False
+    from .report_schema import SCHEMA_VERSION
+
+    fingerprint = query_fingerprint(keywords, user_country, user_region, user_currency)
+    try:
+        _get_supabase().table(CACHE_TABLE).upsert(
+            {
+                "fingerprint": fingerprint,
+                "query": normalize_query(keywords),
+                "user_country": user_country or None,
+                "user_region": user_region or None,
+                "user_currency": user_currency or None,
+                "rates_version": _rates_version(),
+                "schema_version": SCHEMA_VERSION,
+                "payload": {"keywords": keywords, "report": report, "pdf": pdf},
+                "source_job_id": job_id,
+                "hit_count": 0,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "last_hit_at": None,
+            },
+            on_conflict="fingerprint",
+        ).execute()
+    except Exception as e:
+        _warn_once("store", e)
+        return False
+    from .semantic_cache import index_analysis
+
+    index_analysis(fingerprint, keywords, user_country, user_region, user_currency)
+    return True
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
 
 from .supabase_resilience import is_transient_http_error
 
@@ -17,3 +18,24 @@ def raise_service_unavailable(exc: BaseException | None = None) -> None:
         detail=detail,
         headers={"Retry-After": "3"},
     )
+
+
+async def analysis_backlog_response() -> JSONResponse | None:
+    """429 with Retry-After when the analysis queue is full (app/admission.py), else None."""
+    from starlette.concurrency import run_in_threadpool
+
+    from ..admission import admission
+
+    retry_after = await run_in_threadpool(admission.backlog_retry_after)
+    if retry_after is None:
+        return None
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={
+            "success": False,
+            "error": "analysis_backlog_full",
+            "message": "Too many analyses are waiting right now. Please try again shortly.",
+            "retry_after": retry_after,
+        },
+        headers={"Retry-After": str(retry_after)},
+    )
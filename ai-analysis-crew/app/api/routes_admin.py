@@ -1639,6 +1639,69 @@ async def admin_app_errors(
     )
 
 
+@router.get("/email-outbox/stats")
+async def admin_email_outbox_stats(
+    _admin: CurrentUser = Depends(require_roles("admin", "super_admin")),
+):
+    """Outbox depth per status plus this API process's enqueue/send/retry counters."""
+    from ..email_outbox import outbox_stats
+
+    supabase = get_supabase_admin()
+    return api_ok(data=await run_in_threadpool(outbox_stats, supabase))
+
+
+@router.get("/llm-usage")
+async def admin_llm_usage(
+    days: int = Query(default=30, ge=1, le=365),
+    top: int = Query(default=20, ge=1, le=200),
+    _admin: CurrentUser = Depends(require_roles("admin", "super_admin")),
+):
+    """LLM tokens and cost per tier, step/agent and model, plus the most expensive analyses."""
+    from ..llm_usage import usage_report
+
+    supabase = get_supabase_admin()
+    try:
+        report = await run_in_threadpool(usage_report, supabase, days=days, top=top)
+    except Exception as e:
+        return api_error(f"LLM usage unavailable (run docs/sql/llm_usage_events.sql): {e}", status_code=503)
+    return api_ok(data=report)
+
+
+@router.get("/email-outbox/dead-letters")
+async def admin_email_dead_letters(
+    kind: str | None = None,
+    page: int = Query(default=1, ge=1),
+    limit: int = Query(default=50, ge=1, le=200),
+    _admin: CurrentUser = Depends(require_roles("admin", "super_admin")),
+):
+    supabase = get_supabase_admin()
+    offset = (page - 1) * limit
+    q = supabase.table("email_dead_letters").select("*", count="exact").order("created_at", desc=True)
+    if kind and kind != "all":
+        q = q.eq("kind", kind)
+    res = q.range(offset, offset + limit - 1).execute()
+    total = _count_from_response(res, len(res.data or []))
+    return api_ok(
+        data={
+            "dead_letters": res.data or [],
+            "pagination": {"page": page, "limit": limit, "total": total},
+        }
+    )
+
+
+@router.post("/email-outbox/dead-letters/{deadLetterId}/requeue")
+async def admin_requeue_dead_letter(
+    deadLetterId: str = Path(...),
+    _admin: CurrentUser = Depends(require_roles("admin", "super_admin")),
+):
+    from ..email_outbox import requeue_dead_letter
+
+    supabase = get_supabase_admin()
+    if not await run_in_threadpool(requeue_dead_letter, supabase, deadLetterId):
+        return api_error("Dead letter not found", status_code=404)
+    return api_ok(data={"requeued": True})
+
+
 @router.get("/audit-logs")
 async def admin_audit_logs(
     page: int = Query(default=1, ge=1),
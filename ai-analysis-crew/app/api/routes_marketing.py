@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import csv
 import io
 import json
@@ -9,7 +10,6 @@ import logging
 import os
 import re
 import secrets
-from difflib import SequenceMatcher
 from datetime import datetime, timedelta, timezone
 from typing import Any, Literal
 
@@ -17,13 +17,16 @@ from fastapi import APIRouter, Body, Depends, File, Form, HTTPException, Query,
 from fastapi.responses import RedirectResponse, Response
 from pydantic import BaseModel, Field
 
-from ..marketing_crew import (
-    auto_extract_email_from_csv_row,
-    extract_lead_fields_from_csv_row,
-    generate_email_with_openai,
-    generate_serp_discovery_queries,
-)
+from ..marketing_crew import generate_email_with_openai, generate_serp_discovery_queries
 from ..marketing_discovery_queries import prepare_discovery_queries, record_discovery_queries_run
+from ..marketing_import import (
+    IMPORTS_TABLE,
+    CsvImportError,
+    build_lead_payload,
+    open_csv,
+    run_csv_import,
+    start_background_import,
+)
 from ..marketing_pipeline import (
     frontend_base_url,
     log_error,
@@ -35,12 +38,15 @@ from ..marketing_pipeline import (
     send_marketing_email,
 )
 from ..marketing_sanitize import (
-    apply_sanitize_result_to_payload,
-    sanitize_lead_for_storage,
+    collect_sanitize_batch_jobs,
+    sanitize_mode,
+    submit_sanitize_batch_job,
 )
 from ..marketing_rules import (
     LeadInsertResult,
     app_user_exists_for_email,
+    existing_app_user_emails,
+    existing_marketing_lead_emails,
     is_disposable_domain,
     is_valid_email,
     marketing_lead_exists,
@@ -53,6 +59,7 @@ from ..marketing_outbound_defaults import (
     sanitize_review_batch_cap,
 )
 from ..marketing_serpapi import organic_results_to_lead_candidates, search_google
+from ..marketing_track_events import record_click, record_open
 from ..marketing_tracking import gif_pixel_response, validate_redirect_url
 from .auth_dependencies import CurrentUser, require_roles
 from .responses import api_error, api_ok
@@ -834,51 +841,48 @@ def _insert_marketing_lead(
     campaign_id: str | None,
     source: str,
     run_sanitize: bool,
+    known_lead_emails: set[str] | None = None,
+    known_user_emails: set[str] | None = None,
 ) -> LeadInsertResult:
+    """
+    Insert one lead. Callers that prefetched duplicates for a whole batch
+    (existing_marketing_lead_emails / existing_app_user_emails) pass those sets
+    to skip the per-email lookups; created emails are added to known_lead_emails.
+    """
     raw = {k: v for k, v in dict(row).items() if k not in ("sanitization_status", "source")}
     raw = normalize_row(raw)
     email = normalize_email(raw.get("email") or raw.get("EMAIL"))
     if not email:
         return LeadInsertResult(None, "missing_email")
 
-    if marketing_lead_exists(supabase, email):
+    if known_lead_emails is not None:
+        if email in known_lead_emails:
+            return LeadInsertResult(None, "duplicate_lead")
+    elif marketing_lead_exists(supabase, email):
         return LeadInsertResult(None, "duplicate_lead")
-    if app_user_exists_for_email(supabase, email):
+    if known_user_emails is not None:
+        if email in known_user_emails:
+            return LeadInsertResult(None, "duplicate_user")
+    elif app_user_exists_for_email(supabase, email):
         return LeadInsertResult(None, "duplicate_user")
-    full_name = raw.get("full_name") or raw.get("FULL_NAME") or ""
-    job_title = raw.get("job_title") or raw.get("JOB_TITLE") or ""
-    company = raw.get("company_name") or raw.get("COMPANY_NAME") or ""
-    platform = raw.get("platform") or ""
-
     effective_campaign = (str(campaign_id).strip() if campaign_id else "") or None
     if not effective_campaign:
         effective_campaign = default_campaign_id_for_new_leads(supabase)
 
-    payload = {
-        "full_name": str(full_name).strip() or None,
-        "job_title": str(job_title).strip() or None,
-        "company_name": str(company).strip() or None,
-        "platform": str(platform).strip() or None,
-        "email": email,
-        "source": source,
-        "campaign_id": effective_campaign,
-        "raw_payload": raw,
-        "lead_status_internal": "pending",
-    }
-
-    if email and is_valid_email(email):
-        sr = sanitize_lead_for_storage(raw, email=email, run_sanitize=run_sanitize)
-        apply_sanitize_result_to_payload(payload, sr)
-    else:
-        payload["sanitization_status"] = "review"
-        payload["crew_trace"] = "missing_or_invalid_email"
-
-    payload["unsubscribe_token"] = secrets.token_urlsafe(32)
+    payload = build_lead_payload(
+        raw,
+        email=email,
+        campaign_id=effective_campaign,
+        source=source,
+        run_sanitize=run_sanitize,
+    )
 
     try:
         ins = supabase.table("marketing_leads").insert(payload).execute()
         lead = (ins.data or [None])[0]
         if lead:
+            if known_lead_emails is not None:
+                known_lead_emails.add(email)
             return LeadInsertResult(lead, "created")
     except Exception as e:
         msg = str(e).lower()
@@ -896,24 +900,14 @@ async def import_leads_csv(
     campaign_id: str | None = Form(None),
     run_sanitize: bool = Form(True),
     column_map: str | None = Form(None),
+    background: bool = Form(False),
     _admin: CurrentUser = Depends(require_roles("admin", "super_admin")),
 ):
+    """
+    Streaming import (app/marketing_import.py). background=true returns an
+    import id at once; poll GET /leads/import/{import_id} for progress.
+    """
     supabase = get_supabase_admin()
-    raw_bytes = await file.read()
-    if not raw_bytes:
-        return api_error("Uploaded file is empty", status_code=400)
-    text = ""
-    decode_errors: list[str] = []
-    for enc in ("utf-8-sig", "utf-16", "utf-16le", "utf-16be", "latin-1"):
-        try:
-            text = raw_bytes.decode(enc)
-            break
-        except Exception as e:
-            decode_errors.append(f"{enc}:{e}")
-    if not text:
-        raise HTTPException(status_code=400, detail="Could not decode file. Save as UTF-8/UTF-16 CSV or TSV.")
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-
     mapping: dict[str, str] = {}
     if column_map:
         try:
@@ -921,195 +915,54 @@ async def import_leads_csv(
         except Exception:
             # Be permissive: ignore malformed column_map and continue with auto-detect.
             mapping = {}
+    filename = getattr(file, "filename", None) or "unknown"
 
-    sample = text[:8192]
     try:
-        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
-        delimiter = dialect.delimiter
-    except Exception:
-        delimiter = ","
-
-    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
-    if not reader.fieldnames:
-        return api_error(
-            "CSV has no header row. Ensure first row contains column names (e.g. EMAIL, FULL_NAME, COMPANY_NAME).",
-            status_code=400,
-        )
-
-    # Some ".csv" exports still use tabs/semicolons. Recover if header parsed as one giant column.
-    if len(reader.fieldnames) == 1:
-        single = (reader.fieldnames[0] or "")
-        fallback_delim = None
-        if "\t" in single:
-            fallback_delim = "\t"
-        elif ";" in single:
-            fallback_delim = ";"
-        elif "|" in single:
-            fallback_delim = "|"
-        if fallback_delim:
-            delimiter = fallback_delim
-            reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
-            if not reader.fieldnames:
-                return api_error("CSV header could not be parsed", status_code=400)
-
-    # Remove blank header columns from exports that start with empty tab/commas.
-    reader.fieldnames = [(h or "").strip() for h in reader.fieldnames if (h or "").strip()]
-    if not reader.fieldnames:
-        return api_error("CSV header is empty after normalization", status_code=400)
+        if background:
+            job = await start_background_import(
+                supabase,
+                file.file,
+                filename=filename,
+                mapping=mapping,
+                campaign_id=campaign_id,
+                run_sanitize=run_sanitize,
+            )
+            if job is not None:
+                return api_ok(data={"import_id": job["id"], "status": job.get("status") or "running"})
+        reader, delimiter = await asyncio.to_thread(open_csv, file.file)
+    except CsvImportError as e:
+        return api_error(str(e), status_code=400)
 
     logger.info(
         "marketing import: filename=%s delimiter=%r headers=%s",
-        getattr(file, "filename", "unknown"),
+        filename,
         delimiter,
-        reader.fieldnames[:20],
+        (reader.fieldnames or [])[:20],
     )
+    stats = await run_csv_import(
+        supabase,
+        reader,
+        mapping=mapping,
+        campaign_id=campaign_id,
+        run_sanitize=run_sanitize,
+    )
+    return api_ok(data={**stats.summary(), "delimiter": delimiter})
 
-    def _norm_header(v: str) -> str:
-        return re.sub(r"[^a-z0-9]+", "", (v or "").strip().lower())
-
-    def _guess_email_col(headers: list[str]) -> str | None:
-        preferred = {
-            "email",
-            "emailaddress",
-            "workemail",
-            "businessemail",
-            "contactemail",
-            "companyemail",
-            "primaryemail",
-            "officialemail",
-        }
-        scored: list[tuple[float, str]] = []
-        for h in headers:
-            nh = _norm_header(h)
-            if not nh:
-                continue
-            if nh in preferred:
-                return h
-            score = max(
-                SequenceMatcher(None, nh, "email").ratio(),
-                SequenceMatcher(None, nh, "emailaddress").ratio(),
-                0.92 if "email" in nh else 0.0,
-            )
-            scored.append((score, h))
-        if not scored:
-            return None
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return scored[0][1] if scored[0][0] >= 0.58 else None
-
-    def col(key: str, default_alts: list[str]) -> str | None:
-        if mapping.get(key):
-            return mapping[key]
-        fieldnames = list(reader.fieldnames or [])
-        norm_map = {_norm_header(h): h for h in fieldnames}
-        for a in default_alts:
-            direct = norm_map.get(_norm_header(a))
-            if direct:
-                return direct
-        return None
-
-    email_c = col("email", ["EMAIL", "email", "Email"]) or _guess_email_col(list(reader.fieldnames or []))
-
-    fn_c = col("full_name", ["FULL_NAME", "full_name", "Name"])
-    job_c = col("job_title", ["JOB_TITLE", "job_title"])
-    co_c = col("company_name", ["COMPANY_NAME", "company_name", "Company"])
-    plat_c = col("platform", ["platform", "Platform"])
-
-    imported = 0
-    skipped_no_email = 0
-    skipped_duplicate_lead = 0
-    skipped_duplicate_user = 0
-    errors: list[str] = []
-
-    for i, row in enumerate(reader):
-        try:
-            # Skip blank rows
-            if not row or all(not str(v or "").strip() for v in row.values()):
-                continue
-
-            # Remove empty-key columns (common in sheet exports with extra separators)
-            row = {str(k or "").strip(): (v or "") for k, v in row.items() if str(k or "").strip()}
-
-            out: dict[str, Any] = {}
-            mapped_email = (row.get(email_c) or "").strip() if email_c else ""
-            auto_email = auto_extract_email_from_csv_row({k: (v or "") for k, v in row.items()})
-            # Always prioritize AI/auto extraction for emails.
-            em = auto_email or mapped_email
-            if fn_c:
-                out["full_name"] = (row.get(fn_c) or "").strip()
-            if job_c:
-                out["job_title"] = (row.get(job_c) or "").strip()
-            if co_c:
-                out["company_name"] = (row.get(co_c) or "").strip()
-            if plat_c:
-                out["platform"] = (row.get(plat_c) or "").strip()
-
-            # Only call AI extraction when we actually need it (reduces import latency/timeouts).
-            needs_ai_extract = (
-                not em
-                or not out.get("full_name")
-                or not out.get("job_title")
-                or not out.get("company_name")
-                or not out.get("platform")
-            )
-            ai_extracted = None
-            if needs_ai_extract:
-                ai_extracted = extract_lead_fields_from_csv_row({k: (v or "") for k, v in row.items()})
-                if not em:
-                    em = ai_extracted.email.strip()
-            out["email"] = em
-            if not out["email"] or not is_valid_email(out["email"]):
-                skipped_no_email += 1
-                continue
-            if fn_c:
-                out["full_name"] = out.get("full_name") or ""
-            if not out.get("full_name") and ai_extracted:
-                out["full_name"] = ai_extracted.full_name
-            if job_c:
-                out["job_title"] = out.get("job_title") or ""
-            if not out.get("job_title") and ai_extracted:
-                out["job_title"] = ai_extracted.job_title
-            if co_c:
-                out["company_name"] = out.get("company_name") or ""
-            if not out.get("company_name") and ai_extracted:
-                out["company_name"] = ai_extracted.company_name
-            if plat_c:
-                out["platform"] = out.get("platform") or ""
-            if not out.get("platform"):
-                out["platform"] = (ai_extracted.platform if ai_extracted else "") or "csv_import"
-
-            result = _insert_marketing_lead(
-                supabase,
-                out,
-                campaign_id=campaign_id,
-                source="csv_import",
-                run_sanitize=run_sanitize,
-            )
-            if result.status == "created":
-                imported += 1
-            elif result.status == "duplicate_lead":
-                skipped_duplicate_lead += 1
-            elif result.status == "duplicate_user":
-                skipped_duplicate_user += 1
-            elif result.status == "missing_email":
-                skipped_no_email += 1
-            else:
-                errors.append(f"row {i+2}: could not insert lead")
-        except Exception as e:
-            errors.append(f"row {i+2}: {e}")
-
-    if errors:
-        log_error(supabase, severity="warning", message="csv_import partial errors", context={"errors": errors[:50]})
 
-    return api_ok(
-        data={
-            "imported": imported,
-            "skipped_no_email": skipped_no_email,
-            "skipped_duplicate_lead": skipped_duplicate_lead,
-            "skipped_duplicate_user": skipped_duplicate_user,
-            "delimiter": delimiter,
-            "errors": errors[:20],
-        }
-    )
+@admin_router.get("/leads/import/{import_id}")
+async def get_leads_import(
+    import_id: str,
+    _admin: CurrentUser = Depends(require_roles("admin", "super_admin")),
+):
+    supabase = get_supabase_admin()
+    try:
+        res = supabase.table(IMPORTS_TABLE).select("*").eq("id", import_id).limit(1).execute()
+    except Exception as e:
+        logger.exception("get_leads_import")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if not res.data:
+        return api_error("Import not found", status_code=404)
+    return api_ok(data=res.data[0])
 
 
 def _run_google_serp_discovery(
@@ -1173,18 +1026,22 @@ def _run_google_serp_discovery(
                     list(resp.keys())[:20],
                 )
             candidates = organic_results_to_lead_candidates(resp, query=q)
+            usable = [c for c in candidates if _discovery_candidate_has_usable_email(c)]
+            batch_emails = [c.get("email") for c in usable]
+            known_leads = existing_marketing_lead_emails(supabase, batch_emails)
+            known_users = existing_app_user_emails(supabase, batch_emails)
             stored_q = 0
-            for c in candidates:
+            for c in usable:
                 if tag_cc:
                     c["target_country_code"] = tag_cc
-                if not _discovery_candidate_has_usable_email(c):
-                    continue
                 result = _insert_marketing_lead(
                     supabase,
                     c,
                     campaign_id=campaign_id,
                     source=lead_source,
                     run_sanitize=True,
+                    known_lead_emails=known_leads,
+                    known_user_emails=known_users,
                 )
                 if result.status == "created":
                     created += 1
@@ -1255,7 +1112,8 @@ async def discover_serpapi(
     if not queries_to_run:
         return api_error("No discovery queries available for this run", status_code=400)
 
-    data = _run_google_serp_discovery(
+    data = await asyncio.to_thread(
+        _run_google_serp_discovery,
         supabase,
         queries=queries_to_run,
         key_override=key_override,
@@ -1658,11 +1516,30 @@ def run_marketing_sanitize_cron_job(supabase: Any, *, max_total: int | None = No
             "note": "sanitize_review_batch is 0 — enable in admin settings",
         }
     total_cap = max_total if max_total is not None else max(scap * 5, 500)
-    result = run_marketing_sanitize_review_drain(
-        supabase,
-        batch_size=scap,
-        max_total=max(1, min(int(total_cap), 2000)),
-    )
+    # Finished Batch API jobs are written back whichever mode is active now.
+    try:
+        batch_jobs = collect_sanitize_batch_jobs(supabase)
+    except Exception as e:
+        # Quiet in sync mode: the table only exists once batch_api has been set up.
+        (logger.warning if sanitize_mode() == "batch_api" else logger.debug)(
+            "marketing sanitize: collecting batch jobs failed: %s", e
+        )
+        batch_jobs = {"ok": False, "error": str(e)}
+    if sanitize_mode() == "batch_api":
+        try:
+            result = submit_sanitize_batch_job(supabase, max_leads=max(int(total_cap), scap))
+        except Exception as e:
+            logger.error("marketing sanitize: batch submit failed: %s", e)
+            result = {"ok": False, "error": str(e)}
+        result["mode"] = "batch_api"
+    else:
+        result = run_marketing_sanitize_review_drain(
+            supabase,
+            batch_size=scap,
+            max_total=max(1, min(int(total_cap), 2000)),
+        )
+        result["mode"] = "sync"
+    result["batch_jobs"] = batch_jobs
     result["batch_size"] = scap
     return result
 
@@ -1671,7 +1548,8 @@ def run_marketing_sanitize_cron_job(supabase: Any, *, max_total: int | None = No
 async def cron_marketing_send(limit: int = Query(default=20, ge=1, le=200)):
     supabase = get_supabase_admin()
     try:
-        result = run_marketing_send_cron(supabase, max_batch=limit)
+        # Blocking (runs the async send engine on its own loop) — keep it off the event loop.
+        result = await asyncio.to_thread(run_marketing_send_cron, supabase, max_batch=limit)
         return result
     except Exception as e:
         logger.error("cron marketing-send: %s", e)
@@ -1702,37 +1580,17 @@ async def cron_marketing_sanitize(max_total: int = Query(default=500, ge=1, le=2
 async def cron_marketing_discover(max_queries: int = Query(default=2, ge=1, le=10)):
     """Scheduled Google discovery using saved query templates (Serper.dev by default)."""
     supabase = get_supabase_admin()
-    return run_marketing_discover_cron_job(supabase, max_queries=max_queries)
+    return await asyncio.to_thread(run_marketing_discover_cron_job, supabase, max_queries=max_queries)
 
 
 @cron_router.api_route("/track/mopen/{token}", methods=["GET", "HEAD"])
 async def marketing_track_open(request: Request, token: str):
-    """1x1 pixel: record an open for a sent marketing email (requires tracking_token on marketing_sends)."""
+    """1x1 pixel: record an open for a sent marketing email (buffered; see app/marketing_track_events.py)."""
     body, hdr = gif_pixel_response()
     headers = dict(hdr)
     t = (token or "").strip()
     if 8 <= len(t) <= 128:
-        try:
-            supabase = get_supabase_admin()
-            r = (
-                supabase.table("marketing_sends")
-                .select("id,open_count,first_opened_at")
-                .eq("tracking_token", t)
-                .eq("status", "sent")
-                .limit(1)
-                .execute()
-            )
-            rows = r.data or []
-            if rows:
-                row = rows[0]
-                now = datetime.now(timezone.utc).isoformat()
-                oc = int(row.get("open_count") or 0) + 1
-                patch: dict[str, Any] = {"open_count": oc}
-                if not row.get("first_opened_at"):
-                    patch["first_opened_at"] = now
-                supabase.table("marketing_sends").update(patch).eq("id", row["id"]).execute()
-        except Exception as e:
-            logger.debug("marketing_track_open: %s", e)
+        record_open(t)
     if request.method == "HEAD":
         return Response(status_code=200, headers=headers, media_type=headers.get("Content-Type"))
     return Response(content=body, headers=headers, media_type=headers.get("Content-Type"))
@@ -1740,32 +1598,12 @@ async def marketing_track_open(request: Request, token: str):
 
 @cron_router.get("/track/mclk/{token}")
 async def marketing_track_click(token: str, u: str = Query(..., description="Destination URL (http/https)")):
-    """Redirect through the API to count a link click, then 302 to the original URL."""
+    """Count a link click (buffered, applied by the tracking flusher), then 302 to the original URL."""
     t = (token or "").strip()
     dest = validate_redirect_url(u)
     if not (8 <= len(t) <= 128) or not dest:
         raise HTTPException(status_code=400, detail="Invalid link")
-    try:
-        supabase = get_supabase_admin()
-        r = (
-            supabase.table("marketing_sends")
-            .select("id,click_count,first_clicked_at")
-            .eq("tracking_token", t)
-            .eq("status", "sent")
-            .limit(1)
-            .execute()
-        )
-        rows = r.data or []
-        if rows:
-            row = rows[0]
-            now = datetime.now(timezone.utc).isoformat()
-            cc = int(row.get("click_count") or 0) + 1
-            patch: dict[str, Any] = {"click_count": cc}
-            if not row.get("first_clicked_at"):
-                patch["first_clicked_at"] = now
-            supabase.table("marketing_sends").update(patch).eq("id", row["id"]).execute()
-    except Exception as e:
-        logger.debug("marketing_track_click: %s", e)
+    record_click(t)
     return RedirectResponse(url=dest, status_code=302)
 
 
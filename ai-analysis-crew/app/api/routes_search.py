@@ -12,6 +12,7 @@ from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from .auth_dependencies import CurrentUser, get_current_user
+from .http_errors import analysis_backlog_response
 from .plan_enforcement import get_user_tier_and_limits
 from .responses import api_ok, api_error
 
@@ -24,6 +25,8 @@ class KeywordSearchRequest(BaseModel):
     user_country: Optional[str] = None
     user_region: Optional[str] = None
     user_currency: Optional[str] = None
+    # Skip the result cache and run the full crew
+    force_fresh: bool = False
 
 
 @router.post("/keywords")
@@ -53,6 +56,10 @@ async def search_keywords(
         if not keywords:
             return api_error("Keywords are required", status_code=400)
 
+        backlog = await analysis_backlog_response()
+        if backlog is not None:
+            return backlog
+
         from ..content_validator import validate_keywords
 
         kw_validation = await run_in_threadpool(lambda: validate_keywords(keywords))
@@ -142,6 +149,8 @@ async def search_keywords(
                     keywords_label=keywords,
                     credit_charged=credit_charged,
                     billing_user_id=user.id,
+                    tier=tier,
+                    force_fresh=payload.force_fresh,
                 )
             )
 
@@ -183,6 +192,7 @@ async def schedule_keyword_search(
         user_country = body.get("user_country") or None
         user_region = body.get("user_region") or None
         user_currency = body.get("user_currency") or None
+        force_fresh = bool(body.get("force_fresh"))
 
         # Handle keywords as either string or array
         if isinstance(keywords_raw, list):
@@ -196,6 +206,10 @@ async def schedule_keyword_search(
                 status_code=400, content={"error": "Keywords are required"}
             )
 
+        backlog = await analysis_backlog_response()
+        if backlog is not None:
+            return backlog
+
         from ..content_validator import validate_keywords
 
         kw_validation = await run_in_threadpool(lambda: validate_keywords(keywords))
@@ -256,6 +270,7 @@ async def schedule_keyword_search(
                 user_region=user_region,
                 user_currency=user_currency,
                 user_id=user.id if user else None,
+                force_fresh=force_fresh,
             )
         )
 
@@ -292,6 +307,11 @@ async def get_keyword_search_status(job_id: str):
         if not job_status:
             return api_error("Job not found", status_code=404)
 
+        if job_status.get("current_stage") == "queued":
+            from ..admission import admission
+
+            job_status["queue_position"] = await run_in_threadpool(admission.queue_position, job_id)
+
         return api_ok(data=job_status)
 
     except Exception as e:
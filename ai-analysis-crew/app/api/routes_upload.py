@@ -14,6 +14,7 @@ from fastapi.responses import JSONResponse
 from starlette.concurrency import run_in_threadpool
 
 from .auth_dependencies import CurrentUser, get_current_user, require_roles
+from .http_errors import analysis_backlog_response
 from .plan_enforcement import check_upload_limit, get_profile_role, get_user_tier_and_limits
 from .workspace_dependencies import (
     WorkspaceScope,
@@ -163,7 +164,12 @@ async def get_crew_analysis_job(
         if not result.data:
             return api_error("Job not found", status_code=404)
 
-        return api_ok(data=result.data)
+        job = result.data
+        if job.get("current_stage") == "queued":
+            from ..admission import admission
+
+            job = {**job, "queue_position": await run_in_threadpool(admission.queue_position, job_id)}
+        return api_ok(data=job)
 
     except Exception as e:
         print(f"❌ Failed to fetch crew analysis job: {e}")
@@ -194,6 +200,10 @@ async def create_crew_analysis_job(
         workspace_id = scope.workspace_id
         user_email = user.email
 
+        backlog = await analysis_backlog_response()
+        if backlog is not None:
+            return backlog
+
         image_data = await image.read()
 
         from ..content_validator import validate_upload_content
@@ -380,6 +390,7 @@ async def create_crew_analysis_job(
                 image_name=image.filename,
                 credit_charged=credit_charged,
                 billing_user_id=billing_user_id,
+                tier=tier,
             )
         )
 
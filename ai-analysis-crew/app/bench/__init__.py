@@ -0,0 +1,6 @@
+"""Offline benchmarks for the analysis pipeline (no OpenAI / Supabase / SMTP needed).
+
+Run a single benchmark with ``python -m app.bench.<name>`` from ai-analysis-crew/.
+``python -m app.bench`` runs whole analysis jobs end to end against a local
+Supabase stub and a deterministic fake LLM (see app/bench/__main__.py).
+"""
@@ -0,0 +1,331 @@
+"""
+End-to-end pipeline benchmark against local fakes (no network).
+
+  python -m app.bench [--jobs 8] [--workers 2] [--llm-latency-ms 40]
+                      [--ms-per-token 0.5] [--db-latency-ms 2] [--tracemalloc]
+                      [--json out.json] [--baseline base.json --tolerance 0.15]
+                      [--cassette recorded.jsonl [--latency-scale 1.0]]
+
+Starts a SupabaseStub and a FakeOpenAI server (app/bench/stubs.py), points
+SUPABASE_URL / OPENAI_BASE_URL at them, then runs ``--jobs`` keyword jobs
+through ``run_analysis_background`` concurrently: admission, leases, the
+CrewAI kickoff with routing / compaction / usage ledger, PDF render and
+upload, storage and completion all run as in production. Reported:
+
+- throughput (jobs/s) and job latency p50 / p95
+- per-stage latency p50 / p95 from the crew_analysis_jobs stage updates
+- event-loop lag p50 / p99 / max (50 ms ticker)
+- peak busy threads and queue depth of CREW_EXECUTOR and the default executor
+- RSS high-water mark (and tracemalloc peak with --tracemalloc)
+
+With --baseline, throughput, job p95 and loop-lag p99 are compared against a
+previous --json file; a change worse than --tolerance exits with status 1.
+The result caches are disabled so every job runs the crew.
+
+With --cassette, LLM traffic is replayed from a cassette recorded against the
+real API (app/bench/cassette.py) with its recorded latencies, instead of the
+FakeOpenAI answers; Supabase stays on the stub.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from .cassette import REPLAY, cassette
+from .stubs import FakeOpenAI, SupabaseStub
+
+_QUERIES = [
+    "Bosch 0 986 435 505 fuel injector",
+    "SKF 6205-2RS deep groove ball bearing",
+    "Siemens 3RT2026-1BB40 contactor",
+    "Denso 234-9100 oxygen sensor",
+    "Gates 5PK1035 poly v belt",
+    "ABB ACS580-01-12A7-4 drive",
+    "NGK BKR6E spark plug",
+    "Mahle OC 90 oil filter",
+]
+
+# Shaped like a JWT: supabase-py rejects keys that are not.
+_FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench"
+
+
+def _configure_env(supabase_url: str, openai_url: Optional[str], args: argparse.Namespace) -> None:
+    """Must run before app.main (and database_storage) is imported."""
+    if openai_url is None:
+        # Replaying a cassette: keep the recorded API host.
+        for name in ("OPENAI_BASE_URL", "OPENAI_API_BASE"):
+            os.environ.pop(name, None)
+    else:
+        os.environ["OPENAI_BASE_URL"] = os.environ["OPENAI_API_BASE"] = f"{openai_url}/v1"
+    os.environ.update({
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_SERVICE_KEY": _FAKE_KEY,
+        "SUPABASE_ANON_KEY": _FAKE_KEY,
+        "OPENAI_API_KEY": "sk-bench",
+        "ANALYSIS_CACHE_ENABLED": "0",
+        "SEMANTIC_CACHE_ENABLED": "0",
+        "CREW_ANALYSIS_WORKERS": str(args.workers),
+        "CREW_ADMISSION_MAX_QUEUE": str(max(50, args.jobs)),
+        "CREW_CONTEXT_COMPACTION": "0" if args.no_compaction else "1",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+        # Empty wins over .env (load_dotenv does not override): no SMTP, email service or Redis.
+        "SMTP_USER": "",
+        "SMTP_PASSWORD": "",
+        "GMAIL_USER": "",
+        "EMAIL_SERVICE_URL": "",
+        "REDIS_URL": "",
+        "REDIS_HOST": "",
+    })
+
+
+def _pct(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(round(q * (len(values) - 1))))], 1)
+
+
+class _Sampler:
+    """Event-loop lag and thread-pool occupancy, sampled every ``interval`` seconds."""
+
+    def __init__(self, pools: dict[str, Optional[ThreadPoolExecutor]], interval: float = 0.05):
+        self.pools = pools
+        self.interval = interval
+        self.lag_ms: list[float] = []
+        self.busy = {name: 0 for name in pools}
+        self.queued = {name: 0 for name in pools}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag_ms.append(max(0.0, (loop.time() - t0 - self.interval) * 1000))
+            for name, pool in self.pools.items():
+                if pool is None:
+                    continue
+                idle = getattr(getattr(pool, "_idle_semaphore", None), "_value", 0)
+                self.busy[name] = max(self.busy[name], len(pool._threads) - idle)
+                self.queued[name] = max(self.queued[name], pool._work_queue.qsize())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def _stage_latencies(history: list[tuple[str, float, Optional[str], Optional[str]]]) -> dict[str, list[float]]:
+    """ms spent in each current_stage, from consecutive stage changes per job."""
+    per_job: dict[str, list[tuple[float, Optional[str]]]] = {}
+    for job_id, t, _status, stage in history:
+        marks = per_job.setdefault(job_id, [])
+        if stage and (not marks or marks[-1][1] != stage):
+            marks.append((t, stage))
+    out: dict[str, list[float]] = {}
+    for marks in per_job.values():
+        for (t0, stage), (t1, _next) in zip(marks, marks[1:]):
+            out.setdefault(stage or "?", []).append((t1 - t0) * 1000)
+    return out
+
+
+async def _run(args: argparse.Namespace, supabase: SupabaseStub, llm: Optional[FakeOpenAI]) -> dict[str, Any]:
+    from ..concurrency import CREW_EXECUTOR, configure_server_concurrency
+    from ..main import run_analysis_background
+
+    configure_server_concurrency()
+    loop = asyncio.get_running_loop()
+    user_id = str(uuid.uuid4())
+    email = "bench@example.com"
+    supabase.seed("profiles", [{"id": user_id, "email": email, "country": "US", "currency": "USD"}])
+    jobs = []
+    for i in range(args.jobs):
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "user_email": email,
+            "keywords": f"{_QUERIES[i % len(_QUERIES)]} #{i}",
+            "status": "pending",
+            "current_stage": "pending",
+            "progress": 0,
+        }
+        jobs.append(job)
+    supabase.seed("crew_analysis_jobs", jobs)
+
+    sampler = _Sampler({"crew": CREW_EXECUTOR, "default": getattr(loop, "_default_executor", None)})
+    sampler.start()
+    latencies: list[float] = []
+
+    async def _one(job: dict[str, Any]) -> None:
+        t0 = time.perf_counter()
+        await run_analysis_background(
+            job["id"], email, None, job["keywords"], user_id=user_id, tier="pro", force_fresh=True
+        )
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(_one(j) for j in jobs))
+    elapsed = time.perf_counter() - t_start
+    await sampler.stop()
+
+    rows = {r["id"]: r for r in supabase.tables.get("crew_analysis_jobs", [])}
+    statuses = [rows.get(j["id"], {}).get("status") for j in jobs]
+    stage_ms: dict[str, list[float]] = {}
+    for j in jobs:
+        context = ((rows.get(j["id"], {}).get("result_data") or {}).get("context")) or {}
+        for stage, stats in context.items():
+            if isinstance(stats, dict) and stats.get("stage_ms") is not None:
+                stage_ms.setdefault(stage, []).append(float(stats["stage_ms"]))
+
+    return {
+        "jobs": args.jobs,
+        "workers": args.workers,
+        "completed": statuses.count("completed"),
+        "failed": sum(1 for s in statuses if s != "completed"),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_jobs_per_s": round(args.jobs / elapsed, 3) if elapsed else None,
+        "job_ms": {"p50": _pct(latencies, 0.5), "p95": _pct(latencies, 0.95)},
+        "job_stage_ms": {
+            stage: {"p50": _pct(v, 0.5), "p95": _pct(v, 0.95), "n": len(v)}
+            for stage, v in _stage_latencies(supabase.job_history).items()
+        },
+        "crew_stage_ms": {stage: {"p50": _pct(v, 0.5), "p95": _pct(v, 0.95)} for stage, v in stage_ms.items()},
+        "loop_lag_ms": {
+            "p50": _pct(sampler.lag_ms, 0.5),
+            "p99": _pct(sampler.lag_ms, 0.99),
+            "max": round(max(sampler.lag_ms), 1) if sampler.lag_ms else None,
+        },
+        "thread_pools": {
+            name: {
+                "max_workers": getattr(pool, "_max_workers", None),
+                "peak_busy": sampler.busy[name],
+                "peak_queued": sampler.queued[name],
+                "saturation_pct": round(100 * sampler.busy[name] / pool._max_workers) if pool else None,
+            }
+            for name, pool in sampler.pools.items()
+        },
+        "llm_calls": dict(llm.calls) if llm else None,
+        "db_requests": supabase.requests,
+    }
+
+
+def _print(result: dict[str, Any]) -> None:
+    print(
+        f"{result['jobs']} jobs, {result['workers']} crew workers: {result['completed']} completed, "
+        f"{result['failed']} failed in {result['elapsed_s']} s "
+        f"({result['throughput_jobs_per_s']} jobs/s, p50 {result['job_ms']['p50']} ms, p95 {result['job_ms']['p95']} ms)"
+    )
+    print("job stages (ms)")
+    for stage, s in result["job_stage_ms"].items():
+        print(f"  {stage:<20} p50 {s['p50']:>9}  p95 {s['p95']:>9}  n={s['n']}")
+    if result["crew_stage_ms"]:
+        print("crew tasks (ms)")
+        for stage, s in result["crew_stage_ms"].items():
+            print(f"  {stage:<20} p50 {s['p50']:>9}  p95 {s['p95']:>9}")
+    lag = result["loop_lag_ms"]
+    print(f"event-loop lag (ms)    p50 {lag['p50']}  p99 {lag['p99']}  max {lag['max']}")
+    for name, p in result["thread_pools"].items():
+        print(
+            f"pool {name:<8}          peak busy {p['peak_busy']}/{p['max_workers']} "
+            f"({p['saturation_pct']}%), peak queued {p['peak_queued']}"
+        )
+    mem = f"RSS high-water {result['max_rss_mb']} MB"
+    if result.get("tracemalloc_peak_mb") is not None:
+        mem += f", tracemalloc peak {result['tracemalloc_peak_mb']} MB"
+    print(mem)
+    if result["llm_calls"] is not None:
+        print(f"LLM calls {result['llm_calls']}")
+    print(f"Supabase requests {result['db_requests']}")
+
+
+def _regressions(result: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    checks = [
+        ("throughput_jobs_per_s", result.get("throughput_jobs_per_s"), baseline.get("throughput_jobs_per_s"), True),
+        ("job_ms.p95", result["job_ms"].get("p95"), (baseline.get("job_ms") or {}).get("p95"), False),
+        ("loop_lag_ms.p99", result["loop_lag_ms"].get("p99"), (baseline.get("loop_lag_ms") or {}).get("p99"), False),
+    ]
+    out = []
+    for name, now, base, higher_is_better in checks:
+        if now is None or not base:
+            continue
+        change = (now - base) / base
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            out.append(f"{name}: {base} -> {now} ({change:+.0%})")
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="CREW_ANALYSIS_WORKERS")
+    parser.add_argument("--llm-latency-ms", type=float, default=40.0, help="fixed latency per LLM call")
+    parser.add_argument("--ms-per-token", type=float, default=0.5, help="added latency per completion token")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="latency per Supabase request")
+    parser.add_argument("--no-compaction", action="store_true", help="run with CREW_CONTEXT_COMPACTION=0")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--json", default=None, help="write the result to this file")
+    parser.add_argument("--baseline", default=None, help="earlier --json result to gate against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--cassette", default=None, help="replay LLM calls from this cassette")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latencies")
+    args = parser.parse_args(argv)
+
+    supabase = SupabaseStub(latency_ms=args.db_latency_ms).start()
+    llm = None if args.cassette else FakeOpenAI(latency_ms=args.llm_latency_ms, ms_per_token=args.ms_per_token).start()
+    _configure_env(supabase.url, llm.url if llm else None, args)
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        if args.cassette:
+            with cassette(args.cassette, REPLAY, latency="recorded", latency_scale=args.latency_scale, strict=False):
+                result = asyncio.run(_run(args, supabase, llm))
+        else:
+            result = asyncio.run(_run(args, supabase, llm))
+    finally:
+        supabase.stop()
+        if llm:
+            llm.stop()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["max_rss_mb"] = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if args.tracemalloc:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+
+    _print(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = _regressions(result, baseline, args.tolerance)
+        if regressions:
+            print(f"REGRESSION vs {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regression vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    if result["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+Record / replay HTTP cassettes for offline load tests and benchmarks.
+
+  python -m app.bench.cassette record cassettes/discovery.jsonl -m app.marketing_serpapi ...
+  python -m app.bench.cassette replay cassettes/discovery.jsonl --latency recorded -m app.bench ...
+
+or in code:
+
+  with cassette("cassettes/gmail.jsonl", mode="replay", latency="recorded"):
+      await list_candidate_messages(...)
+
+Recording patches the transports, not the callers: ``httpx.HTTPTransport``,
+``httpx.AsyncHTTPTransport`` (OpenAI SDK, LangChain / CrewAI OpenAI calls,
+Serper, Gmail, Supabase) and ``requests.adapters.HTTPAdapter``
+(database_storage, pdf_storage). The application code runs unchanged.
+
+A cassette is JSON lines, one interaction per line: method, URL, a hash of the
+canonical request body (JSON with sorted keys, or sorted form fields), a short
+body preview, and the response status, headers, body and elapsed ms.
+Credentials never reach the file. Authorization / api-key / cookie headers are
+not stored. Secret query params and body fields (REDACT_FIELDS) are replaced
+before hashing, so replay still matches. The same fields are redacted in JSON
+and form-encoded response bodies (OAuth token exchanges), so replayed token
+responses carry the placeholder instead of a live token.
+
+Replay serves interactions by (method, URL, body hash). Repeats of one request
+come back in recorded order and then cycle, so a load test can issue more
+calls than were recorded. With ``strict=False`` (the CLI default), a request
+that was never recorded falls back to responses for the same method and URL,
+then the same method and path (prompts carry job ids, Gmail pages carry
+cursors). Unmatched requests raise CassetteMiss. Hosts in ``passthrough``
+(default localhost / 127.0.0.1, i.e. the bench stubs) go to the network in
+both modes. Injected latency per response is either
+``latency="recorded"`` (the recorded elapsed time times ``latency_scale``) or a
+fixed number of milliseconds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import runpy
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Query params and JSON / form body fields whose values are never written.
+REDACT_FIELDS = frozenset({
+    "api_key", "key", "access_token", "refresh_token", "id_token", "token",
+    "client_secret", "password", "apikey",
+})
+# Request headers never written.
+_SECRET_HEADERS = frozenset({"authorization", "api-key", "x-api-key", "apikey", "cookie", "proxy-authorization"})
+# Response headers dropped: bodies are stored decoded and re-framed on replay.
+_DROP_RESPONSE_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"})
+_REDACTED = "REDACTED"
+_PREVIEW_CHARS = 2000
+
+
+class CassetteMiss(LookupError):
+    """Replay got a request the cassette has no interaction for."""
+
+
+def _redact_query(url: str) -> str:
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, _REDACTED if k.lower() in REDACT_FIELDS else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+def _without_query(url: str) -> str:
+    return urlunsplit(urlsplit(url)._replace(query=""))
+
+
+def _redact_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _REDACTED if str(k).lower() in REDACT_FIELDS else _redact_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(v) for v in value]
+    return value
+
+
+def canonical_body(body: bytes, content_type: str = "") -> str:
+    """Redacted, order-independent form of a request body (hashed for matching)."""
+    if not body:
+        return ""
+    text = body.decode("utf-8", errors="replace")
+    if "json" in content_type or text[:1] in "{[":
+        try:
+            return json.dumps(_redact_json(json.loads(text)), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+    if "x-www-form-urlencoded" in content_type:
+        pairs = parse_qsl(text, keep_blank_values=True)
+        return urlencode(sorted((k, _REDACTED if k.lower() in REDACT_FIELDS else v) for k, v in pairs))
+    return text
+
+
+def _redact_response_body(text: str, content_type: str = "") -> str:
+    """Response body with REDACT_FIELDS values replaced (JSON or form-encoded); key order kept."""
+    if "json" in content_type or text.lstrip()[:1] in ("{", "["):
+        try:
+            return json.dumps(_redact_json(json.loads(text)), ensure_ascii=False)
+        except ValueError:
+            pass
+    if "x-www-form-urlencoded" in content_type:
+        pairs = parse_qsl(text, keep_blank_values=True)
+        return urlencode([(k, _REDACTED if k.lower() in REDACT_FIELDS else v) for k, v in pairs])
+    return text
+
+
+def request_key(method: str, url: str, body: bytes, content_type: str = "") -> tuple[str, str, str]:
+    digest = hashlib.sha256(canonical_body(body, content_type).encode("utf-8")).hexdigest()[:32]
+    return method.upper(), _redact_query(url), digest
+
+
+class Cassette:
+    """Interactions of one cassette file, matched by request_key (thread-safe)."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        mode: str = REPLAY,
+        *,
+        latency: Union[str, float, None] = None,
+        latency_scale: float = 1.0,
+        strict: bool = True,
+        passthrough: tuple[str, ...] = ("127.0.0.1", "localhost"),
+    ) -> None:
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"mode must be {RECORD!r} or {REPLAY!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.passthrough = passthrough
+        self.recorded = 0
+        self.served = 0
+        self._lock = threading.Lock()
+        self._exact: dict[tuple[str, str, str], list[dict[str, Any]]] = {}
+        self._by_url: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._by_path: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._cursor: dict[tuple[str, ...], int] = {}
+        if mode == REPLAY:
+            self._load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+
+    def _load(self) -> None:
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                req = entry["request"]
+                self._exact.setdefault((req["method"], req["url"], req["body_sha"]), []).append(entry)
+                self._by_url.setdefault((req["method"], req["url"]), []).append(entry)
+                self._by_path.setdefault((req["method"], _without_query(req["url"])), []).append(entry)
+
+    def passes_through(self, url: str) -> bool:
+        return (urlsplit(url).hostname or "") in self.passthrough
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        body: bytes,
+        status: int,
+        response_headers: list[tuple[str, str]],
+        content: bytes,
+        elapsed_ms: float,
+    ) -> None:
+        content_type = headers.get("content-type") or headers.get("Content-Type") or ""
+        method, safe_url, digest = request_key(method, url, body, content_type)
+        response: dict[str, Any] = {
+            "status": status,
+            "headers": [[k, v] for k, v in response_headers if k.lower() not in _DROP_RESPONSE_HEADERS],
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+        response_type = next((v for k, v in response_headers if k.lower() == "content-type"), "")
+        try:
+            response["body"] = _redact_response_body(content.decode("utf-8"), response_type.lower())
+        except UnicodeDecodeError:
+            response["body_b64"] = base64.b64encode(content).decode("ascii")
+        entry = {
+            "request": {
+                "method": method,
+                "url": safe_url,
+                "body_sha": digest,
+                "body_preview": canonical_body(body, content_type)[:_PREVIEW_CHARS],
+                "headers": {k: v for k, v in headers.items() if k.lower() not in _SECRET_HEADERS},
+            },
+            "response": response,
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def match(self, method: str, url: str, body: bytes, content_type: str = "") -> dict[str, Any]:
+        """Recorded response for a request; raises CassetteMiss."""
+        key = request_key(method, url, body, content_type)
+        with self._lock:
+            candidates = self._exact.get(key)
+            cursor_key: tuple[str, ...] = key
+            if not candidates and not self.strict:
+                cursor_key = key[:2]
+                candidates = self._by_url.get(key[:2])
+                if not candidates:
+                    cursor_key = (key[0], _without_query(key[1]))
+                    candidates = self._by_path.get(cursor_key)
+            if not candidates:
+                raise CassetteMiss(f"{key[0]} {key[1]} (body {key[2][:12]}) not in {self.path}")
+            i = self._cursor.get(cursor_key, 0)
+            self._cursor[cursor_key] = i + 1
+            self.served += 1
+            return candidates[i % len(candidates)]["response"]
+
+    def delay_sec(self, response: dict[str, Any]) -> float:
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return float(response.get("elapsed_ms") or 0) * self.latency_scale / 1000
+        return float(self.latency) / 1000
+
+
+def _body_bytes(response: dict[str, Any]) -> bytes:
+    if "body_b64" in response:
+        return base64.b64decode(response["body_b64"])
+    return str(response.get("body") or "").encode("utf-8")
+
+
+# --- transport patches --------------------------------------------------------
+
+_active: Optional[Cassette] = None
+_patch_lock = threading.Lock()
+
+
+def _patch_httpx(cas: Cassette) -> list[tuple[Any, str, Any]]:
+    try:
+        import httpx
+    except ImportError:
+        return []
+
+    orig_sync = httpx.HTTPTransport.handle_request
+    orig_async = httpx.AsyncHTTPTransport.handle_async_request
+
+    def _replayed(request: "httpx.Request") -> tuple["httpx.Response", float]:
+        request.read()
+        recorded = cas.match(request.method, str(request.url), request.content, request.headers.get("content-type", ""))
+        return httpx.Response(
+            recorded["status"],
+            headers=[tuple(h) for h in recorded.get("headers") or []],
+            content=_body_bytes(recorded),
+            request=request,
+        ), cas.delay_sec(recorded)
+
+    def _record(request: "httpx.Request", response: "httpx.Response", elapsed_ms: float) -> "httpx.Response":
+        content = response.content
+        cas.record(
+            request.method, str(request.url), dict(request.headers), request.content,
+            response.status_code, list(response.headers.multi_items()), content, elapsed_ms,
+        )
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _DROP_RESPONSE_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request,
+                              extensions=response.extensions)
+
+    def handle_request(self: Any, request: "httpx.Request") -> "httpx.Response":
+        if cas.passes_through(str(request.url)):
+            return orig_sync(self, request)
+        if cas.mode == REPLAY:
+            response, delay = _replayed(request)
+            if delay:
+                time.sleep(delay)
+            return response
+        request.read()
+        t0 = time.perf_counter()
+        response = orig_sync(self, request)
+        response.read()
+        return _record(request, response, (time.perf_counter() - t0) * 1000)
+
+    async def handle_async_request(self: Any, request: "httpx.Request") -> "httpx.Response":
+        if cas.passes_through(str(request.url)):
+            return await orig_async(self, request)
+        if cas.mode == REPLAY:
+            await request.aread()
+            response, delay = _replayed(request)
+            if delay:
+                await asyncio.sleep(delay)
+            return response
+        await request.aread()
+        t0 = time.perf_counter()
+        response = await orig_async(self, request)
+        await response.aread()
+        return _record(request, response, (time.perf_counter() - t0) * 1000)
+
+    httpx.HTTPTransport.handle_request = handle_request  # type: ignore[method-assign]
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request  # type: ignore[method-assign]
+    return [
+        (httpx.HTTPTransport, "handle_request", orig_sync),
+        (httpx.AsyncHTTPTransport, "handle_async_request", orig_async),
+    ]
+
+
+def _patch_requests(cas: Cassette) -> list[tuple[Any, str, Any]]:
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+    except ImportError:
+        return []
+
+    orig_send = HTTPAdapter.send
+
+    def send(self: Any, request: "requests.PreparedRequest", **kwargs: Any) -> "requests.Response":
+        url = request.url or ""
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        elif not isinstance(body, bytes):  # file-like / generator uploads
+            body = b""
+        if cas.passes_through(url):
+            return orig_send(self, request, **kwargs)
+        if cas.mode == REPLAY:
+            recorded = cas.match(request.method or "GET", url, body, request.headers.get("Content-Type", ""))
+            delay = cas.delay_sec(recorded)
+            if delay:
+                time.sleep(delay)
+            response = requests.Response()
+            response.status_code = recorded["status"]
+            response.headers = CaseInsensitiveDict({k: v for k, v in recorded.get("headers") or []})
+            response._content = _body_bytes(recorded)
+            response.encoding = get_encoding_from_headers(response.headers)
+            response.url = url
+            response.request = request
+            response.connection = self
+            return response
+        t0 = time.perf_counter()
+        response = orig_send(self, request, **kwargs)
+        content = response.content
+        cas.record(
+            request.method or "GET", url, dict(request.headers), body,
+            response.status_code, list(response.headers.items()), content,
+            (time.perf_counter() - t0) * 1000,
+        )
+        return response
+
+    HTTPAdapter.send = send  # type: ignore[method-assign]
+    return [(HTTPAdapter, "send", orig_send)]
+
+
+@contextmanager
+def cassette(
+    path: Union[str, Path],
+    mode: str = REPLAY,
+    **options: Any,
+) -> Iterator[Cassette]:
+    """Route httpx / requests traffic through a cassette for the block (one at a time)."""
+    global _active
+    cas = Cassette(path, mode, **options)
+    with _patch_lock:
+        if _active is not None:
+            raise RuntimeError(f"cassette {_active.path} is already active")
+        _active = cas
+        patches = _patch_httpx(cas) + _patch_requests(cas)
+    try:
+        yield cas
+    finally:
+        with _patch_lock:
+            for owner, name, original in patches:
+                setattr(owner, name, original)
+            _active = None
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Everything after -m MODULE belongs to the wrapped module.
+    target_args: list[str] = []
+    if "-m" in argv:
+        i = argv.index("-m")
+        argv, target_args = argv[: i + 2], argv[i + 2 :]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=(RECORD, REPLAY))
+    parser.add_argument("path", help="cassette file (JSON lines)")
+    parser.add_argument("-m", dest="module", required=True, help="module to run, with its own arguments after it")
+    parser.add_argument("--latency", default=None, help='"recorded" or a fixed ms per response (replay)')
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for --latency recorded")
+    parser.add_argument("--strict", action="store_true", help="require the exact request body on replay")
+    args = parser.parse_args(argv)
+
+    latency: Union[str, float, None] = args.latency
+    if latency not in (None, "recorded"):
+        latency = float(latency)
+    sys.argv = [args.module, *target_args]
+    with cassette(args.path, args.mode, latency=latency, latency_scale=args.latency_scale,
+                  strict=args.strict) as cas:
+        try:
+            runpy.run_module(args.module, run_name="__main__", alter_sys=True)
+        finally:
+            verb = "recorded" if cas.mode == RECORD else "served"
+            count = cas.recorded if cas.mode == RECORD else cas.served
+            print(f"cassette {cas.path}: {count} interactions {verb}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Currency conversion: correctness checks and throughput.
+
+  python -m app.bench.currency [--repeat 20] [--target GBP]
+
+Correctness runs first and exits non-zero on any failure:
+- fixed cases for the tokenizer (source detection, ranges, codes, stray commas)
+- the sample corpus converted by convert_prices_in_report must match the
+  previous line-by-line implementation (kept below as _legacy_convert)
+- the structured path must rewrite each price's markdown text in place, and
+  convert price lines the structure does not cover like convert_prices_in_report
+
+Throughput compares the legacy scan, the compiled tokenizer and the
+structured-price path over the same reports. Rates come from a fixed table so
+results do not depend on the installed rates file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import sys
+import time
+
+from .. import currency_utils as cu
+from ..currency_rates import RatesTable
+from ..report_parser import parse_report
+from ..report_schema import PartDetails, PriceRange, StructuredReport, Supplier
+from .samples import sample_corpus
+
+FIXED_RATES = RatesTable(version=0, base="USD", rates=dict(cu.RATES_FROM_USD), source="bench")
+
+
+_LEGACY_AMOUNT_RE = re.compile(r"([£$€₹]|KSh\s?|R\s?)?([\d,]+(?:\.\d+)?)")
+
+
+def _legacy_convert_line(line: str, target: str) -> str:
+    def detect() -> str:
+        if "£" in line or re.search(r"\bGBP\b", line, re.I):
+            return "GBP"
+        if "€" in line or re.search(r"\bEUR\b", line, re.I):
+            return "EUR"
+        if "₹" in line or re.search(r"\bINR\b", line, re.I):
+            return "INR"
+        if "¥" in line or re.search(r"\bJPY\b", line, re.I):
+            return "JPY"
+        if "KSh" in line or re.search(r"\bKES\b", line, re.I):
+            return "KES"
+        return "USD"
+
+    source = detect()
+
+    def repl(match: re.Match[str]) -> str:
+        numeric = float(match.group(2).replace(",", ""))
+        converted = cu.convert_amount(numeric, source, target, FIXED_RATES)
+        return cu._format_converted_amount(converted, target)
+
+    return _LEGACY_AMOUNT_RE.sub(repl, line)
+
+
+def _legacy_convert(report_text: str, target_currency: str) -> str:
+    """The pre-tokenizer implementation, for output and speed comparison."""
+    target = target_currency.strip().upper()
+    text = re.sub(r"(\*\*Currency:\*\*\s*)[A-Z]{3}", rf"\1{target}", report_text, flags=re.IGNORECASE)
+    lines = text.split("\n")
+    for idx in parse_report(report_text).price_lines:
+        lines[idx] = _legacy_convert_line(lines[idx], target)
+    return "\n".join(lines)
+
+
+# (line, target, expected)
+LINE_CASES = [
+    ("Price: $1,000 - $2,000", "GBP", "Price: £790 - £1,580"),
+    ("Price: £790", "USD", "Price: $1,000"),
+    ("Approx. 1,290 KES (KSh 1,290)", "USD", "Approx. $10 KES ($10)"),
+    ("€920 or $1,000", "GBP", "£790 or £859"),  # EUR outranks USD as the source
+    ("usd 500 per unit", "GBP", "usd £395 per unit"),
+    ("$1,800, with fitting", "GBP", "£1,422, with fitting"),  # trailing comma is not part of the amount
+    ("Warranty: 2 years, $, ask", "GBP", "Warranty: £2 years, $, ask"),  # legacy raised on the lone comma
+    ("No amounts here $", "GBP", "No amounts here $"),
+]
+
+
+def check_lines() -> list[str]:
+    failures = []
+    for line, target, expected in LINE_CASES:
+        got = cu._convert_line(line, target, FIXED_RATES)
+        if got != expected:
+            failures.append(f"line {line!r} -> {target}: expected {expected!r}, got {got!r}")
+    return failures
+
+
+def check_corpus(corpus: list[str], target: str) -> list[str]:
+    failures = []
+    for i, text in enumerate(corpus):
+        if cu.convert_prices_in_report(text, target, FIXED_RATES) != _legacy_convert(text, target):
+            failures.append(f"corpus report {i}: tokenizer output differs from legacy")
+    return failures
+
+
+def _structured_for(text: str) -> StructuredReport:
+    """Structured prices pointing at the first few price texts in the sample report."""
+    suppliers = []
+    for idx in parse_report(text).price_lines[:5]:
+        m = re.search(r"\$([\d,]+(?:\.\d+)?)(?:\s*-\s*\$([\d,]+(?:\.\d+)?))?", text.split("\n")[idx])
+        if not m:
+            continue
+        low = float(m.group(1).replace(",", ""))
+        high = float(m.group(2).replace(",", "")) if m.group(2) else None
+        price = PriceRange(low=low, high=high, currency="USD", text=m.group(0))
+        suppliers.append(Supplier(name=f"Supplier {len(suppliers) + 1}", price=price))
+    return StructuredReport(part=PartDetails(name="Sample part"), suppliers=suppliers)
+
+
+def check_structured(corpus: list[str], target: str) -> list[str]:
+    failures = []
+    for i, text in enumerate(corpus[:5]):
+        structured = _structured_for(text)
+        originals = [p.text for p in structured.price_ranges()]
+        converted, result = cu.convert_structured_report(text, structured, target, FIXED_RATES)
+        for original, price in zip(originals, result.price_ranges()):
+            if price.currency != target or price.text not in converted or original in converted:
+                failures.append(f"corpus report {i}: structured price {original!r} not rewritten")
+        covered = [p.text for p in result.price_ranges()]
+        by_lines = cu.convert_prices_in_report(text, target, FIXED_RATES).split("\n")
+        out_lines = converted.split("\n")
+        for idx in parse_report(text).price_lines:
+            if not any(c in out_lines[idx] for c in covered) and out_lines[idx] != by_lines[idx]:
+                failures.append(f"corpus report {i}: uncovered price line {idx} not converted")
+    return failures
+
+
+def _bench(fn, corpus: list[str], repeat: int) -> list[float]:
+    per_report: list[float] = []
+    for _ in range(repeat):
+        for item in corpus:
+            t0 = time.perf_counter()
+            fn(item)
+            per_report.append((time.perf_counter() - t0) * 1e6)
+    return per_report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--target", default="GBP")
+    args = parser.parse_args(argv)
+    target = args.target.upper()
+
+    corpus = sample_corpus(30)
+    failures = check_lines() + check_corpus(corpus, target) + check_structured(corpus, target)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"correctness: {len(LINE_CASES)} line cases, {len(corpus)} corpus reports, structured path ok")
+
+    # Report-level legacy and tokenizer both include the report parse (the cache
+    # holds 4 reports); the structured path needs no parse at all. The *-lines
+    # variants convert a report's already-identified price lines only.
+    structured = [(text, _structured_for(text)) for text in corpus]
+    price_lines = [[text.split("\n")[i] for i in parse_report(text).price_lines] for text in corpus]
+    variants = (
+        ("legacy-lines", price_lines, lambda ls: [_legacy_convert_line(l, target) for l in ls]),
+        ("tok-lines", price_lines, lambda ls: [cu._convert_line(l, target, FIXED_RATES) for l in ls]),
+        ("legacy", corpus, lambda t: _legacy_convert(t, target)),
+        ("tokenizer", corpus, lambda t: cu.convert_prices_in_report(t, target, FIXED_RATES)),
+        (
+            "structured",
+            structured,
+            lambda pair: cu.convert_structured_report(pair[0], pair[1].model_copy(deep=True), target, FIXED_RATES),
+        ),
+    )
+    for name, items, fn in variants:
+        us = sorted(_bench(fn, items, args.repeat))
+        print(f"{name:>12}: median {statistics.median(us):.0f} us  p95 {us[int(len(us) * 0.95)]:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
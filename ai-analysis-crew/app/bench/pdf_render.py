@@ -0,0 +1,91 @@
+"""
+PDF render benchmark: file-based pipeline vs in-memory pipeline.
+
+  python -m app.bench.pdf_render [--iterations 20] [--paragraphs 10]
+
+"file" reproduces the previous flow: styles built on every call, a
+SimpleDocTemplate writing straight to a temp file path, then the file read
+back once for the Storage upload and once for the email. "memory" is the
+current flow: cached styles, BytesIO, bytes handed downstream. Both lay out
+the same story, so the difference is style construction plus file I/O;
+ReportLab layout dominates either way.
+Reports wall time (median / p95) and tracemalloc peak per report.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from ..report_generator_enhanced import (
+    _build_story,
+    _build_styles,
+    _new_doc,
+    render_enhanced_report,
+    report_styles,
+)
+from .samples import sample_report
+
+
+def _file_pipeline(text: str) -> int:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        _new_doc(path).build(_build_story(text, _build_styles()))
+        total = 0
+        for _ in ("upload", "email"):
+            with open(path, "rb") as f:
+                total += len(f.read())
+        return total
+    finally:
+        os.unlink(path)
+
+
+def _memory_pipeline(text: str) -> int:
+    return render_enhanced_report(text).size_bytes
+
+
+def _measure(fn: Callable[[str], int], texts: list[str]) -> dict[str, float]:
+    # Timing and memory are separate passes: tracemalloc slows allocation-heavy code.
+    times: list[float] = []
+    for text in texts:
+        t0 = time.perf_counter()
+        fn(text)
+        times.append((time.perf_counter() - t0) * 1000)
+    peaks: list[int] = []
+    for text in texts[:5]:
+        tracemalloc.start()
+        fn(text)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    times.sort()
+    return {
+        "median_ms": statistics.median(times),
+        "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+        "peak_kb": statistics.median(peaks) / 1024,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=28, help="analysis paragraphs per report (page count)")
+    args = parser.parse_args(argv)
+
+    texts = [sample_report(i, suppliers=5, analysis_paragraphs=args.paragraphs) for i in range(args.iterations)]
+    report_styles()  # warm the cache so "memory" measures steady state
+    probe = render_enhanced_report(texts[0])
+    print(f"sample report: {probe.pages} pages, {probe.size_bytes / 1024:.1f} KB, {len(texts)} iterations")
+
+    for name, fn in (("file", _file_pipeline), ("memory", _memory_pipeline)):
+        r = _measure(fn, texts)
+        print(f"{name:>7}: median {r['median_ms']:.1f} ms  p95 {r['p95_ms']:.1f} ms  peak {r['peak_kb']:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Report parsing: extraction correctness and throughput.
+
+  python -m app.bench.report_parse [--corpus DIR] [--generated 0] [--repeat 20]
+
+Correctness runs first and exits non-zero on any failure: every report in
+app/bench/fixtures/reports (anonymised crew reports: qualitative confidence,
+part details as labelled bullets, unnumbered and "###" supplier headings,
+"##" sections) must yield the part name, manufacturer, category, confidence,
+suppliers, spec keys and pricing listed for it in expected.json.
+
+Throughput runs over the fixtures, or over DIR (.md/.txt reports, e.g.
+jobs.full_analysis exports) when given, plus ``--generated`` deterministic
+samples from app.bench.samples. It reports report_parser._parse (uncached)
+and the full DB extraction that store_crew_analysis_to_database performs on
+top of one parse.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from ..report_parser import _parse
+from .samples import sample_corpus
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "reports"
+
+
+def _report_paths(directory: Path) -> list[Path]:
+    return sorted(p for p in directory.iterdir() if p.suffix in (".md", ".txt"))
+
+
+def load_corpus(directory: str | None, generated: int = 0) -> list[str]:
+    paths = _report_paths(Path(directory) if directory else FIXTURES)
+    corpus = [p.read_text(encoding="utf-8", errors="replace") for p in paths]
+    return corpus + (sample_corpus(generated) if generated else [])
+
+
+def check_fixtures() -> list[str]:
+    from .. import database_storage as ds
+
+    expected = json.loads((FIXTURES / "expected.json").read_text(encoding="utf-8"))
+    failures = []
+    for path in _report_paths(FIXTURES):
+        want = expected.get(path.name)
+        if want is None:
+            failures.append(f"{path.name}: no entry in expected.json")
+            continue
+        fields = ds._fields_from_report(_parse(path.read_text(encoding="utf-8")))
+        got = {
+            "part_name": fields["part_name"],
+            "manufacturer": fields["manufacturer"],
+            "category": fields["category"],
+            "confidence": fields["confidence"],
+            "suppliers": [[s["name"], s["price_range"]] for s in fields["suppliers"]],
+            "technical_specs": list(fields["technical_specs"]),
+            "pricing": fields["pricing"],
+        }
+        for key, value in want.items():
+            if got[key] != value:
+                failures.append(f"{path.name}: {key} = {got[key]!r}, expected {value!r}")
+    return failures
+
+
+def _extract_all(text: str) -> None:
+    from .. import database_storage as ds
+
+    report = _parse(text)
+    suppliers = ds._extract_suppliers(report)
+    ds._extract_part_name(report)
+    ds._extract_manufacturer(report)
+    ds._extract_category(report)
+    ds._extract_confidence(report)
+    ds._extract_description(report)
+    ds._extract_technical_specs(report)
+    ds._extract_compatible_vehicles(report)
+    ds._extract_buy_links(suppliers)
+    ds._extract_pricing(report)
+
+
+def _bench(fn, corpus: list[str], repeat: int) -> list[float]:
+    per_report: list[float] = []
+    for _ in range(repeat):
+        for text in corpus:
+            t0 = time.perf_counter()
+            fn(text)
+            per_report.append((time.perf_counter() - t0) * 1e6)
+    return per_report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of .md/.txt reports (default: the fixtures)")
+    parser.add_argument("--generated", type=int, default=0, help="add this many generated sample reports")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    failures = check_fixtures()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"correctness: {len(_report_paths(FIXTURES))} fixture reports ok")
+
+    corpus = load_corpus(args.corpus, args.generated)
+    if not corpus:
+        raise SystemExit("empty corpus")
+    total_kb = sum(len(t.encode("utf-8")) for t in corpus) / 1024
+    print(f"corpus: {len(corpus)} reports, {total_kb:.0f} KB, repeat {args.repeat}")
+
+    for name, fn in (("parse", _parse), ("parse+extract", _extract_all)):
+        us = _bench(fn, corpus, args.repeat)
+        us.sort()
+        throughput = len(us) / (sum(us) / 1e6)
+        print(
+            f"{name:>14}: median {statistics.median(us):.0f} us  "
+            f"p95 {us[int(len(us) * 0.95)]:.0f} us  {throughput:.0f} reports/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Deterministic report texts shaped like the crew's report_task output."""
+
+from __future__ import annotations
+
+import random
+
+_MANUFACTURERS = ["Bosch", "Denso", "Siemens", "ABB", "Schneider Electric", "Caterpillar", "Cummins", "SKF"]
+_CATEGORIES = ["Alternator", "Fuel Injector", "Contactor", "Variable Frequency Drive", "Bearing", "Starter Motor"]
+_CURRENCIES = [("$", "USD"), ("£", "GBP"), ("€", "EUR"), ("KES ", "KES")]
+
+_FILLER = (
+    "The unit is engineered for continuous duty in demanding environments and is widely used "
+    "across automotive, agricultural and light industrial applications. Its sealed housing, "
+    "corrosion-resistant finish and precision-machined interfaces give it a long service life "
+    "when installed and maintained according to the manufacturer's guidelines."
+)
+
+
+def sample_report(seed: int = 0, *, suppliers: int = 3, alternatives: int = 5, analysis_paragraphs: int = 6) -> str:
+    """
+    A full report with the six numbered sections, a parts table, specs, suppliers
+    with contact blocks and prices. Defaults render to roughly 8-12 PDF pages.
+    """
+    rnd = random.Random(seed)
+    maker = rnd.choice(_MANUFACTURERS)
+    category = rnd.choice(_CATEGORIES)
+    symbol, code = rnd.choice(_CURRENCIES)
+    model = f"{maker[:3].upper()}-{rnd.randint(1000, 9999)}"
+    part_no = f"{rnd.randint(100000, 999999)}-{rnd.randint(10, 99)}"
+
+    out: list[str] = [
+        f"Currency: {code}",
+        "",
+        "✅ **1. IDENTIFIED PART DETAILS**",
+        "",
+        "| Name/Type | Model Number | Part Number(s) | Serial Number | Category | Manufacturer |",
+        "|---|---|---|---|---|---|",
+        f"| {category} | {model} | {part_no} | N/A | {category} / Electrical | {maker} |",
+        "",
+        "✅ **2. FULL ANALYSIS**",
+        "",
+    ]
+    for i in range(analysis_paragraphs):
+        out.append(f"**Aspect {i + 1}:** {_FILLER} {_FILLER}")
+        out.append("")
+
+    out += ["✅ **3. TECHNICAL SPECIFICATIONS**", ""]
+    for name, unit in (("Voltage", "V"), ("Current", "A"), ("Power", "kW"), ("Weight", "kg"), ("Length", "mm"),
+                       ("Width", "mm"), ("Height", "mm"), ("Operating Temperature", "°C"), ("Speed", "rpm")):
+        out.append(f"- **{name}:** {rnd.randint(5, 900)} {unit}")
+    out.append("")
+
+    out += ["✅ **4. TOP 3 SUPPLIERS**", ""]
+    for n in range(1, suppliers + 1):
+        company = f"{rnd.choice(_MANUFACTURERS)} Parts Depot {n}"
+        low = rnd.randint(40, 400)
+        out += [
+            f"**{n}. {company} (Distributor)**",
+            "",
+            "**Full Analysis:**",
+            f"{company} is an authorised distributor with regional warehouses. {_FILLER}",
+            "",
+            "**Technical Specs/Offerings:**",
+            f"Genuine and OEM-equivalent {category.lower()} units, including {model}.",
+            "",
+            "**Price Range:**",
+            f"{symbol}{low:,}.00 - {symbol}{low + rnd.randint(20, 300):,}.00",
+            "",
+            "**Contact Information:**",
+            f"- Phone: +1 555 {rnd.randint(1000000, 9999999)}",
+            f"- Email: sales{n}@partsdepot{n}.example",
+            f"- Website: https://partsdepot{n}.example/{model.lower()}",
+            f"- Address: {rnd.randint(1, 999)} Industrial Way, Springfield",
+            "",
+        ]
+
+    out += ["✅ **5. ALTERNATIVE/REPLACEMENT OPTIONS**", ""]
+    for n in range(1, alternatives + 1):
+        out += [
+            f"**Option {n}: {rnd.choice(_MANUFACTURERS)} {category} {rnd.randint(100, 999)}**",
+            f"- Key specifications: {rnd.randint(12, 48)} V, {rnd.randint(40, 220)} A",
+            f"- Price range: {symbol}{rnd.randint(50, 500):,} - {symbol}{rnd.randint(500, 900):,}",
+            "- Compatibility notes: direct fit for most applications; verify mounting pattern.",
+            "",
+        ]
+
+    out += [
+        "✅ **6. CONCLUSION**",
+        "",
+        f"The {maker} {model} is widely available. {_FILLER}",
+        "- Best value: authorised distributors listed above",
+        "- Fastest delivery: regional stock holders",
+    ]
+    return "\n".join(out)
+
+
+def sample_corpus(n: int = 20) -> list[str]:
+    """n varied reports (different sizes, currencies and supplier counts)."""
+    return [
+        sample_report(
+            seed,
+            suppliers=3 + seed % 3,
+            alternatives=3 + seed % 3,
+            analysis_paragraphs=4 + seed % 5,
+        )
+        for seed in range(n)
+    ]
@@ -0,0 +1,144 @@
+"""
+Semantic cache: offline hit rate and precision.
+
+  python -m app.bench.semantic_cache [--parts 200] [--embedder hashing|openai]
+
+Indexes one query per synthetic part (brand, part type, OEM number), then
+probes with rewrites of the same part (word order, casing, spaced or dashed
+part numbers, filler words, a typo) and with near misses (same brand and type
+with another part number, same number with another part type, the same query
+plus a component word such as "seal kit"). For the
+configured thresholds it reports:
+
+- serve hit rate: share of same-part probes served from the cache
+- serve precision: share of served probes that got the right part
+- seed hit rate / precision: the same, counting seed or serve as a match
+
+A threshold sweep on raw similarity (without the content-key guard) follows,
+to help choose SEMANTIC_CACHE_SERVE_THRESHOLD / SEMANTIC_CACHE_SEED_THRESHOLD.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from ..semantic_cache import SEED, SERVE, IndexEntry, SemanticIndex, classify, get_embedder, content_key, thresholds
+
+_BRANDS = ["Bosch", "Denso", "Valeo", "Delphi", "Mahle", "NGK", "Hella", "SKF", "Gates", "Continental", "Siemens", "ABB"]
+_TYPES = [
+    "alternator", "starter motor", "fuel injector", "oil filter", "spark plug", "water pump",
+    "timing belt", "wheel bearing", "brake pad set", "ignition coil", "contactor", "radiator fan",
+]
+_FILLER = ["price", "for sale", "replacement", "genuine", "oem", "supplier", "new"]
+# Appended to a query they name a different item (a kit or component of the part).
+_COMPONENTS = ["seal kit", "repair kit", "gasket", "housing", "mounting bracket"]
+
+
+def _part_number(rnd: random.Random) -> str:
+    groups = [str(rnd.randint(0, 9))] + [f"{rnd.randint(0, 999):03d}" for _ in range(3)]
+    return "".join(groups)
+
+
+def _spaced(number: str) -> str:
+    return " ".join([number[0], number[1:4], number[4:7], number[7:]])
+
+
+def _dashed(number: str) -> str:
+    return "-".join([number[:4], number[4:7], number[7:]])
+
+
+def _typo(word: str, rnd: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rnd.randint(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+
+
+def build_dataset(n_parts: int, seed: int = 7):
+    """(indexed entries, probes as (query, expected fingerprint or None))."""
+    rnd = random.Random(seed)
+    parts = []
+    for i in range(n_parts):
+        parts.append((f"part-{i}", rnd.choice(_BRANDS), rnd.choice(_TYPES), _part_number(rnd)))
+
+    entries = [
+        IndexEntry(fp, f"{brand} {ptype} {number}", "GB", "", "GBP", content_key(f"{brand} {ptype} {number}"))
+        for fp, brand, ptype, number in parts
+    ]
+    probes: list[tuple[str, str | None]] = []
+    for fp, brand, ptype, number in parts:
+        probes += [
+            (f"{ptype} {brand.upper()} {number}", fp),
+            (f"{brand.lower()} {_spaced(number)} {ptype}", fp),
+            (f"{_dashed(number)} {brand} {ptype}", fp),
+            (f"{brand} {ptype} {number} {rnd.choice(_FILLER)}", fp),
+            (f"{brand} {_typo(ptype, rnd)} {number}", fp),
+        ]
+        other_number = _part_number(rnd)
+        other_type = rnd.choice([t for t in _TYPES if t != ptype])
+        probes += [
+            (f"{brand} {ptype} {other_number}", None),
+            (f"{brand} {other_type} {number}", None),
+            (f"{brand} {ptype} {number} {rnd.choice(_COMPONENTS)}", None),
+        ]
+    return entries, probes
+
+
+def evaluate(index: SemanticIndex, probes: list[tuple[str, str | None]]):
+    rows = []
+    for query, expected in probes:
+        found = index.search(query, "GB", "", "GBP")
+        if found is None:
+            rows.append((expected, None, 0.0, None))
+            continue
+        entry, score = found
+        rows.append((expected, entry.fingerprint, score, classify(query, entry, score)))
+    return rows
+
+
+def _rate(n: int, d: int) -> str:
+    return f"{n / d:6.1%} ({n}/{d})" if d else "   n/a"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--embedder", default="hashing")
+    args = parser.parse_args(argv)
+
+    embedder = get_embedder(args.embedder)
+    entries, probes = build_dataset(args.parts)
+    index = SemanticIndex(Path(tempfile.mkdtemp(prefix="semantic-bench-")), embedder)
+    t0 = time.perf_counter()
+    index.add_many(entries)
+    build_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    rows = evaluate(index, probes)
+    lookup_us = (time.perf_counter() - t0) * 1e6 / len(probes)
+
+    serve_t, seed_t = thresholds()
+    positives = sum(1 for expected, *_ in rows if expected)
+    print(f"embedder {embedder.name}: {len(entries)} indexed, {len(probes)} probes ({positives} same-part)")
+    print(f"index build {build_ms:.0f} ms, lookup {lookup_us:.0f} us/query")
+    for label, actions in (("serve", {SERVE}), ("seed", {SERVE, SEED})):
+        matched = [(e, got) for e, got, _, action in rows if action in actions]
+        correct = sum(1 for e, got in matched if e and e == got)
+        threshold = serve_t if label == "serve" else seed_t
+        print(
+            f"{label:>5} @ {threshold:.2f}: hit rate {_rate(correct, positives)}"
+            f"  precision {_rate(correct, len(matched))}"
+        )
+
+    print("raw similarity sweep (no content-key guard):")
+    for t in (0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95):
+        matched = [(e, got) for e, got, score, _ in rows if got and score >= t]
+        correct = sum(1 for e, got in matched if e and e == got)
+        print(f"  >= {t:.2f}: hit rate {_rate(correct, positives)}  precision {_rate(correct, len(matched))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""
+Local stand-ins for Supabase and OpenAI used by ``python -m app.bench``.
+
+Both are plain HTTP servers on 127.0.0.1, so the pipeline's own clients
+(supabase-py / postgrest, ``requests`` in database_storage and pdf_storage,
+the OpenAI SDK, LangChain and CrewAI's LLM) run unmodified; only
+SUPABASE_URL and OPENAI_BASE_URL point somewhere else.
+
+SupabaseStub: an in-memory PostgREST subset (select / filters incl. ``or``,
+order, limit, Range and count=exact, insert, upsert on_conflict, update,
+delete, RPC returning null) plus Storage upload and sign. Every change to
+crew_analysis_jobs is kept in ``job_history`` for per-stage timings.
+
+FakeOpenAI: /v1/chat/completions (plain and SSE streaming) and
+/v1/embeddings. Answers are deterministic per agent role and query, in the
+"Final Answer:" form CrewAI parses, JSON for json_object requests; latency is
+``latency_ms`` plus ``ms_per_token`` per completion token.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from .samples import sample_report
+
+
+class _Server:
+    handler: type[BaseHTTPRequestHandler]
+
+    def __init__(self) -> None:
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        assert self._httpd is not None, "server not started"
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_Server":
+        stub = self
+
+        class Handler(self.handler):  # type: ignore[misc, valid-type]
+            server_stub = stub
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_stub: Any
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - BaseHTTPRequestHandler API
+        pass
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send(self, status: int, payload: Any = None, headers: Optional[dict[str, str]] = None) -> None:
+        data = b"" if payload is None else json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if data and self.command != "HEAD":
+            self.wfile.write(data)
+
+
+# --- Supabase ---------------------------------------------------------------
+
+_OPS: dict[str, Callable[[Any, str], bool]] = {
+    "eq": lambda v, a: _s(v) == a,
+    "neq": lambda v, a: _s(v) != a,
+    "gt": lambda v, a: v is not None and _cmp(v, a) > 0,
+    "gte": lambda v, a: v is not None and _cmp(v, a) >= 0,
+    "lt": lambda v, a: v is not None and _cmp(v, a) < 0,
+    "lte": lambda v, a: v is not None and _cmp(v, a) <= 0,
+    "is": lambda v, a: (v is None) if a == "null" else _s(v) == a,
+    "in": lambda v, a: _s(v) in [x.strip().strip('"') for x in a.strip("()").split(",")],
+    "like": lambda v, a: v is not None and re.fullmatch(re.escape(a).replace(r"\*", ".*").replace("%", ".*"), str(v)) is not None,
+    "ilike": lambda v, a: v is not None
+    and re.fullmatch(re.escape(a).replace(r"\*", ".*").replace("%", ".*"), str(v), re.IGNORECASE) is not None,
+}
+
+
+def _s(v: Any) -> str:
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return "" if v is None else str(v)
+
+
+def _cmp(v: Any, a: str) -> int:
+    try:
+        x, y = float(v), float(a)
+    except (TypeError, ValueError):
+        x, y = str(v), a  # ISO timestamps compare as strings
+    return (x > y) - (x < y)
+
+
+def _condition(column: str, expr: str) -> Callable[[dict[str, Any]], bool]:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, arg = expr.partition(".")
+    fn = _OPS.get(op)
+    if fn is None:
+        return lambda row: True
+    arg = unquote(arg)
+    if negate:
+        return lambda row: not fn(row.get(column), arg)
+    return lambda row: fn(row.get(column), arg)
+
+
+def _split_or(expr: str) -> list[str]:
+    parts, depth, cur = [], 0, ""
+    for ch in expr.strip("()"):
+        if ch == "," and depth == 0:
+            parts.append(cur)
+            cur = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        cur += ch
+    return parts + ([cur] if cur else [])
+
+
+def _filters(query: list[tuple[str, str]]) -> list[Callable[[dict[str, Any]], bool]]:
+    out: list[Callable[[dict[str, Any]], bool]] = []
+    for key, value in query:
+        if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+            continue
+        if key == "or":
+            conds = []
+            for part in _split_or(value):
+                col, _, rest = part.partition(".")
+                conds.append(_condition(col, rest))
+            out.append(lambda row, conds=conds: any(c(row) for c in conds))
+            continue
+        out.append(_condition(key, value))
+    return out
+
+
+class _SupabaseHandler(_Handler):
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_HEAD(self) -> None:
+        self._dispatch("HEAD")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        stub: SupabaseStub = self.server_stub
+        stub.requests += 1
+        parts = urlsplit(self.path)
+        body = self._body() if method in ("POST", "PUT", "PATCH") else b""
+        if stub.latency_ms:
+            time.sleep(stub.latency_ms / 1000)
+        if parts.path.startswith("/storage/v1/object/"):
+            return self._storage(method, parts.path[len("/storage/v1/object/") :], body)
+        if parts.path.startswith("/rest/v1/rpc/"):
+            return self._send(200, None if not stub.rpc_results else stub.rpc_results.get(parts.path[13:]))
+        if not parts.path.startswith("/rest/v1/"):
+            return self._send(404, {"message": "not found"})
+        table = parts.path[len("/rest/v1/") :].strip("/")
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        prefer = self.headers.get("Prefer") or ""
+        with stub.lock:
+            if method in ("GET", "HEAD"):
+                return self._select(table, query, prefer)
+            if method == "POST":
+                return self._insert(table, query, prefer, json.loads(body or b"null"))
+            if method == "PATCH":
+                return self._update(table, query, prefer, json.loads(body or b"{}"))
+            if method == "DELETE":
+                return self._delete(table, query, prefer)
+        self._send(405, {"message": "method not allowed"})
+
+    def _rows(self, table: str, query: list[tuple[str, str]]) -> list[dict[str, Any]]:
+        conds = _filters(query)
+        return [r for r in self.server_stub.tables.setdefault(table, []) if all(c(r) for c in conds)]
+
+    def _project(self, rows: list[dict[str, Any]], query: list[tuple[str, str]]) -> list[dict[str, Any]]:
+        select = dict(query).get("select") or "*"
+        cols = [c.strip() for c in select.split(",") if c.strip() and "(" not in c]
+        if "*" in cols or not cols:
+            return [dict(r) for r in rows]
+        out = []
+        for r in rows:
+            row = {}
+            for c in cols:
+                name, _, alias = c.partition(":")
+                if alias:
+                    name, alias = alias, name
+                name = name.split("->")[0]
+                row[alias or name] = r.get(name)
+            out.append(row)
+        return out
+
+    def _respond_rows(self, rows: list[dict[str, Any]], query: list[tuple[str, str]], prefer: str, total: int) -> None:
+        headers = {}
+        if "count=" in prefer:
+            headers["Content-Range"] = f"0-{max(len(rows) - 1, 0)}/{total}" if rows else f"*/{total}"
+        if "return=minimal" in prefer and self.command != "GET":
+            return self._send(201 if self.command == "POST" else 204, None, headers)
+        data: Any = self._project(rows, query)
+        if "vnd.pgrst.object" in (self.headers.get("Accept") or ""):
+            if len(data) != 1:
+                return self._send(406, {"message": "JSON object requested, multiple (or no) rows returned"}, headers)
+            data = data[0]
+        self._send(201 if self.command == "POST" else 200, data, headers)
+
+    def _select(self, table: str, query: list[tuple[str, str]], prefer: str) -> None:
+        rows = self._rows(table, query)
+        params = dict(query)
+        for spec in reversed([o for o in (params.get("order") or "").split(",") if o]):
+            col, *mods = spec.split(".")
+            desc = "desc" in mods
+            rows.sort(key=lambda r: (r.get(col) is None, _s(r.get(col))), reverse=desc)
+        total = len(rows)
+        start, end = 0, None
+        rng = self.headers.get("Range")
+        if rng and "-" in rng:
+            a, b = rng.split("-", 1)
+            start, end = int(a or 0), int(b) + 1 if b else None
+        if params.get("offset"):
+            start = int(params["offset"])
+        if params.get("limit"):
+            end = start + int(params["limit"])
+        self._respond_rows(rows[start:end], query, prefer, total)
+
+    def _insert(self, table: str, query: list[tuple[str, str]], prefer: str, payload: Any) -> None:
+        stub: SupabaseStub = self.server_stub
+        rows = payload if isinstance(payload, list) else [payload]
+        store = stub.tables.setdefault(table, [])
+        conflict = [c for c in (dict(query).get("on_conflict") or "id").split(",") if c]
+        merge = "resolution=merge-duplicates" in prefer
+        ignore = "resolution=ignore-duplicates" in prefer
+        out = []
+        now = datetime.now(timezone.utc).isoformat()
+        for row in rows:
+            row = dict(row)
+            existing = None
+            if all(row.get(c) is not None for c in conflict):
+                existing = next((r for r in store if all(_s(r.get(c)) == _s(row.get(c)) for c in conflict)), None)
+            if existing is not None:
+                if ignore:
+                    continue
+                if not merge:
+                    return self._send(409, {"code": "23505", "message": f"duplicate key value violates unique constraint on {table}"})
+                existing.update(row)
+                out.append(existing)
+                stub._record(table, existing)
+                continue
+            row.setdefault("id", str(uuid.uuid4()))
+            row.setdefault("created_at", now)
+            store.append(row)
+            out.append(row)
+            stub._record(table, row)
+        self._respond_rows(out, query, prefer, len(out))
+
+    def _update(self, table: str, query: list[tuple[str, str]], prefer: str, patch: dict[str, Any]) -> None:
+        rows = self._rows(table, query)
+        for r in rows:
+            r.update(patch)
+            self.server_stub._record(table, r)
+        self._respond_rows(rows, query, prefer, len(rows))
+
+    def _delete(self, table: str, query: list[tuple[str, str]], prefer: str) -> None:
+        rows = self._rows(table, query)
+        store = self.server_stub.tables.setdefault(table, [])
+        ids = {id(r) for r in rows}
+        store[:] = [r for r in store if id(r) not in ids]
+        self._respond_rows(rows, query, prefer, len(rows))
+
+    def _storage(self, method: str, path: str, body: bytes) -> None:
+        stub: SupabaseStub = self.server_stub
+        if path.startswith("sign/"):
+            key = path[5:]
+            return self._send(200, {"signedURL": f"/object/sign/{key}?token=bench"})
+        if method in ("POST", "PUT"):
+            with stub.lock:
+                stub.objects[path] = len(body)
+            return self._send(200, {"Key": path})
+        if method == "GET" and path.startswith("public/"):
+            return self._send(200 if path[7:] in stub.objects else 404, {"size": stub.objects.get(path[7:])})
+        self._send(404, {"message": "not found"})
+
+
+class SupabaseStub(_Server):
+    """In-memory PostgREST + Storage (see module docstring)."""
+
+    handler = _SupabaseHandler
+
+    def __init__(self, *, latency_ms: float = 0.0, rpc_results: Optional[dict[str, Any]] = None) -> None:
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.rpc_results = rpc_results or {}
+        self.lock = threading.RLock()
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        self.objects: dict[str, int] = {}
+        # (job_id, perf_counter, status, current_stage) for every crew_analysis_jobs write
+        self.job_history: list[tuple[str, float, Optional[str], Optional[str]]] = []
+
+    def seed(self, table: str, rows: list[dict[str, Any]]) -> None:
+        with self.lock:
+            self.tables.setdefault(table, []).extend(dict(r) for r in rows)
+
+    def _record(self, table: str, row: dict[str, Any]) -> None:
+        if table == "crew_analysis_jobs":
+            self.job_history.append((str(row.get("id")), time.perf_counter(), row.get("status"), row.get("current_stage")))
+
+
+# --- OpenAI -----------------------------------------------------------------
+
+_ROLE_OUTPUTS = {
+    "Part Identifier": "identify",
+    "Technical Research Specialist": "research",
+    "Supplier Finder": "suppliers",
+    "Report Compiler": "report",
+    "Completion Coordinator": "done",
+}
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.blake2b(text.encode("utf-8"), digest_size=4).hexdigest(), 16)
+
+
+def _section(report: str, number: int) -> str:
+    """Numbered "✅ **N. TITLE**" section of a sample report, heading included."""
+    m = re.search(rf"(?ms)^✅\s*\*\*{number}\.\s.*?(?=^✅|\Z)", report)
+    return m.group(0).strip() if m else report[:1500]
+
+
+def _structured_block(report: str) -> str:
+    # first data row of the IDENTIFIED PART DETAILS table
+    row = re.search(r"^\|---.*\n\|([^\n]+)\|$", report, re.MULTILINE)
+    cells = [c.strip() for c in row.group(1).split("|")] if row else []
+    currency = re.match(r"Currency:\s*(\w+)", report)
+    part = {
+        "name": cells[0] if cells else "Spare part",
+        "model_number": cells[1] if len(cells) > 1 else None,
+        "manufacturer": cells[-1] if len(cells) > 5 else None,
+        "confidence": 90,
+    }
+    structured = {"currency": currency.group(1) if currency else None, "part": part, "specs": [], "suppliers": []}
+    return "```json\n" + json.dumps(structured) + "\n```"
+
+
+def fake_answer(role: Optional[str], prompt: str) -> str:
+    """Deterministic crew answer for an agent role (keyed on the prompt's first 200 chars)."""
+    report = sample_report(_seed(prompt[:200]))
+    kind = _ROLE_OUTPUTS.get(role or "")
+    if kind == "identify":
+        return _section(report, 1)
+    if kind == "research":
+        return "\n\n".join(_section(report, n) for n in (3, 5))
+    if kind == "suppliers":
+        return _section(report, 4)
+    if kind == "report":
+        return f"{report}\n\n{_structured_block(report)}"
+    if kind == "done":
+        return "The analysis is complete and the report is ready for delivery."
+    return report[:1200]
+
+
+def fake_json(prompt: str) -> dict[str, Any]:
+    """One object that satisfies the app's JSON-mode prompts (validators, copy, queries)."""
+    return {
+        "is_spare_part_query": True,
+        "is_spare_part_image": True,
+        "is_spare_part": True,
+        "is_manufacturing_spare_part": True,
+        "detected_subject": "spare part",
+        "identified_part_name": "spare part",
+        "subject": "Your SpareFinder report",
+        "headline": "Your part analysis is ready",
+        "subhead": "Suppliers and prices inside.",
+        "bullets": ["Identified part", "Verified suppliers", "Price ranges"],
+        "ctaLabel": "View report",
+        "html": "<p>Hello</p>",
+        "text": "Hello",
+        "queries": [f"industrial spare parts supplier {i}" for i in range(8)],
+    }
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, list):
+        return " ".join(str(p.get("text") or "") for p in content if isinstance(p, dict))
+    return str(content or "")
+
+
+class _OpenAIHandler(_Handler):
+    def do_POST(self) -> None:
+        stub: FakeOpenAI = self.server_stub
+        stub.requests += 1
+        body = json.loads(self._body() or b"{}")
+        path = urlsplit(self.path).path
+        if path.endswith("/embeddings"):
+            return self._embeddings(body)
+        if not path.endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": "not found"}})
+        messages = body.get("messages") or []
+        system = next((_message_text(m.get("content")) for m in messages if m.get("role") == "system"), "")
+        prompt = "\n".join(_message_text(m.get("content")) for m in messages)
+        role = next((r for r in _ROLE_OUTPUTS if f"You are {r}" in system), None)
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(fake_json(prompt))
+        elif role:
+            content = f"Thought: I now can give a great answer\nFinal Answer: {fake_answer(role, prompt)}"
+        else:
+            content = fake_answer(None, prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        time.sleep((stub.latency_ms + stub.ms_per_token * completion_tokens) / 1000)
+        model = body.get("model") or "gpt-4o-mini"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        with stub.lock:
+            stub.calls[role or "direct"] = stub.calls.get(role or "direct", 0) + 1
+        if body.get("stream"):
+            return self._stream(model, content, usage)
+        self._send(200, {
+            "id": f"chatcmpl-bench-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, model: str, content: str, usage: dict[str, int]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": f"chatcmpl-bench-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+
+        def chunk(payload: dict[str, Any]) -> None:
+            data = f"data: {json.dumps({**base, **payload})}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+        for i in range(0, len(content), 200):
+            chunk({"choices": [{"index": 0, "delta": {"content": content[i : i + 200]}, "finish_reason": None}]})
+        chunk({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+        done = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(done):x}\r\n".encode("ascii") + done + b"\r\n0\r\n\r\n")
+
+    def _embeddings(self, body: dict[str, Any]) -> None:
+        inputs = body.get("input") or []
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for i, text in enumerate(inputs):
+            h = hashlib.blake2b(str(text).encode("utf-8"), digest_size=64).digest()
+            data.append({"object": "embedding", "index": i, "embedding": [(b - 127.5) / 127.5 for b in h]})
+        tokens = sum(len(str(t)) // 4 + 1 for t in inputs)
+        self._send(200, {"object": "list", "data": data, "model": body.get("model"),
+                         "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+
+class FakeOpenAI(_Server):
+    """Deterministic OpenAI-compatible chat and embeddings endpoint."""
+
+    handler = _OpenAIHandler
+
+    def __init__(self, *, latency_ms: float = 0.0, ms_per_token: float = 0.0) -> None:
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+        self.lock = threading.Lock()
+        self.calls: dict[str, int] = {}
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import asyncio
 import concurrent.futures
+import contextvars
 import os
 from functools import partial
 from typing import Callable, ParamSpec, TypeVar
@@ -13,12 +14,19 @@ T = TypeVar("T")
 
 _CREW_WORKERS = max(1, int(os.getenv("CREW_ANALYSIS_WORKERS", "2")))
 _API_IO_WORKERS = max(4, int(os.getenv("API_THREAD_POOL_WORKERS", "32")))
+_MARKETING_RENDER_WORKERS = max(1, int(os.getenv("MARKETING_RENDER_WORKERS", "4")))
 
 CREW_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
     max_workers=_CREW_WORKERS,
     thread_name_prefix="crew-analysis",
 )
 
+# Marketing email rendering (template merge, OpenAI or Crew per lead) for the send engine.
+MARKETING_RENDER_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_MARKETING_RENDER_WORKERS,
+    thread_name_prefix="marketing-render",
+)
+
 _concurrency_configured = False
 
 
@@ -53,4 +61,6 @@ async def run_crew_blocking(
 ) -> T:
     """Run a blocking CrewAI / vision call without occupying the default I/O pool."""
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(CREW_EXECUTOR, partial(func, *args, **kwargs))
+    # Carry context variables (llm_usage attribution) into the worker like asyncio.to_thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(CREW_EXECUTOR, partial(ctx.run, func, *args, **kwargs))
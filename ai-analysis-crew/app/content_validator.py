@@ -14,6 +14,8 @@ from typing import Optional
 
 from openai import OpenAI
 
+from .model_routing import ModelTrace, routed_chat_completion
+
 logger = logging.getLogger(__name__)
 
 # User-facing copy
@@ -182,8 +184,9 @@ Accept: part names, OEM numbers, equipment models, industrial/automotive compone
 Reject: animals, people, food, entertainment, memes, general trivia, unrelated consumer goods, empty/nature/landscape queries."""
 
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("CONTENT_VALIDATION_MODEL", "gpt-4o-mini"),
+        response = routed_chat_completion(
+            client,
+            "content_validation",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
             temperature=0,
@@ -263,8 +266,9 @@ REJECT (is_spare_part_image=false):
 When uncertain but the main subject looks like a part, component, or metal assembly, accept. Reject only when clearly not a part."""
 
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("CONTENT_VALIDATION_MODEL", "gpt-4o-mini"),
+        response = routed_chat_completion(
+            client,
+            "content_validation",
             messages=[
                 {
                     "role": "user",
@@ -352,7 +356,12 @@ def validate_image(image_data: bytes) -> ContentValidationResult:
     return _llm_validate_image(image_data)
 
 
-def _llm_validate_identified_part(identification_text: str) -> ContentValidationResult:
+def _llm_validate_identified_part(
+    identification_text: str,
+    *,
+    tier: Optional[str] = None,
+    trace: Optional[ModelTrace] = None,
+) -> ContentValidationResult:
     client = _openai_client()
     text = (identification_text or "").strip()
     if not text:
@@ -399,8 +408,11 @@ Do NOT reject automotive body parts or large assemblies (e.g. "front bumper asse
 Only reject when the identification clearly names a non-part subject (animal, person, food, nature scene, etc.)."""
 
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("CONTENT_VALIDATION_MODEL", "gpt-4o-mini"),
+        response = routed_chat_completion(
+            client,
+            "content_validation",
+            tier=tier,
+            trace=trace,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=220,
             temperature=0,
@@ -442,7 +454,12 @@ def _heuristic_non_part_subject(text: str) -> Optional[str]:
     return match.group(0) if match else None
 
 
-def validate_identified_part(identification_text: str) -> ContentValidationResult:
+def validate_identified_part(
+    identification_text: str,
+    *,
+    tier: Optional[str] = None,
+    trace: Optional[ModelTrace] = None,
+) -> ContentValidationResult:
     """After vision/part identification — reject animals, nature, empty; accept parts."""
     if not _validation_enabled():
         return ContentValidationResult(True, "", None, "skipped")
@@ -466,7 +483,7 @@ def validate_identified_part(identification_text: str) -> ContentValidationResul
         msg = REJECT_IDENTIFIED_SUBJECT_MESSAGE.format(subject=blocked)
         return ContentValidationResult(False, msg, blocked, "heuristic")
 
-    return _llm_validate_identified_part(identification_text)
+    return _llm_validate_identified_part(identification_text, tier=tier, trace=trace)
 
 
 def validate_upload_content(
@@ -3,12 +3,22 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import Any
 
 logger = logging.getLogger(__name__)
 
 CREDIT_COST_ANALYSIS = 1
 
+# Postgres function from docs/sql/credit_ledger_atomic.sql
+CREDIT_LEDGER_RPC = "apply_credit_delta"
+
+# While PostgREST reports the function missing, skip it until this monotonic
+# time and use the legacy path; re-probed after LEDGER_RPC_REPROBE_SEC so a
+# late migration (or a schema-cache hiccup) does not disable it for good.
+LEDGER_RPC_REPROBE_SEC = 300.0
+_ledger_rpc_missing_until = 0.0
+
 
 def _read_balance_from_user_credits(supabase: Any, user_id: str) -> int | None:
     try:
@@ -79,6 +89,62 @@ def _log_transaction(
         logger.debug("credit_transactions insert skipped: %s", exc)
 
 
+def _is_missing_rpc_error(exc: Exception) -> bool:
+    text = str(exc)
+    return "PGRST202" in text or "Could not find the function" in text
+
+
+def _is_duplicate_error(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return "23505" in msg or "duplicate" in msg or "unique" in msg
+
+
+def _apply_credit_delta_rpc(
+    supabase: Any,
+    user_id: str,
+    delta: int,
+    *,
+    reason: str,
+    metadata: dict[str, Any] | None,
+    idempotency_key: str | None,
+) -> dict[str, Any] | None:
+    """
+    Deduct (delta < 0) or add credits and write the ledger row in one round trip.
+    Returns the RPC payload {ok, applied, balance, error}, or None when the
+    function is not deployed and the caller should use the legacy path.
+    """
+    global _ledger_rpc_missing_until
+    if time.monotonic() < _ledger_rpc_missing_until:
+        return None
+    try:
+        res = supabase.rpc(
+            CREDIT_LEDGER_RPC,
+            {
+                "p_user_id": user_id,
+                "p_delta": int(delta),
+                "p_reason": reason,
+                "p_metadata": metadata or {},
+                "p_idempotency_key": idempotency_key,
+            },
+        ).execute()
+    except Exception as exc:
+        if _is_missing_rpc_error(exc):
+            _ledger_rpc_missing_until = time.monotonic() + LEDGER_RPC_REPROBE_SEC
+            logger.warning(
+                "%s RPC not deployed; using legacy credit writes for %ss",
+                CREDIT_LEDGER_RPC,
+                int(LEDGER_RPC_REPROBE_SEC),
+            )
+            return None
+        raise
+    data = res.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if not isinstance(data, dict):
+        raise RuntimeError(f"{CREDIT_LEDGER_RPC} returned unexpected payload: {data!r}")
+    return data
+
+
 def should_skip_credit_charge(*, role: str | None, tier: str | None) -> bool:
     if (role or "").lower() in ("admin", "super_admin"):
         return True
@@ -94,12 +160,34 @@ def deduct_credits(
     *,
     reason: str,
     metadata: dict[str, Any] | None = None,
+    idempotency_key: str | None = None,
 ) -> tuple[bool, int, str | None]:
-    """Deduct credits atomically (best-effort). Returns (ok, balance_after, error)."""
+    """
+    Deduct credits atomically via the ledger RPC. Returns (ok, balance_after, error).
+    A repeated idempotency_key succeeds without charging twice.
+    """
     amount = int(amount)
     if amount <= 0:
         return True, get_user_credit_balance(supabase, user_id), None
 
+    try:
+        payload = _apply_credit_delta_rpc(
+            supabase,
+            user_id,
+            -amount,
+            reason=reason,
+            metadata=metadata,
+            idempotency_key=idempotency_key,
+        )
+    except Exception as exc:
+        logger.exception("deduct_credits RPC failed for %s: %s", user_id, exc)
+        return False, get_user_credit_balance(supabase, user_id), "credit_deduction_failed"
+    if payload is not None:
+        balance = int(payload.get("balance") or 0)
+        if payload.get("ok"):
+            return True, balance, None
+        return False, balance, payload.get("error") or "credit_deduction_failed"
+
     before = get_user_credit_balance(supabase, user_id)
     if before < amount:
         return False, before, "insufficient_credits"
@@ -130,12 +218,26 @@ def add_credits(
     *,
     reason: str,
     metadata: dict[str, Any] | None = None,
+    idempotency_key: str | None = None,
 ) -> int:
     """Add credits back (refund/grant). Returns balance after."""
     amount = int(amount)
     if amount <= 0:
         return get_user_credit_balance(supabase, user_id)
 
+    payload = _apply_credit_delta_rpc(
+        supabase,
+        user_id,
+        amount,
+        reason=reason,
+        metadata=metadata,
+        idempotency_key=idempotency_key,
+    )
+    if payload is not None:
+        if not payload.get("ok"):
+            raise RuntimeError(f"add_credits failed for {user_id}: {payload.get('error')}")
+        return int(payload.get("balance") or 0)
+
     before = get_user_credit_balance(supabase, user_id)
     after = before + amount
     _write_balance(supabase, user_id, after)
@@ -159,30 +261,81 @@ def refund_analysis_credit(
     job_id: str,
     reason: str = "Analysis failed — credit refunded",
 ) -> bool:
-    """Refund one analysis credit once per job_id (best-effort idempotency)."""
+    """Refund one analysis credit once per job_id (idempotent via the ledger key)."""
     meta = {"job_id": job_id, "kind": "analysis_refund"}
-    try:
-        existing = (
-            supabase.table("credit_transactions")
-            .select("id")
-            .eq("user_id", user_id)
-            .eq("transaction_type", "add")
-            .contains("metadata", meta)
-            .limit(1)
-            .execute()
-        )
-        if existing.data:
-            return False
-    except Exception:
-        pass
-
-    add_credits(
+    payload = _apply_credit_delta_rpc(
         supabase,
         user_id,
         CREDIT_COST_ANALYSIS,
         reason=reason,
         metadata=meta,
+        idempotency_key=f"analysis_refund:{job_id}",
     )
+    if payload is not None:
+        applied = bool(payload.get("ok") and payload.get("applied"))
+        if applied:
+            logger.info("Refunded analysis credit for user %s job %s", user_id, job_id)
+        return applied
+
+    # Legacy path: claim the refund with a ledger row under the RPC's key *before*
+    # touching the balance, so a retried, concurrent or second-reason refund for
+    # the same job hits the unique idempotency_key index instead of crediting twice.
+    key = f"analysis_refund:{job_id}"
+    before = get_user_credit_balance(supabase, user_id)
+    after = before + CREDIT_COST_ANALYSIS
+    try:
+        supabase.table("credit_transactions").insert(
+            {
+                "user_id": user_id,
+                "transaction_type": "add",
+                "amount": CREDIT_COST_ANALYSIS,
+                "credits_before": before,
+                "credits_after": after,
+                "reason": reason,
+                "metadata": meta,
+                "idempotency_key": key,
+            }
+        ).execute()
+    except Exception as exc:
+        if _is_duplicate_error(exc):
+            return False
+        # idempotency_key column not deployed (pre credit_ledger_atomic.sql):
+        # best-effort check on the job's refund metadata, as before.
+        logger.debug("Keyed refund ledger insert failed, checking metadata: %s", exc)
+        try:
+            existing = (
+                supabase.table("credit_transactions")
+                .select("id")
+                .eq("user_id", user_id)
+                .eq("transaction_type", "add")
+                .contains("metadata", meta)
+                .limit(1)
+                .execute()
+            )
+            if existing.data:
+                return False
+        except Exception:
+            pass
+        add_credits(supabase, user_id, CREDIT_COST_ANALYSIS, reason=reason, metadata=meta)
+        logger.info("Refunded analysis credit for user %s job %s", user_id, job_id)
+        return True
+
+    try:
+        _write_balance(supabase, user_id, after)
+    except Exception:
+        # Release the claim so a retry can refund; otherwise the key would mark
+        # a refund that was never credited.
+        try:
+            (
+                supabase.table("credit_transactions")
+                .delete()
+                .eq("user_id", user_id)
+                .eq("idempotency_key", key)
+                .execute()
+            )
+        except Exception as cleanup_err:
+            logger.error("Could not release refund claim %s after a failed balance write: %s", key, cleanup_err)
+        raise
     logger.info("Refunded analysis credit for user %s job %s", user_id, job_id)
     return True
 
@@ -208,5 +361,6 @@ def charge_analysis_credit(
         CREDIT_COST_ANALYSIS,
         reason="Image analysis",
         metadata={"job_id": job_id, "kind": "analysis_charge"},
+        idempotency_key=f"analysis_charge:{job_id}",
     )
     return ok, balance, err, False
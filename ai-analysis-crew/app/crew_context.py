@@ -0,0 +1,174 @@
+"""
+Context budgeting between sequential crew tasks.
+
+CrewAI hands every task the raw outputs of its context tasks, so the prompt
+grows along identify -> research -> supplier -> report -> completion. Before
+a task runs, ``build_task_context`` rebuilds that context for it:
+
+1. Section selection: headed sections the consuming stage does not use are
+   dropped (e.g. the supplier search does not need the research alternatives).
+2. Dedup: spec / bullet lines already given by an earlier output are removed
+   (the report would otherwise see each spec two or three times).
+3. Budget: if still over CONTEXT_BUDGETS[stage] tokens (tiktoken), each output
+   is trimmed at a line boundary; outputs smaller than their fair share are
+   kept whole and the rest share what is left.
+
+Trimming is extractive (no extra LLM call), so it adds milliseconds, not a
+summarization round trip. The vision description put into the identify task
+gets the same dedup and VISION_BUDGET. Task outputs themselves are not
+changed: the report text and checkpoints stay complete.
+
+Per-stage numbers (context tokens before / after, compaction ms, stage ms)
+are collected by crew_setup.BudgetedCrew and stored in result_data["context"],
+so jobs with CREW_CONTEXT_COMPACTION=0 and =1 can be compared.
+
+Env:
+  CREW_CONTEXT_COMPACTION   1/0 (default 1)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Any, Optional
+
+from .llm_usage import count_tokens, token_encoding
+
+# Token budget of the upstream context each stage receives.
+CONTEXT_BUDGETS: dict[str, int] = {
+    "research_agent": 1200,
+    "supplier_finder": 1500,
+    "report_generator": 5000,
+    "email_agent": 300,
+}
+VISION_BUDGET = 1000
+
+# consuming stage -> producing stage -> section headings (regex) it does not need
+DROP_SECTIONS: dict[str, dict[str, str]] = {
+    "supplier_finder": {
+        "research_agent": r"alternative|replacement option|key feature|technology|quality indicator",
+    },
+}
+
+# Same divider CrewAI uses between aggregated task outputs.
+DIVIDER = "\n\n----------\n\n"
+
+_HEADING_RE = re.compile(
+    r"^\s*(#{1,6}\s+\S.*|\d+[.)]\s*\*\*[^*]+\*\*:?\s*|\*\*[^*]+\*\*:?\s*|[A-Z][A-Z0-9 /&()-]{3,}:?\s*)$"
+)
+_NORMALIZE_RE = re.compile(r"[\s*_`#>|•\-–—]+")
+# Lines shorter than this (normalized) are never treated as duplicates.
+MIN_DEDUP_CHARS = 16
+
+
+def compaction_enabled() -> bool:
+    flag = (os.getenv("CREW_CONTEXT_COMPACTION") or "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def _is_heading(line: str) -> bool:
+    return bool(_HEADING_RE.match(line))
+
+
+def split_sections(text: str) -> list[tuple[str, list[str]]]:
+    """(heading, lines) blocks; text before the first heading has heading ""."""
+    sections: list[tuple[str, list[str]]] = [("", [])]
+    for line in (text or "").splitlines():
+        if _is_heading(line):
+            sections.append((line.strip(), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [s for s in sections if s[1]]
+
+
+def drop_sections(text: str, pattern: Optional[str]) -> str:
+    if not pattern:
+        return text
+    rx = re.compile(pattern, re.IGNORECASE)
+    kept = [lines for heading, lines in split_sections(text) if not (heading and rx.search(heading))]
+    return "\n".join(line for lines in kept for line in lines)
+
+
+def dedupe_lines(text: str, seen: set[str]) -> str:
+    """Drop non-heading lines already in ``seen`` (updated in place) and collapse blank runs."""
+    out: list[str] = []
+    for line in (text or "").splitlines():
+        if not line.strip():
+            if out and out[-1].strip():
+                out.append("")
+            continue
+        if not _is_heading(line):
+            key = _NORMALIZE_RE.sub(" ", line).strip().casefold()
+            if len(key) >= MIN_DEDUP_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+        out.append(line)
+    return "\n".join(out).strip()
+
+
+def trim_to_tokens(text: str, budget: int) -> str:
+    """Cut ``text`` to about ``budget`` tokens at a line boundary, noting the cut."""
+    if budget <= 0:
+        return ""
+    total = count_tokens(text)
+    if total <= budget:
+        return text
+    enc = token_encoding()
+    head = enc.decode(enc.encode(text, disallowed_special=())[:budget]) if enc else text[: budget * 4]
+    cut = head.rfind("\n")
+    if cut > len(head) // 2:
+        head = head[:cut]
+    return f"{head.rstrip()}\n[… {total - count_tokens(head)} more tokens omitted]"
+
+
+def _allocate(sizes: list[int], budget: int) -> list[int]:
+    """Water-filling: small outputs keep everything, large ones split the rest evenly."""
+    alloc = [0] * len(sizes)
+    remaining = budget
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while pending:
+        share = remaining // len(pending)
+        i = pending[0]
+        if sizes[i] <= share:
+            alloc[i] = sizes[i]
+            remaining -= sizes[i]
+            pending.pop(0)
+            continue
+        for j in pending:
+            alloc[j] = share
+        break
+    return alloc
+
+
+def build_task_context(stage: str, sources: list[tuple[str, str]]) -> tuple[str, dict[str, Any]]:
+    """
+    Context string for ``stage`` from ``sources`` ((producing stage, raw output),
+    in task order), plus {"tokens_before", "tokens_after", "compaction_ms"}.
+    """
+    t0 = time.perf_counter()
+    raw = DIVIDER.join(text for _, text in sources if text)
+    before = count_tokens(raw)
+    budget = CONTEXT_BUDGETS.get(stage)
+    if not compaction_enabled() or budget is None:
+        return raw, {"tokens_before": before, "tokens_after": before, "compaction_ms": 0}
+
+    drops = DROP_SECTIONS.get(stage, {})
+    seen: set[str] = set()
+    texts = [dedupe_lines(drop_sections(text or "", drops.get(producer)), seen) for producer, text in sources]
+    sizes = [count_tokens(t) for t in texts]
+    if sum(sizes) > budget:
+        texts = [trim_to_tokens(t, n) for t, n in zip(texts, _allocate(sizes, budget))]
+    context = DIVIDER.join(t for t in texts if t)
+    return context, {
+        "tokens_before": before,
+        "tokens_after": count_tokens(context),
+        "compaction_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def compact_vision_description(text: str) -> str:
+    if not compaction_enabled():
+        return text
+    return trim_to_tokens(dedupe_lines(text, set()), VISION_BUDGET)
@@ -30,6 +30,7 @@ from .database_storage import (
     update_crew_job_identified_part,
     update_crew_job_status,
 )
+from .job_checkpoints import save_task_output
 
 
 
@@ -57,7 +58,7 @@ _STREAM_TASK_STAGES: list[tuple[str, int, int]] = [
 
 
 
-_AGENT_ROLE_TO_STAGE: dict[str, str] = {
+AGENT_ROLE_TO_STAGE: dict[str, str] = {
 
     "Part Identifier": "part_identifier",
 
@@ -152,7 +153,7 @@ def _agent_role_from_output(output: Any) -> str:
 
         text = str(agent).strip()
 
-        for known_role in _AGENT_ROLE_TO_STAGE:
+        for known_role in AGENT_ROLE_TO_STAGE:
 
             if known_role.lower() in text.lower():
 
@@ -208,7 +209,7 @@ def _handle_task_completed(job_id: str, output: Any) -> None:
 
     role = _agent_role_from_output(output)
 
-    stage = _AGENT_ROLE_TO_STAGE.get(role)
+    stage = AGENT_ROLE_TO_STAGE.get(role)
 
     if not stage:
 
@@ -226,6 +227,8 @@ def _handle_task_completed(job_id: str, output: Any) -> None:
 
         _persist_stage(job_id, stage_key, hi)
 
+        save_task_output(job_id, stage_key, _task_output_text(output))
+
         if stage_key == "part_identifier":
 
             label = extract_identified_part_label(_task_output_text(output))
@@ -260,7 +263,7 @@ def create_task_progress_callback(job_id: str) -> Callable[[Any], None]:
 
         role = _agent_role_from_output(output)
 
-        stage = _AGENT_ROLE_TO_STAGE.get(role)
+        stage = AGENT_ROLE_TO_STAGE.get(role)
 
         if not stage or stage in completed:
 
@@ -333,6 +336,10 @@ def run_crew_kickoff(crew: Crew, job_id: Optional[str] = None) -> Any:
 
     streaming = crew.kickoff()
 
+    # A resumed crew omits tasks that finished before the restart; chunk task_index
+    # is relative to crew.tasks, so shift it onto the full stage list.
+    index_offset = max(0, len(_STREAM_TASK_STAGES) - len(getattr(crew, "tasks", None) or _STREAM_TASK_STAGES))
+
     last_db_write = 0.0
 
     current_task_index = -1
@@ -347,9 +354,13 @@ def run_crew_kickoff(crew: Crew, job_id: Optional[str] = None) -> Any:
 
         idx = int(getattr(chunk, "task_index", -1))
 
+        if idx >= 0:
+
+            idx += index_offset
+
         role = (getattr(chunk, "agent_role", "") or "").strip()
 
-        stage = _AGENT_ROLE_TO_STAGE.get(role)
+        stage = AGENT_ROLE_TO_STAGE.get(role)
 
 
 
@@ -2,14 +2,23 @@
 
 import os
 import asyncio
-from typing import Callable, Optional, Tuple
+import time
+from typing import Any, Callable, Optional, Tuple
 from crewai import Agent, Task, Crew
-from langchain_openai import ChatOpenAI
+from pydantic import Field, PrivateAttr
 from .report_generator import generate_report
-from .email_sender import send_email_with_attachment, send_email_via_email_service
-from .crew_progress import crew_streaming_enabled, create_task_progress_callback
+from .email_sender import send_email_with_attachment
+from .email_outbox import deliver_email
+from .report_delivery import ReportPdf, read_and_remove
+from .report_schema import REPORT_JSON_INSTRUCTIONS
+from .crew_context import build_task_context, compact_vision_description
+from .llm_usage import count_tokens
+from .crew_progress import AGENT_ROLE_TO_STAGE, crew_streaming_enabled, create_task_progress_callback
+from .model_routing import CREW_STEPS, ModelTrace, chat_llm, resolve_route
 from .vision_analyzer import sanitize_vision_description
 
+# Cap on a seeded prior report in the part identifier prompt (semantic_cache)
+PRIOR_REPORT_MAX_CHARS = 6000
 
 # Global progress emitter function
 progress_emitter: Optional[Callable] = None
@@ -103,6 +112,18 @@ def create_email_agent(llm):
     )
 
 
+def _standard_report_fallback(comprehensive_report_text: str) -> str:
+    """Plain ReportLab report (temp file) used when the enhanced renderer fails."""
+    from .report_generator import generate_report
+    part_details = {"Report": comprehensive_report_text[:500]}
+    technical_specs = {"Details": comprehensive_report_text[500:1500]}
+    suppliers = [{"Information": comprehensive_report_text[1500:2500]}]
+    summary = comprehensive_report_text[-500:]
+    filepath = generate_report(part_details, technical_specs, suppliers, summary)
+    emit_progress("report_generator", f"PDF report generated: {filepath}", "completed")
+    return filepath
+
+
 def generate_report_tool_func(comprehensive_report_text: str) -> str:
     """Generate an enhanced PDF report from comprehensive analysis."""
     emit_progress("report_generator", "Generating professional PDF report...", "in_progress")
@@ -120,23 +141,42 @@ def generate_report_tool_func(comprehensive_report_text: str) -> str:
         emit_progress("report_generator", f"Professional PDF report generated: {filepath}", "completed")
     except Exception as e:
         print(f"Error with enhanced report, falling back to standard: {e}")
-        # Fallback to standard report generator
-        from .report_generator import generate_report
-        part_details = {"Report": comprehensive_report_text[:500]}
-        technical_specs = {"Details": comprehensive_report_text[500:1500]}
-        suppliers = [{"Information": comprehensive_report_text[1500:2500]}]
-        summary = comprehensive_report_text[-500:]
-        filepath = generate_report(part_details, technical_specs, suppliers, summary)
-        emit_progress("report_generator", f"PDF report generated: {filepath}", "completed")
+        filepath = _standard_report_fallback(comprehensive_report_text)
     
     return filepath
 
 
-def send_email_tool_func(to_email: str, pdf_path: str, pdf_url: str | None = None) -> str:
+def render_report_pdf(comprehensive_report_text: str, structured=None) -> ReportPdf:
+    """Render the PDF in memory; only the standard fallback goes through a temp file."""
+    emit_progress("report_generator", "Generating professional PDF report...", "in_progress")
+
+    from .report_generator_enhanced import render_enhanced_report
+    from .utils import get_timestamp
+
+    filename = f"report_{get_timestamp()}.pdf"
+    try:
+        rendered = render_enhanced_report(comprehensive_report_text, structured=structured)
+    except Exception as e:
+        print(f"Error with enhanced report, falling back to standard: {e}")
+        return read_and_remove(_standard_report_fallback(comprehensive_report_text))
+    emit_progress(
+        "report_generator",
+        f"Professional PDF report generated: {filename} ({rendered.pages} pages)",
+        "completed",
+    )
+    return ReportPdf(filename=filename, data=rendered.data)
+
+
+def send_email_tool_func(
+    to_email: str,
+    report: ReportPdf,
+    job_id: str | None = None,
+) -> str:
     """
     Send an email with the report.
-    Prefer the external email-service (EMAIL_SERVICE_URL) with a PDF link when available;
-    fall back to SMTP attachment otherwise.
+    With a PDF link, the email is queued on the email outbox (keyed per job_id so a
+    retried job does not mail twice). The PDF is attached only when there is no link
+    or REPORT_EMAIL_DELIVERY=attach_small allows it (see report_delivery).
     """
     emit_progress("email_agent", f"Sending email to {to_email}...", "in_progress")
     subject = "Comprehensive Part Analysis Report"
@@ -173,7 +213,8 @@ This report has been professionally formatted and structured for your convenienc
 Best regards,
 AI Spare Part Analyzer Team
 """
-    # Preferred path: send a link via the external email-service
+    pdf_url = report.email_url
+    html = None
     if pdf_url:
         html = f"""
         <div style="font-family:Arial,Helvetica,sans-serif;line-height:1.5">
@@ -186,18 +227,29 @@ AI Spare Part Analyzer Team
         </div>
         """.strip()
 
-        success = send_email_via_email_service(
+    # Preferred path: queue a link-only email (small payload, retried by the outbox worker)
+    if pdf_url and not report.should_attach():
+        success = deliver_email(
+            kind="analysis_report",
             to_email=to_email,
             subject=subject,
             html=html,
-            text=body_text + (f"\n\nReport link: {pdf_url}" if pdf_url else ""),
+            text=body_text + f"\n\nReport link: {pdf_url}",
+            idempotency_key=f"analysis_report:{job_id}" if job_id else None,
         )
         if success:
-            emit_progress("email_agent", f"Email sent successfully to {to_email}", "completed")
-            return f"Email sent successfully to {to_email}"
-
-    # Fallback: try SMTP attachment (may be blocked on some Render plans)
-    success = send_email_with_attachment(to_email, subject, body_text, pdf_path)
+            emit_progress("email_agent", f"Email queued successfully for {to_email}", "completed")
+            return f"Email queued successfully for {to_email}"
+
+    # Attachment from the in-memory PDF (no link, small-attachment policy, or queueing failed)
+    success = send_email_with_attachment(
+        to_email,
+        subject,
+        body_text + (f"\n\nReport link: {pdf_url}" if pdf_url else ""),
+        attachment_bytes=report.data,
+        attachment_filename=report.filename,
+        html=html,
+    )
     if success:
         emit_progress("email_agent", f"Email sent successfully to {to_email}", "completed")
         return f"Email sent successfully to {to_email}"
@@ -206,6 +258,65 @@ AI Spare Part Analyzer Team
         return "Failed to send email"
 
 
+def _task_stage(task: Any) -> Optional[str]:
+    agent = getattr(task, "agent", None)
+    return AGENT_ROLE_TO_STAGE.get(str(getattr(agent, "role", "") or "").strip())
+
+
+class BudgetedCrew(Crew):
+    """
+    Crew that hands each task a compacted context (crew_context.build_task_context)
+    instead of the raw upstream outputs, and records per-stage context tokens
+    and duration in ``context_stats``. Overrides CrewAI 1.6 internals.
+    """
+
+    context_stats: dict[str, dict[str, Any]] = Field(default_factory=dict)
+    _stage_started: dict[str, float] = PrivateAttr(default_factory=dict)
+
+    def _get_context(self, task: Task, task_outputs: list) -> str:
+        stage = _task_stage(task)
+        if stage:
+            self._stage_started[stage] = time.perf_counter()
+        if not task.context or not stage or not isinstance(task.context, list):
+            return super()._get_context(task, task_outputs)
+        sources = [
+            (_task_stage(t) or "", t.output.raw)
+            for t in task.context
+            if t.output is not None
+        ]
+        context, stats = build_task_context(stage, sources)
+        self.context_stats.setdefault(stage, {}).update(stats)
+        return context
+
+    def _process_task_result(self, task: Task, output: Any) -> None:
+        super()._process_task_result(task, output)
+        stage = _task_stage(task)
+        started = self._stage_started.pop(stage, None) if stage else None
+        if started is not None:
+            self.context_stats.setdefault(stage, {})["stage_ms"] = round((time.perf_counter() - started) * 1000)
+
+
+def _restore_completed_tasks(stage_tasks: list, completed_outputs: dict[str, str]) -> list:
+    """
+    Attach checkpointed outputs to finished tasks and return the ones still to run.
+
+    Only a leading run of finished tasks is skipped (tasks are sequential), so a
+    gap in the checkpoints reruns everything from that point on.
+    """
+    from crewai.tasks.task_output import TaskOutput
+
+    remaining = list(stage_tasks)
+    while remaining and remaining[0][0] in completed_outputs:
+        stage, task, agent = remaining.pop(0)
+        task.output = TaskOutput(
+            description=task.description,
+            expected_output=task.expected_output,
+            raw=completed_outputs[stage],
+            agent=agent.role,
+        )
+    return remaining
+
+
 def setup_crew(
     image_data: Optional[bytes],
     keywords: Optional[str],
@@ -215,6 +326,11 @@ def setup_crew(
     user_currency: Optional[str] = None,
     job_id: Optional[str] = None,
     vision_description: Optional[str] = None,
+    completed_outputs: Optional[dict[str, str]] = None,
+    prior_report: Optional[str] = None,
+    tier: Optional[str] = None,
+    model_overrides: Optional[dict[str, str]] = None,
+    trace: Optional[ModelTrace] = None,
 ) -> Tuple[Crew, Task]:
     """
     Set up and configure the CrewAI crew for spare part analysis.
@@ -226,6 +342,15 @@ def setup_crew(
         user_country: Optional user country — restricts supplier search to this area
         user_region: Optional user region — restricts supplier search to this area
         user_currency: Optional ISO currency code for all quoted prices
+        completed_outputs: Stage key -> raw output of tasks finished before a
+            restart (job_checkpoints); those tasks are not rerun and their
+            outputs feed later tasks as context
+        prior_report: Report from a near-duplicate earlier query (semantic_cache);
+            given to the keyword search as a starting point to verify and refresh
+        tier: User's plan tier for model_routing tier overrides
+        model_overrides: Stage key -> model replacing the routed one (a fallback
+            chosen after the previous kickoff timed out or got a 5xx)
+        trace: Records the model each remaining stage runs on
 
     Returns:
         Configured Crew instance
@@ -235,20 +360,23 @@ def setup_crew(
     if not openai_api_key:
         raise ValueError("OPENAI_API_KEY environment variable must be set")
     
-    # Initialize LLMs - using model names directly
-    # GPT-4o has native vision capabilities
     has_image = image_data is not None
-    
-    # GPT-4o supports both text and vision natively
-    gpt4o = ChatOpenAI(model="gpt-4o", temperature=0.7, max_tokens=4096)
-    gpt4_turbo = ChatOpenAI(model="gpt-4-turbo", temperature=0.7)
-    
+
+    # One LLM per agent from the routing policy (app/data/model_routing.json)
+    llms = {}
+    for step in CREW_STEPS:
+        route = resolve_route(step, tier)
+        model = (model_overrides or {}).get(step) or route.model
+        llms[step] = chat_llm(route, model)
+        if trace is not None and step not in (completed_outputs or {}):
+            trace.record(step, model, fallback_from=route.model if model != route.model else None)
+
     # Create agents
-    part_identifier = create_part_identifier_agent(gpt4o, has_vision=has_image)
-    research_agent = create_research_agent(gpt4_turbo)
-    supplier_finder = create_supplier_finder_agent(gpt4_turbo)
-    report_generator_agent = create_report_generator_agent(gpt4_turbo)
-    email_agent = create_email_agent(gpt4_turbo)
+    part_identifier = create_part_identifier_agent(llms["part_identifier"], has_vision=has_image)
+    research_agent = create_research_agent(llms["research_agent"])
+    supplier_finder = create_supplier_finder_agent(llms["supplier_finder"])
+    report_generator_agent = create_report_generator_agent(llms["report_generator"])
+    email_agent = create_email_agent(llms["email_agent"])
     
     # Note: In newer versions of CrewAI, tools are not always required
     # Agents can work without explicit tools defined
@@ -256,6 +384,7 @@ def setup_crew(
     # Build input description
     input_desc = []
     image_base64 = None
+    vision_stats: dict[str, int] = {}
     
     if image_data:
         # Convert image bytes to base64 for GPT-4o vision
@@ -276,6 +405,12 @@ def setup_crew(
     elif vision_description:
         # Image was pre-analyzed by GPT-4o Vision before crew kickoff (main background path)
         cleaned = sanitize_vision_description(vision_description)
+        compacted = compact_vision_description(cleaned)
+        vision_stats = {
+            "tokens_before": count_tokens(cleaned),
+            "tokens_after": count_tokens(compacted),
+        }
+        cleaned = compacted
         input_desc.append(
             f"""
             Pre-analyzed spare part from an uploaded image (vision AI):
@@ -311,6 +446,18 @@ def setup_crew(
             Provide the same level of detail and professionalism as an image-based analysis.
             """
             )
+            if prior_report:
+                input_desc.append(
+                    f"""
+            A previous analysis for a closely matching query is below. Use it as a starting point:
+            confirm the part identity and part numbers against these keywords, keep what still holds,
+            and refresh supplier availability, contact details and prices.
+
+            --- PREVIOUS ANALYSIS ---
+            {prior_report[:PRIOR_REPORT_MAX_CHARS]}
+            --- END PREVIOUS ANALYSIS ---
+            """
+                )
     
     analysis_input = " ".join(input_desc) if input_desc else "No specific input provided."
     
@@ -502,9 +649,9 @@ def setup_crew(
         - Recommendations
         
         Use clear headers, bullet points, and organized formatting throughout.
-        """,
+        {REPORT_JSON_INSTRUCTIONS}""",
         agent=report_generator_agent,
-        expected_output="Professionally structured comprehensive report following the exact format specified, ready for PDF generation",
+        expected_output="Professionally structured comprehensive report following the exact format specified, ready for PDF generation, ending with the JSON summary block",
         context=[identify_task, research_task, supplier_task]
     )
     
@@ -534,26 +681,25 @@ def setup_crew(
         # Streaming already prints progress; verbose duplicates "Final Answer" panels
         crew_verbose = not use_stream
 
+    stage_tasks = [
+        ("part_identifier", identify_task, part_identifier),
+        ("research_agent", research_task, research_agent),
+        ("supplier_finder", supplier_task, supplier_finder),
+        ("report_generator", report_task, report_generator_agent),
+        ("email_agent", email_task, email_agent),
+    ]
+    remaining = _restore_completed_tasks(stage_tasks, completed_outputs or {})
+
     # Create crew (stream=True on CrewAI >= 1.6 for token-level progress)
-    crew = Crew(
-        agents=[
-            part_identifier,
-            research_agent,
-            supplier_finder,
-            report_generator_agent,
-            email_agent
-        ],
-        tasks=[
-            identify_task,
-            research_task,
-            supplier_task,
-            report_task,
-            email_task
-        ],
+    crew = BudgetedCrew(
+        agents=[agent for _, _, agent in remaining],
+        tasks=[task for _, task, _ in remaining],
         verbose=True,
         stream=use_stream,
         task_callback=task_callback,
     )
+    if vision_stats:
+        crew.context_stats["part_identifier"] = dict(vision_stats)
     
     # Return crew and report_task so we can access the report output
     return crew, report_task
@@ -9,6 +9,15 @@ Env:
   STUCK_JOBS_MAX_PROGRESS      max progress % to count as stuck (default 15)
   STUCK_JOBS_BATCH_LIMIT       max jobs per run (default 100)
   STUCK_JOBS_MAX_RESTARTS      restart attempts before failing job (default 3)
+  STUCK_JOBS_RESUME_MINUTES    idle threshold for jobs above STUCK_JOBS_MAX_PROGRESS that
+                               have stage checkpoints and can resume cheaply (default 15)
+
+Jobs holding a worker lease (app/job_leases.py) are restarted only once the
+lease has expired, at any progress; a live worker's job is never touched. The
+updated_at/progress heuristics above apply only to jobs without a lease (rows
+from before the migration, or workers that could not lease). Such jobs touch
+updated_at every JOB_LEASE_HEARTBEAT_SEC while they wait in the admission
+queue, so a queued job is not mistaken for a stuck one.
 """
 
 from __future__ import annotations
@@ -22,6 +31,7 @@ from typing import Any
 from croniter import croniter
 
 from .database_storage import update_crew_job_status
+from .job_leases import reclaim_expired_lease
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +42,13 @@ DEFAULT_STUCK_MINUTES = 5
 DEFAULT_MAX_PROGRESS = 15
 DEFAULT_BATCH_LIMIT = 100
 DEFAULT_MAX_RESTARTS = 3
+DEFAULT_RESUME_MINUTES = 15
 
 _JOB_SELECT = (
     "id,status,progress,updated_at,created_at,user_email,keywords,"
     "image_url,image_name,user_id,result_data"
 )
+_LEASE_SELECT = _JOB_SELECT + ",lease_owner,lease_expires_at"
 
 
 def _env_bool(name: str, default: bool = True) -> bool:
@@ -81,7 +93,7 @@ def _parse_ts(value: str | None) -> datetime | None:
         return None
 
 
-def _job_is_stuck(row: dict[str, Any], *, cutoff: datetime, max_progress: int) -> bool:
+def _job_is_stuck(row: dict[str, Any], *, cutoff: datetime, max_progress: int | None) -> bool:
     status = (row.get("status") or "").lower().strip()
     if status not in STUCK_STATUSES:
         return False
@@ -90,7 +102,7 @@ def _job_is_stuck(row: dict[str, Any], *, cutoff: datetime, max_progress: int) -
         progress_val = int(progress) if progress is not None else 0
     except (TypeError, ValueError):
         progress_val = 0
-    if progress_val > max_progress:
+    if max_progress is not None and progress_val > max_progress:
         return False
     updated = _parse_ts(row.get("updated_at")) or _parse_ts(row.get("created_at"))
     if not updated:
@@ -202,25 +214,69 @@ async def run_stuck_jobs_recovery(
         max_restarts if max_restarts is not None else stuck_jobs_max_restarts(),
     )
 
-    cutoff = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(minutes=minutes)
     cutoff_iso = cutoff.isoformat()
 
+    # Leased jobs: the lease expiry is the only signal. If the lease columns are
+    # missing (migration not applied) fall back to the heuristics for every row.
+    leases = True
+    expired: list[dict[str, Any]] = []
     try:
-        result = (
+        res = (
             supabase.table("crew_analysis_jobs")
-            .select(_JOB_SELECT)
+            .select(_LEASE_SELECT)
             .in_("status", list(STUCK_STATUSES))
-            .lte("progress", max_prog)
-            .lt("updated_at", cutoff_iso)
-            .order("updated_at")
+            .lt("lease_expires_at", now.isoformat())
+            .order("lease_expires_at")
             .limit(batch)
             .execute()
         )
+        expired = res.data or []
+    except Exception as e:
+        logger.warning("stuck jobs cron: lease query failed (%s); using updated_at heuristics only", e)
+        leases = False
+
+    def _unleased(query: Any) -> Any:
+        return query.is_("lease_owner", "null") if leases else query
+
+    try:
+        result = _unleased(
+            supabase.table("crew_analysis_jobs")
+            .select(_JOB_SELECT)
+            .in_("status", list(STUCK_STATUSES))
+            .lte("progress", max_prog)
+            .lt("updated_at", cutoff_iso)
+        ).order("updated_at").limit(batch).execute()
     except Exception as e:
         logger.exception("stuck jobs cron: query failed")
         return {"ok": False, "error": str(e)}
 
-    rows = result.data or []
+    rows = expired + (result.data or [])
+    expired_ids = {str(r.get("id")) for r in expired}
+
+    # Jobs that died past the early stages (e.g. during PDF upload) only restart
+    # when checkpoints let them resume; they get a longer idle threshold.
+    resume_minutes = max(minutes, _env_int("STUCK_JOBS_RESUME_MINUTES", DEFAULT_RESUME_MINUTES))
+    resume_cutoff = datetime.now(timezone.utc) - timedelta(minutes=resume_minutes)
+    resumable: set[str] = set()
+    try:
+        late = _unleased(
+            supabase.table("crew_analysis_jobs")
+            .select(_JOB_SELECT)
+            .in_("status", list(STUCK_STATUSES))
+            .gt("progress", max_prog)
+            .lt("updated_at", resume_cutoff.isoformat())
+        ).order("updated_at").limit(batch).execute()
+        late_rows = late.data or []
+        if late_rows:
+            from .job_checkpoints import jobs_with_checkpoints
+
+            resumable = jobs_with_checkpoints([str(r.get("id")) for r in late_rows if r.get("id")])
+            rows.extend(r for r in late_rows if str(r.get("id")) in resumable)
+    except Exception:
+        logger.exception("stuck jobs cron: resumable query failed")
+
     restarted_ids: list[str] = []
     failed_ids: list[str] = []
     skipped: list[dict[str, str]] = []
@@ -228,10 +284,15 @@ async def run_stuck_jobs_recovery(
     from .main import kickoff_crew_analysis_job
 
     for row in rows:
-        if not _job_is_stuck(row, cutoff=cutoff, max_progress=max_prog):
+        job_id = str(row.get("id") or "")
+        if job_id in expired_ids:
+            pass
+        elif job_id in resumable:
+            if not _job_is_stuck(row, cutoff=resume_cutoff, max_progress=None):
+                continue
+        elif not _job_is_stuck(row, cutoff=cutoff, max_progress=max_prog):
             continue
 
-        job_id = str(row.get("id") or "")
         if not job_id:
             continue
 
@@ -254,6 +315,12 @@ async def run_stuck_jobs_recovery(
                 skipped.append({"id": job_id, "reason": "fail_update_failed"})
             continue
 
+        if job_id in expired_ids and not reclaim_expired_lease(
+            supabase, job_id, row.get("lease_expires_at")
+        ):
+            skipped.append({"id": job_id, "reason": "lease_renewed"})
+            continue
+
         new_count = prior_count + 1
         if not _reset_job_for_restart(supabase, job_id, row.get("result_data"), new_count):
             skipped.append({"id": job_id, "reason": "reset_failed"})
@@ -277,6 +344,8 @@ async def run_stuck_jobs_recovery(
         "max_progress": max_prog,
         "max_restarts": max_rst,
         "candidates": len(rows),
+        "resumable": len(resumable),
+        "expired_leases": len(expired_ids),
         "restarted": len(restarted_ids),
         "failed_max_restarts": len(failed_ids),
         "skipped": len(skipped),
@@ -0,0 +1,156 @@
+"""
+Versioned exchange-rate table for display conversion.
+
+Rates live in a JSON file (app/data/currency_rates.json, or CURRENCY_RATES_PATH)
+with a version, base currency and per-code rates vs the base. The table is
+loaded once per process and reloaded only when the file's mtime changes, so an
+offline refresh is picked up without a restart:
+
+  python -m app.currency_rates --refresh [--url URL] [--path FILE]
+  python -m app.currency_rates --show
+
+Refresh fetches CURRENCY_RATES_URL (an open.er-api.com style {"rates": {...}}
+payload), keeps the codes the app knows about, bumps the version and writes
+the file atomically. Nothing fetches rates at request time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_RATES_PATH = Path(__file__).resolve().parent / "data" / "currency_rates.json"
+DEFAULT_RATES_URL = "https://open.er-api.com/v6/latest/USD"
+
+
+@dataclass(frozen=True)
+class RatesTable:
+    version: int
+    base: str
+    rates: dict[str, float]
+    updated_at: Optional[str] = None
+    source: str = "bundled"
+
+    def rate(self, code: str) -> Optional[float]:
+        return self.rates.get(code)
+
+
+def rates_path() -> Path:
+    override = (os.getenv("CURRENCY_RATES_PATH") or "").strip()
+    return Path(override) if override else BUNDLED_RATES_PATH
+
+
+def _builtin_table() -> RatesTable:
+    from .currency_utils import RATES_FROM_USD
+
+    return RatesTable(version=0, base="USD", rates=dict(RATES_FROM_USD), source="builtin")
+
+
+def _read_table(path: Path) -> RatesTable:
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    rates = {str(k).upper(): float(v) for k, v in (payload.get("rates") or {}).items() if float(v) > 0}
+    base = str(payload.get("base") or "USD").upper()
+    if base not in rates:
+        rates[base] = 1.0
+    return RatesTable(
+        version=int(payload.get("version") or 0),
+        base=base,
+        rates=rates,
+        updated_at=payload.get("updated_at"),
+        source=str(payload.get("source") or path.name),
+    )
+
+
+_lock = threading.Lock()
+_cached: Optional[tuple[str, float, RatesTable]] = None
+
+
+def current_rates() -> RatesTable:
+    """The rate table, reloaded only when the file changes; built-in rates if it is unreadable."""
+    global _cached
+    path = rates_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        mtime = -1.0
+    cached = _cached
+    if cached and cached[0] == str(path) and cached[1] == mtime:
+        return cached[2]
+    with _lock:
+        cached = _cached
+        if cached and cached[0] == str(path) and cached[1] == mtime:
+            return cached[2]
+        try:
+            table = _read_table(path)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Currency rates unavailable at %s (%s); using built-in rates", path, e)
+            table = _builtin_table()
+        _cached = (str(path), mtime, table)
+        return table
+
+
+def refresh_rates(url: Optional[str] = None, path: Optional[Path] = None) -> RatesTable:
+    """Fetch fresh rates and write a new table version (run offline, e.g. from a cron job)."""
+    import requests
+
+    from .currency_utils import COUNTRY_TO_CURRENCY
+
+    url = url or os.getenv("CURRENCY_RATES_URL") or DEFAULT_RATES_URL
+    path = path or rates_path()
+    response = requests.get(url, timeout=20)
+    response.raise_for_status()
+    fetched = response.json().get("rates") or {}
+
+    try:
+        previous = _read_table(path)
+    except (OSError, ValueError, TypeError):
+        previous = _builtin_table()
+    wanted = set(previous.rates) | set(COUNTRY_TO_CURRENCY.values())
+    rates = {code: float(fetched[code]) for code in sorted(wanted) if fetched.get(code)}
+    missing = sorted(wanted - set(rates))
+    if missing:
+        logger.warning("Rate feed has no %s; keeping previous values", ", ".join(missing))
+        rates.update({code: previous.rates[code] for code in missing if code in previous.rates})
+
+    payload = {
+        "version": previous.version + 1,
+        "base": "USD",
+        "updated_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "source": url,
+        "rates": rates,
+    }
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    return _read_table(path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refresh", action="store_true", help="fetch rates and write a new version")
+    parser.add_argument("--show", action="store_true", help="print the active table")
+    parser.add_argument("--url")
+    parser.add_argument("--path", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.refresh:
+        table = refresh_rates(args.url, args.path)
+        print(f"wrote version {table.version} ({len(table.rates)} rates) to {args.path or rates_path()}")
+    if args.show or not args.refresh:
+        table = current_rates()
+        print(f"version {table.version} base {table.base} updated {table.updated_at} source {table.source}")
+        for code, rate in sorted(table.rates.items()):
+            print(f"  {code} {rate:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,15 @@
 from __future__ import annotations
 
 import re
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-# Approximate rates vs USD for display conversion (updated periodically).
+from .currency_rates import RatesTable, current_rates
+from .report_parser import parse_report
+
+if TYPE_CHECKING:
+    from .report_schema import PriceRange, StructuredReport
+
+# Built-in fallback when the versioned table (currency_rates) cannot be read.
 RATES_FROM_USD: dict[str, float] = {
     "USD": 1.0,
     "GBP": 0.79,
@@ -197,32 +203,22 @@ def currency_instruction(currency: Optional[str]) -> str:
         """
 
 
-def convert_amount(amount: float, from_currency: str, to_currency: str) -> float:
-    """Convert a numeric amount between currencies using USD as pivot."""
+def convert_amount(
+    amount: float,
+    from_currency: str,
+    to_currency: str,
+    rates: Optional[RatesTable] = None,
+) -> float:
+    """Convert a numeric amount between currencies, pivoting through the rate table's base."""
     src = (from_currency or "USD").strip().upper()
     dst = (to_currency or "GBP").strip().upper()
     if src == dst:
         return amount
-    src_rate = RATES_FROM_USD.get(src, 1.0)
-    dst_rate = RATES_FROM_USD.get(dst, 1.0)
-    usd = amount / src_rate if src_rate else amount
-    return usd * dst_rate
-
-
-def _detect_line_currency(line: str) -> str:
-    if "£" in line or re.search(r"\bGBP\b", line, re.I):
-        return "GBP"
-    if "€" in line or re.search(r"\bEUR\b", line, re.I):
-        return "EUR"
-    if "₹" in line or re.search(r"\bINR\b", line, re.I):
-        return "INR"
-    if "¥" in line or re.search(r"\bJPY\b", line, re.I):
-        return "JPY"
-    if "KSh" in line or re.search(r"\bKES\b", line, re.I):
-        return "KES"
-    if "$" in line or re.search(r"\bUSD\b", line, re.I):
-        return "USD"
-    return "USD"
+    table = (rates or current_rates()).rates
+    src_rate = table.get(src, 1.0)
+    dst_rate = table.get(dst, 1.0)
+    base = amount / src_rate if src_rate else amount
+    return base * dst_rate
 
 
 def _format_converted_amount(amount: float, currency: str) -> str:
@@ -234,32 +230,129 @@ def _format_converted_amount(amount: float, currency: str) -> str:
     return f"{sym}{rounded:,}"
 
 
-def convert_prices_in_report(report_text: str, target_currency: Optional[str]) -> str:
+_CURRENCY_HEADER_RE = re.compile(r"(\*\*Currency:\*\*\s*)[A-Z]{3}", re.IGNORECASE)
+
+# One scan per price line: amounts (with an optional symbol prefix), bare symbols
+# and ISO codes. Amounts must start with a digit, so a stray comma is not a number.
+_PRICE_TOKEN_RE = re.compile(
+    r"(?P<amount>(?P<prefix>[£$€₹]|KSh\s?|R\s?)?(?P<number>\d(?:[\d,]*\d)?(?:\.\d+)?))"
+    r"|(?P<symbol>[£$€₹¥]|KSh)"
+    r"|(?P<code>(?i:\b(?:GBP|EUR|INR|JPY|KES|USD)\b))"
+)
+_MARKER_CURRENCY = {"£": "GBP", "€": "EUR", "₹": "INR", "¥": "JPY", "KSh": "KES", "$": "USD"}
+# When a line mixes markers, the source currency is the first of these present.
+_SOURCE_PRIORITY = ("GBP", "EUR", "INR", "JPY", "KES", "USD")
+
+
+def _convert_line(line: str, target: str, rates: RatesTable) -> str:
+    """Detect the line's source currency and rewrite every amount, from one tokenizer pass."""
+    seen: set[str] = set()
+    amounts: list[re.Match[str]] = []
+    for m in _PRICE_TOKEN_RE.finditer(line):
+        if m.group("amount"):
+            amounts.append(m)
+            prefix = (m.group("prefix") or "").strip()
+            if prefix in _MARKER_CURRENCY:
+                seen.add(_MARKER_CURRENCY[prefix])
+        elif m.group("symbol"):
+            seen.add(_MARKER_CURRENCY[m.group("symbol")])
+        else:
+            seen.add(m.group("code").upper())
+    if not amounts:
+        return line
+    source = next((code for code in _SOURCE_PRIORITY if code in seen), "USD")
+    factor = convert_amount(1.0, source, target, rates)
+    sym = CURRENCY_SYMBOLS.get(target, f"{target} ")
+
+    out: list[str] = []
+    pos = 0
+    for m in amounts:
+        numeric = float(m.group("number").replace(",", ""))
+        out.append(line[pos:m.start()])
+        out.append(f"{sym}{round(numeric * factor):,}")
+        pos = m.end()
+    out.append(line[pos:])
+    return "".join(out)
+
+
+def convert_prices_in_report(
+    report_text: str,
+    target_currency: Optional[str],
+    rates: Optional[RatesTable] = None,
+) -> str:
     """Convert price amounts in report markdown to the user's currency."""
     if not report_text or not target_currency:
         return report_text
 
     target = target_currency.strip().upper()
-    text = re.sub(
-        r"(\*\*Currency:\*\*\s*)[A-Z]{3}",
-        rf"\1{target}",
-        report_text,
-        flags=re.IGNORECASE,
-    )
+    text = _CURRENCY_HEADER_RE.sub(rf"\g<1>{target}", report_text)
+    rates = rates or current_rates()
+
+    # Only lines the report parser flagged as carrying a currency marker are rewritten.
+    lines = text.split("\n")
+    for idx in parse_report(report_text).price_lines:
+        lines[idx] = _convert_line(lines[idx], target, rates)
+    return "\n".join(lines)
 
-    amount_pattern = re.compile(r"([£$€₹]|KSh\s?|R\s?)?([\d,]+(?:\.\d+)?)")
 
-    def convert_line(line: str) -> str:
-        if not re.search(r"[£$€₹]|KSh|\b(GBP|USD|EUR|KES)\b", line, re.I):
-            return line
-        source = _detect_line_currency(line)
+def format_price_range(price: "PriceRange") -> str:
+    """'£1,800 - £2,600' from a structured price (empty when it has no amounts)."""
+    amounts = [a for a in (price.low, price.high) if a is not None]
+    if not amounts:
+        return price.text or ""
+    currency = price.currency or "USD"
+    if len(amounts) == 2 and round(amounts[0]) != round(amounts[1]):
+        return f"{_format_converted_amount(amounts[0], currency)} - {_format_converted_amount(amounts[1], currency)}"
+    return _format_converted_amount(amounts[0], currency)
 
-        def repl(match: re.Match[str]) -> str:
-            raw = match.group(0)
-            numeric = float(match.group(2).replace(",", ""))
-            converted = convert_amount(numeric, source, target)
-            return _format_converted_amount(converted, target)
 
-        return amount_pattern.sub(repl, line)
+def convert_structured_report(
+    report_text: str,
+    structured: Optional["StructuredReport"],
+    target_currency: Optional[str],
+    rates: Optional[RatesTable] = None,
+) -> tuple[str, Optional["StructuredReport"]]:
+    """
+    Convert prices using the report's structured price ranges.
+
+    Amounts are converted numerically from each range's stated currency, and the
+    range's exact markdown text is replaced in place. Price lines that carry none
+    of the structured ranges (prices the JSON block left out) still go through
+    the line-based pass, so the whole report ends up in the target currency.
+    Reports without a structure fall back to convert_prices_in_report.
+    """
+    if not target_currency:
+        return report_text, structured
+    if structured is None:
+        return convert_prices_in_report(report_text, target_currency, rates), None
+
+    target = target_currency.strip().upper()
+    text = _CURRENCY_HEADER_RE.sub(rf"\g<1>{target}", report_text)
+    rates = rates or current_rates()
+    covered: list[str] = []
+    for price in structured.price_ranges():
+        source = price.currency or structured.currency or "USD"
+        if price.low is None and price.high is None:
+            continue
+        if source == target:
+            if price.text:
+                covered.append(price.text)
+            continue
+        original = price.text
+        if price.low is not None:
+            price.low = round(convert_amount(price.low, source, target, rates), 2)
+        if price.high is not None:
+            price.high = round(convert_amount(price.high, source, target, rates), 2)
+        price.currency = target
+        price.text = format_price_range(price)
+        if original and original in text:
+            text = text.replace(original, price.text)
+        if price.text:
+            covered.append(price.text)
 
-    return "\n".join(convert_line(line) for line in text.split("\n"))
+    lines = text.split("\n")
+    for idx in parse_report(text).price_lines:
+        if not any(c in lines[idx] for c in covered):
+            lines[idx] = _convert_line(lines[idx], target, rates)
+    structured.currency = target
+    return "\n".join(lines), structured
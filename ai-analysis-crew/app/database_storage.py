@@ -5,11 +5,17 @@ Stores comprehensive analysis results to Supabase database
 
 import os
 import logging
+import re
 import requests
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
+from .report_parser import ParsedReport, iter_labelled, normalize_key, parse_report
+
+if TYPE_CHECKING:
+    from .report_schema import StructuredReport
+
 # Load environment variables
 load_dotenv()
 
@@ -100,14 +106,19 @@ def store_crew_analysis_to_database(
             
         logger.info(f"📊 Storing SpareFinder AI Research to database: {analysis_id}")
         
-        # Parse the comprehensive report text to extract structured data
+        # Prefer the Report Compiler's validated structure; otherwise parse the
+        # markdown once (shared with PDF rendering via parse_report's cache)
         report_text = analysis_data.get('report_text', '')
-        
-        # Extract part details from report
-        part_name = _extract_part_name(report_text)
-        manufacturer = _extract_manufacturer(report_text)
-        category = _extract_category(report_text)
-        confidence_score = _extract_confidence(report_text)
+        structured = analysis_data.get('structured')
+        if structured is not None:
+            fields = _fields_from_structured(structured)
+        else:
+            fields = _fields_from_report(parse_report(report_text))
+        part_name = fields['part_name']
+        manufacturer = fields['manufacturer']
+        category = fields['category']
+        confidence_score = fields['confidence']
+        suppliers = fields['suppliers']
         
         # Get user_id from email (might be None if user not found)
         user_id = get_user_id_from_email(user_email)
@@ -123,7 +134,7 @@ def store_crew_analysis_to_database(
             'manufacturer': manufacturer,
             'confidence_score': safe_int(confidence_score * 100) if confidence_score else 95,
             'precise_part_name': part_name,
-            'description': _extract_description(report_text),
+            'description': fields['description'],
             'full_analysis': report_text,
             'processing_time_seconds': safe_int(analysis_data.get('processing_time', 180)),
             'model_version': 'AI Crew v2.0 (GPT-4o Vision + CrewAI)',
@@ -135,11 +146,11 @@ def store_crew_analysis_to_database(
                 'search_region': analysis_data.get('search_region'),
                 'search_currency': analysis_data.get('search_currency'),
             },
-            'suppliers': _extract_suppliers(report_text),
-            'technical_data_sheet': _extract_technical_specs(report_text),
-            'compatible_vehicles': _extract_compatible_vehicles(report_text),
-            'buy_links': _extract_buy_links(report_text),
-            'estimated_price': _extract_pricing(report_text),
+            'suppliers': suppliers,
+            'technical_data_sheet': fields['technical_specs'],
+            'compatible_vehicles': fields['compatible_vehicles'],
+            'buy_links': _extract_buy_links(suppliers),
+            'estimated_price': fields['pricing'],
             'created_at': datetime.utcnow().isoformat(),
             'updated_at': datetime.utcnow().isoformat()
         }
@@ -186,6 +197,7 @@ def store_crew_analysis_to_database(
                 'analysis': job_data,
                 'user_email': user_email,
                 'analysis_method': 'ai_crew_multi_agent',
+                'structured_report': structured.model_dump(exclude_none=True) if structured is not None else None,
                 'agents_used': [
                     'image_analysis',
                     'part_identifier',
@@ -221,27 +233,32 @@ def store_crew_analysis_to_database(
 
 # Helper functions to extract structured data from report text
 
+_BRAND_RE = re.compile(r"\*\*Brand/Manufacturer\*\*:\s*([^\n|]+)", re.IGNORECASE)
+_PART_TYPE_RE = re.compile(
+    r"\*\*Type of Part/Component\*\*:\s*(?:[A-Za-z][A-Za-z\s]*-\s*)?(.+?)(?:\n|$)",
+    re.IGNORECASE,
+)
+_BUMPER_ROW_RE = re.compile(r"\|\s*Front Bumper Assembly[^|]*\|", re.IGNORECASE)
+# Leading score of a confidence value ("92%", "85 (high)"); qualitative values
+# such as "High (3 catalogues)" must not pick up a later number.
+_CONFIDENCE_RE = re.compile(r"\s*(\d+(?:\.\d+)?)\s*%?")
+_VEHICLE_RE = re.compile(r'(?:\d{4}[-\s])?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+([A-Z][a-z0-9]+)')
+_PRICING_RE = re.compile(r'\b(New|Used|Refurb(?:ished)?)[:\s]+\$?([\d,]+(?:-[\d,]+)?)', re.IGNORECASE)
+_PRICING_KEYS = {"new": "new", "used": "used", "refu": "refurbished"}
+
 def extract_identified_part_label(text: str) -> Optional[str]:
     """Best-effort label from Part Identifier agent output (before full report)."""
     if not text or not str(text).strip():
         return None
-    import re
-
     body = str(text).strip()
     brand: Optional[str] = None
     part_type: Optional[str] = None
 
-    brand_match = re.search(
-        r"\*\*Brand/Manufacturer\*\*:\s*([^\n|]+)", body, re.IGNORECASE
-    )
+    brand_match = _BRAND_RE.search(body)
     if brand_match:
         brand = brand_match.group(1).strip().rstrip(".")
 
-    type_match = re.search(
-        r"\*\*Type of Part/Component\*\*:\s*(?:[A-Za-z][A-Za-z\s]*-\s*)?(.+?)(?:\n|$)",
-        body,
-        re.IGNORECASE,
-    )
+    type_match = _PART_TYPE_RE.search(body)
     if type_match:
         part_type = type_match.group(1).strip().rstrip(".")
 
@@ -256,9 +273,7 @@ def extract_identified_part_label(text: str) -> Optional[str]:
     if brand:
         return brand[:80]
 
-    table_match = re.search(
-        r"\|\s*Front Bumper Assembly[^|]*\|", body, re.IGNORECASE
-    )
+    table_match = _BUMPER_ROW_RE.search(body)
     if table_match:
         return "Front Bumper Assembly"
 
@@ -307,177 +322,203 @@ def update_crew_job_identified_part(
         return False
 
 
-def _extract_part_name(report_text: str) -> str:
+def _part_details_row(report: ParsedReport) -> Dict[str, str]:
+    """Header -> value for the first row of the identified-part table (section 1)."""
+    rows = report.first_table("manufacturer", "name/type", "part number")
+    if not rows or len(rows) < 2:
+        return {}
+    return {normalize_key(h): v.strip() for h, v in zip(rows[0], rows[1]) if v.strip()}
+
+
+def _field(report: ParsedReport, *keys: str) -> Optional[str]:
+    for key in keys:
+        value = report.fields.get(key)
+        if value:
+            return value
+    return None
+
+
+def _extract_part_name(report: ParsedReport) -> str:
     """Extract part name from report"""
     try:
-        interim = extract_identified_part_label(report_text)
+        interim = extract_identified_part_label(report.text)
         if interim:
             return interim
-        import re
-        # Look for patterns like "Name: ..." or "Part Name: ..."
-        match = re.search(r'(?:Part )?Name[:\s]+([^\n]+)', report_text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-        # Fallback: look in first section
-        lines = report_text.split('\n')
-        for line in lines[:20]:
-            if ':' in line and not line.startswith('#'):
-                return line.split(':', 1)[1].strip()
+        row = _part_details_row(report)
+        name = row.get("name/type") or row.get("name") or _field(report, "part name", "name", "name/type")
+        if name:
+            return name
+        # Fallback: first "Label: value" line near the top
+        for block in report.blocks:
+            if block.line >= 20:
+                break
+            if block.value:
+                return block.value
         return "Unidentified Part"
-    except:
+    except Exception:
         return "Unidentified Part"
 
 
-def _extract_manufacturer(report_text: str) -> Optional[str]:
+def _extract_manufacturer(report: ParsedReport) -> Optional[str]:
     """Extract manufacturer from report"""
-    try:
-        import re
-        match = re.search(r'Manufacturer[:\s]+([^\n]+)', report_text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    except:
-        pass
-    return None
+    return _part_details_row(report).get("manufacturer") or _field(
+        report, "manufacturer", "brand/manufacturer", "brand"
+    )
 
 
-def _extract_category(report_text: str) -> Optional[str]:
+def _extract_category(report: ParsedReport) -> Optional[str]:
     """Extract category from report"""
-    try:
-        import re
-        match = re.search(r'Category[:\s]+([^\n]+)', report_text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    except:
-        pass
-    return None
+    return _part_details_row(report).get("category") or _field(report, "category")
 
 
-def _extract_confidence(report_text: str) -> Optional[float]:
+def _extract_confidence(report: ParsedReport) -> Optional[float]:
     """Extract confidence score from report"""
-    try:
-        import re
-        match = re.search(r'Confidence[:\s]+(\d+(?:\.\d+)?)', report_text, re.IGNORECASE)
+    raw = _field(report, "confidence", "confidence score", "confidence level")
+    if raw:
+        match = _CONFIDENCE_RE.match(raw)
         if match:
             return float(match.group(1)) / 100.0
-    except:
-        pass
     return 0.95  # Default high confidence for AI Crew
 
 
-def _extract_description(report_text: str) -> str:
+def _extract_description(report: ParsedReport) -> str:
     """Extract description from report"""
-    try:
-        # Look for Full Analysis section
-        import re
-        match = re.search(r'\*\*2\. FULL ANALYSIS\*\*(.*?)(?=\*\*3\.|$)', report_text, re.DOTALL | re.IGNORECASE)
-        if match:
-            desc = match.group(1).strip()
+    section = report.section(2, "analysis")
+    if section:
+        desc = section.text().strip()
+        if desc:
             # Take first few sentences
             sentences = desc.split('.')[:3]
             return '. '.join(sentences) + '.'
-    except:
-        pass
     return "Comprehensive AI analysis completed"
 
 
-def _extract_suppliers(report_text: str) -> list:
-    """Extract suppliers from report"""
+def _extract_suppliers(report: ParsedReport) -> list:
+    """
+    Extract suppliers (top 3) from the supplier section's sub-headings: numbered
+    ("**1. Acme (Distributor)**") or, when there are none, unnumbered bold or
+    "###" headings without a "Label:" colon.
+    """
     suppliers = []
     try:
-        import re
-        # Look for supplier sections
-        supplier_section = re.search(r'\*\*4\. TOP 3 SUPPLIERS\*\*(.*?)(?=\*\*5\.|$)', report_text, re.DOTALL | re.IGNORECASE)
-        if supplier_section:
-            supplier_text = supplier_section.group(1)
-            # Extract individual suppliers
-            supplier_blocks = re.findall(r'\*\*(\d+)\.\s*([^\*]+?)\*\*.*?(?=\*\*\d+\.|$)', supplier_text, re.DOTALL)
-            for num, supplier_data in supplier_blocks:
-                # Extract details
-                name_match = re.search(r'^([^(]+)', supplier_data)
-                phone_match = re.search(r'Phone[:\s]+([^\n]+)', supplier_data, re.IGNORECASE)
-                email_match = re.search(r'Email[:\s]+([^\n]+)', supplier_data, re.IGNORECASE)
-                website_match = re.search(r'Website[:\s]+([^\n]+)', supplier_data, re.IGNORECASE)
-                price_match = re.search(r'Price Range[:\s]+([^\n]+)', supplier_data, re.IGNORECASE)
-                
-                supplier = {
-                    'name': name_match.group(1).strip() if name_match else f"Supplier {num}",
-                    'contact': phone_match.group(1).strip() if phone_match else '',
-                    'url': website_match.group(1).strip() if website_match else '',
-                    'price_range': price_match.group(1).strip() if price_match else '',
-                    'email': email_match.group(1).strip() if email_match else ''
-                }
-                suppliers.append(supplier)
+        section = report.section(4, "supplier")
+        if not section:
+            return suppliers
+        numbered = any(block.kind == "numbered" for block in section.blocks)
+        groups: list[tuple[Any, list]] = []
+        for block in section.blocks:
+            if numbered:
+                is_heading = block.kind == "numbered"
+            else:
+                is_heading = block.kind in ("subsection", "heading") and block.key is None
+            if is_heading:
+                groups.append((block, []))
+            elif groups:
+                groups[-1][1].append(block)
+        for n, (heading, blocks) in enumerate(groups, 1):
+            details: Dict[str, str] = {}
+            for key, value in iter_labelled(blocks):
+                details.setdefault(key, value)
+            title = heading.title or heading.text.lstrip('#').strip().strip('*')
+            name = title.split('(')[0].strip()
+            suppliers.append({
+                'name': name or f"Supplier {heading.number or n}",
+                'contact': details.get('phone', ''),
+                'url': details.get('website', ''),
+                'price_range': details.get('price range', ''),
+                'email': details.get('email', ''),
+            })
     except Exception as e:
         logger.warning(f"Failed to extract suppliers: {e}")
     return suppliers[:3]  # Return top 3
 
 
-def _extract_technical_specs(report_text: str) -> Dict[str, str]:
+def _extract_technical_specs(report: ParsedReport) -> Dict[str, str]:
     """Extract technical specifications from report"""
-    specs = {}
-    try:
-        import re
-        # Look for technical specifications section
-        spec_section = re.search(r'\*\*3\. TECHNICAL SPECIFICATIONS\*\*(.*?)(?=\*\*4\.|$)', report_text, re.DOTALL | re.IGNORECASE)
-        if spec_section:
-            spec_text = spec_section.group(1)
-            # Extract key-value pairs
-            spec_lines = re.findall(r'[-•]\s*([^:]+):\s*([^\n]+)', spec_text)
-            for key, value in spec_lines[:10]:  # Limit to 10 specs
-                specs[key.strip().lower().replace(' ', '_')] = value.strip()
-    except Exception as e:
-        logger.warning(f"Failed to extract technical specs: {e}")
+    specs: Dict[str, str] = {}
+    section = report.section(3, "specification")
+    if not section:
+        return specs
+    for block in section.blocks:
+        if block.kind == "bullet" and block.key and block.value:
+            specs[block.key.replace(' ', '_')] = block.value
+            if len(specs) >= 10:  # Limit to 10 specs
+                break
     return specs
 
 
-def _extract_compatible_vehicles(report_text: str) -> list:
+def _extract_compatible_vehicles(report: ParsedReport) -> list:
     """Extract compatible vehicles from report"""
-    vehicles = []
-    try:
-        import re
-        # Look for compatibility section
-        compat_match = re.search(r'Compatib(?:le|ility)[^\n]*:(.*?)(?:\n\n|\*\*)', report_text, re.DOTALL | re.IGNORECASE)
-        if compat_match:
-            compat_text = compat_match.group(1)
-            # Extract vehicle mentions
-            vehicle_pattern = r'(?:\d{4}[-\s])?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+([A-Z][a-z0-9]+)'
-            matches = re.findall(vehicle_pattern, compat_text)
-            vehicles = [f"{make} {model}" for make, model in matches[:10]]
-    except Exception as e:
-        logger.warning(f"Failed to extract compatible vehicles: {e}")
-    return vehicles
-
-
-def _extract_buy_links(report_text: str) -> Dict[str, str]:
-    """Extract buy links from report"""
-    links = {}
-    try:
-        suppliers = _extract_suppliers(report_text)
-        for i, supplier in enumerate(suppliers):
-            if supplier.get('url'):
-                links[supplier['name']] = supplier['url']
-    except Exception as e:
-        logger.warning(f"Failed to extract buy links: {e}")
-    return links
-
-
-def _extract_pricing(report_text: str) -> Dict[str, str]:
-    """Extract pricing information from report"""
-    pricing = {}
-    try:
-        import re
-        # Look for price patterns
-        price_patterns = [
-            (r'New[:\s]+\$?([\d,]+(?:-[\d,]+)?)', 'new'),
-            (r'Used[:\s]+\$?([\d,]+(?:-[\d,]+)?)', 'used'),
-            (r'Refurb(?:ished)?[:\s]+\$?([\d,]+(?:-[\d,]+)?)', 'refurbished'),
-        ]
-        for pattern, key in price_patterns:
-            match = re.search(pattern, report_text, re.IGNORECASE)
-            if match:
-                pricing[key] = f"${match.group(1)}"
-    except Exception as e:
-        logger.warning(f"Failed to extract pricing: {e}")
+    for block in report.blocks:
+        if block.key and block.key.startswith("compatib") and block.value:
+            matches = _VEHICLE_RE.findall(block.value)
+            return [f"{make} {model}" for make, model in matches[:10]]
+    return []
+
+
+def _fields_from_report(report: ParsedReport) -> Dict[str, Any]:
+    """Job fields recovered from the markdown (reports without a structured block)."""
+    return {
+        'part_name': _extract_part_name(report),
+        'manufacturer': _extract_manufacturer(report),
+        'category': _extract_category(report),
+        'confidence': _extract_confidence(report),
+        'description': _extract_description(report),
+        'suppliers': _extract_suppliers(report),
+        'technical_specs': _extract_technical_specs(report),
+        'compatible_vehicles': _extract_compatible_vehicles(report),
+        'pricing': _extract_pricing(report),
+    }
+
+
+def _fields_from_structured(structured: "StructuredReport") -> Dict[str, Any]:
+    """Same job fields, read straight from the validated StructuredReport."""
+    from .currency_utils import format_price_range
+
+    part = structured.part
+    specs: Dict[str, str] = {}
+    for spec in structured.specs[:10]:
+        specs[normalize_key(spec.name).replace(' ', '_')] = spec.value
+    pricing: Dict[str, str] = {}
+    for price in structured.price_estimates:
+        key = _PRICING_KEYS.get((price.condition or "").lower()[:4])
+        if key:
+            pricing.setdefault(key, format_price_range(price))
+    return {
+        'part_name': part.name or "Unidentified Part",
+        'manufacturer': part.manufacturer,
+        'category': part.category,
+        'confidence': part.confidence / 100.0 if part.confidence is not None else 0.95,
+        'description': structured.description or "Comprehensive AI analysis completed",
+        'suppliers': [
+            {
+                'name': s.name,
+                'contact': s.phone or '',
+                'url': s.website or '',
+                'price_range': format_price_range(s.price) if s.price else '',
+                'email': s.email or '',
+            }
+            for s in structured.suppliers[:3]
+        ],
+        'technical_specs': specs,
+        'compatible_vehicles': structured.compatible_vehicles[:10],
+        'pricing': pricing,
+    }
+
+
+def _extract_buy_links(suppliers: list) -> Dict[str, str]:
+    """Supplier name -> website, from already-extracted suppliers"""
+    return {s['name']: s['url'] for s in suppliers if s.get('url')}
+
+
+def _extract_pricing(report: ParsedReport) -> Dict[str, str]:
+    """Extract new/used/refurbished pricing from report"""
+    pricing: Dict[str, str] = {}
+    for match in _PRICING_RE.finditer(report.text):
+        key = _PRICING_KEYS[match.group(1).lower()[:4]]
+        pricing.setdefault(key, f"${match.group(2)}")
+        if len(pricing) == len(_PRICING_KEYS):
+            break
     return pricing
 
 
@@ -653,14 +694,18 @@ def update_crew_job_status(
         try:
             from .redis_client import is_redis_configured, publish_job_update
             if is_redis_configured():
-                publish_job_update({
+                message = {
                     "type": "crew_job_update",
                     "job_id": job_id,
                     "status": status,
                     "current_stage": current_stage,
                     "progress": progress,
                     "error_message": error_message,
-                })
+                }
+                if progress is None:
+                    # Progress unchanged: do not push a null over the client's value
+                    del message["progress"]
+                publish_job_update(message)
         except Exception as pub_err:
             logger.debug("Redis publish_job_update (status): %s", pub_err)
         return True
@@ -0,0 +1,328 @@
+"""Durable outbound email queue (docs/sql/email_outbox.sql).
+
+Request handlers, crons and the analysis pipeline call ``deliver_email`` which
+inserts an ``email_outbox`` row keyed by an idempotency key and returns at once.
+A background worker claims due rows, sends them over the pooled SMTP transport
+(email-service as fallback) and reschedules failures with exponential backoff.
+Rows that exhaust EMAIL_OUTBOX_MAX_ATTEMPTS are marked ``dead`` and copied to
+``email_dead_letters`` for the admin dashboard.
+
+When the outbox table is missing or Supabase is unreachable, ``deliver_email``
+falls back to sending inline so mail is never silently dropped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_TABLE = "email_outbox"
+DEAD_LETTER_TABLE = "email_dead_letters"
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+MAX_ATTEMPTS = _env_int("EMAIL_OUTBOX_MAX_ATTEMPTS", 6, lo=1, hi=20)
+BATCH_SIZE = _env_int("EMAIL_OUTBOX_BATCH", 25, lo=1, hi=200)
+POLL_SEC = _env_int("EMAIL_OUTBOX_POLL_SEC", 5, lo=1, hi=300)
+BASE_BACKOFF_SEC = 30
+MAX_BACKOFF_SEC = 3600
+# Rows stuck in "sending" this long (worker died mid-batch) are put back in the queue.
+STALE_CLAIM_SEC = 600
+
+# In-process delivery counters (since start); persisted state lives in email_outbox.
+_metrics: dict[str, int] = {"enqueued": 0, "inline": 0, "sent": 0, "retried": 0, "dead": 0}
+_worker_task: asyncio.Task | None = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def default_idempotency_key(*, kind: str, to_email: str, subject: str, html: str) -> str:
+    """Content hash bucketed per UTC day: retried webhooks/crons do not double-send."""
+    h = hashlib.sha256()
+    for part in (kind, to_email.strip().lower(), subject, html, _now().date().isoformat()):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return f"{kind}:{h.hexdigest()[:32]}"
+
+
+def _get_supabase() -> Any:
+    from .api.supabase_admin import get_supabase_admin
+
+    return get_supabase_admin()
+
+
+def enqueue_email(
+    *,
+    kind: str,
+    to_email: str,
+    subject: str,
+    html: str,
+    text: str | None = None,
+    idempotency_key: str | None = None,
+    supabase: Any = None,
+) -> bool:
+    """
+    Queue one email. True when a row exists for the key (new or duplicate);
+    False when the outbox is unavailable and the caller should send inline.
+    """
+    key = idempotency_key or default_idempotency_key(kind=kind, to_email=to_email, subject=subject, html=html)
+    row = {
+        "idempotency_key": key,
+        "kind": kind,
+        "to_email": to_email.strip(),
+        "subject": subject,
+        "html": html or "",
+        "text_body": text,
+        "status": "queued",
+        "next_attempt_at": _now().isoformat(),
+    }
+    try:
+        sb = supabase or _get_supabase()
+        sb.table(OUTBOX_TABLE).upsert(row, on_conflict="idempotency_key", ignore_duplicates=True).execute()
+    except Exception as e:
+        logger.warning("email outbox enqueue failed (%s); sending inline: %s", kind, e)
+        return False
+    _metrics["enqueued"] += 1
+    return True
+
+
+def _send_now(*, to_email: str, subject: str, html: str, text: str | None) -> bool:
+    from .email_sender import send_basic_email_smtp, send_email_via_email_service
+
+    ok = send_basic_email_smtp(to_email=to_email, subject=subject, html=html, text=text)
+    if not ok:
+        ok = send_email_via_email_service(to_email=to_email, subject=subject, html=html, text=text)
+    return bool(ok)
+
+
+def deliver_email(
+    *,
+    kind: str,
+    to_email: str,
+    subject: str,
+    html: str,
+    text: str | None = None,
+    idempotency_key: str | None = None,
+) -> bool:
+    """Queue for background delivery, or send inline when the outbox is unavailable."""
+    if enqueue_email(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        html=html,
+        text=text,
+        idempotency_key=idempotency_key,
+    ):
+        return True
+    _metrics["inline"] += 1
+    return _send_now(to_email=to_email, subject=subject, html=html, text=text)
+
+
+def _backoff_seconds(attempts: int) -> float:
+    base = min(MAX_BACKOFF_SEC, BASE_BACKOFF_SEC * (2 ** max(0, attempts - 1)))
+    return base * random.uniform(0.9, 1.1)
+
+
+def _claim_due(supabase: Any, limit: int) -> list[dict[str, Any]]:
+    now = _now()
+    stale = (now - timedelta(seconds=STALE_CLAIM_SEC)).isoformat()
+    supabase.table(OUTBOX_TABLE).update({"status": "queued", "claimed_at": None}).eq("status", "sending").lt(
+        "claimed_at", stale
+    ).execute()
+
+    due = (
+        supabase.table(OUTBOX_TABLE)
+        .select("id")
+        .eq("status", "queued")
+        .lte("next_attempt_at", now.isoformat())
+        .order("next_attempt_at")
+        .limit(limit)
+        .execute()
+    )
+    ids = [r["id"] for r in (due.data or [])]
+    if not ids:
+        return []
+    # Conditional on status so concurrent workers (replicas) never claim the same row.
+    claimed = (
+        supabase.table(OUTBOX_TABLE)
+        .update({"status": "sending", "claimed_at": now.isoformat()})
+        .in_("id", ids)
+        .eq("status", "queued")
+        .execute()
+    )
+    return claimed.data or []
+
+
+def _record_failure(supabase: Any, row: dict[str, Any], error: str, elapsed_ms: int) -> str:
+    attempts = int(row.get("attempts") or 0) + 1
+    error = error[:2000]
+    if attempts >= MAX_ATTEMPTS:
+        supabase.table(OUTBOX_TABLE).update(
+            {"status": "dead", "attempts": attempts, "last_error": error, "last_attempt_ms": elapsed_ms}
+        ).eq("id", row["id"]).execute()
+        supabase.table(DEAD_LETTER_TABLE).insert(
+            {
+                "outbox_id": row["id"],
+                "idempotency_key": row["idempotency_key"],
+                "kind": row.get("kind") or "transactional",
+                "to_email": row["to_email"],
+                "subject": row["subject"],
+                "attempts": attempts,
+                "last_error": error,
+            }
+        ).execute()
+        _metrics["dead"] += 1
+        logger.error("email outbox: %s to %s dead after %s attempts: %s", row["kind"], row["to_email"], attempts, error)
+        return "dead"
+    supabase.table(OUTBOX_TABLE).update(
+        {
+            "status": "queued",
+            "attempts": attempts,
+            "last_error": error,
+            "last_attempt_ms": elapsed_ms,
+            "claimed_at": None,
+            "next_attempt_at": (_now() + timedelta(seconds=_backoff_seconds(attempts))).isoformat(),
+        }
+    ).eq("id", row["id"]).execute()
+    _metrics["retried"] += 1
+    return "retry"
+
+
+def drain_email_outbox(supabase: Any, *, batch_size: int = BATCH_SIZE) -> dict[str, int]:
+    """Claim and deliver one batch of due rows. Returns counts for this pass."""
+    from .email_sender import send_email_via_email_service, send_many_basic_emails_smtp
+
+    rows = _claim_due(supabase, batch_size)
+    out = {"claimed": len(rows), "sent": 0, "retry": 0, "dead": 0}
+    if not rows:
+        return out
+
+    started = time.perf_counter()
+    smtp_errors: list[str | None] = []
+    smtp_ok = send_many_basic_emails_smtp(
+        [
+            {"to_email": r["to_email"], "subject": r["subject"], "html": r["html"], "text": r.get("text_body")}
+            for r in rows
+        ],
+        smtp_errors,
+    )
+    smtp_ms = int((time.perf_counter() - started) * 1000 / len(rows))
+
+    delivered: list[dict[str, Any]] = []
+    for i, (row, ok) in enumerate(zip(rows, smtp_ok)):
+        transport, elapsed_ms = "smtp", smtp_ms
+        # Last error from each transport, kept in last_error and the dead letter.
+        errors = [(smtp_errors[i] if i < len(smtp_errors) else None) or "smtp: failed"]
+        if not ok:
+            t0 = time.perf_counter()
+            service_errors: list[str] = []
+            ok = send_email_via_email_service(
+                to_email=row["to_email"],
+                subject=row["subject"],
+                html=row["html"],
+                text=row.get("text_body"),
+                errors=service_errors,
+            )
+            errors.append(service_errors[-1] if service_errors else "email-service: failed")
+            transport, elapsed_ms = "email_service", smtp_ms + int((time.perf_counter() - t0) * 1000)
+        if ok:
+            delivered.append(
+                {
+                    "id": row["id"],
+                    "idempotency_key": row["idempotency_key"],
+                    "to_email": row["to_email"],
+                    "subject": row["subject"],
+                    "status": "sent",
+                    "attempts": int(row.get("attempts") or 0) + 1,
+                    "sent_at": _now().isoformat(),
+                    "transport": transport,
+                    "last_attempt_ms": elapsed_ms,
+                    "last_error": None,
+                }
+            )
+            continue
+        try:
+            out[_record_failure(supabase, row, " | ".join(errors), elapsed_ms)] += 1
+        except Exception as e:
+            logger.error("email outbox: could not record failure for %s: %s", row.get("id"), e)
+
+    if delivered:
+        supabase.table(OUTBOX_TABLE).upsert(delivered, on_conflict="id").execute()
+        out["sent"] = len(delivered)
+        _metrics["sent"] += len(delivered)
+    return out
+
+
+async def email_outbox_worker_loop() -> None:
+    """Drain continuously; back off to POLL_SEC when idle and a minute on errors."""
+    while True:
+        try:
+            result = await asyncio.to_thread(drain_email_outbox, _get_supabase())
+            if result["claimed"]:
+                logger.info("email outbox: %s", result)
+                continue
+            await asyncio.sleep(POLL_SEC)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("email outbox worker: %s", e)
+            await asyncio.sleep(60)
+
+
+def start_email_outbox_worker() -> None:
+    """Start the in-process drain loop (set EMAIL_OUTBOX_WORKER=0 to run it elsewhere)."""
+    global _worker_task
+    if (os.getenv("EMAIL_OUTBOX_WORKER") or "1").strip().lower() in ("0", "false", "no", "off"):
+        logger.info("Email outbox worker disabled (EMAIL_OUTBOX_WORKER=0)")
+        return
+    if _worker_task is not None and not _worker_task.done():
+        return
+    _worker_task = asyncio.create_task(email_outbox_worker_loop())
+    logger.info("Started email outbox worker (poll=%ss, batch=%s)", POLL_SEC, BATCH_SIZE)
+
+
+def outbox_stats(supabase: Any) -> dict[str, Any]:
+    """Queue depth per status plus this process's delivery counters (admin dashboard)."""
+    counts: dict[str, int] = {}
+    for status in ("queued", "sending", "sent", "dead"):
+        try:
+            r = supabase.table(OUTBOX_TABLE).select("id", count="exact").eq("status", status).limit(1).execute()
+            counts[status] = int(getattr(r, "count", None) or 0)
+        except Exception:
+            counts[status] = 0
+    return {"by_status": counts, "process_metrics": dict(_metrics)}
+
+
+def requeue_dead_letter(supabase: Any, dead_letter_id: str) -> bool:
+    """Put a dead-lettered email back in the queue with a fresh retry budget."""
+    r = supabase.table(DEAD_LETTER_TABLE).select("*").eq("id", dead_letter_id).limit(1).execute()
+    dl = (r.data or [None])[0]
+    if not dl or not dl.get("outbox_id"):
+        return False
+    supabase.table(OUTBOX_TABLE).update(
+        {
+            "status": "queued",
+            "attempts": 0,
+            "claimed_at": None,
+            "next_attempt_at": _now().isoformat(),
+        }
+    ).eq("id", dl["outbox_id"]).execute()
+    supabase.table(DEAD_LETTER_TABLE).update({"requeued_at": _now().isoformat()}).eq("id", dead_letter_id).execute()
+    return True
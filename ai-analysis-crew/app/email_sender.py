@@ -14,7 +14,7 @@ import os
 import smtplib
 import logging
 import socket
-from typing import Optional
+from typing import Any, Optional
 from email.utils import formataddr
 from email.header import Header
 from email.mime.multipart import MIMEMultipart
@@ -24,6 +24,8 @@ from email import encoders
 from pathlib import Path
 import httpx
 
+from .smtp_pool import SmtpConfig, get_smtp_pool
+
 logger = logging.getLogger(__name__)
 
 def _env_bool(name: str, default: bool = False) -> bool:
@@ -72,23 +74,17 @@ def _resolve_smtp_host_port() -> tuple[str, int] | None:
     return host, port
 
 
-def send_basic_email_smtp(
-    *,
-    to_email: str,
-    subject: str,
-    html: str,
-    text: Optional[str] = None,
-) -> bool:
-    """Send a basic email via SMTP using SMTP_USER/SMTP_PASSWORD (or legacy GMAIL_*)."""
+def _resolve_smtp_config() -> tuple[SmtpConfig, str, str] | None:
+    """SMTP settings for the pooled transport: (config, envelope from, From header)."""
     creds = _resolve_smtp_credentials()
     if not creds:
         logger.warning("⚠️ Email not configured (SMTP_USER/SMTP_PASSWORD not set) - skipping email send")
-        return False
+        return None
     smtp_user, smtp_password = creds
 
     smtp_cfg = _resolve_smtp_host_port()
     if not smtp_cfg:
-        return False
+        return None
     smtp_host, smtp_port = smtp_cfg
     is_secure = _env_bool("SMTP_SECURE", default=(smtp_port == 465))
 
@@ -96,7 +92,17 @@ def send_basic_email_smtp(
     # Always prefer showing a brand display-name in inboxes
     from_name = (os.getenv("SMTP_FROM_NAME") or "SpareFinder").strip()
     from_header = formataddr((str(Header(from_name, "utf-8")), from_email))
+    config = SmtpConfig(
+        host=smtp_host,
+        port=smtp_port,
+        user=smtp_user,
+        password=smtp_password,
+        secure=is_secure,
+    )
+    return config, from_email, from_header
+
 
+def _build_basic_message(*, from_header: str, to_email: str, subject: str, html: str, text: Optional[str]) -> MIMEMultipart:
     msg = MIMEMultipart("alternative")
     msg["From"] = from_header
     msg["To"] = to_email
@@ -105,68 +111,105 @@ def send_basic_email_smtp(
         msg.attach(MIMEText(text, "plain"))
     if html:
         msg.attach(MIMEText(html, "html"))
+    return msg
 
-    # Quick connectivity test
-    try:
-        test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        test_socket.settimeout(5)
-        result = test_socket.connect_ex((smtp_host, smtp_port))
-        test_socket.close()
-        if result != 0:
-            logger.warning(f"⚠️ Cannot reach {smtp_host}:{smtp_port} - skipping email send")
-            return False
-    except Exception as conn_test_error:
-        logger.warning(f"⚠️ Network connectivity test failed: {conn_test_error}")
+
+def send_basic_email_smtp(
+    *,
+    to_email: str,
+    subject: str,
+    html: str,
+    text: Optional[str] = None,
+) -> bool:
+    """
+    Send a basic email via SMTP using SMTP_USER/SMTP_PASSWORD (or legacy GMAIL_*).
+    Reuses an authenticated session from the SMTP pool when one is idle.
+    """
+    resolved = _resolve_smtp_config()
+    if not resolved:
         return False
+    config, from_email, from_header = resolved
+    msg = _build_basic_message(from_header=from_header, to_email=to_email, subject=subject, html=html, text=text)
 
     try:
-        server = None
-        try:
-            if is_secure:
-                server = smtplib.SMTP_SSL(host=smtp_host, port=smtp_port, timeout=30)
-            else:
-                # Pass host/port into constructor so smtplib stores a non-empty internal hostname for TLS SNI.
-                server = smtplib.SMTP(host=smtp_host, port=smtp_port, timeout=30)
-                server._host = smtp_host  # type: ignore[attr-defined]
-                server.starttls()
-
-            server.login(smtp_user, smtp_password)
-            server.sendmail(from_email, [to_email], msg.as_string())
-            logger.info(f"✅ Email sent successfully to {to_email}")
-            return True
-        finally:
-            if server:
-                try:
-                    server.quit()
-                except Exception:
-                    try:
-                        server.close()
-                    except Exception:
-                        pass
+        get_smtp_pool(config).send(from_email, [to_email], msg.as_string())
+        logger.info(f"✅ Email sent successfully to {to_email}")
+        return True
     except smtplib.SMTPAuthenticationError as e:
         logger.error(f"❌ SMTP authentication failed: {e}")
         return False
     except smtplib.SMTPException as e:
         logger.error(f"❌ SMTP error: {e}")
         return False
+    except ConnectionRefusedError as e:
+        logger.warning(f"⚠️ {e} - skipping email send")
+        return False
     except Exception as e:
         logger.error(f"❌ Unexpected error sending email: {e}")
         return False
 
 
+def send_many_basic_emails_smtp(
+    emails: list[dict[str, Any]],
+    errors: Optional[list[Optional[str]]] = None,
+) -> list[bool]:
+    """
+    Send many basic emails over one pooled SMTP session (one TLS + AUTH handshake).
+    Each item has to_email, subject, html and optional text; returns per-item success.
+    With ``errors`` the per-item SMTP error (None on success) is appended there.
+    """
+    if not emails:
+        return []
+    resolved = _resolve_smtp_config()
+    if not resolved:
+        if errors is not None:
+            errors.extend(["smtp: not configured"] * len(emails))
+        return [False] * len(emails)
+    config, from_email, from_header = resolved
+    batch = [
+        (
+            [e["to_email"]],
+            _build_basic_message(
+                from_header=from_header,
+                to_email=e["to_email"],
+                subject=e["subject"],
+                html=e["html"],
+                text=e.get("text"),
+            ).as_string(),
+        )
+        for e in emails
+    ]
+    results = get_smtp_pool(config).send_many(from_email, batch)
+    if errors is not None:
+        errors.extend(None if err is None else f"smtp: {err}" for err in results)
+    out: list[bool] = []
+    for e, err in zip(emails, results):
+        if err is None:
+            logger.info(f"✅ Email sent successfully to {e['to_email']}")
+            out.append(True)
+        else:
+            logger.error(f"❌ SMTP send to {e['to_email']} failed: {err}")
+            out.append(False)
+    return out
+
+
 def send_email_via_email_service(
     *,
     to_email: str,
     subject: str,
     html: str,
     text: Optional[str] = None,
+    errors: Optional[list[str]] = None,
 ) -> bool:
     """
     Send an email via the separate email-service HTTP API.
     Expects EMAIL_SERVICE_URL to be set (e.g. https://sparefinder-org-1.onrender.com).
+    With ``errors`` the failure reason is appended there.
     """
     base_url = (os.getenv("EMAIL_SERVICE_URL") or "").strip().rstrip("/")
     if not base_url:
+        if errors is not None:
+            errors.append("email-service: EMAIL_SERVICE_URL not set")
         return False
 
     url = f"{base_url}/send-email"
@@ -179,9 +222,13 @@ def send_email_via_email_service(
             logger.info(f"✅ Email-service sent email to {to_email}")
             return True
         logger.error(f"❌ Email-service failed ({res.status_code}): {res.text}")
+        if errors is not None:
+            errors.append(f"email-service: HTTP {res.status_code}: {res.text[:500]}")
         return False
     except Exception as e:
         logger.error(f"❌ Email-service request failed: {e}")
+        if errors is not None:
+            errors.append(f"email-service: {e}")
         return False
 
 
@@ -190,10 +237,12 @@ def send_no_regional_suppliers_email(
     to_email: str,
     region_label: str,
     settings_url: str = "https://sparefinder.org/dashboard/settings",
+    idempotency_key: Optional[str] = None,
 ) -> bool:
     """
     Send an email when no suppliers were found in the user's region.
     Suggests retrying with another region or disabling the region preference (global search).
+    Queued through the email outbox; pass idempotency_key (e.g. per analysis) to dedupe retries.
     """
     subject = "SpareFinder: No suppliers found in your region – retry or switch to global"
     text = f"""Hi,
@@ -224,18 +273,23 @@ Your report is still attached / available in your History.
   <p>— SpareFinder</p>
 </body>
 </html>"""
-    ok = send_basic_email_smtp(to_email=to_email, subject=subject, html=html, text=text)
-    if not ok:
-        ok = send_email_via_email_service(to_email=to_email, subject=subject, html=html, text=text)
-    return ok
+    from .email_outbox import deliver_email
+
+    return deliver_email(
+        kind="no_regional_suppliers",
+        to_email=to_email,
+        subject=subject,
+        html=html,
+        text=text,
+        idempotency_key=idempotency_key,
+    )
 
 
 def _send_billing_email(*, to_email: str, subject: str, html: str, text: str) -> bool:
-    """Send a billing-related email (SMTP first, then email-service fallback)."""
-    ok = send_basic_email_smtp(to_email=to_email, subject=subject, html=html, text=text)
-    if not ok:
-        ok = send_email_via_email_service(to_email=to_email, subject=subject, html=html, text=text)
-    return ok
+    """Queue a billing-related email via the outbox (inline SMTP/email-service if unavailable)."""
+    from .email_outbox import deliver_email
+
+    return deliver_email(kind="billing", to_email=to_email, subject=subject, html=html, text=text)
 
 
 def _email_header() -> str:
@@ -718,62 +772,44 @@ def send_email_with_attachment(
     to_email: str,
     subject: str,
     body: str,
-    attachment_path: str
+    attachment_path: Optional[str] = None,
+    *,
+    attachment_bytes: Optional[bytes] = None,
+    attachment_filename: Optional[str] = None,
+    html: Optional[str] = None,
 ) -> bool:
     """
-    Send an email with PDF attachment via Gmail SMTP.
+    Send an email with PDF attachment via SMTP.
     
     Args:
         to_email: Recipient email address
         subject: Email subject
         body: Email body text
-        attachment_path: Path to PDF file to attach
+        attachment_path: Path to PDF file to attach (ignored when attachment_bytes is given)
+        attachment_bytes: In-memory PDF (avoids re-reading the generated file)
+        attachment_filename: Filename shown to the recipient for attachment_bytes
+        html: Optional HTML alternative to the plain-text body
         
     Returns:
         True if successful, False otherwise
     """
-    creds = _resolve_smtp_credentials()
-    if not creds:
-        logger.warning("⚠️ Email not configured (SMTP_USER/SMTP_PASSWORD not set) - skipping email send")
+    resolved = _resolve_smtp_config()
+    if not resolved:
         return False
-    smtp_user, smtp_password = creds
-    
-    # Check if attachment exists
-    if not Path(attachment_path).exists():
-        logger.error(f"❌ Attachment file not found: {attachment_path}")
-        return False
-    
-    smtp_cfg = _resolve_smtp_host_port()
-    if not smtp_cfg:
-        return False
-    smtp_host, smtp_port = smtp_cfg
-    is_secure = _env_bool("SMTP_SECURE", default=(smtp_port == 465))
+    config, from_email, from_header = resolved
 
-    from_email = (os.getenv("SMTP_FROM") or smtp_user).strip()
-    # Always prefer showing a brand display-name in inboxes
-    from_name = (os.getenv("SMTP_FROM_NAME") or "SpareFinder").strip()
-    from_header = formataddr((str(Header(from_name, "utf-8")), from_email))
-    
-    try:
-        # Test network connectivity first
-        logger.info(f"📧 Attempting to send email to {to_email} via {smtp_host}:{smtp_port}")
-        
-        # Check network connectivity before attempting connection
-        try:
-            test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            test_socket.settimeout(5)  # 5 second timeout for connectivity test
-            result = test_socket.connect_ex((smtp_host, smtp_port))
-            test_socket.close()
-            
-            if result != 0:
-                logger.warning(f"⚠️ Cannot reach {smtp_host}:{smtp_port} - network may be unreachable")
-                logger.warning("⚠️ Email sending will be skipped - analysis will continue")
-                return False
-        except Exception as conn_test_error:
-            logger.warning(f"⚠️ Network connectivity test failed: {conn_test_error}")
-            logger.warning("⚠️ Email sending will be skipped - analysis will continue")
+    if attachment_bytes is None:
+        # Check if attachment exists
+        if not attachment_path or not Path(attachment_path).exists():
+            logger.error(f"❌ Attachment file not found: {attachment_path}")
             return False
-        
+        attachment_bytes = Path(attachment_path).read_bytes()
+        attachment_filename = attachment_filename or Path(attachment_path).name
+    attachment_filename = attachment_filename or "report.pdf"
+
+    try:
+        logger.info(f"📧 Attempting to send email to {to_email} via {config.host}:{config.port}")
+
         # Create message
         msg = MIMEMultipart()
         msg['From'] = from_header
@@ -781,46 +817,28 @@ def send_email_with_attachment(
         msg['Subject'] = subject
         
         # Add body
-        msg.attach(MIMEText(body, 'plain'))
+        if html:
+            alt = MIMEMultipart("alternative")
+            alt.attach(MIMEText(body, 'plain'))
+            alt.attach(MIMEText(html, 'html'))
+            msg.attach(alt)
+        else:
+            msg.attach(MIMEText(body, 'plain'))
         
         # Attach PDF
-        with open(attachment_path, "rb") as attachment:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(attachment.read())
-        
+        part = MIMEBase('application', 'pdf')
+        part.set_payload(attachment_bytes)
         encoders.encode_base64(part)
         part.add_header(
             'Content-Disposition',
-            f'attachment; filename= {Path(attachment_path).name}'
+            f'attachment; filename= {attachment_filename}'
         )
         msg.attach(part)
         
-        # Connect to SMTP server with timeout and better error handling
-        server = None
-        try:
-            if is_secure:
-                server = smtplib.SMTP_SSL(host=smtp_host, port=smtp_port, timeout=30)
-            else:
-                server = smtplib.SMTP(host=smtp_host, port=smtp_port, timeout=30)  # 30 second timeout
-                server._host = smtp_host  # type: ignore[attr-defined]
-                server.starttls()
-
-            server.login(smtp_user, smtp_password)
-            text = msg.as_string()
-            server.sendmail(from_email, to_email, text)
-            logger.info(f"✅ Email sent successfully to {to_email}")
-            return True
-        finally:
-            # Always close the connection
-            if server:
-                try:
-                    server.quit()
-                except:
-                    try:
-                        server.close()
-                    except:
-                        pass
-        
+        get_smtp_pool(config).send(from_email, [to_email], msg.as_string())
+        logger.info(f"✅ Email sent successfully to {to_email}")
+        return True
+
     except socket.gaierror as e:
         # DNS resolution failure or network unreachable
         logger.error(f"❌ Network error (DNS/connection): {e}")
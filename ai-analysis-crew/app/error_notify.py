@@ -10,7 +10,7 @@ import os
 import time
 from typing import Any
 
-from .email_sender import send_basic_email_smtp, send_email_via_email_service
+from .email_sender import send_email_via_email_service, send_many_basic_emails_smtp
 from .marketing_outbound_defaults import get_marketing_settings_row
 
 logger = logging.getLogger(__name__)
@@ -158,8 +158,10 @@ def send_error_notify_email(
     subject = f"[SpareFinder {area_label} {sev}] {message[:100]}"
 
     delivered = False
-    for to_email in recipients:
-        ok = send_basic_email_smtp(to_email=to_email, subject=subject, html=body_html, text=text)
+    smtp_results = send_many_basic_emails_smtp(
+        [{"to_email": to, "subject": subject, "html": body_html, "text": text} for to in recipients]
+    )
+    for to_email, ok in zip(recipients, smtp_results):
         if not ok:
             ok = bool(
                 send_email_via_email_service(
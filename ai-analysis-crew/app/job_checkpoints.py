@@ -0,0 +1,165 @@
+"""Per-stage checkpoints for crew analysis jobs (docs/sql/crew_job_checkpoints.sql).
+
+``run_analysis_background`` records each stage as it completes: the sanitized
+vision text, every crew task output (via the crew task callback), the final
+report text, the uploaded PDF, the database store and the completion email.
+When a job is restarted (stuck-job recovery) it loads the checkpoints and skips
+straight past finished stages, so a job that died during PDF upload does not
+re-download the image or rerun vision and the crew.
+
+Checkpoints are best effort: when the table is missing or Supabase is
+unreachable, writes are skipped and jobs simply run from the start. Rows are
+deleted once the job completes. CREW_CHECKPOINTS=0 disables the feature.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TABLE = "crew_job_checkpoints"
+
+VISION = "vision"
+REPORT = "report"
+PDF = "pdf"
+STORED = "stored"
+EMAILED = "emailed"
+# Crew task outputs are stored as "task:<stage>" using crew_progress stage keys.
+TASK_PREFIX = "task:"
+RESUMABLE_TASK_STAGES = ("part_identifier", "research_agent", "supplier_finder", "report_generator")
+
+_warned = False
+
+
+def checkpoints_enabled() -> bool:
+    flag = (os.getenv("CREW_CHECKPOINTS") or "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def _get_supabase() -> Any:
+    from .api.supabase_admin import get_supabase_admin
+
+    return get_supabase_admin()
+
+
+def _warn_once(action: str, err: Exception) -> None:
+    global _warned
+    if not _warned:
+        _warned = True
+        logger.warning("Job checkpoints unavailable (%s: %s); jobs will restart from scratch", action, err)
+    else:
+        logger.debug("Job checkpoint %s failed: %s", action, err)
+
+
+@dataclass
+class JobCheckpoints:
+    job_id: str
+    stages: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def get(self, stage: str) -> Optional[dict[str, Any]]:
+        return self.stages.get(stage)
+
+    def has(self, stage: str) -> bool:
+        return stage in self.stages
+
+    @property
+    def vision_text(self) -> Optional[str]:
+        return (self.get(VISION) or {}).get("text")
+
+    def task_outputs(self) -> dict[str, str]:
+        """Crew stage key -> raw task output for tasks that already finished."""
+        outputs: dict[str, str] = {}
+        for stage in RESUMABLE_TASK_STAGES:
+            text = (self.get(TASK_PREFIX + stage) or {}).get("text")
+            if text:
+                outputs[stage] = text
+        return outputs
+
+    def resume_point(self) -> str:
+        """Last completed stage, for logs."""
+        for stage in (EMAILED, STORED, PDF, REPORT):
+            if stage in self.stages:
+                return stage
+        tasks = self.task_outputs()
+        if tasks:
+            return TASK_PREFIX + list(tasks)[-1]
+        return VISION if VISION in self.stages else "start"
+
+
+def save_checkpoint(job_id: str, stage: str, payload: Optional[dict[str, Any]] = None) -> bool:
+    """Upsert one stage's checkpoint (sync; call via asyncio.to_thread from async code)."""
+    if not job_id or not checkpoints_enabled():
+        return False
+    try:
+        _get_supabase().table(CHECKPOINT_TABLE).upsert(
+            {
+                "job_id": job_id,
+                "stage": stage,
+                "payload": payload or {},
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            },
+            on_conflict="job_id,stage",
+        ).execute()
+        return True
+    except Exception as e:
+        _warn_once("save", e)
+        return False
+
+
+def save_task_output(job_id: str, stage: str, text: str) -> bool:
+    if stage not in RESUMABLE_TASK_STAGES or not text:
+        return False
+    return save_checkpoint(job_id, TASK_PREFIX + stage, {"text": text})
+
+
+def load_checkpoints(job_id: str) -> JobCheckpoints:
+    checkpoints = JobCheckpoints(job_id=job_id)
+    if not job_id or not checkpoints_enabled():
+        return checkpoints
+    try:
+        res = (
+            _get_supabase()
+            .table(CHECKPOINT_TABLE)
+            .select("stage,payload")
+            .eq("job_id", job_id)
+            .execute()
+        )
+    except Exception as e:
+        _warn_once("load", e)
+        return checkpoints
+    for row in res.data or []:
+        payload = row.get("payload")
+        checkpoints.stages[str(row.get("stage"))] = payload if isinstance(payload, dict) else {}
+    return checkpoints
+
+
+def jobs_with_checkpoints(job_ids: list[str]) -> set[str]:
+    """Subset of job_ids that have at least one checkpoint (stuck-job recovery)."""
+    if not job_ids or not checkpoints_enabled():
+        return set()
+    try:
+        res = (
+            _get_supabase()
+            .table(CHECKPOINT_TABLE)
+            .select("job_id")
+            .in_("job_id", job_ids)
+            .execute()
+        )
+    except Exception as e:
+        _warn_once("lookup", e)
+        return set()
+    return {str(row.get("job_id")) for row in res.data or []}
+
+
+def clear_checkpoints(job_id: str) -> None:
+    if not job_id or not checkpoints_enabled():
+        return
+    try:
+        _get_supabase().table(CHECKPOINT_TABLE).delete().eq("job_id", job_id).execute()
+    except Exception as e:
+        _warn_once("clear", e)
@@ -0,0 +1,189 @@
+"""Worker leases for running crew analysis jobs (docs/sql/crew_job_leases.sql).
+
+A job is owned by exactly one run: ``run_analysis_background`` acquires a lease
+(``lease_owner`` + ``lease_expires_at`` on crew_analysis_jobs) before doing any
+work and a heartbeat task renews it every JOB_LEASE_HEARTBEAT_SEC. Stuck-job
+recovery reclaims only jobs whose lease has expired, so a long crew step on a
+live worker is never restarted, and a dead worker is detected at any progress.
+
+If another run holds a live lease the new run exits without touching the job.
+If a renewal finds the lease taken over, this run cancels itself so the job is
+never processed twice. When the lease columns do not exist yet (migration not
+applied) leasing is skipped and jobs run as before.
+
+Env:
+  JOB_LEASE_TTL_SEC        lease length (default 120)
+  JOB_LEASE_HEARTBEAT_SEC  renewal interval (default 30, at most TTL / 3)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+JOBS_TABLE = "crew_analysis_jobs"
+# Identifies this process in lease_owner; each run appends its own token.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+LEASE_TTL_SEC = _env_int("JOB_LEASE_TTL_SEC", 120, lo=30, hi=3600)
+HEARTBEAT_SEC = min(_env_int("JOB_LEASE_HEARTBEAT_SEC", 30, lo=5, hi=600), LEASE_TTL_SEC // 3)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _get_supabase() -> Any:
+    from .api.supabase_admin import get_supabase_admin
+
+    return get_supabase_admin()
+
+
+def _expiry() -> str:
+    return (_now() + timedelta(seconds=LEASE_TTL_SEC)).isoformat()
+
+
+class JobLease:
+    """One run's claim on a job. ``held`` is False when another live run owns it."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.owner = f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+        # False when the lease columns are missing: run unleased, as before leases existed
+        self.enabled = True
+        # True once a renewal found the job owned by another run
+        self.lost = False
+        self._heartbeat: Optional[asyncio.Task] = None
+        # The run that holds this lease; the only task a lost lease may cancel
+        self._owner_task: Optional[asyncio.Task] = None
+
+    def acquire(self) -> bool:
+        """Claim the job if unowned or its lease expired (sync; conditional update)."""
+        # No "+00:00" offset: the value sits inside a PostgREST or=() filter
+        now = _now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        try:
+            res = (
+                _get_supabase()
+                .table(JOBS_TABLE)
+                .update({"lease_owner": self.owner, "lease_expires_at": _expiry()})
+                .eq("id", self.job_id)
+                .or_(f"lease_owner.is.null,lease_expires_at.lt.{now}")
+                .execute()
+            )
+        except Exception as e:
+            logger.warning("Job lease unavailable for %s (%s); running unleased", self.job_id[:8], e)
+            self.enabled = False
+            self.held = True
+            return True
+        self.held = bool(res.data)
+        return self.held
+
+    def renew(self) -> Optional[bool]:
+        """True renewed, False lost to another owner, None on a transient error."""
+        try:
+            res = (
+                _get_supabase()
+                .table(JOBS_TABLE)
+                .update({"lease_expires_at": _expiry()})
+                .eq("id", self.job_id)
+                .eq("lease_owner", self.owner)
+                .execute()
+            )
+        except Exception as e:
+            logger.warning("Job lease renewal failed for %s: %s", self.job_id[:8], e)
+            return None
+        return bool(res.data)
+
+    def release(self) -> None:
+        if not (self.enabled and self.held):
+            return
+        try:
+            (
+                _get_supabase()
+                .table(JOBS_TABLE)
+                .update({"lease_owner": None, "lease_expires_at": None})
+                .eq("id", self.job_id)
+                .eq("lease_owner", self.owner)
+                .execute()
+            )
+        except Exception as e:
+            logger.warning("Job lease release failed for %s: %s", self.job_id[:8], e)
+        self.held = False
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SEC)
+            renewed = await asyncio.to_thread(self.renew)
+            if renewed is False:
+                logger.error(
+                    "Lost lease on crew job %s to another worker; stopping this run",
+                    self.job_id[:8],
+                )
+                self.held = False
+                self.lost = True
+                # Only this run: the job-wide cancel flag and the registered task
+                # may already belong to the run that took the lease over.
+                task = self._owner_task
+                if task is not None and not task.done():
+                    task.cancel()
+                return
+
+    async def start(self) -> bool:
+        """Acquire and start the heartbeat; returns held."""
+        self._owner_task = asyncio.current_task()
+        await asyncio.to_thread(self.acquire)
+        if self.held and self.enabled:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        return self.held
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await asyncio.to_thread(self.release)
+
+    async def __aenter__(self) -> "JobLease":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.stop()
+
+
+def reclaim_expired_lease(supabase: Any, job_id: str, expires_at: Optional[str]) -> bool:
+    """
+    Clear an expired lease so a restart can acquire it. Conditional on the
+    lease value the caller saw, so concurrent recoveries reclaim a job once.
+    """
+    if not expires_at:
+        return True
+    try:
+        res = (
+            supabase.table(JOBS_TABLE)
+            .update({"lease_owner": None, "lease_expires_at": None})
+            .eq("id", job_id)
+            .eq("lease_expires_at", expires_at)
+            .lt("lease_expires_at", _now().isoformat())
+            .execute()
+        )
+    except Exception:
+        logger.exception("Failed to reclaim lease for job %s", job_id)
+        return False
+    return bool(res.data)
@@ -0,0 +1,431 @@
+"""
+LLM token and cost ledger (docs/sql/llm_usage_events.sql).
+
+Every OpenAI call made through ``model_routing.routed_chat_completion`` and
+every crew kickoff (per agent, from CrewAI's own token counters) is recorded
+as one usage event: step, model, prompt / completion tokens and the cost from
+MODEL_PRICES_PER_1M. Events are attributed from ``usage_context`` (job_id,
+user_id, tier, campaign_id, lead_id), a context variable set by the analysis
+pipeline and the marketing jobs, so the LLM call sites do not thread ids.
+
+Events are buffered in memory and written in batches by a background loop
+(``start_usage_flusher``); a failed write is retried on the next flush, and
+the buffer is capped so a missing table cannot grow memory without bound.
+``GET /api/admin/llm-usage`` reads the aggregate views: cost per analysis,
+per tier, per agent/step and per model.
+
+Env:
+  LLM_USAGE_LEDGER        1/0 (default 1)
+  LLM_USAGE_FLUSH_SEC     seconds between batch writes (default 10)
+  LLM_USAGE_BATCH         rows per insert (default 200)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+USAGE_TABLE = "llm_usage_events"
+
+# USD per 1M tokens (input, output). Dated snapshots match by prefix.
+MODEL_PRICES_PER_1M: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+_ATTRIBUTION_KEYS = ("job_id", "user_id", "tier", "campaign_id", "lead_id")
+# Attribution columns typed UUID in llm_usage_events; other values are stored as NULL.
+_UUID_KEYS = ("job_id", "user_id", "campaign_id", "lead_id")
+# Postgres data exception (22xxx) / integrity violation (23xxx): retrying the same row never helps.
+_DATA_ERROR_RE = re.compile(r"\b2[23][0-9A-Z]{3}\b")
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+FLUSH_SEC = _env_int("LLM_USAGE_FLUSH_SEC", 10, lo=1, hi=3600)
+BATCH_SIZE = _env_int("LLM_USAGE_BATCH", 200, lo=1, hi=1000)
+MAX_BUFFER = 20000
+
+_attribution: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar("llm_usage_attribution", default={})
+_lock = threading.Lock()
+_buffer: deque[dict[str, Any]] = deque()
+# Running totals per job for result_data["usage"]; popped when the job finishes.
+_job_totals: dict[str, dict[str, Any]] = {}
+_dropped = 0
+_warned = False
+_flusher_task: Optional[asyncio.Task] = None
+
+
+def ledger_enabled() -> bool:
+    flag = (os.getenv("LLM_USAGE_LEDGER") or "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def _get_supabase() -> Any:
+    from .api.supabase_admin import get_supabase_admin
+
+    return get_supabase_admin()
+
+
+def _warn_once(action: str, err: Exception) -> None:
+    global _warned
+    if not _warned:
+        _warned = True
+        logger.warning("LLM usage ledger unavailable (%s: %s); usage stays in memory until it recovers", action, err)
+    else:
+        logger.debug("LLM usage ledger %s failed: %s", action, err)
+
+
+def bind_usage(**attrs: Any) -> contextvars.Token:
+    """Attribute later LLM usage in this context to these ids; undo with ``unbind_usage``."""
+    merged = dict(_attribution.get())
+    merged.update({k: str(v) for k, v in attrs.items() if k in _ATTRIBUTION_KEYS and v})
+    return _attribution.set(merged)
+
+
+def unbind_usage(token: contextvars.Token) -> None:
+    _attribution.reset(token)
+
+
+@contextmanager
+def usage_context(**attrs: Any) -> Iterator[None]:
+    """Attribute LLM usage inside the block to these ids (merged with any outer context)."""
+    token = bind_usage(**attrs)
+    try:
+        yield
+    finally:
+        unbind_usage(token)
+
+
+def _uuid_or_none(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def _price(model: str) -> Optional[tuple[float, float]]:
+    m = (model or "").strip().lower()
+    if m in MODEL_PRICES_PER_1M:
+        return MODEL_PRICES_PER_1M[m]
+    for name in sorted(MODEL_PRICES_PER_1M, key=len, reverse=True):
+        if m.startswith(name):
+            return MODEL_PRICES_PER_1M[name]
+    return None
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    price = _price(model)
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def token_encoding(model: str = "gpt-4o") -> Any:
+    """
+    tiktoken encoding for ``model`` (o200k_base if unknown), or None when
+    tiktoken is missing or cannot fetch its BPE file (it downloads on first use).
+    """
+    return _encoding(model)
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable (%s); estimating tokens from length", e)
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """tiktoken count; a chars/4 estimate if tiktoken is missing."""
+    enc = token_encoding(model)
+    if enc is None:
+        return (len(text or "") + 3) // 4
+    return len(enc.encode(text or "", disallowed_special=()))
+
+
+def record_usage(
+    step: str,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    *,
+    requests: int = 1,
+    latency_ms: Optional[float] = None,
+    fallback: bool = False,
+) -> None:
+    """Queue one usage event, attributed from the current usage_context."""
+    global _dropped
+    if not ledger_enabled() or (prompt_tokens <= 0 and completion_tokens <= 0):
+        return
+    attrs = _attribution.get()
+    cost = cost_usd(model, prompt_tokens, completion_tokens)
+    row = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "step": step,
+        "model": model,
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "requests": int(requests),
+        "cost_usd": round(cost, 6) if cost is not None else None,
+        "latency_ms": round(latency_ms) if latency_ms is not None else None,
+        "fallback": fallback,
+        **{k: attrs.get(k) for k in _ATTRIBUTION_KEYS},
+    }
+    # A client-supplied analysis_id need not be a UUID; one bad value would fail every batch it is in.
+    for k in _UUID_KEYS:
+        row[k] = _uuid_or_none(row[k])
+    with _lock:
+        if len(_buffer) >= MAX_BUFFER:
+            _buffer.popleft()
+            _dropped += 1
+        _buffer.append(row)
+        job_id = attrs.get("job_id")
+        if job_id:
+            totals = _job_totals.setdefault(
+                job_id, {"prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "requests": 0}
+            )
+            totals["prompt_tokens"] += row["prompt_tokens"]
+            totals["completion_tokens"] += row["completion_tokens"]
+            totals["requests"] += row["requests"]
+            totals["cost_usd"] += cost or 0.0
+
+
+def record_openai_response(
+    step: str,
+    model: str,
+    response: Any,
+    *,
+    latency_ms: Optional[float] = None,
+    fallback: bool = False,
+) -> None:
+    """Usage from an OpenAI chat/embeddings response (``response.usage``)."""
+    usage = getattr(response, "usage", None)
+    prompt = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion = int(getattr(usage, "completion_tokens", 0) or 0)
+    if usage is None:
+        choices = getattr(response, "choices", None) or []
+        text = "".join(str(getattr(getattr(c, "message", None), "content", "") or "") for c in choices)
+        completion = count_tokens(text, model) if text else 0
+    record_usage(step, getattr(response, "model", None) or model, prompt, completion,
+                 latency_ms=latency_ms, fallback=fallback)
+
+
+def _agent_usage(agent: Any) -> Optional[Any]:
+    llm = getattr(agent, "llm", None)
+    summary = getattr(llm, "get_token_usage_summary", None)
+    if callable(summary):
+        try:
+            return summary()
+        except Exception:
+            pass
+    process = getattr(agent, "_token_process", None)
+    if process is not None and callable(getattr(process, "get_summary", None)):
+        try:
+            return process.get_summary()
+        except Exception:
+            pass
+    return None
+
+
+def record_crew_usage(crew: Any, *, step_for_role: Optional[dict[str, str]] = None, default_step: str = "crew") -> None:
+    """
+    Per-agent token counters of a finished (or failed) kickoff. Each agent has
+    its own LLM, so the counters attribute usage to the agent's step.
+    """
+    for agent in getattr(crew, "agents", None) or []:
+        usage = _agent_usage(agent)
+        if usage is None:
+            continue
+        role = str(getattr(agent, "role", "") or "").strip()
+        step = (step_for_role or {}).get(role) or default_step
+        llm = getattr(agent, "llm", None)
+        model = str(getattr(llm, "model", None) or getattr(llm, "model_name", None) or "unknown")
+        record_usage(
+            step,
+            model,
+            int(getattr(usage, "prompt_tokens", 0) or 0),
+            int(getattr(usage, "completion_tokens", 0) or 0),
+            requests=int(getattr(usage, "successful_requests", 0) or 0) or 1,
+        )
+
+
+def pop_job_usage(job_id: str) -> Optional[dict[str, Any]]:
+    """Totals recorded for a job in this process (stored as result_data["usage"])."""
+    with _lock:
+        totals = _job_totals.pop(job_id, None)
+    if totals:
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return totals
+
+
+def flush_usage(supabase: Any = None) -> int:
+    """Write buffered events in batches; returns rows written (sync)."""
+    global _dropped
+    if not _buffer:
+        return 0
+    with _lock:
+        rows = list(_buffer)
+        _buffer.clear()
+    written = 0
+    done = 0
+    try:
+        supabase = supabase or _get_supabase()
+        for i in range(0, len(rows), BATCH_SIZE):
+            batch = rows[i : i + BATCH_SIZE]
+            try:
+                supabase.table(USAGE_TABLE).insert(batch).execute()
+                written += len(batch)
+            except Exception as e:
+                # Bad data in one row must not poison the batch forever: retry row
+                # by row and drop what the table rejects. Anything else (table
+                # missing, network) keeps the rows for the next flush.
+                if not _DATA_ERROR_RE.search(str(e)):
+                    raise
+                for j, row in enumerate(batch):
+                    try:
+                        supabase.table(USAGE_TABLE).insert(row).execute()
+                        written += 1
+                    except Exception as row_err:
+                        if not _DATA_ERROR_RE.search(str(row_err)):
+                            raise
+                        logger.warning("LLM usage ledger: dropping rejected %s row: %s", row.get("step"), row_err)
+                        with _lock:
+                            _dropped += 1
+                    done = i + j + 1
+            done = i + len(batch)
+    except Exception as e:
+        _warn_once("flush", e)
+        with _lock:
+            # Keep the unwritten rows (oldest first) for the next flush.
+            _buffer.extendleft(reversed(rows[done:]))
+            while len(_buffer) > MAX_BUFFER:
+                _buffer.popleft()
+    return written
+
+
+async def usage_flusher_loop() -> None:
+    while True:
+        try:
+            await asyncio.sleep(FLUSH_SEC)
+            await asyncio.to_thread(flush_usage)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(flush_usage)
+            raise
+        except Exception as e:
+            logger.warning("LLM usage flusher: %s", e)
+
+
+def start_usage_flusher() -> None:
+    global _flusher_task
+    if not ledger_enabled():
+        logger.info("LLM usage ledger disabled (LLM_USAGE_LEDGER=0)")
+        return
+    if _flusher_task is not None and not _flusher_task.done():
+        return
+    _flusher_task = asyncio.create_task(usage_flusher_loop())
+    logger.info("Started LLM usage flusher (every %ss, batch=%s)", FLUSH_SEC, BATCH_SIZE)
+
+
+def _group(rows: list[dict[str, Any]], key: str) -> list[dict[str, Any]]:
+    out: dict[str, dict[str, Any]] = {}
+    for r in rows:
+        k = r.get(key) or "unknown"
+        g = out.setdefault(k, {key: k, "requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+        g["requests"] += int(r.get("requests") or 0)
+        g["prompt_tokens"] += int(r.get("prompt_tokens") or 0)
+        g["completion_tokens"] += int(r.get("completion_tokens") or 0)
+        g["cost_usd"] += float(r.get("cost_usd") or 0)
+    for g in out.values():
+        g["cost_usd"] = round(g["cost_usd"], 4)
+    return sorted(out.values(), key=lambda g: g["cost_usd"], reverse=True)
+
+
+def usage_report(supabase: Any, *, days: int = 30, top: int = 20) -> dict[str, Any]:
+    """Admin aggregates over the last ``days`` from the llm_usage_* views (sync)."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+    # PostgREST returns at most 1000 rows per request: page through the view.
+    daily: list[dict[str, Any]] = []
+    page, size = 0, 1000
+    while True:
+        batch = (
+            supabase.table("llm_usage_daily")
+            .select("day,analysis,tier,step,model,requests,prompt_tokens,completion_tokens,cost_usd")
+            .gte("day", since)
+            .order("day")
+            .order("step")
+            .order("model")
+            .order("tier")
+            .order("analysis")
+            .range(page * size, page * size + size - 1)
+            .execute()
+            .data
+            or []
+        )
+        daily.extend(batch)
+        if len(batch) < size:
+            break
+        page += 1
+    jobs = (
+        supabase.table("llm_usage_by_job")
+        .select("job_id,tier,first_at,requests,prompt_tokens,completion_tokens,cost_usd")
+        .gte("first_at", since)
+        .order("cost_usd", desc=True)
+        .limit(top)
+        .execute()
+        .data
+        or []
+    )
+    per_tier = _group(daily, "tier")
+    analyses = (
+        supabase.table("llm_usage_by_job").select("job_id", count="exact").gte("first_at", since).limit(1).execute()
+    )
+    n_jobs = int(getattr(analyses, "count", None) or 0)
+    job_cost = sum(float(r.get("cost_usd") or 0) for r in daily if r.get("analysis"))
+    return {
+        "since": since,
+        "total_cost_usd": round(sum(float(r.get("cost_usd") or 0) for r in daily), 4),
+        "analyses": n_jobs,
+        "avg_cost_per_analysis_usd": round(job_cost / n_jobs, 4) if n_jobs else None,
+        "per_tier": per_tier,
+        "per_step": _group(daily, "step"),
+        "per_model": _group(daily, "model"),
+        "top_analyses": jobs,
+        "process": {"buffered": len(_buffer), "dropped": _dropped},
+    }
@@ -18,7 +18,7 @@ except Exception:
 import asyncio
 import base64
 import queue as queue_module
-from typing import Optional, Callable
+from typing import Any, Optional, Callable
 import warnings
 import logging
 
@@ -55,8 +55,32 @@ from starlette.types import ASGIApp, Receive, Scope, Send
 from datetime import datetime
 import json
 import uvicorn
-from .crew_setup import setup_crew, set_progress_emitter, emit_progress, generate_report_tool_func, send_email_tool_func
-from .crew_progress import run_crew_kickoff
+from .crew_setup import setup_crew, set_progress_emitter, emit_progress, render_report_pdf, send_email_tool_func
+from .report_delivery import ReportPdf, publish_report_pdf
+from .report_schema import StructuredReport, split_structured_report
+from .admission import AdmissionTicket, admission, normalize_tier
+from .analysis_cache import (
+    CachedAnalysis,
+    credit_policy as cache_credit_policy,
+    lookup_cached_analysis,
+    store_cached_analysis,
+    user_wants_fresh,
+)
+from .job_leases import HEARTBEAT_SEC, JobLease
+from .job_checkpoints import (
+    EMAILED as CHECKPOINT_EMAILED,
+    PDF as CHECKPOINT_PDF,
+    REPORT as CHECKPOINT_REPORT,
+    STORED as CHECKPOINT_STORED,
+    VISION as CHECKPOINT_VISION,
+    JobCheckpoints,
+    clear_checkpoints,
+    load_checkpoints,
+    save_checkpoint,
+)
+from .crew_progress import AGENT_ROLE_TO_STAGE, run_crew_kickoff
+from .llm_usage import bind_usage, pop_job_usage, record_crew_usage, unbind_usage
+from .model_routing import CREW_STEPS, ModelTrace, is_fallback_error, resolve_route, routed_chat_completion
 from .email_sender import send_email_via_email_service, send_basic_email_smtp, send_no_regional_suppliers_email
 from .utils import ensure_temp_dir
 from .vision_analyzer import get_image_description, sanitize_vision_description
@@ -419,7 +443,20 @@ async def kickoff_crew_analysis_job(
     if reset_status:
         await _update_job_async(job_id, "processing", "starting", 5)
 
-    if image_data is None and image_url and not str(image_url).startswith("placeholder_url"):
+    checkpoints = await asyncio.to_thread(load_checkpoints, job_id)
+    # Vision text (or anything later) is checkpointed: the image is not needed again
+    needs_image = not (
+        checkpoints.vision_text
+        or checkpoints.task_outputs()
+        or checkpoints.has(CHECKPOINT_REPORT)
+    )
+
+    if (
+        needs_image
+        and image_data is None
+        and image_url
+        and not str(image_url).startswith("placeholder_url")
+    ):
         try:
             async with httpx.AsyncClient(timeout=30.0) as client:
                 img_response = await client.get(image_url)
@@ -441,6 +478,7 @@ async def kickoff_crew_analysis_job(
             keywords or "",
             user_id=user_id,
             image_name=image_name,
+            checkpoints=checkpoints,
         )
     )
 
@@ -581,6 +619,30 @@ async def startup_event():
     except Exception as e:
         logger.warning("Stuck-jobs scheduler not started: %s", e)
 
+    # Email outbox worker (docs/sql/email_outbox.sql); set EMAIL_OUTBOX_WORKER=0 to disable
+    try:
+        from .email_outbox import start_email_outbox_worker
+
+        start_email_outbox_worker()
+    except Exception as e:
+        logger.warning("Email outbox worker not started: %s", e)
+
+    # LLM token/cost ledger (docs/sql/llm_usage_events.sql); LLM_USAGE_LEDGER=0 to disable
+    try:
+        from .llm_usage import start_usage_flusher
+
+        start_usage_flusher()
+    except Exception as e:
+        logger.warning("LLM usage flusher not started: %s", e)
+
+    # Write-behind open/click counters (docs/sql/marketing_tracking_events.sql)
+    try:
+        from .marketing_track_events import start_tracking_flusher
+
+        start_tracking_flusher()
+    except Exception as e:
+        logger.warning("Marketing tracking flusher not started: %s", e)
+
     # Redis Pub/Sub: subscribe to crew_job_updates and broadcast to WebSocket clients
     try:
         from .redis_client import is_redis_configured, start_job_updates_subscriber
@@ -713,8 +775,9 @@ async def email_copy(payload: EmailCopyRequest):
 
     try:
         client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=os.getenv("EMAIL_COPY_MODEL", "gpt-4o-mini"),
+        resp = routed_chat_completion(
+            client,
+            "email_copy",
             temperature=0.9,
             max_tokens=300,
             messages=[
@@ -977,6 +1040,210 @@ async def _ensure_job_active(job_id: str) -> None:
         raise CrewJobCancelledError(f"Job {job_id} no longer exists")
 
 
+def _collect_context_stats(
+    analysis_id: str, crew: Any, into: Optional[dict[str, dict[str, Any]]]
+) -> None:
+    stats = getattr(crew, "context_stats", None) or {}
+    for stage, row in stats.items():
+        logger.info(
+            "Job %s %s: context %s -> %s tokens (compaction %sms), stage %sms",
+            analysis_id,
+            stage,
+            row.get("tokens_before"),
+            row.get("tokens_after"),
+            row.get("compaction_ms", 0),
+            row.get("stage_ms"),
+        )
+    if into is not None:
+        into.update({stage: dict(row) for stage, row in stats.items()})
+
+
+async def _crew_report_text(
+    analysis_id: str,
+    user_email: str,
+    image_data: Optional[bytes],
+    keywords: Optional[str],
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+    checkpoints: JobCheckpoints,
+    prior_report: Optional[str] = None,
+    tier: Optional[str] = None,
+    trace: Optional[ModelTrace] = None,
+    context_stats: Optional[dict[str, dict[str, Any]]] = None,
+) -> str:
+    """
+    Vision + crew stages of run_analysis_background; returns the Report Compiler's raw answer.
+
+    Stages recorded in checkpoints are not rerun: a saved report task output is
+    returned directly, saved vision text skips vision and part validation, and
+    saved task outputs are handed to setup_crew so only the remaining tasks run.
+    ``prior_report`` (a near-duplicate query's report) seeds a keyword crew.
+
+    Models come from app/model_routing.py for ``tier``. When the kickoff times
+    out or gets a 5xx, the stages that had not finished move to their next
+    fallback model and the crew resumes from the saved task outputs; ``trace``
+    records the model that served each stage, ``context_stats`` the context
+    tokens before/after compaction and the duration of each stage (crew_context).
+    """
+    task_outputs = checkpoints.task_outputs()
+    if "report_generator" in task_outputs:
+        logger.info("♻️ Job %s: reusing checkpointed report task output", analysis_id)
+        return task_outputs["report_generator"]
+
+    vision_text = checkpoints.vision_text
+    await _update_job_async(analysis_id, "processing", "image_analysis", 10)
+
+    if image_data and not vision_text:
+        emit_progress(
+            "image_analysis",
+            "Analyzing image with GPT-4o Vision...",
+            "in_progress",
+        )
+        raw_vision = await run_crew_blocking(
+            get_image_description, image_data, keywords, tier=tier, trace=trace
+        )
+        vision_text = sanitize_vision_description(raw_vision)
+        from .content_validator import (
+            NonManufacturingPartError,
+            validate_identified_part,
+        )
+
+        part_check = await run_crew_blocking(
+            validate_identified_part, vision_text, tier=tier, trace=trace
+        )
+        if not part_check.is_valid:
+            raise NonManufacturingPartError(
+                part_check.user_message,
+                part_check.detected_subject,
+            )
+        await asyncio.to_thread(save_checkpoint, analysis_id, CHECKPOINT_VISION, {"text": vision_text})
+        emit_progress("image_analysis", "Image analyzed successfully", "completed")
+
+    if vision_text:
+        await _ensure_job_active(analysis_id)
+        await _update_job_async(analysis_id, "processing", "part_identifier", 20)
+        vision_label = await asyncio.to_thread(
+            extract_identified_part_label, vision_text
+        )
+        if vision_label:
+            await asyncio.to_thread(
+                update_crew_job_identified_part,
+                analysis_id,
+                vision_label,
+                "part_identifier",
+                20,
+            )
+    else:
+        await _update_job_async(analysis_id, "processing", "part_identifier", 15)
+
+    model_overrides: dict[str, str] = {}
+    while True:
+        crew, report_task = await run_crew_blocking(
+            setup_crew,
+            None,
+            keywords,
+            user_email,
+            user_country=user_country,
+            user_region=user_region,
+            user_currency=user_currency,
+            job_id=analysis_id,
+            vision_description=vision_text or None,
+            completed_outputs=task_outputs,
+            prior_report=None if vision_text else prior_report,
+            tier=tier,
+            model_overrides=model_overrides,
+            trace=trace,
+        )
+
+        await _ensure_job_active(analysis_id)
+        emit_progress("execution", "Starting analysis workflow...", "in_progress")
+        await _update_job_async(analysis_id, "processing", "part_identifier", 22)
+
+        try:
+            result = await run_crew_blocking(run_crew_kickoff, crew, analysis_id)
+            record_crew_usage(crew, step_for_role=AGENT_ROLE_TO_STAGE)
+            _collect_context_stats(analysis_id, crew, context_stats)
+            break
+        except CrewJobCancelledError:
+            record_crew_usage(crew, step_for_role=AGENT_ROLE_TO_STAGE)
+            raise
+        except Exception as kickoff_err:
+            record_crew_usage(crew, step_for_role=AGENT_ROLE_TO_STAGE)
+            if not is_fallback_error(kickoff_err):
+                raise
+            # Stages finished before the failure were checkpointed by the task callback
+            task_outputs = (await asyncio.to_thread(load_checkpoints, analysis_id)).task_outputs()
+            if "report_generator" in task_outputs:
+                return task_outputs["report_generator"]
+            fallback_to: dict[str, str] = {}
+            for step in CREW_STEPS:
+                if step in task_outputs:
+                    continue
+                route = resolve_route(step, tier)
+                nxt = route.next_model(model_overrides.get(step) or route.model)
+                if nxt:
+                    fallback_to[step] = nxt
+            if not fallback_to:
+                raise
+            logger.warning(
+                "Job %s: crew kickoff failed (%s); retrying remaining stages on %s",
+                analysis_id,
+                kickoff_err,
+                fallback_to,
+            )
+            model_overrides.update(fallback_to)
+
+    await _ensure_job_active(analysis_id)
+
+    await _update_job_async(analysis_id, "processing", "report_generator", 78)
+    emit_progress(
+        "report_generator",
+        "Agents finished — compiling your report…",
+        "in_progress",
+    )
+    
+    # Extract the report_task output directly
+    # The report_task contains the full comprehensive report from the Report Compiler agent
+    try:
+        # After crew.kickoff(), the task's output attribute contains the TaskOutput object
+        logger.info(f"🔍 Report task type: {type(report_task)}")
+        logger.info(f"🔍 Report task has output: {hasattr(report_task, 'output')}")
+        
+        # Try to get the output from the report_task directly
+        if hasattr(report_task, 'output') and report_task.output:
+            # TaskOutput object has raw_output, exported_output, or we can call result()
+            if hasattr(report_task.output, 'raw_output'):
+                result_text = str(report_task.output.raw_output)
+                logger.info(f"📄 Used report_task.output.raw_output")
+            elif hasattr(report_task.output, 'exported_output'):
+                result_text = str(report_task.output.exported_output)
+                logger.info(f"📄 Used report_task.output.exported_output")
+            elif hasattr(report_task.output, 'raw'):
+                result_text = str(report_task.output.raw)
+                logger.info(f"📄 Used report_task.output.raw")
+            elif callable(getattr(report_task.output, 'result', None)):
+                result_text = str(report_task.output.result())
+                logger.info(f"📄 Used report_task.output.result()")
+            else:
+                result_text = str(report_task.output)
+                logger.info(f"📄 Used report_task.output (str)")
+                
+            logger.info(f"📄 Extracted report from Report Compiler task")
+            logger.info(f"📄 Report preview (first 200 chars): {result_text[:200]}")
+            logger.info(f"📄 Report length: {len(result_text)} chars")
+        else:
+            # Fallback to full crew result
+            result_text = str(result)
+            logger.warning(f"⚠️ Could not access report_task.output, using full result")
+    except Exception as e:
+        logger.error(f"❌ Error extracting report task output: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        result_text = str(result)
+    return result_text
+
+
 async def run_analysis_background(
     analysis_id: str,
     user_email: str,
@@ -988,14 +1255,36 @@ async def run_analysis_background(
     user_id: Optional[str] = None,
     image_name: Optional[str] = None,
     keywords_label: Optional[str] = None,
+    checkpoints: Optional[JobCheckpoints] = None,
+    credit_charged: bool = False,
+    billing_user_id: Optional[str] = None,
+    tier: Optional[str] = None,
+    force_fresh: bool = False,
 ):
-    """Run the SpareFinder Research in the background and update database."""
+    """
+    Run the SpareFinder Research in the background and update database.
+
+    The job first waits for an admission slot (app/admission.py; ``tier``
+    orders the queue, looked up from the user when not given). Keyword-only
+    jobs are first looked up in the result cache (app/analysis_cache.py) unless
+    ``force_fresh``; a hit skips the queue and the crew. Each completed stage is
+    checkpointed (job_checkpoints); a restarted job resumes after the last one
+    instead of starting over.
+    """
     from .notification_service import (
         notify_analysis_completed,
         notify_analysis_failed,
         resolve_user_id,
     )
 
+    # One live run per job: a second start (another instance, a duplicate kickoff)
+    # finds the lease held and leaves the job alone. The lease comes first so a
+    # losing start never replaces the live run's task or clears its cancel flag.
+    lease = JobLease(analysis_id)
+    if not await lease.start():
+        logger.warning("Crew job %s is leased by another live worker; not starting a second run", analysis_id)
+        return
+
     current_task = asyncio.current_task()
     if current_task is not None:
         register_running_task(analysis_id, current_task)
@@ -1015,225 +1304,251 @@ async def run_analysis_background(
     )
     label_keywords = keywords_label or keywords
     crew_report_text: Optional[str] = None
+    ticket: Optional[AdmissionTicket] = None
+    model_trace = ModelTrace()
+    context_stats: dict[str, dict[str, Any]] = {}
+
+    if tier is None and (billing_user_id or resolved_user_id):
+        try:
+            from .api.plan_enforcement import get_user_tier_and_limits
+
+            tier, _ = await get_user_tier_and_limits(billing_user_id or resolved_user_id, "user")
+        except Exception as tier_err:
+            logger.debug("Tier lookup for job %s failed: %s", analysis_id, tier_err)
+
+    queued_touch: Optional[asyncio.Task] = None
+
+    # Queued notices set only the stage (and updated_at): a resumed job keeps
+    # the progress it had reached instead of dropping back to 5%.
+    async def _touch_while_queued() -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SEC)
+            await _update_job_async(analysis_id, "processing", "queued")
+
+    async def _report_queued(position: int) -> None:
+        nonlocal queued_touch
+        logger.info("⏳ Crew job %s queued at position %s", analysis_id, position)
+        await _update_job_async(analysis_id, "processing", "queued")
+        # Stuck-job recovery judges unleased jobs by updated_at; keep it fresh
+        # while waiting for a slot so a queued job is not restarted as stuck.
+        if not lease.enabled:
+            queued_touch = asyncio.create_task(_touch_while_queued())
 
     set_progress_emitter(create_db_progress_emitter(analysis_id))
+    usage_token = bind_usage(
+        job_id=analysis_id, user_id=resolved_user_id, tier=normalize_tier(tier) if tier else None
+    )
     try:
-        await _ensure_job_active(analysis_id)
-        await _update_job_async(analysis_id, "processing", "image_analysis", 10)
-
-        if image_data:
-            emit_progress(
-                "image_analysis",
-                "Analyzing image with GPT-4o Vision...",
-                "in_progress",
-            )
-            raw_vision = await run_crew_blocking(
-                get_image_description, image_data, keywords
-            )
-            vision_text = sanitize_vision_description(raw_vision)
-            from .content_validator import (
-                NonManufacturingPartError,
-                validate_identified_part,
+        cached: Optional[CachedAnalysis] = None
+        prior_report: Optional[str] = None
+        if image_data is None and checkpoints is None and keywords:
+            if not force_fresh:
+                force_fresh = await asyncio.to_thread(user_wants_fresh, resolved_user_id)
+        if image_data is None and checkpoints is None and keywords and not force_fresh:
+            cached = await asyncio.to_thread(
+                lookup_cached_analysis, keywords, user_country, user_region, user_currency
             )
+            if cached is None:
+                # Near-duplicate query: serve it, or hand the prior report to the crew
+                from .semantic_cache import lookup_similar_analysis
 
-            part_check = await run_crew_blocking(
-                validate_identified_part, vision_text
-            )
-            if not part_check.is_valid:
-                raise NonManufacturingPartError(
-                    part_check.user_message,
-                    part_check.detected_subject,
+                cached, prior_report = await asyncio.to_thread(
+                    lookup_similar_analysis, keywords, user_country, user_region, user_currency
                 )
-            emit_progress("image_analysis", "Image analyzed successfully", "completed")
-            await _ensure_job_active(analysis_id)
-            await _update_job_async(analysis_id, "processing", "part_identifier", 20)
-            vision_label = await asyncio.to_thread(
-                extract_identified_part_label, vision_text
-            )
-            if vision_label:
+        if cached is not None:
+            logger.info("⚡ Crew job %s served from cache (source job %s)", analysis_id, cached.source_job_id)
+            checkpoints = cached.as_checkpoints(analysis_id)
+            if credit_charged and billing_user_id and cache_credit_policy() == "free":
+                from .api.supabase_admin import get_supabase_admin
+                from .credit_service import refund_analysis_credit
+
                 await asyncio.to_thread(
-                    update_crew_job_identified_part,
-                    analysis_id,
-                    vision_label,
-                    "part_identifier",
-                    20,
+                    refund_analysis_credit,
+                    get_supabase_admin(),
+                    billing_user_id,
+                    job_id=analysis_id,
+                    reason="Cached result — credit refunded",
                 )
-            crew, report_task = await run_crew_blocking(
-                setup_crew,
-                None,
-                keywords,
-                user_email,
-                user_country=user_country,
-                user_region=user_region,
-                user_currency=user_currency,
-                job_id=analysis_id,
-                vision_description=vision_text,
+        else:
+            try:
+                ticket = await admission.acquire(analysis_id, tier, on_queued=_report_queued)
+            finally:
+                if queued_touch is not None:
+                    queued_touch.cancel()
+        await _ensure_job_active(analysis_id)
+        if checkpoints is None:
+            checkpoints = await asyncio.to_thread(load_checkpoints, analysis_id)
+        if checkpoints.stages:
+            logger.info("♻️ Resuming job %s after checkpoint %s", analysis_id, checkpoints.resume_point())
+
+        region_label = format_region_label(user_country, user_region)
+        report_cp = checkpoints.get(CHECKPOINT_REPORT)
+        if report_cp and report_cp.get("text"):
+            result_text = report_cp["text"]
+            structured_report = (
+                StructuredReport.model_validate(report_cp["structured"])
+                if report_cp.get("structured")
+                else None
             )
+            no_regional_suppliers = bool(report_cp.get("no_regional_suppliers"))
+            crew_report_text = result_text
         else:
-            await _update_job_async(analysis_id, "processing", "part_identifier", 15)
-            crew, report_task = await run_crew_blocking(
-                setup_crew,
-                None,
-                keywords,
+            result_text = await _crew_report_text(
+                analysis_id,
                 user_email,
-                user_country=user_country,
-                user_region=user_region,
-                user_currency=user_currency,
-                job_id=analysis_id,
+                image_data,
+                keywords,
+                user_country,
+                user_region,
+                user_currency,
+                checkpoints,
+                prior_report,
+                tier=tier,
+                trace=model_trace,
+                context_stats=context_stats,
             )
+            # Strip and validate the Report Compiler's JSON block (None -> markdown parsing fallback)
+            result_text, structured_report = split_structured_report(result_text)
+            if structured_report is None:
+                logger.info("📄 No valid structured block in report; falling back to markdown extraction")
+            crew_report_text = result_text
 
-        await _ensure_job_active(analysis_id)
-        emit_progress("execution", "Starting analysis workflow...", "in_progress")
-        await _update_job_async(analysis_id, "processing", "part_identifier", 22)
-
-        result = await run_crew_blocking(run_crew_kickoff, crew, analysis_id)
-
-        await _ensure_job_active(analysis_id)
-
-        await _update_job_async(analysis_id, "processing", "report_generator", 78)
-        emit_progress(
-            "report_generator",
-            "Agents finished — compiling your report…",
-            "in_progress",
-        )
-        
-        # Extract the report_task output directly
-        # The report_task contains the full comprehensive report from the Report Compiler agent
-        try:
-            # After crew.kickoff(), the task's output attribute contains the TaskOutput object
-            logger.info(f"🔍 Report task type: {type(report_task)}")
-            logger.info(f"🔍 Report task has output: {hasattr(report_task, 'output')}")
-            
-            # Try to get the output from the report_task directly
-            if hasattr(report_task, 'output') and report_task.output:
-                # TaskOutput object has raw_output, exported_output, or we can call result()
-                if hasattr(report_task.output, 'raw_output'):
-                    result_text = str(report_task.output.raw_output)
-                    logger.info(f"📄 Used report_task.output.raw_output")
-                elif hasattr(report_task.output, 'exported_output'):
-                    result_text = str(report_task.output.exported_output)
-                    logger.info(f"📄 Used report_task.output.exported_output")
-                elif hasattr(report_task.output, 'raw'):
-                    result_text = str(report_task.output.raw)
-                    logger.info(f"📄 Used report_task.output.raw")
-                elif callable(getattr(report_task.output, 'result', None)):
-                    result_text = str(report_task.output.result())
-                    logger.info(f"📄 Used report_task.output.result()")
-                else:
-                    result_text = str(report_task.output)
-                    logger.info(f"📄 Used report_task.output (str)")
-                    
-                logger.info(f"📄 Extracted report from Report Compiler task")
-                logger.info(f"📄 Report preview (first 200 chars): {result_text[:200]}")
-                logger.info(f"📄 Report length: {len(result_text)} chars")
-            else:
-                # Fallback to full crew result
-                result_text = str(result)
-                logger.warning(f"⚠️ Could not access report_task.output, using full result")
-        except Exception as e:
-            logger.error(f"❌ Error extracting report task output: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            result_text = str(result)
+            await _ensure_job_active(analysis_id)
 
-        crew_report_text = result_text
+            if region_label:
+                from .region_preferences import inject_search_region_into_report
 
-        await _ensure_job_active(analysis_id)
-
-        region_label = format_region_label(user_country, user_region)
-        if region_label:
-            from .region_preferences import inject_search_region_into_report
+                result_text = inject_search_region_into_report(
+                    result_text, region_label, user_currency
+                )
 
-            result_text = inject_search_region_into_report(
-                result_text, region_label, user_currency
+            # Detect no-regional-suppliers so we can flag job and email user
+            no_regional_suppliers = bool(
+                "[NO_REGIONAL_SUPPLIERS]" in result_text
+                and (user_country or user_region)
             )
+            if no_regional_suppliers:
+                result_text = result_text.replace("[NO_REGIONAL_SUPPLIERS]", "").strip()
+                logger.info(f"📌 No regional suppliers for {region_label}; will flag job and send follow-up email")
 
-        if user_currency:
-            from .currency_utils import convert_prices_in_report
-
-            result_text = convert_prices_in_report(result_text, user_currency)
-
-        # Detect no-regional-suppliers so we can flag job and email user
-        no_regional_suppliers = (
-            "[NO_REGIONAL_SUPPLIERS]" in result_text
-            and (user_country or user_region)
-        )
-        if no_regional_suppliers:
-            result_text = result_text.replace("[NO_REGIONAL_SUPPLIERS]", "").strip()
-            logger.info(f"📌 No regional suppliers for {region_label}; will flag job and send follow-up email")
-        
-        emit_progress(
-            "report_generator",
-            "Generating professional PDF from analysis results...",
-            "in_progress",
-        )
-        pdf_path = await asyncio.to_thread(
-            generate_report_tool_func, comprehensive_report_text=result_text
-        )
-        
-        # Extract just the filename for URL storage
-        pdf_filename = pdf_path.split('/')[-1] if '/' in pdf_path else pdf_path.split('\\')[-1]
-        
-        await _update_job_async(analysis_id, "processing", "report_generator", 85)
+            # Last text transform: the PDF renderer and DB extraction then share one parse of result_text
+            if user_currency:
+                from .currency_utils import convert_structured_report
 
-        pdf_public_url = None
-        try:
-            from .pdf_storage import upload_pdf_to_supabase_storage
-            pdf_public_url = await asyncio.to_thread(
-                upload_pdf_to_supabase_storage, pdf_path, pdf_filename
+                result_text, structured_report = convert_structured_report(
+                    result_text, structured_report, user_currency
+                )
+            await asyncio.to_thread(
+                save_checkpoint,
+                analysis_id,
+                CHECKPOINT_REPORT,
+                {
+                    "text": result_text,
+                    "structured": structured_report.model_dump(exclude_none=True) if structured_report else None,
+                    "no_regional_suppliers": no_regional_suppliers,
+                },
             )
-            if pdf_public_url:
-                logger.info(f"✅ PDF uploaded to Supabase Storage: {pdf_public_url}")
-            else:
-                logger.warning("⚠️ PDF upload to Supabase Storage failed, using local path")
-        except Exception as upload_err:
-            logger.error(f"❌ Error uploading PDF: {upload_err}")
-        
-        emit_progress("database_storage", "Storing analysis to database...", "in_progress")
-        await _update_job_async(analysis_id, "processing", "database_storage", 90)
-        await asyncio.to_thread(
-            store_crew_analysis_to_database,
-            analysis_id=analysis_id,
-            user_email=user_email,
-            analysis_data={
-                "report_text": result_text,
-                "processing_time": 180,
-                "pdf_path": pdf_filename,
-                "pdf_url": pdf_public_url if pdf_public_url else pdf_filename,
-                "search_region": region_label or None,
-                "search_currency": user_currency or None,
-            },
-            image_url=None,
-            keywords=keywords,
-        )
-        emit_progress("database_storage", "Analysis stored to database", "completed")
 
-        await _update_job_async(analysis_id, "processing", "email_agent", 95)
-        logger.info(f"📧 Attempting to send email to {user_email}")
-        try:
-            email_result = await asyncio.to_thread(
-                send_email_tool_func, user_email, pdf_path, pdf_public_url
+        pdf_cp = checkpoints.get(CHECKPOINT_PDF)
+        if pdf_cp and pdf_cp.get("public_url"):
+            # Already uploaded: the email only needs the link
+            report_pdf = ReportPdf(
+                filename=pdf_cp.get("filename") or "report.pdf",
+                data=b"",
+                public_url=pdf_cp["public_url"],
+                email_url=pdf_cp.get("email_url") or pdf_cp["public_url"],
+                object_path=pdf_cp.get("object_path"),
             )
-            if "successfully" in email_result.lower():
-                logger.info(f"✅ Email sent successfully to {user_email}")
-            else:
-                logger.warning(f"⚠️ Email sending failed, but analysis will continue: {email_result}")
-        except Exception as email_error:
-            logger.error(f"❌ Error during email sending: {email_error}")
-            logger.warning("⚠️ Email sending failed, but analysis completed successfully")
-            # Don't re-raise - continue with job completion
+        else:
+            emit_progress(
+                "report_generator",
+                "Generating professional PDF from analysis results...",
+                "in_progress",
+            )
+            report_pdf = await asyncio.to_thread(render_report_pdf, result_text, structured_report)
+            await _update_job_async(analysis_id, "processing", "report_generator", 85)
+            try:
+                await asyncio.to_thread(publish_report_pdf, report_pdf)
+                if report_pdf.public_url:
+                    logger.info(f"✅ PDF uploaded to Supabase Storage: {report_pdf.public_url}")
+                    await asyncio.to_thread(
+                        save_checkpoint,
+                        analysis_id,
+                        CHECKPOINT_PDF,
+                        {
+                            "filename": report_pdf.filename,
+                            "public_url": report_pdf.public_url,
+                            "email_url": report_pdf.email_url,
+                            "object_path": report_pdf.object_path,
+                        },
+                    )
+                else:
+                    logger.warning("⚠️ PDF upload to Supabase Storage failed, using local path")
+            except Exception as upload_err:
+                logger.error(f"❌ Error uploading PDF: {upload_err}")
+        pdf_filename = report_pdf.filename
+        pdf_public_url = report_pdf.public_url
+
+        if not checkpoints.has(CHECKPOINT_STORED):
+            emit_progress("database_storage", "Storing analysis to database...", "in_progress")
+            await _update_job_async(analysis_id, "processing", "database_storage", 90)
+            stored = await asyncio.to_thread(
+                store_crew_analysis_to_database,
+                analysis_id=analysis_id,
+                user_email=user_email,
+                analysis_data={
+                    "report_text": result_text,
+                    "structured": structured_report,
+                    "processing_time": 180,
+                    "pdf_path": pdf_filename,
+                    "pdf_url": pdf_public_url if pdf_public_url else pdf_filename,
+                    "search_region": region_label or None,
+                    "search_currency": user_currency or None,
+                },
+                image_url=None,
+                keywords=keywords,
+            )
+            if stored:
+                await asyncio.to_thread(save_checkpoint, analysis_id, CHECKPOINT_STORED)
+            emit_progress("database_storage", "Analysis stored to database", "completed")
+
+        if not checkpoints.has(CHECKPOINT_EMAILED):
+            await _update_job_async(analysis_id, "processing", "email_agent", 95)
+            logger.info(f"📧 Attempting to send email to {user_email}")
+            try:
+                email_result = await asyncio.to_thread(
+                    send_email_tool_func, user_email, report_pdf, analysis_id
+                )
+                if "successfully" in email_result.lower():
+                    logger.info(f"✅ Email sent successfully to {user_email}")
+                    await asyncio.to_thread(save_checkpoint, analysis_id, CHECKPOINT_EMAILED)
+                else:
+                    logger.warning(f"⚠️ Email sending failed, but analysis will continue: {email_result}")
+            except Exception as email_error:
+                logger.error(f"❌ Error during email sending: {email_error}")
+                logger.warning("⚠️ Email sending failed, but analysis completed successfully")
+                # Don't re-raise - continue with job completion
         
         logger.info(f"🏁 Completing job {analysis_id}")
         await _update_job_async(analysis_id, "completed", "completion", 100)
         emit_progress("completion", "Analysis complete", "completed")
         pdf_url_for_completion = pdf_public_url if pdf_public_url else pdf_filename
         result_data = {"report_text": result_text}
+        if structured_report is not None:
+            result_data["structured_report"] = structured_report.model_dump(exclude_none=True)
         if region_label:
             result_data["search_region"] = region_label
         if user_currency:
             result_data["search_currency"] = user_currency
         if no_regional_suppliers:
             result_data["no_regional_suppliers"] = True
+        if model_trace.steps:
+            result_data["models"] = model_trace.as_dict()
+        usage = pop_job_usage(analysis_id)
+        if usage:
+            result_data["usage"] = usage
+        if context_stats:
+            result_data["context"] = context_stats
         completion_success = await asyncio.to_thread(
             complete_crew_job,
             analysis_id,
@@ -1243,6 +1558,27 @@ async def run_analysis_background(
         
         if completion_success:
             logger.info(f"✅ Job {analysis_id} marked as completed in database")
+            await asyncio.to_thread(clear_checkpoints, analysis_id)
+            if cached is None and image_data is None and not image_name and report_pdf.public_url:
+                await asyncio.to_thread(
+                    store_cached_analysis,
+                    analysis_id,
+                    keywords or "",
+                    user_country,
+                    user_region,
+                    user_currency,
+                    checkpoints.get(CHECKPOINT_REPORT)
+                    or {
+                        "text": result_text,
+                        "structured": structured_report.model_dump(exclude_none=True) if structured_report else None,
+                        "no_regional_suppliers": no_regional_suppliers,
+                    },
+                    {
+                        "filename": report_pdf.filename,
+                        "public_url": report_pdf.public_url,
+                        "object_path": report_pdf.object_path,
+                    },
+                )
         else:
             logger.warning(f"⚠️ Full job completion update failed; status was already set to completed")
         
@@ -1253,6 +1589,7 @@ async def run_analysis_background(
                     lambda: send_no_regional_suppliers_email(
                         to_email=user_email,
                         region_label=region_label,
+                        idempotency_key=f"no_regional_suppliers:{analysis_id}",
                     )
                 )
                 if send_ok:
@@ -1298,6 +1635,7 @@ async def run_analysis_background(
                     {"report_text": crew_report_text, "post_processing_error": str(e)},
                     None,
                 )
+                await asyncio.to_thread(clear_checkpoints, analysis_id)
             except Exception as completion_err:
                 logger.error(
                     "Failed to mark job %s completed after post-crew error: %s",
@@ -1335,8 +1673,14 @@ async def run_analysis_background(
         print(f"❌ Analysis failed: {e}")
     finally:
         set_progress_emitter(None)
+        unbind_usage(usage_token)
+        pop_job_usage(analysis_id)
+        await admission.release(ticket)
+        await lease.stop()
         unregister_running_task(analysis_id, current_task)
-        clear_cancel_flag(analysis_id)
+        # After a lost lease the flag is the new owner's (e.g. a user cancel)
+        if not lease.lost:
+            clear_cancel_flag(analysis_id)
 
 
 @app.post("/analyze-part")
@@ -1344,7 +1688,8 @@ async def analyze_part(
     user_email: str = Form(...),
     analysis_id: Optional[str] = Form(None),
     keywords: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    force_fresh: bool = Form(False),
 ):
     """
     Analyze a car part from image and/or keywords.
@@ -1354,6 +1699,7 @@ async def analyze_part(
     - analysis_id: Optional job ID for tracking (will generate if not provided)
     - keywords: Optional text description
     - file: Optional image file
+    - force_fresh: Skip the keyword result cache
     
     Note: For real-time progress, connect to /ws/progress WebSocket endpoint.
     """
@@ -1369,6 +1715,12 @@ async def analyze_part(
                 status_code=400,
                 content={"error": "Valid email address is required"}
             )
+
+        from .api.http_errors import analysis_backlog_response
+
+        backlog = await analysis_backlog_response()
+        if backlog is not None:
+            return backlog
         
         # Generate analysis ID if not provided
         if not analysis_id:
@@ -1392,7 +1744,8 @@ async def analyze_part(
             analysis_id,
             user_email,
             image_data,
-            keywords
+            keywords,
+            force_fresh=force_fresh,
         ))
         
         return JSONResponse(
@@ -1475,20 +1828,18 @@ async def websocket_progress(websocket: WebSocket):
         emit_progress("report_generator", "Generating professional PDF from analysis results...", "in_progress")
         
         # Use the complete result text for enhanced report generation
-        result_text = str(result)
+        result_text, structured_report = split_structured_report(str(result))
         
         # Generate enhanced PDF with the complete structured text
-        pdf_path = generate_report_tool_func(comprehensive_report_text=result_text)
-        
-        # Extract just the filename for URL storage
-        pdf_filename = pdf_path.split('/')[-1] if '/' in pdf_path else pdf_path.split('\\')[-1]
+        report_pdf = render_report_pdf(result_text, structured_report)
+        pdf_filename = report_pdf.filename
         
         # Upload PDF to Supabase Storage for persistent access
         emit_progress("database_storage", "📤 Uploading PDF to cloud storage...", "in_progress")
         pdf_public_url = None
         try:
-            from .pdf_storage import upload_pdf_to_supabase_storage
-            pdf_public_url = upload_pdf_to_supabase_storage(pdf_path, pdf_filename)
+            publish_report_pdf(report_pdf)
+            pdf_public_url = report_pdf.public_url
             if pdf_public_url:
                 emit_progress("database_storage", "✅ PDF uploaded to cloud storage", "completed")
                 logger.info(f"✅ PDF uploaded to Supabase Storage: {pdf_public_url}")
@@ -1515,6 +1866,7 @@ async def websocket_progress(websocket: WebSocket):
             user_email=user_email,
             analysis_data={
                 'report_text': result_text,
+                'structured': structured_report,
                 'processing_time': processing_time,
                 'pdf_path': pdf_filename,
                 'pdf_url': pdf_url_for_db
@@ -1530,7 +1882,7 @@ async def websocket_progress(websocket: WebSocket):
         
         # Send email (non-blocking - don't fail analysis if email fails)
         try:
-            email_result = send_email_tool_func(user_email, pdf_path, pdf_public_url)
+            email_result = send_email_tool_func(user_email, report_pdf, analysis_id)
             if "successfully" in email_result.lower():
                 emit_progress("completion", "✅ Analysis complete! Report sent to your email.", "completed")
             else:
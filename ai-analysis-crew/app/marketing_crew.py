@@ -10,10 +10,12 @@ from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Literal
 
 from crewai import Agent, Crew, Task
-from langchain_openai import ChatOpenAI
 from openai import OpenAI
 from pydantic import BaseModel
 
+from .llm_usage import record_crew_usage
+from .model_routing import chat_llm, resolve_route, routed_chat_completion
+
 logger = logging.getLogger(__name__)
 
 
@@ -106,7 +108,6 @@ def extract_lead_fields_from_csv_row(raw_row: dict[str, Any]) -> ExtractedLeadFi
         return ExtractedLeadFields(email=heuristic_email)
 
     client = _openai_client()
-    model = os.getenv("MARKETING_SANITIZE_MODEL", "gpt-4o-mini")
     payload = json.dumps(raw_row, ensure_ascii=False)[:12000]
     system = (
         "Extract lead fields from CSV row JSON. "
@@ -114,8 +115,9 @@ def extract_lead_fields_from_csv_row(raw_row: dict[str, Any]) -> ExtractedLeadFi
         "If unknown, return empty string. Never invent an email."
     )
     try:
-        resp = client.chat.completions.create(
-            model=model,
+        resp = routed_chat_completion(
+            client,
+            "marketing_sanitize",
             temperature=0.0,
             max_tokens=300,
             messages=[
@@ -155,15 +157,7 @@ def auto_extract_email_from_csv_row(raw_row: dict[str, Any]) -> str:
     return _heuristic_email_from_row(raw_row).strip().lower()
 
 
-def sanitize_lead_with_openai(raw_payload: dict[str, Any], *, fast_path: bool = True) -> SanitizeResult:
-    """
-    Normalize messy CSV/Serp rows into structured fields + gatekeeper status.
-    Uses JSON mode for reliability.
-    """
-    client = _openai_client()
-    model = os.getenv("MARKETING_SANITIZE_MODEL", "gpt-4o-mini")
-    user_payload = json.dumps(raw_payload, ensure_ascii=False)[:12000]
-
+def _sanitize_system(fast_path: bool) -> str:
     system = (
         "You are a B2B lead data normalizer for SpareFinder (industrial spare parts SaaS). "
         "Given raw lead JSON, produce structured fields. "
@@ -174,13 +168,39 @@ def sanitize_lead_with_openai(raw_payload: dict[str, Any], *, fast_path: bool =
     )
     if fast_path:
         system += " Prefer accepted when email looks like a real business domain."
+    return system
+
+
+def _sanitize_result_from_data(data: dict[str, Any], default_trace: str = "openai_sanitize") -> SanitizeResult:
+    status = str(data.get("sanitization_status") or "review").lower()
+    if status not in ("accepted", "review", "rejected"):
+        status = "review"
+
+    return SanitizeResult(
+        sanitized_full_name=str(data.get("sanitized_full_name") or "")[:500],
+        sanitized_job_title=str(data.get("sanitized_job_title") or "")[:500],
+        sanitized_company_name=str(data.get("sanitized_company_name") or "")[:500],
+        sanitized_notes=str(data.get("sanitized_notes") or "")[:2000],
+        sanitization_status=status,  # type: ignore[arg-type]
+        crew_trace=str(data.get("crew_trace") or default_trace)[:2000],
+    )
+
+
+def sanitize_lead_with_openai(raw_payload: dict[str, Any], *, fast_path: bool = True) -> SanitizeResult:
+    """
+    Normalize messy CSV/Serp rows into structured fields + gatekeeper status.
+    Uses JSON mode for reliability.
+    """
+    client = _openai_client()
+    user_payload = json.dumps(raw_payload, ensure_ascii=False)[:12000]
 
-    resp = client.chat.completions.create(
-        model=model,
+    resp = routed_chat_completion(
+        client,
+        "marketing_sanitize",
         temperature=0.2,
         max_tokens=500,
         messages=[
-            {"role": "system", "content": system},
+            {"role": "system", "content": _sanitize_system(fast_path)},
             {"role": "user", "content": user_payload},
         ],
         response_format={"type": "json_object"},
@@ -194,19 +214,147 @@ def sanitize_lead_with_openai(raw_payload: dict[str, Any], *, fast_path: bool =
             sanitized_notes="AI parse failed",
             crew_trace="json_parse_error",
         )
+    return _sanitize_result_from_data(data)
 
-    status = str(data.get("sanitization_status") or "review").lower()
-    if status not in ("accepted", "review", "rejected"):
-        status = "review"
 
-    return SanitizeResult(
-        sanitized_full_name=str(data.get("sanitized_full_name") or "")[:500],
-        sanitized_job_title=str(data.get("sanitized_job_title") or "")[:500],
-        sanitized_company_name=str(data.get("sanitized_company_name") or "")[:500],
-        sanitized_notes=str(data.get("sanitized_notes") or "")[:2000],
-        sanitization_status=status,  # type: ignore[arg-type]
-        crew_trace=str(data.get("crew_trace") or "openai_sanitize")[:2000],
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+# Leads (or CSV rows) packed into one chat completion; 20-50 keeps the answer
+# well inside max_tokens while cutting per-request overhead ~25x.
+SANITIZE_BATCH_SIZE = _env_int("MARKETING_SANITIZE_BATCH_SIZE", 25, lo=1, hi=50)
+# Per-item input cap in batched prompts (the single-lead path allows 12000).
+_BATCH_ITEM_CHARS = 3000
+# Output tokens budgeted per item in a batched answer.
+_BATCH_TOKENS_PER_ITEM = 160
+
+
+def _compact_item(raw: dict[str, Any]) -> str:
+    """Lead / row JSON without empty values, capped for batching."""
+    slim = {k: v for k, v in raw.items() if v not in (None, "", [], {})}
+    return json.dumps(slim, ensure_ascii=False, default=str)[:_BATCH_ITEM_CHARS]
+
+
+def _batch_user_payload(items: list[tuple[str, dict[str, Any]]]) -> str:
+    return "\n".join(f'{{"id": {json.dumps(item_id)}, "lead": {_compact_item(raw)}}}' for item_id, raw in items)
+
+
+def sanitize_batch_request(items: list[tuple[str, dict[str, Any]]], *, fast_path: bool = True) -> dict[str, Any]:
+    """
+    Chat completion arguments (without model) that sanitize ``items`` ((id, raw lead))
+    in one request. Shared by the synchronous batch path and the Batch API JSONL.
+    """
+    system = (
+        _sanitize_system(fast_path)
+        + " You receive one JSON object per line, each {\"id\", \"lead\"}. Apply the rules to every lead "
+        "independently and return ONLY JSON {\"results\": [...]} with one object per input line, each carrying "
+        "the input \"id\" unchanged plus the keys above."
+    )
+    return {
+        "temperature": 0.2,
+        "max_tokens": min(16000, 200 + _BATCH_TOKENS_PER_ITEM * len(items)),
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": _batch_user_payload(items)},
+        ],
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _results_by_id(content: str, ids: list[str]) -> dict[str, dict[str, Any]]:
+    try:
+        data = json.loads(content or "{}")
+    except json.JSONDecodeError:
+        return {}
+    results = data.get("results") if isinstance(data, dict) else data
+    wanted = set(ids)
+    out: dict[str, dict[str, Any]] = {}
+    for item in results if isinstance(results, list) else []:
+        if isinstance(item, dict) and str(item.get("id")) in wanted:
+            out.setdefault(str(item["id"]), item)
+    return out
+
+
+def parse_sanitize_batch_content(content: str, ids: list[str]) -> dict[str, SanitizeResult]:
+    """Results of a batched answer keyed by input id; ids the model dropped are absent."""
+    return {
+        item_id: _sanitize_result_from_data(data, "openai_sanitize_batch")
+        for item_id, data in _results_by_id(content, ids).items()
+    }
+
+
+def sanitize_leads_with_openai(
+    items: list[tuple[str, dict[str, Any]]],
+    *,
+    fast_path: bool = True,
+) -> dict[str, SanitizeResult]:
+    """
+    Batched sanitize_lead_with_openai: SANITIZE_BATCH_SIZE leads per request.
+    Returns results keyed by id; leads missing from an answer (or from a failed
+    request) are left out so the caller can retry them one by one.
+    """
+    client = _openai_client()
+    out: dict[str, SanitizeResult] = {}
+    for i in range(0, len(items), SANITIZE_BATCH_SIZE):
+        chunk = items[i : i + SANITIZE_BATCH_SIZE]
+        try:
+            resp = routed_chat_completion(client, "marketing_sanitize", **sanitize_batch_request(chunk, fast_path=fast_path))
+        except Exception as e:
+            logger.warning("sanitize_leads_with_openai: batch of %s failed: %s", len(chunk), e)
+            continue
+        out.update(parse_sanitize_batch_content(resp.choices[0].message.content or "{}", [k for k, _ in chunk]))
+    return out
+
+
+def extract_lead_fields_from_csv_rows(rows: list[dict[str, Any]]) -> list[ExtractedLeadFields]:
+    """
+    Batched extract_lead_fields_from_csv_row: SANITIZE_BATCH_SIZE rows per request,
+    results in row order. Rows the model skipped fall back to the heuristic email.
+    """
+    heuristic = [ExtractedLeadFields(email=_heuristic_email_from_row(r)) for r in rows]
+    if not rows or not (os.getenv("OPENAI_API_KEY") or "").strip():
+        return heuristic
+
+    client = _openai_client()
+    system = (
+        "Extract lead fields from CSV row JSON. You receive one JSON object per line, each {\"id\", \"lead\"}. "
+        "Return JSON ONLY as {\"results\": [...]} with one object per input line: the input \"id\" plus keys "
+        "email, full_name, job_title, company_name, platform. "
+        "If unknown, return empty string. Never invent an email."
     )
+    out = list(heuristic)
+    for start in range(0, len(rows), SANITIZE_BATCH_SIZE):
+        items = [(str(start + j), r) for j, r in enumerate(rows[start : start + SANITIZE_BATCH_SIZE])]
+        try:
+            resp = routed_chat_completion(
+                client,
+                "marketing_sanitize",
+                temperature=0.0,
+                max_tokens=min(16000, 100 + 120 * len(items)),
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": _batch_user_payload(items)},
+                ],
+                response_format={"type": "json_object"},
+            )
+        except Exception as e:
+            logger.warning("extract_lead_fields_from_csv_rows fallback for %s rows: %s", len(items), e)
+            continue
+        for item_id, data in _results_by_id(resp.choices[0].message.content or "{}", [k for k, _ in items]).items():
+            i = int(item_id)
+            out[i] = ExtractedLeadFields(
+                email=str(data.get("email") or "").strip().lower() or heuristic[i].email,
+                full_name=str(data.get("full_name") or "").strip(),
+                job_title=str(data.get("job_title") or "").strip(),
+                company_name=str(data.get("company_name") or "").strip(),
+                platform=str(data.get("platform") or "").strip(),
+            )
+    return out
 
 
 def generate_email_with_openai(
@@ -217,7 +365,6 @@ def generate_email_with_openai(
 ) -> EmailContent:
     """Single-call outbound generation with honesty guardrails."""
     client = _openai_client()
-    model = os.getenv("MARKETING_OUTBOUND_MODEL", "gpt-4o-mini")
     ctx = json.dumps(lead_context, ensure_ascii=False)[:8000]
 
     system = (
@@ -245,8 +392,9 @@ def generate_email_with_openai(
         "product": "SpareFinder helps teams identify industrial spare parts from photos and discover suppliers.",
     }
 
-    resp = client.chat.completions.create(
-        model=model,
+    resp = routed_chat_completion(
+        client,
+        "marketing_outbound",
         temperature=0.65,
         max_tokens=1200,
         messages=[
@@ -281,7 +429,7 @@ def generate_email_with_crew(
     if not (os.getenv("OPENAI_API_KEY") or "").strip():
         raise ValueError("OPENAI_API_KEY not configured")
 
-    llm = ChatOpenAI(model=os.getenv("MARKETING_CREW_MODEL", "gpt-4o-mini"), temperature=0.5)
+    llm = chat_llm(resolve_route("marketing_crew"))
 
     strategist = Agent(
         role="Messaging strategist",
@@ -326,6 +474,7 @@ def generate_email_with_crew(
     with ThreadPoolExecutor(max_workers=1) as ex:
         future = ex.submit(_run)
         result_text = future.result(timeout=120)
+    record_crew_usage(crew, default_step="marketing_crew")
 
     try:
         start = result_text.find("{")
@@ -356,7 +505,6 @@ def generate_serp_discovery_queries(
     AI-generated Google search strings for SerpAPI B2B discovery (SpareFinder / industrial parts).
     """
     client = _openai_client()
-    model = os.getenv("MARKETING_SANITIZE_MODEL", "gpt-4o-mini")
     cc = (country_code or "").strip().lower()[:4] or "global"
     cn = (country_name or "").strip()[:120] or cc.upper()
     n = max(5, min(int(count), 15))
@@ -398,8 +546,9 @@ def generate_serp_discovery_queries(
         f"{exclude_hint} "
         f'Return JSON ONLY: {{"queries": ["...", ...]}} with exactly {n} unique non-empty strings.'
     )
-    resp = client.chat.completions.create(
-        model=model,
+    resp = routed_chat_completion(
+        client,
+        "marketing_sanitize",
         temperature=0.8,
         max_tokens=900,
         messages=[
@@ -7,7 +7,7 @@ import os
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from .email_sender import send_basic_email_smtp, send_email_via_email_service
+from .email_sender import send_email_via_email_service, send_many_basic_emails_smtp
 from .sparefinder_contact import CONTACT_EMAIL
 
 logger = logging.getLogger(__name__)
@@ -223,8 +223,10 @@ def run_marketing_digest(supabase: Any) -> dict[str, Any]:
 
     subj = f"SpareFinder marketing digest — {day_start.date()}"
     ok_count = 0
-    for to in recipients:
-        ok = send_basic_email_smtp(to_email=to, subject=subj, html=body_html, text="\n".join(summary_lines))
+    smtp_results = send_many_basic_emails_smtp(
+        [{"to_email": to, "subject": subj, "html": body_html, "text": "\n".join(summary_lines)} for to in recipients]
+    )
+    for to, ok in zip(recipients, smtp_results):
         if not ok:
             ok = bool(
                 send_email_via_email_service(
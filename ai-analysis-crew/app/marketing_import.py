@@ -0,0 +1,506 @@
+"""
+Streaming CSV lead import (POST /admin/marketing/leads/import).
+
+The upload is never decoded into one string. The encoding is picked by a
+streaming validation pass (same order as before: utf-8-sig, utf-16 variants,
+latin-1) and csv.DictReader reads the spooled file through a TextIOWrapper,
+so memory is bounded by one chunk of rows plus the set of emails seen.
+
+Per chunk of IMPORT_CHUNK_ROWS rows, off the event loop:
+
+1. Columnar validation: mapped email cells are normalized and checked with
+   the precompiled email regex. Rows with an unusable email cell, or with
+   neither a name nor a company, go to the batched AI extraction
+   (extract_lead_fields_from_csv_rows); complete rows skip it.
+2. Dedup: emails already seen in this file, plus one bulk
+   existing_marketing_lead_emails / existing_app_user_emails lookup per chunk.
+3. Insert: one bulk insert per chunk. If it fails (e.g. a concurrent insert
+   hit the unique email index) the chunk is retried row by row and every
+   failure is reported as "row N: ...".
+
+With background=true the upload is copied to a temp file, the request returns
+an import id at once, and progress is written to marketing_lead_imports after
+every chunk (docs/sql/marketing_lead_imports.sql,
+GET /admin/marketing/leads/import/{id}).
+
+Env:
+  MARKETING_IMPORT_CHUNK_ROWS   rows per chunk (default 500, 50-2000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import os
+import re
+import secrets
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+from itertools import islice
+from typing import IO, Any, Awaitable, Callable, Optional
+
+from .marketing_crew import extract_lead_fields_from_csv_rows
+from .marketing_outbound_defaults import default_campaign_id_for_new_leads
+from .marketing_pipeline import log_error
+from .marketing_rules import (
+    existing_app_user_emails,
+    existing_marketing_lead_emails,
+    is_valid_email,
+    normalize_email,
+    normalize_row,
+)
+from .marketing_sanitize import apply_sanitize_result_to_payload, sanitize_lead_for_storage
+
+logger = logging.getLogger(__name__)
+
+IMPORTS_TABLE = "marketing_lead_imports"
+_ENCODINGS = ("utf-8-sig", "utf-16", "utf-16le", "utf-16be", "latin-1")
+_READ_BLOCK = 1 << 20
+_SNIFF_CHARS = 8192
+_HEADER_RE = re.compile(r"[^a-z0-9]+")
+_PREFERRED_EMAIL_HEADERS = frozenset(
+    {
+        "email",
+        "emailaddress",
+        "workemail",
+        "businessemail",
+        "contactemail",
+        "companyemail",
+        "primaryemail",
+        "officialemail",
+    }
+)
+_COLUMN_ALTS: dict[str, list[str]] = {
+    "email": ["EMAIL", "email", "Email"],
+    "full_name": ["FULL_NAME", "full_name", "Name"],
+    "job_title": ["JOB_TITLE", "job_title"],
+    "company_name": ["COMPANY_NAME", "company_name", "Company"],
+    "platform": ["platform", "Platform"],
+}
+_TEXT_FIELDS = ("full_name", "job_title", "company_name", "platform")
+_MAX_ERRORS = 200
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+IMPORT_CHUNK_ROWS = _env_int("MARKETING_IMPORT_CHUNK_ROWS", 500, lo=50, hi=2000)
+
+
+class CsvImportError(ValueError):
+    """The upload cannot be read as a CSV with a header row (HTTP 400)."""
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+
+def detect_encoding(f: IO[bytes]) -> str:
+    """First encoding in _ENCODINGS that decodes the whole file, checked in blocks."""
+    f.seek(0)
+    has_nul = b"\x00" in f.read(_SNIFF_CHARS)
+    for enc in _ENCODINGS:
+        # BOM-less UTF-16 decodes almost any even-length input; only try it when
+        # the text has the NUL bytes of UTF-16 ASCII (never present in latin-1 CSVs).
+        if enc in ("utf-16le", "utf-16be") and not has_nul:
+            continue
+        f.seek(0)
+        decoder = codecs.getincrementaldecoder(enc)()
+        try:
+            while block := f.read(_READ_BLOCK):
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+        except UnicodeError:
+            # UnicodeDecodeError, or plain UnicodeError from the utf-16 decoder
+            # when the file does not start with a BOM
+            continue
+        f.seek(0)
+        return enc
+    raise CsvImportError("Could not decode file. Save as UTF-8/UTF-16 CSV or TSV.")
+
+
+def _reader(text: IO[str], delimiter: str) -> csv.DictReader:
+    text.seek(0)
+    return csv.DictReader(text, delimiter=delimiter)
+
+
+def open_csv(f: IO[bytes]) -> tuple[csv.DictReader, str]:
+    """(DictReader with normalized fieldnames, delimiter) over the binary upload ``f``."""
+    f.seek(0, io.SEEK_END)
+    if not f.tell():
+        raise CsvImportError("Uploaded file is empty")
+    text = io.TextIOWrapper(f, encoding=detect_encoding(f), newline="")
+    sample = text.read(_SNIFF_CHARS)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except Exception:
+        delimiter = ","
+
+    reader = _reader(text, delimiter)
+    if not reader.fieldnames:
+        raise CsvImportError(
+            "CSV has no header row. Ensure first row contains column names (e.g. EMAIL, FULL_NAME, COMPANY_NAME)."
+        )
+    # Some ".csv" exports still use tabs/semicolons. Recover if header parsed as one giant column.
+    if len(reader.fieldnames) == 1:
+        single = reader.fieldnames[0] or ""
+        fallback = next((d for d in ("\t", ";", "|") if d in single), None)
+        if fallback:
+            delimiter = fallback
+            reader = _reader(text, delimiter)
+            if not reader.fieldnames:
+                raise CsvImportError("CSV header could not be parsed")
+
+    # Remove blank header columns from exports that start with empty tab/commas.
+    reader.fieldnames = [(h or "").strip() for h in reader.fieldnames if (h or "").strip()]
+    if not reader.fieldnames:
+        raise CsvImportError("CSV header is empty after normalization")
+    return reader, delimiter
+
+
+def _norm_header(v: str) -> str:
+    return _HEADER_RE.sub("", (v or "").strip().lower())
+
+
+def _guess_email_col(headers: list[str]) -> Optional[str]:
+    scored: list[tuple[float, str]] = []
+    for h in headers:
+        nh = _norm_header(h)
+        if not nh:
+            continue
+        if nh in _PREFERRED_EMAIL_HEADERS:
+            return h
+        score = max(
+            SequenceMatcher(None, nh, "email").ratio(),
+            SequenceMatcher(None, nh, "emailaddress").ratio(),
+            0.92 if "email" in nh else 0.0,
+        )
+        scored.append((score, h))
+    if not scored:
+        return None
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored[0][1] if scored[0][0] >= 0.58 else None
+
+
+def resolve_columns(headers: list[str], mapping: dict[str, str]) -> dict[str, Optional[str]]:
+    """Lead field -> CSV header: explicit column_map first, then known aliases (email: fuzzy guess)."""
+    norm_map = {_norm_header(h): h for h in headers}
+    cols: dict[str, Optional[str]] = {}
+    for key, alts in _COLUMN_ALTS.items():
+        cols[key] = mapping.get(key) or next((norm_map[n] for n in map(_norm_header, alts) if n in norm_map), None)
+    cols["email"] = cols["email"] or _guess_email_col(headers)
+    return cols
+
+
+# ---------------------------------------------------------------------------
+# Rows -> leads
+# ---------------------------------------------------------------------------
+
+
+def build_lead_payload(
+    raw: dict[str, Any],
+    *,
+    email: str,
+    campaign_id: Optional[str],
+    source: str,
+    run_sanitize: bool,
+) -> dict[str, Any]:
+    """marketing_leads insert payload for a normalized row (see normalize_row)."""
+    payload = {
+        "full_name": str(raw.get("full_name") or raw.get("FULL_NAME") or "").strip() or None,
+        "job_title": str(raw.get("job_title") or raw.get("JOB_TITLE") or "").strip() or None,
+        "company_name": str(raw.get("company_name") or raw.get("COMPANY_NAME") or "").strip() or None,
+        "platform": str(raw.get("platform") or "").strip() or None,
+        "email": email,
+        "source": source,
+        "campaign_id": campaign_id,
+        "raw_payload": raw,
+        "lead_status_internal": "pending",
+    }
+    if email and is_valid_email(email):
+        sr = sanitize_lead_for_storage(raw, email=email, run_sanitize=run_sanitize)
+        apply_sanitize_result_to_payload(payload, sr)
+    else:
+        payload["sanitization_status"] = "review"
+        payload["crew_trace"] = "missing_or_invalid_email"
+    payload["unsubscribe_token"] = secrets.token_urlsafe(32)
+    return payload
+
+
+def _is_duplicate_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return "23505" in msg or "duplicate" in msg or "unique" in msg
+
+
+@dataclass
+class ImportStats:
+    rows_read: int = 0
+    imported: int = 0
+    skipped_no_email: int = 0
+    skipped_duplicate_lead: int = 0
+    skipped_duplicate_user: int = 0
+    ai_rows: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def error(self, msg: str) -> None:
+        if len(self.errors) < _MAX_ERRORS:
+            self.errors.append(msg)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "rows_read": self.rows_read,
+            "imported": self.imported,
+            "skipped_no_email": self.skipped_no_email,
+            "skipped_duplicate_lead": self.skipped_duplicate_lead,
+            "skipped_duplicate_user": self.skipped_duplicate_user,
+            "ai_rows": self.ai_rows,
+            "errors": self.errors[:20],
+        }
+
+
+@dataclass
+class _ImportContext:
+    supabase: Any
+    cols: dict[str, Optional[str]]
+    campaign_id: Optional[str]
+    run_sanitize: bool
+    stats: ImportStats = field(default_factory=ImportStats)
+    seen: set[str] = field(default_factory=set)
+
+
+def _clean_rows(batch: list[tuple[int, dict[str, Any]]]) -> list[tuple[int, dict[str, str]]]:
+    chunk: list[tuple[int, dict[str, str]]] = []
+    for i, row in batch:
+        # Skip blank rows
+        if not row or all(not str(v or "").strip() for v in row.values()):
+            continue
+        # Remove empty-key columns (common in sheet exports with extra separators)
+        chunk.append((i, {str(k or "").strip(): (v or "") for k, v in row.items() if str(k or "").strip()}))
+    return chunk
+
+
+def _mapped(row: dict[str, str], col: Optional[str]) -> str:
+    return str(row.get(col) or "").strip() if col else ""
+
+
+def _chunk_to_leads(chunk: list[tuple[int, dict[str, str]]], ctx: _ImportContext) -> list[tuple[int, dict[str, Any]]]:
+    """Columnar pass: (row index, lead dict with a valid email), AI only for incomplete rows."""
+    cols = ctx.cols
+    emails = [_mapped(row, cols["email"]) for _, row in chunk]
+    fields = {key: [_mapped(row, cols[key]) for _, row in chunk] for key in _TEXT_FIELDS}
+    valid = [normalize_email(em) for em in emails]
+    need_ai = [
+        j for j, em in enumerate(valid) if not em or not (fields["full_name"][j] or fields["company_name"][j])
+    ]
+    extracted = dict(zip(need_ai, extract_lead_fields_from_csv_rows([chunk[j][1] for j in need_ai]))) if need_ai else {}
+    ctx.stats.ai_rows += len(need_ai)
+
+    leads: list[tuple[int, dict[str, Any]]] = []
+    for j, (i, _) in enumerate(chunk):
+        ai = extracted.get(j)
+        if ai is not None:
+            # AI/auto extraction wins for the email when it ran (AI result, else regex heuristic).
+            em = ai.email.strip().lower() or emails[j]
+        else:
+            em = valid[j] or ""
+        if not em or not is_valid_email(em):
+            ctx.stats.skipped_no_email += 1
+            continue
+        out: dict[str, Any] = {"email": em}
+        for key in _TEXT_FIELDS:
+            out[key] = fields[key][j] or (getattr(ai, key) if ai else "")
+        out["platform"] = out["platform"] or "csv_import"
+        leads.append((i, out))
+    return leads
+
+
+def _insert_rows(ctx: _ImportContext, rows: list[tuple[int, dict[str, Any]]]) -> None:
+    """One bulk insert; on failure, row by row with per-row errors."""
+    if not rows:
+        return
+    stats = ctx.stats
+    try:
+        ctx.supabase.table("marketing_leads").insert([p for _, p in rows]).execute()
+        stats.imported += len(rows)
+        return
+    except Exception as e:
+        logger.warning("marketing import: bulk insert of %s leads failed, retrying per row: %s", len(rows), e)
+    for i, payload in rows:
+        try:
+            ins = ctx.supabase.table("marketing_leads").insert(payload).execute()
+            if ins.data:
+                stats.imported += 1
+            else:
+                stats.error(f"row {i+2}: could not insert lead")
+        except Exception as e:
+            if _is_duplicate_error(e):
+                stats.skipped_duplicate_lead += 1
+            else:
+                stats.error(f"row {i+2}: {e}")
+
+
+def process_chunk(ctx: _ImportContext, batch: list[tuple[int, dict[str, Any]]]) -> None:
+    """Validate, dedup and insert one chunk of (row index, csv row). Sync; call via asyncio.to_thread."""
+    stats = ctx.stats
+    leads = _chunk_to_leads(_clean_rows(batch), ctx)
+
+    fresh: list[tuple[int, dict[str, Any], str]] = []
+    for i, out in leads:
+        raw = normalize_row(out)
+        email = normalize_email(raw.get("email"))
+        if not email:
+            stats.skipped_no_email += 1
+        elif email in ctx.seen:
+            stats.skipped_duplicate_lead += 1
+        else:
+            ctx.seen.add(email)
+            fresh.append((i, raw, email))
+
+    existing_leads = existing_marketing_lead_emails(ctx.supabase, [em for *_, em in fresh])
+    existing_users = existing_app_user_emails(ctx.supabase, [em for *_, em in fresh if em not in existing_leads])
+    rows: list[tuple[int, dict[str, Any]]] = []
+    for i, raw, email in fresh:
+        if email in existing_leads:
+            stats.skipped_duplicate_lead += 1
+        elif email in existing_users:
+            stats.skipped_duplicate_user += 1
+        else:
+            try:
+                payload = build_lead_payload(
+                    raw, email=email, campaign_id=ctx.campaign_id, source="csv_import", run_sanitize=ctx.run_sanitize
+                )
+                rows.append((i, payload))
+            except Exception as e:
+                stats.error(f"row {i+2}: {e}")
+    _insert_rows(ctx, rows)
+
+
+async def run_csv_import(
+    supabase: Any,
+    reader: csv.DictReader,
+    *,
+    mapping: dict[str, str],
+    campaign_id: Optional[str],
+    run_sanitize: bool,
+    on_progress: Optional[Callable[[ImportStats], Awaitable[None]]] = None,
+) -> ImportStats:
+    """Stream ``reader`` through process_chunk, IMPORT_CHUNK_ROWS rows at a time."""
+    cols = resolve_columns(list(reader.fieldnames or []), mapping)
+    effective_campaign = (str(campaign_id).strip() if campaign_id else "") or None
+    if not effective_campaign:
+        effective_campaign = await asyncio.to_thread(default_campaign_id_for_new_leads, supabase)
+    ctx = _ImportContext(supabase=supabase, cols=cols, campaign_id=effective_campaign, run_sanitize=run_sanitize)
+
+    rows = enumerate(reader)
+
+    def step() -> bool:
+        batch = list(islice(rows, IMPORT_CHUNK_ROWS))
+        if not batch:
+            return False
+        ctx.stats.rows_read += len(batch)
+        process_chunk(ctx, batch)
+        return True
+
+    while await asyncio.to_thread(step):
+        if on_progress is not None:
+            await on_progress(ctx.stats)
+
+    if ctx.stats.errors:
+        log_error(supabase, severity="warning", message="csv_import partial errors", context={"errors": ctx.stats.errors[:50]})
+    return ctx.stats
+
+
+# ---------------------------------------------------------------------------
+# Background imports
+# ---------------------------------------------------------------------------
+
+
+def spool_upload(src: IO[bytes]) -> IO[bytes]:
+    """Copy an upload to a temp file that outlives the request (deleted on close)."""
+    dst = tempfile.TemporaryFile(prefix="marketing_import_")
+    src.seek(0)
+    shutil.copyfileobj(src, dst, _READ_BLOCK)
+    dst.seek(0)
+    return dst
+
+
+def _update_import(supabase: Any, import_id: str, patch: dict[str, Any]) -> None:
+    try:
+        supabase.table(IMPORTS_TABLE).update(
+            {**patch, "updated_at": datetime.now(timezone.utc).isoformat()}
+        ).eq("id", import_id).execute()
+    except Exception as e:
+        logger.warning("marketing import %s: progress update failed: %s", import_id, e)
+
+
+async def start_background_import(
+    supabase: Any,
+    f: IO[bytes],
+    *,
+    filename: str,
+    mapping: dict[str, str],
+    campaign_id: Optional[str],
+    run_sanitize: bool,
+) -> Optional[dict[str, Any]]:
+    """
+    Validate the header now, then import in a background task with progress in
+    marketing_lead_imports. Returns the tracking row, or None if it could not
+    be created (the caller imports inline instead). Raises CsvImportError.
+    """
+    spooled = await asyncio.to_thread(spool_upload, f)
+    try:
+        reader, delimiter = await asyncio.to_thread(open_csv, spooled)
+        res = (
+            supabase.table(IMPORTS_TABLE)
+            .insert({"status": "running", "filename": filename[:500], "delimiter": delimiter, "summary": {}})
+            .execute()
+        )
+        job = (res.data or [None])[0]
+    except CsvImportError:
+        spooled.close()
+        raise
+    except Exception as e:
+        logger.warning("marketing import tracking unavailable (%s); importing inline", e)
+        spooled.close()
+        return None
+    if not job:
+        spooled.close()
+        return None
+    import_id = str(job["id"])
+
+    async def progress(stats: ImportStats) -> None:
+        await asyncio.to_thread(
+            _update_import, supabase, import_id, {"rows_read": stats.rows_read, "summary": stats.summary()}
+        )
+
+    async def runner() -> None:
+        try:
+            stats = await run_csv_import(
+                supabase, reader, mapping=mapping, campaign_id=campaign_id, run_sanitize=run_sanitize, on_progress=progress
+            )
+            patch = {"status": "completed", "rows_read": stats.rows_read, "summary": stats.summary()}
+        except Exception as e:
+            logger.exception("marketing import %s failed", import_id)
+            patch = {"status": "failed", "error": str(e)[:2000]}
+        finally:
+            spooled.close()
+        patch["finished_at"] = datetime.now(timezone.utc).isoformat()
+        await asyncio.to_thread(_update_import, supabase, import_id, patch)
+
+    task = asyncio.create_task(runner())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return job
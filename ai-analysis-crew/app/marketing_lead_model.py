@@ -0,0 +1,507 @@
+"""
+Learned accept/reject scoring for marketing leads.
+
+rule_based_sanitize_lead rejects invalid and disposable emails and accepts
+everything else. When a trained model is on disk, every rule accept gets a
+second opinion (marketing_sanitize.gate_rule_accept) before it is stored:
+
+- p(accept) >= MARKETING_LEAD_MODEL_ACCEPT: accepted locally
+- p(accept) <= MARKETING_LEAD_MODEL_REJECT: rejected locally
+- in between: status "review", i.e. left to OpenAI (sanitize_leads_with_openai
+  in the review cron, or the Batch API in batch_api mode)
+
+The model is an L2-regularised logistic regression over hashed features:
+email local-part and domain shape (role accounts, digits, separators, TLD,
+label depth, punycode, free-mail providers), name / title / company tokens
+and whether they agree with the email. Scoring is one sparse dot product,
+microseconds per lead with no network call; "MX shape" is read from the
+domain string only, there is no DNS lookup.
+
+Labels come from our own marketing_leads history:
+- accepted: accepted by OpenAI or an admin, or accepted and sent without a bounce
+- rejected: rejected by OpenAI or an admin, or bounced
+Rows settled by the rules (or by this model) teach nothing new and are skipped.
+
+The artifact is a single JSON file (weights, FEATURE_VERSION, holdout
+metrics) versioned by training date and a hash of the labels; an artifact
+built with another FEATURE_VERSION is ignored. Without one nothing changes.
+
+  python -m app.marketing_lead_model --train [--out PATH] [--limit N]
+  python -m app.marketing_lead_model --stats
+
+Env:
+  MARKETING_LEAD_MODEL          1/0 (default 1)
+  MARKETING_LEAD_MODEL_PATH     artifact (default app/data/lead_model.json)
+  MARKETING_LEAD_MODEL_ACCEPT   accept threshold (default 0.9)
+  MARKETING_LEAD_MODEL_REJECT   reject threshold (default 0.1)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURE_VERSION = 1
+HASH_DIM = 4096
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "lead_model.json"
+LEAD_COLUMNS = (
+    "id,email,full_name,job_title,company_name,platform,sanitized_full_name,"
+    "sanitized_job_title,sanitized_company_name,sanitization_status,crew_trace,lead_status_internal"
+)
+
+_FREE_MAIL = frozenset(
+    {
+        "gmail.com",
+        "googlemail.com",
+        "yahoo.com",
+        "hotmail.com",
+        "outlook.com",
+        "live.com",
+        "msn.com",
+        "icloud.com",
+        "me.com",
+        "aol.com",
+        "protonmail.com",
+        "proton.me",
+        "gmx.com",
+        "gmx.de",
+        "mail.ru",
+        "yandex.ru",
+        "qq.com",
+        "163.com",
+    }
+)
+_ROLE_LOCALS = frozenset(
+    {
+        "info",
+        "sales",
+        "admin",
+        "contact",
+        "support",
+        "office",
+        "hello",
+        "noreply",
+        "no-reply",
+        "enquiries",
+        "enquiry",
+        "marketing",
+        "hr",
+        "jobs",
+        "careers",
+        "billing",
+        "accounts",
+        "webmaster",
+        "postmaster",
+        "test",
+    }
+)
+# crew_trace prefixes of decisions made by rules or by this model (not labels).
+_UNLABELLED_TRACES = (
+    "rule",
+    "cron_sanitize",
+    "batch_sanitize",
+    "batch_pending:",
+    "model:",
+    "auto_accept_valid_email",
+    "missing_or_invalid_email",
+    "json_parse_error",
+)
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+def _env_float(name: str, default: float, *, lo: float, hi: float) -> float:
+    try:
+        v = float((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+def lead_model_enabled() -> bool:
+    flag = (os.getenv("MARKETING_LEAD_MODEL") or "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def thresholds() -> tuple[float, float]:
+    """(accept, reject) probability thresholds."""
+    accept = _env_float("MARKETING_LEAD_MODEL_ACCEPT", 0.9, lo=0.5, hi=1.0)
+    reject = _env_float("MARKETING_LEAD_MODEL_REJECT", 0.1, lo=0.0, hi=0.5)
+    return accept, reject
+
+
+def model_path() -> Path:
+    override = (os.getenv("MARKETING_LEAD_MODEL_PATH") or "").strip()
+    return Path(override) if override else DEFAULT_PATH
+
+
+def _text(raw: dict[str, Any], *keys: str) -> str:
+    for key in keys:
+        val = raw.get(key)
+        if isinstance(val, str) and val.strip():
+            return val.strip().lower()
+    return ""
+
+
+def _bucket(n: int, edges: tuple[int, ...]) -> str:
+    for edge in edges:
+        if n <= edge:
+            return str(edge)
+    return f">{edges[-1]}"
+
+
+def lead_features(raw: dict[str, Any], *, email: str) -> list[str]:
+    """Feature names for one lead (hashed by feature_indices)."""
+    local, _, domain = (email or "").strip().lower().partition("@")
+    labels = domain.split(".") if domain else []
+    feats = [
+        "dom:" + domain,
+        "tld:" + (labels[-1] if labels else ""),
+        "depth:" + _bucket(len(labels), (2, 3, 4)),
+        "local_len:" + _bucket(len(local), (3, 6, 10, 16)),
+        "local_digits:" + _bucket(sum(c.isdigit() for c in local), (0, 2, 4)),
+    ]
+    if domain in _FREE_MAIL:
+        feats.append("freemail")
+    if any(c.isdigit() for c in domain):
+        feats.append("dom_digits")
+    if "-" in domain:
+        feats.append("dom_hyphen")
+    if "xn--" in domain:
+        feats.append("punycode")
+    if local in _ROLE_LOCALS or local.split("+", 1)[0] in _ROLE_LOCALS:
+        feats.append("role:" + local)
+    feats.extend("local_sep:" + sep for sep in "._-+" if sep in local)
+    local_tokens = set(_TOKEN_RE.findall(local))
+    feats.extend("local_tok:" + t for t in local_tokens if len(t) >= 2)
+
+    name = _text(raw, "full_name", "FULL_NAME", "sanitized_full_name")
+    title = _text(raw, "job_title", "JOB_TITLE", "sanitized_job_title")
+    company = _text(raw, "company_name", "COMPANY_NAME", "sanitized_company_name")
+    platform = _text(raw, "platform")
+    for prefix, value in (("name", name), ("title", title), ("co", company)):
+        tokens = set(_TOKEN_RE.findall(value))
+        feats.append(f"has_{prefix}" if tokens else f"no_{prefix}")
+        feats.extend(f"{prefix}:{t}" for t in tokens if len(t) >= 2)
+    if platform:
+        feats.append("plat:" + platform)
+    name_tokens = {t for t in _TOKEN_RE.findall(name) if len(t) >= 2}
+    if name_tokens and any(t in local for t in name_tokens):
+        feats.append("name_in_local")
+    co_tokens = {t for t in _TOKEN_RE.findall(company) if len(t) >= 3}
+    if co_tokens and any(t in domain for t in co_tokens):
+        feats.append("co_in_domain")
+    return feats
+
+
+def feature_indices(feats: list[str], dim: int = HASH_DIM) -> np.ndarray:
+    idx = {
+        int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") % dim
+        for f in feats
+    }
+    return np.fromiter(sorted(idx), dtype=np.int64, count=len(idx))
+
+
+@dataclass(frozen=True)
+class LeadScore:
+    p_accept: float
+    decision: Optional[str]  # "accepted" | "rejected" | None (uncertain band)
+    version: str
+
+    @property
+    def trace(self) -> str:
+        return f"model:{self.decision or 'review'}:{self.version}:p={self.p_accept:.3f}"
+
+
+class LeadModel:
+    def __init__(self, weights: np.ndarray, bias: float, *, version: str, meta: Optional[dict[str, Any]] = None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.version = version
+        self.meta = meta or {}
+
+    @property
+    def dim(self) -> int:
+        return int(self.weights.shape[0])
+
+    def p_accept(self, raw: dict[str, Any], *, email: str) -> float:
+        z = self.bias + float(self.weights[feature_indices(lead_features(raw, email=email), self.dim)].sum())
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+    def score(self, raw: dict[str, Any], *, email: str) -> LeadScore:
+        p = self.p_accept(raw, email=email)
+        accept, reject = thresholds()
+        decision = "accepted" if p >= accept else "rejected" if p <= reject else None
+        return LeadScore(p_accept=p, decision=decision, version=self.version)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            **self.meta,
+            "feature_version": FEATURE_VERSION,
+            "version": self.version,
+            "dim": self.dim,
+            "bias": round(self.bias, 6),
+            "weights": [round(float(w), 6) for w in self.weights],
+        }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.to_json()))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LeadModel"]:
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Lead model %s unreadable: %s", path, e)
+            return None
+        if data.get("feature_version") != FEATURE_VERSION:
+            logger.warning(
+                "Lead model %s has feature version %s (expected %s); ignored",
+                path,
+                data.get("feature_version"),
+                FEATURE_VERSION,
+            )
+            return None
+        meta = {k: v for k, v in data.items() if k not in ("feature_version", "version", "dim", "bias", "weights")}
+        return cls(np.asarray(data["weights"]), data.get("bias", 0.0), version=str(data.get("version") or "?"), meta=meta)
+
+
+_model_lock = threading.Lock()
+_model_cache: tuple[Optional[tuple[str, float]], Optional[LeadModel]] = (None, None)
+
+
+def get_lead_model() -> Optional[LeadModel]:
+    """Process-wide model, reloaded when the artifact file changes; None when disabled or missing."""
+    global _model_cache
+    if not lead_model_enabled():
+        return None
+    path = model_path()
+    try:
+        key: Optional[tuple[str, float]] = (str(path), path.stat().st_mtime)
+    except OSError:
+        key = None
+    if key is not None and key == _model_cache[0]:
+        return _model_cache[1]
+    with _model_lock:
+        if key != _model_cache[0]:
+            model = LeadModel.load(path) if key is not None else None
+            if model is not None:
+                logger.info("Lead model %s loaded from %s", model.version, path)
+            _model_cache = (key, model)
+        return _model_cache[1]
+
+
+def score_lead(raw: dict[str, Any], *, email: str) -> Optional[LeadScore]:
+    """LeadScore from the loaded model, or None when there is none (the rules decide)."""
+    model = get_lead_model()
+    if model is None:
+        return None
+    try:
+        return model.score(raw, email=email)
+    except Exception as e:
+        logger.warning("Lead model scoring failed for %s: %s", email, e)
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Training
+# ---------------------------------------------------------------------------
+
+
+def label_for_row(row: dict[str, Any]) -> Optional[int]:
+    """1 accept / 0 reject / None (no usable decision) for a marketing_leads row."""
+    internal = str(row.get("lead_status_internal") or "").lower()
+    status = str(row.get("sanitization_status") or "").lower()
+    if internal == "bounced":
+        return 0
+    if status == "accepted" and internal == "sent":
+        return 1
+    trace = str(row.get("crew_trace") or "").strip().lower()
+    if not trace or trace.startswith(_UNLABELLED_TRACES):
+        return None
+    return {"accepted": 1, "rejected": 0}.get(status)
+
+
+def load_training_rows(supabase: Any, *, limit: int = 200_000) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    page, size = 0, 1000
+    while len(rows) < limit:
+        res = (
+            supabase.table("marketing_leads")
+            .select(LEAD_COLUMNS)
+            .neq("sanitization_status", "review")
+            .order("created_at", desc=True)
+            .range(page * size, page * size + size - 1)
+            .execute()
+        )
+        batch = res.data or []
+        rows.extend(batch)
+        if len(batch) < size:
+            break
+        page += 1
+    return rows[:limit]
+
+
+def _in_holdout(lead_id: str, share: float) -> bool:
+    h = int.from_bytes(hashlib.blake2b(lead_id.encode("utf-8"), digest_size=4).digest(), "little")
+    return h / 2**32 < share
+
+
+def _design(examples: list[tuple[dict[str, Any], str]], dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """CSR-style (indices, indptr) of the binary feature matrix."""
+    rows = [feature_indices(lead_features(raw, email=email), dim) for raw, email in examples]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(r) for r in rows])
+    indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    return indices, indptr
+
+
+def _logits(indices: np.ndarray, indptr: np.ndarray, w: np.ndarray, b: float) -> np.ndarray:
+    # Every lead has at least the shape features, so no row is empty (reduceat needs that).
+    return np.add.reduceat(w[indices], indptr[:-1]) + b
+
+
+def fit_logistic(
+    indices: np.ndarray,
+    indptr: np.ndarray,
+    y: np.ndarray,
+    *,
+    dim: int = HASH_DIM,
+    l2: float = 1e-3,
+    epochs: int = 300,
+    lr: float = 0.1,
+) -> tuple[np.ndarray, float]:
+    """Class-balanced L2 logistic regression, full-batch Adam."""
+    n = len(y)
+    counts = np.bincount(y.astype(np.int64), minlength=2).astype(np.float64)
+    sample_w = np.where(y == 1, n / (2 * max(counts[1], 1)), n / (2 * max(counts[0], 1)))
+    row_of = np.repeat(np.arange(n), np.diff(indptr))
+    w = np.zeros(dim)
+    b = 0.0
+    m_w, v_w = np.zeros(dim), np.zeros(dim)
+    m_b = v_b = 0.0
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for t in range(1, epochs + 1):
+        p = 1.0 / (1.0 + np.exp(-_logits(indices, indptr, w, b)))
+        r = (p - y) * sample_w / n
+        g_w = np.bincount(indices, weights=r[row_of], minlength=dim) + l2 * w
+        g_b = float(r.sum())
+        m_w = beta1 * m_w + (1 - beta1) * g_w
+        v_w = beta2 * v_w + (1 - beta2) * g_w**2
+        m_b = beta1 * m_b + (1 - beta1) * g_b
+        v_b = beta2 * v_b + (1 - beta2) * g_b**2
+        w -= lr * (m_w / (1 - beta1**t)) / (np.sqrt(v_w / (1 - beta2**t)) + eps)
+        b -= lr * (m_b / (1 - beta1**t)) / (np.sqrt(v_b / (1 - beta2**t)) + eps)
+    return w, b
+
+
+def _auc(y: np.ndarray, p: np.ndarray) -> Optional[float]:
+    pos, neg = int(y.sum()), int(len(y) - y.sum())
+    if not pos or not neg:
+        return None
+    ranks = np.empty(len(p))
+    ranks[np.argsort(p, kind="mergesort")] = np.arange(1, len(p) + 1)
+    return float((ranks[y == 1].sum() - pos * (pos + 1) / 2) / (pos * neg))
+
+
+def evaluate(y: np.ndarray, p: np.ndarray) -> dict[str, Any]:
+    """Holdout metrics: accuracy, AUC, and how much the thresholds decide locally."""
+    accept, reject = thresholds()
+    local = (p >= accept) | (p <= reject)
+    correct = (p >= 0.5) == (y == 1)
+    auc = _auc(y, p)
+    return {
+        "n": int(len(y)),
+        "accuracy": round(float(correct.mean()), 4) if len(y) else None,
+        "auc": round(auc, 4) if auc is not None else None,
+        "local_share": round(float(local.mean()), 4) if len(y) else None,
+        "local_accuracy": round(float(correct[local].mean()), 4) if local.any() else None,
+        "thresholds": {"accept": accept, "reject": reject},
+    }
+
+
+def train_lead_model(rows: list[dict[str, Any]], *, holdout: float = 0.2, dim: int = HASH_DIM) -> LeadModel:
+    """Fit on labelled rows (label_for_row), report metrics on a stable id-hash holdout."""
+    labelled: list[tuple[str, dict[str, Any], str, int]] = []
+    for row in rows:
+        label = label_for_row(row)
+        email = str(row.get("email") or "").strip().lower()
+        if label is None or "@" not in email:
+            continue
+        labelled.append((str(row.get("id") or email), row, email, label))
+    if len(labelled) < 50 or len({lab for *_, lab in labelled}) < 2:
+        raise ValueError(f"not enough labelled leads to train ({len(labelled)}, need 50 with both classes)")
+
+    train = [x for x in labelled if not _in_holdout(x[0], holdout)]
+    test = [x for x in labelled if _in_holdout(x[0], holdout)]
+    indices, indptr = _design([(r, e) for _, r, e, _ in train], dim)
+    w, b = fit_logistic(indices, indptr, np.array([lab for *_, lab in train], dtype=np.float64), dim=dim)
+
+    metrics: dict[str, Any] = {}
+    if test:
+        t_idx, t_ptr = _design([(r, e) for _, r, e, _ in test], dim)
+        p = 1.0 / (1.0 + np.exp(-_logits(t_idx, t_ptr, w, b)))
+        metrics = evaluate(np.array([lab for *_, lab in test], dtype=np.float64), p)
+
+    digest = hashlib.sha1("\n".join(f"{i}:{lab}" for i, *_, lab in sorted(labelled)).encode("utf-8")).hexdigest()[:8]
+    now = datetime.now(timezone.utc)
+    return LeadModel(
+        w,
+        b,
+        version=f"lr{FEATURE_VERSION}-{now:%Y%m%d}-{digest}",
+        meta={
+            "trained_at": now.isoformat(),
+            "n_train": len(train),
+            "n_accept": sum(lab for *_, lab in labelled),
+            "n_reject": sum(1 - lab for *_, lab in labelled),
+            "holdout": metrics,
+        },
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", action="store_true", help="fit on marketing_leads history and write the artifact")
+    parser.add_argument("--stats", action="store_true", help="print the artifact's version and holdout metrics")
+    parser.add_argument("--out", type=Path, default=None, help="artifact path (default MARKETING_LEAD_MODEL_PATH)")
+    parser.add_argument("--limit", type=int, default=200_000, help="max leads to load")
+    args = parser.parse_args(argv)
+
+    path = args.out or model_path()
+    if args.train:
+        from .api.supabase_admin import get_supabase_admin
+
+        rows = load_training_rows(get_supabase_admin(), limit=args.limit)
+        model = train_lead_model(rows)
+        model.save(path)
+        print(f"wrote {path} ({model.version}, {model.meta['n_train']} training leads)")
+        print(json.dumps(model.meta["holdout"], indent=2))
+        return
+
+    model = LeadModel.load(path)
+    if model is None:
+        print(f"no lead model at {path}")
+        return
+    print(f"{model.version} at {path}, dim {model.dim}")
+    print(json.dumps(model.meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import secrets
@@ -9,16 +10,24 @@ from datetime import datetime, timedelta, timezone
 from typing import Any
 
 from .email_sender import send_basic_email_smtp, send_email_via_email_service
+from .llm_usage import usage_context
 from .marketing_crew import (
     EmailContent,
     generate_email_with_crew,
     generate_email_with_openai,
     sanitize_lead_with_openai,
+    sanitize_leads_with_openai,
 )
 from .marketing_merge import apply_merge, html_to_plain, lead_to_merge_dict
 from .marketing_outbound_defaults import default_campaign_id_for_new_leads, sanitize_review_batch_cap
-from .marketing_rules import is_disposable_domain, is_valid_email
-from .marketing_sanitize import finalize_sanitization_result, rule_based_sanitize_lead
+from .marketing_sanitize import (
+    NOT_BATCH_PENDING,
+    finalize_sanitization_result,
+    sanitize_patch,
+    triage_review_leads,
+    write_sanitize_patches,
+)
+from .marketing_suppression import load_suppression_filter, suppressed_emails
 from .sparefinder_contact import CONTACT_EMAIL
 
 logger = logging.getLogger(__name__)
@@ -53,6 +62,28 @@ def sync_lead_unsubscribe_token(supabase: Any, lead: dict[str, Any]) -> str:
     return token
 
 
+def sync_lead_unsubscribe_tokens(supabase: Any, leads: list[dict[str, Any]]) -> None:
+    """Batch form of sync_lead_unsubscribe_token: one upsert for every lead missing a token."""
+    rows: list[dict[str, Any]] = []
+    fresh: list[tuple[dict[str, Any], str]] = []
+    for lead in leads:
+        token = ensure_unsubscribe_token(lead)
+        if not lead.get("id") or lead.get("unsubscribe_token") == token:
+            continue
+        rows.append({"id": lead["id"], "email": lead.get("email"), "unsubscribe_token": token})
+        fresh.append((lead, token))
+    if not rows:
+        return
+    try:
+        supabase.table("marketing_leads").upsert(rows, on_conflict="id").execute()
+        for lead, token in fresh:
+            lead["unsubscribe_token"] = token
+    except Exception as e:
+        logger.warning("Bulk unsubscribe_token upsert failed (%s leads), falling back per lead: %s", len(rows), e)
+        for lead, _ in fresh:
+            sync_lead_unsubscribe_token(supabase, lead)
+
+
 def is_suppressed(supabase: Any, email: str | None) -> bool:
     if not email or "@" not in email:
         return True
@@ -96,6 +127,7 @@ def count_sends_today(supabase: Any, campaign_id: str) -> int:
             .eq("campaign_id", campaign_id)
             .eq("status", "sent")
             .gte("sent_at", start.isoformat())
+            .limit(1)
             .execute()
         )
         return int(getattr(r, "count", None) or 0)
@@ -103,6 +135,15 @@ def count_sends_today(supabase: Any, campaign_id: str) -> int:
         return 0
 
 
+def count_sends_today_by_campaign(supabase: Any, campaign_ids: list[str]) -> dict[str, int]:
+    """
+    Batch form of count_sends_today: one exact-count query per campaign.
+    Fetching the rows and counting them client-side undercounts once a
+    campaign passes PostgREST's max-rows cap (1000), so only counts travel.
+    """
+    return {cid: count_sends_today(supabase, cid) for cid in dict.fromkeys(campaign_ids)}
+
+
 def marketing_support_email(campaign: dict[str, Any] | None = None) -> str:
     """Support address shown in outbound mail (campaign reply-to, then env, then default)."""
     if campaign:
@@ -224,19 +265,20 @@ def render_message_for_lead(
             "notes": lead.get("sanitized_notes") or "",
         }
         try:
-            if use_crew_ai:
-                merge_preview = apply_merge(campaign.get("html_template") or "", ctx)
-                body = generate_email_with_crew(
-                    lead_context=lead_ctx,
-                    campaign_brief=campaign.get("ai_brief") or "",
-                    merge_preview=merge_preview,
-                )
-            else:
-                body = generate_email_with_openai(
-                    lead_context=lead_ctx,
-                    campaign_brief=campaign.get("ai_brief") or "",
-                    compliance_footer_html=compliance_footer,
-                )
+            with usage_context(campaign_id=campaign.get("id"), lead_id=lead.get("id")):
+                if use_crew_ai:
+                    merge_preview = apply_merge(campaign.get("html_template") or "", ctx)
+                    body = generate_email_with_crew(
+                        lead_context=lead_ctx,
+                        campaign_brief=campaign.get("ai_brief") or "",
+                        merge_preview=merge_preview,
+                    )
+                else:
+                    body = generate_email_with_openai(
+                        lead_context=lead_ctx,
+                        campaign_brief=campaign.get("ai_brief") or "",
+                        compliance_footer_html=compliance_footer,
+                    )
             # Always merge: AI output may still contain {{frontend_url}} etc. even when
             # it omits unsubscribe placeholders (previously we skipped merge in that case).
             html_body = apply_merge((body.html or "").strip(), ctx)
@@ -287,6 +329,34 @@ def record_send(
     body_html_snapshot: str | None,
     tracking_token: str | None = None,
 ) -> None:
+    payload = build_send_record(
+        lead_id=lead_id,
+        campaign_id=campaign_id,
+        cron_run_id=cron_run_id,
+        status=status,
+        error_message=error_message,
+        subject_snapshot=subject_snapshot,
+        body_html_snapshot=body_html_snapshot,
+        tracking_token=tracking_token,
+    )
+    try:
+        supabase.table("marketing_sends").insert(payload).execute()
+    except Exception as e:
+        logger.error("Failed to record marketing_sends: %s", e)
+
+
+def build_send_record(
+    *,
+    lead_id: str,
+    campaign_id: str,
+    cron_run_id: str | None,
+    status: str,
+    error_message: str | None,
+    subject_snapshot: str | None,
+    body_html_snapshot: str | None,
+    tracking_token: str | None = None,
+) -> dict[str, Any]:
+    """marketing_sends row for record_send / record_sends (sent_at stamped now)."""
     payload: dict[str, Any] = {
         "lead_id": lead_id,
         "campaign_id": campaign_id,
@@ -300,10 +370,37 @@ def record_send(
         payload["sent_at"] = datetime.now(timezone.utc).isoformat()
     if tracking_token:
         payload["tracking_token"] = tracking_token
+    return payload
+
+
+def record_sends(supabase: Any, payloads: list[dict[str, Any]]) -> None:
+    """Bulk insert rows built by build_send_record."""
+    # PostgREST bulk inserts need identical keys on every object.
+    keys: set[str] = set()
+    for p in payloads:
+        keys.update(p)
+    rows = [{k: p.get(k) for k in keys} for p in payloads]
+    for i in range(0, len(rows), 200):
+        chunk = rows[i : i + 200]
+        try:
+            supabase.table("marketing_sends").insert(chunk).execute()
+        except Exception as e:
+            logger.error("Failed to record %s marketing_sends rows: %s", len(chunk), e)
+
+
+def mark_leads_sent(supabase: Any, lead_ids: list[str]) -> None:
+    """Flip delivered leads to lead_status_internal=sent in one update."""
+    if not lead_ids:
+        return
     try:
-        supabase.table("marketing_sends").insert(payload).execute()
+        supabase.table("marketing_leads").update(
+            {
+                "lead_status_internal": "sent",
+                "last_sent_at": datetime.now(timezone.utc).isoformat(),
+            }
+        ).in_("id", lead_ids).execute()
     except Exception as e:
-        logger.error("Failed to record marketing_sends: %s", e)
+        logger.warning("Failed to mark %s leads sent: %s", len(lead_ids), e)
 
 
 def send_tracked_marketing_and_record(
@@ -316,10 +413,12 @@ def send_tracked_marketing_and_record(
     subj: str,
     html: str,
     text: str,
+    pending_records: list[dict[str, Any]] | None = None,
 ) -> bool:
     """
     Inject open pixel + click redirects (when enabled), send via SMTP/email-service,
     and append a marketing_sends row. Returns True on successful delivery.
+    With ``pending_records`` the row is appended there for a later record_sends().
     """
     from .marketing_tracking import inject_tracking_into_html, tracking_enabled
 
@@ -327,8 +426,7 @@ def send_tracked_marketing_and_record(
     html_out = inject_tracking_into_html(html, tracking_token=track) if track else html
     ok = send_marketing_email(to_email=to_email, subject=subj, html=html_out, text=text)
     if ok:
-        record_send(
-            supabase,
+        row = build_send_record(
             lead_id=lead_id,
             campaign_id=campaign_id,
             cron_run_id=cron_run_id,
@@ -339,8 +437,7 @@ def send_tracked_marketing_and_record(
             tracking_token=track,
         )
     else:
-        record_send(
-            supabase,
+        row = build_send_record(
             lead_id=lead_id,
             campaign_id=campaign_id,
             cron_run_id=cron_run_id,
@@ -350,6 +447,10 @@ def send_tracked_marketing_and_record(
             body_html_snapshot=None,
             tracking_token=None,
         )
+    if pending_records is not None:
+        pending_records.append(row)
+    else:
+        record_sends(supabase, [row])
     return ok
 
 
@@ -387,7 +488,8 @@ def run_marketing_sanitize_review_batch(
     max_batch: int = 25,
 ) -> dict[str, Any]:
     """
-    Process leads stuck in sanitization_status=review: rule-check email, then re-run OpenAI sanitize.
+    Process leads stuck in sanitization_status=review: rule-check email, then re-run OpenAI sanitize
+    on the rest in batched requests, and write all results back with bulk upserts.
     Called from marketing send/discover crons so the queue drains without manual admin actions.
     """
     max_batch = max(0, min(int(max_batch), 500))
@@ -406,6 +508,7 @@ def run_marketing_sanitize_review_batch(
             supabase.table("marketing_leads")
             .select("*")
             .eq("sanitization_status", "review")
+            .or_(NOT_BATCH_PENDING)
             .order("updated_at", desc=False)
             .limit(max_batch)
             .execute()
@@ -423,62 +526,37 @@ def run_marketing_sanitize_review_batch(
             "errors": 0,
         }
 
-    accepted = 0
-    rejected = 0
-    still_review = 0
-    errors = 0
     now_iso = datetime.now(timezone.utc).isoformat()
-
-    for lead in rows:
-        lid = str(lead.get("id") or "").strip()
-        if not lid:
-            continue
-        email = (lead.get("email") or "").strip().lower()
-        raw = {k: v for k, v in dict(lead).items() if k not in ("sanitization_status",)}
-        patch: dict[str, Any] = {"updated_at": now_iso}
-        status_out = "review"
-
+    patches, needs_ai = triage_review_leads(rows, now_iso=now_iso)
+    errors = 0
+    if needs_ai:
         try:
-            if not email or not is_valid_email(email):
-                patch["sanitization_status"] = "rejected"
-                patch["crew_trace"] = "cron_sanitize:invalid_email"
-                status_out = "rejected"
-            elif is_disposable_domain(email):
-                patch["sanitization_status"] = "rejected"
-                patch["crew_trace"] = "cron_sanitize:disposable_domain"
-                status_out = "rejected"
-            else:
-                rule = rule_based_sanitize_lead(raw, email=email)
-                if rule.sanitization_status == "accepted":
-                    sr = rule
-                else:
-                    sr = sanitize_lead_with_openai(raw, fast_path=True)
-                    sr = finalize_sanitization_result(email=email, raw=raw, result=sr)
-                patch["sanitized_full_name"] = sr.sanitized_full_name or None
-                patch["sanitized_job_title"] = sr.sanitized_job_title or None
-                patch["sanitized_company_name"] = sr.sanitized_company_name or None
-                patch["sanitized_notes"] = sr.sanitized_notes or None
-                patch["sanitization_status"] = sr.sanitization_status
-                patch["crew_trace"] = (sr.crew_trace or "cron_sanitize")[:2000]
-                status_out = sr.sanitization_status
+            batched = sanitize_leads_with_openai([(str(lead["id"]), raw) for lead, raw in needs_ai], fast_path=True)
         except Exception as ex:
-            logger.warning("sanitize_review_batch OpenAI lead %s: %s", lid, ex)
-            patch["sanitization_status"] = "review"
-            patch["crew_trace"] = f"cron_sanitize_error:{ex}"[:500]
-            status_out = "review"
-            errors += 1
-
-        try:
-            supabase.table("marketing_leads").update(patch).eq("id", lid).execute()
-            if status_out == "accepted":
-                accepted += 1
-            elif status_out == "rejected":
-                rejected += 1
-            else:
-                still_review += 1
-        except Exception as ue:
-            logger.warning("sanitize_review_batch update %s: %s", lid, ue)
-            errors += 1
+            logger.warning("sanitize_review_batch OpenAI batch of %s: %s", len(needs_ai), ex)
+            batched = {}
+        for lead, raw in needs_ai:
+            lid = str(lead["id"])
+            email = (lead.get("email") or "").strip().lower()
+            try:
+                sr = batched.get(lid)
+                if sr is None:
+                    # Dropped from the batched answer: one more try on its own.
+                    with usage_context(lead_id=lid):
+                        sr = sanitize_lead_with_openai(raw, fast_path=True)
+                sr = finalize_sanitization_result(email=email, raw=raw, result=sr)
+                patches.append(sanitize_patch(lead, now_iso=now_iso, result=sr, crew_trace=sr.crew_trace or "cron_sanitize"))
+            except Exception as ex:
+                logger.warning("sanitize_review_batch OpenAI lead %s: %s", lid, ex)
+                patches.append(sanitize_patch(lead, now_iso=now_iso, crew_trace=f"cron_sanitize_error:{ex}"[:500]))
+                errors += 1
+
+    failed = write_sanitize_patches(supabase, patches)
+    errors += len(failed)
+    written = [p for p in patches if str(p["id"]) not in failed]
+    accepted = sum(1 for p in written if p["sanitization_status"] == "accepted")
+    rejected = sum(1 for p in written if p["sanitization_status"] == "rejected")
+    still_review = len(written) - accepted - rejected
 
     processed = len(rows)
     return {
@@ -554,9 +632,9 @@ def run_marketing_send_cron(
 ) -> dict[str, Any]:
     """
     Public cron: process active campaigns, send to pending leads (email required, not suppressed).
-    Respects per-campaign limits and is_paused.
+    Respects per-campaign limits and is_paused. Blocking — runs its own event loop for the
+    send engine, so async callers must use asyncio.to_thread.
     """
-    import time
     import uuid
 
     run_id = str(uuid.uuid4())
@@ -630,6 +708,16 @@ def run_marketing_send_cron(
     except Exception as e:
         logger.warning("send cron: orphan campaign_id backfill skipped: %s", e)
 
+    from .marketing_send_engine import CampaignSendPlan, dispatch_campaign_sends
+
+    suppression = load_suppression_filter(supabase)
+    sends_today = count_sends_today_by_campaign(
+        supabase, [str(c["id"]) for c in campaigns if c.get("id")]
+    )
+
+    # Budgets are reserved up front in priority order; every selected lead
+    # (sent, failed or skipped) consumes one unit, as in the sequential loop.
+    plans: list[CampaignSendPlan] = []
     for campaign in campaigns:
         if remaining_global <= 0:
             break
@@ -638,14 +726,12 @@ def run_marketing_send_cron(
             continue
         daily_cap = int(campaign.get("max_per_day") or 50)
         run_cap = int(campaign.get("max_per_run") or 10)
-        already = count_sends_today(supabase, str(cid))
+        already = sends_today.get(str(cid), 0)
         remaining_day = max(0, daily_cap - already)
         budget = min(run_cap, remaining_day, remaining_global)
         if budget <= 0:
             continue
 
-        delay_sec = int(campaign.get("min_delay_seconds") or 0)
-
         try:
             lr = (
                 supabase.table("marketing_leads")
@@ -664,93 +750,20 @@ def run_marketing_send_cron(
         campaigns_with_budget += 1
         candidates_considered += len(candidates)
 
-        for lead in candidates:
-            if remaining_global <= 0:
-                break
-            if budget <= 0:
-                break
-            email = (lead.get("email") or "").strip().lower()
-
-            if is_suppressed(supabase, email):
-                skipped += 1
-                remaining_global -= 1
-                budget -= 1
-                record_send(
-                    supabase,
-                    lead_id=str(lead["id"]),
-                    campaign_id=str(cid),
-                    cron_run_id=run_id or None,
-                    status="skipped",
-                    error_message="suppressed",
-                    subject_snapshot=None,
-                    body_html_snapshot=None,
-                )
-                continue
-
-            sync_lead_unsubscribe_token(supabase, lead)
-
-            use_ai = bool(campaign.get("use_ai"))
-            use_crew = bool(campaign.get("use_crew_ai"))
-
-            try:
-                subj, html, text = render_message_for_lead(
-                    lead=lead,
-                    campaign=campaign,
-                    use_ai=use_ai,
-                    use_crew_ai=use_crew,
-                )
-            except Exception as ge:
-                failed += 1
-                remaining_global -= 1
-                budget -= 1
-                record_send(
-                    supabase,
-                    lead_id=str(lead["id"]),
-                    campaign_id=str(cid),
-                    cron_run_id=run_id or None,
-                    status="failed",
-                    error_message=f"render: {ge}"[:2000],
-                    subject_snapshot=None,
-                    body_html_snapshot=None,
-                )
-                log_error(
-                    supabase,
-                    severity="error",
-                    message=str(ge)[:2000],
-                    context={"lead_id": str(lead["id"]), "campaign_id": str(cid)},
-                )
-                continue
-
-            ok = send_tracked_marketing_and_record(
-                supabase,
-                to_email=email,
-                lead_id=str(lead["id"]),
-                campaign_id=str(cid),
-                cron_run_id=run_id or None,
-                subj=subj,
-                html=html,
-                text=text,
-            )
-            if ok:
-                sent += 1
-                remaining_global -= 1
-                budget -= 1
-                try:
-                    supabase.table("marketing_leads").update(
-                        {
-                            "lead_status_internal": "sent",
-                            "last_sent_at": datetime.now(timezone.utc).isoformat(),
-                        }
-                    ).eq("id", lead["id"]).execute()
-                except Exception:
-                    pass
-            else:
-                failed += 1
-                remaining_global -= 1
-                budget -= 1
+        batch = candidates[:budget]
+        remaining_global -= len(batch)
+        suppressed = suppressed_emails(supabase, [l.get("email") for l in batch], bloom=suppression)
+        sync_lead_unsubscribe_tokens(
+            supabase,
+            [l for l in batch if (l.get("email") or "").strip().lower() not in suppressed],
+        )
+        plans.append(CampaignSendPlan(campaign=campaign, leads=batch, suppressed=suppressed))
 
-            if delay_sec > 0:
-                time.sleep(min(delay_sec, 60))
+    if plans:
+        counts = asyncio.run(dispatch_campaign_sends(supabase, plans, cron_run_id=run_id or None))
+        sent += counts["sent"]
+        failed += counts["failed"]
+        skipped += counts["skipped"]
 
     hints: list[str] = []
     n_camp = len(campaigns)
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
+import logging
 import re
 from dataclasses import dataclass
-from typing import Any, Literal
+from typing import Any, Iterable, Iterator, Literal
+
+logger = logging.getLogger(__name__)
 
 _EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
 
@@ -126,6 +129,63 @@ def app_user_exists_for_email(supabase: Any, email: str) -> bool:
     return False
 
 
+# PostgREST URL length stays comfortably bounded at this many emails per in_() filter.
+EMAIL_LOOKUP_CHUNK = 150
+
+
+def _email_chunks(emails: Iterable[str | None]) -> Iterator[list[str]]:
+    seen: set[str] = set()
+    chunk: list[str] = []
+    for raw in emails:
+        em = normalize_email(raw)
+        if not em or em in seen:
+            continue
+        seen.add(em)
+        chunk.append(em)
+        if len(chunk) >= EMAIL_LOOKUP_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _existing_emails_in_table(supabase: Any, table: str, emails: Iterable[str | None]) -> set[str]:
+    """
+    Lowercased emails from ``emails`` already stored in ``table.email``.
+    Per chunk: one exact in_() lookup, then one OR-of-ilike lookup for the
+    misses (legacy rows stored with mixed case).
+    """
+    found: set[str] = set()
+    for chunk in _email_chunks(emails):
+        try:
+            exact = supabase.table(table).select("email").in_("email", chunk).execute()
+            for row in exact.data or []:
+                found.add(str(row.get("email") or "").strip().lower())
+            misses = [em for em in chunk if em not in found]
+            if not misses:
+                continue
+            ors = ",".join(f'email.ilike."{em}"' for em in misses)
+            loose = supabase.table(table).select("email").or_(ors).execute()
+            miss_set = set(misses)
+            for row in loose.data or []:
+                em = str(row.get("email") or "").strip().lower()
+                if em in miss_set:
+                    found.add(em)
+        except Exception as exc:
+            logger.warning("%s batch email lookup failed: %s", table, exc)
+    return found
+
+
+def existing_marketing_lead_emails(supabase: Any, emails: Iterable[str | None]) -> set[str]:
+    """Batch form of marketing_lead_exists: the subset of emails already on marketing_leads."""
+    return _existing_emails_in_table(supabase, "marketing_leads", emails)
+
+
+def existing_app_user_emails(supabase: Any, emails: Iterable[str | None]) -> set[str]:
+    """Batch form of app_user_exists_for_email: the subset used by SpareFinder profiles."""
+    return _existing_emails_in_table(supabase, "profiles", emails)
+
+
 def normalize_row(raw: dict[str, Any]) -> dict[str, Any]:
     """Trim string fields; lowercase email."""
     out = dict(raw)
@@ -1,15 +1,56 @@
-"""Rule-based and batched lead sanitization for marketing outbound."""
+"""
+Rule-based and batched lead sanitization for marketing outbound.
+
+The review queue is drained in one of two modes (MARKETING_SANITIZE_MODE):
+
+- sync (default): leads the rules and the lead model (marketing_lead_model)
+  cannot settle go to OpenAI
+  SANITIZE_BATCH_SIZE at a time (marketing_crew.sanitize_leads_with_openai)
+  and every result is written back with one bulk upsert per 500 leads.
+- batch_api: the same batched requests are submitted as one OpenAI Batch API
+  job (JSONL, 24h window, half price) by submit_sanitize_batch_job; leads are
+  tagged crew_trace="batch_pending:<batch id>" so no other run picks them up,
+  and collect_sanitize_batch_jobs writes the results back once the job is done.
+  Jobs are tracked in marketing_sanitize_batches (docs/sql/marketing_sanitize_batches.sql).
+
+Env:
+  MARKETING_SANITIZE_MODE         sync | batch_api (default sync)
+  MARKETING_SANITIZE_BATCH_SIZE   leads per chat completion (default 25, max 50)
+"""
 
 from __future__ import annotations
 
+import json
 import logging
-from typing import Any
+import os
+from datetime import datetime, timezone
+from typing import Any, Optional
 
-from .marketing_crew import SanitizeResult, sanitize_lead_with_openai
+from .marketing_crew import (
+    SANITIZE_BATCH_SIZE,
+    SanitizeResult,
+    parse_sanitize_batch_content,
+    sanitize_batch_request,
+    sanitize_lead_with_openai,
+)
+from .marketing_lead_model import score_lead
 from .marketing_rules import is_disposable_domain, is_valid_email, normalize_email
 
 logger = logging.getLogger(__name__)
 
+SANITIZE_BATCHES_TABLE = "marketing_sanitize_batches"
+BATCH_PENDING_PREFIX = "batch_pending:"
+# PostgREST filter: review leads not already waiting on a Batch API job.
+NOT_BATCH_PENDING = f"crew_trace.is.null,crew_trace.not.like.{BATCH_PENDING_PREFIX}*"
+_UPSERT_CHUNK = 500
+_OPEN_BATCH_STATES = ("validating", "in_progress", "finalizing", "cancelling")
+_DEAD_BATCH_STATES = ("failed", "expired", "cancelled")
+
+
+def sanitize_mode() -> str:
+    mode = (os.getenv("MARKETING_SANITIZE_MODE") or "sync").strip().lower()
+    return mode if mode in ("sync", "batch_api") else "sync"
+
 
 def _pick_str(raw: dict[str, Any], *keys: str) -> str:
     for key in keys:
@@ -52,6 +93,26 @@ def rule_based_sanitize_lead(raw: dict[str, Any], *, email: str) -> SanitizeResu
     )
 
 
+def gate_rule_accept(rule: SanitizeResult, raw: dict[str, Any], *, email: str) -> SanitizeResult:
+    """
+    Second opinion from the lead model (marketing_lead_model) on a rule accept:
+    accepted or rejected locally when it is confident, "review" (left to
+    OpenAI) in the uncertain band. Unchanged without a model.
+    """
+    if rule.sanitization_status != "accepted":
+        return rule
+    scored = score_lead(raw, email=email)
+    if scored is None:
+        return rule
+    if scored.decision == "accepted":
+        status, notes = "accepted", "Auto-accepted: lead model"
+    elif scored.decision == "rejected":
+        status, notes = "rejected", f"Lead model: p(accept)={scored.p_accept:.2f}"
+    else:
+        status, notes = "review", f"Lead model unsure: p(accept)={scored.p_accept:.2f}"
+    return rule.model_copy(update={"sanitization_status": status, "sanitized_notes": notes, "crew_trace": scored.trace})
+
+
 def finalize_sanitization_result(
     *,
     email: str,
@@ -92,12 +153,14 @@ def sanitize_lead_for_storage(
 ) -> SanitizeResult:
     """
     Single entry for inserts/imports.
-    Default: rule-based accept (fast, automated). Optional OpenAI enrichment when requested.
+    Default: rule-based accept (fast, automated), checked by the lead model when one
+    is trained (its uncertain leads are stored as "review" for the sanitize cron).
+    Optional OpenAI enrichment when requested.
     """
     if not run_sanitize:
         return rule_based_sanitize_lead(raw, email=email)
 
-    rule = rule_based_sanitize_lead(raw, email=email)
+    rule = gate_rule_accept(rule_based_sanitize_lead(raw, email=email), raw, email=email)
     if rule.sanitization_status == "rejected":
         return rule
 
@@ -120,3 +183,259 @@ def sanitize_lead_for_storage(
     except Exception as exc:
         logger.warning("sanitize_lead_for_storage OpenAI failed, using rule path: %s", exc)
         return rule
+
+
+def sanitize_patch(
+    lead: dict[str, Any],
+    *,
+    now_iso: str,
+    result: Optional[SanitizeResult] = None,
+    status: Optional[str] = None,
+    crew_trace: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    marketing_leads row for the bulk upsert. Every patch has the same keys
+    (PostgREST bulk upserts need uniform rows); fields a rule rejection does
+    not touch keep the lead's current values.
+    """
+    patch = {
+        "id": lead.get("id"),
+        "email": lead.get("email"),
+        "sanitized_full_name": lead.get("sanitized_full_name"),
+        "sanitized_job_title": lead.get("sanitized_job_title"),
+        "sanitized_company_name": lead.get("sanitized_company_name"),
+        "sanitized_notes": lead.get("sanitized_notes"),
+        "sanitization_status": status or "review",
+        "crew_trace": (crew_trace or lead.get("crew_trace") or "")[:2000],
+        "updated_at": now_iso,
+    }
+    if result is not None:
+        apply_sanitize_result_to_payload(patch, result)
+        if crew_trace:
+            patch["crew_trace"] = crew_trace[:2000]
+    return patch
+
+
+def triage_review_leads(
+    rows: list[dict[str, Any]],
+    *,
+    now_iso: str,
+    trace_prefix: str = "cron_sanitize",
+) -> tuple[list[dict[str, Any]], list[tuple[dict[str, Any], dict[str, Any]]]]:
+    """
+    Rule pass over review leads: (patches for leads the rules settle,
+    [(lead, raw payload)] that still need the model).
+    """
+    patches: list[dict[str, Any]] = []
+    needs_ai: list[tuple[dict[str, Any], dict[str, Any]]] = []
+    for lead in rows:
+        if not str(lead.get("id") or "").strip():
+            continue
+        email = (lead.get("email") or "").strip().lower()
+        raw = {k: v for k, v in dict(lead).items() if k not in ("sanitization_status",)}
+        if not email or not is_valid_email(email):
+            patches.append(sanitize_patch(lead, now_iso=now_iso, status="rejected", crew_trace=f"{trace_prefix}:invalid_email"))
+        elif is_disposable_domain(email):
+            patches.append(
+                sanitize_patch(lead, now_iso=now_iso, status="rejected", crew_trace=f"{trace_prefix}:disposable_domain")
+            )
+        else:
+            rule = gate_rule_accept(rule_based_sanitize_lead(raw, email=email), raw, email=email)
+            if rule.sanitization_status == "review":
+                needs_ai.append((lead, raw))
+            else:
+                patches.append(sanitize_patch(lead, now_iso=now_iso, result=rule))
+    return patches, needs_ai
+
+
+def write_sanitize_patches(supabase: Any, patches: list[dict[str, Any]]) -> set[str]:
+    """Bulk upsert of sanitize_patch rows; falls back per lead. Returns ids that failed."""
+    failed: set[str] = set()
+    for i in range(0, len(patches), _UPSERT_CHUNK):
+        chunk = patches[i : i + _UPSERT_CHUNK]
+        try:
+            supabase.table("marketing_leads").upsert(chunk, on_conflict="id").execute()
+            continue
+        except Exception as e:
+            logger.warning("Bulk sanitize upsert failed (%s leads), falling back per lead: %s", len(chunk), e)
+        for patch in chunk:
+            lid = str(patch.get("id"))
+            try:
+                body = {k: v for k, v in patch.items() if k not in ("id", "email")}
+                supabase.table("marketing_leads").update(body).eq("id", lid).execute()
+            except Exception as ue:
+                logger.warning("sanitize update %s: %s", lid, ue)
+                failed.add(lid)
+    return failed
+
+
+def _openai_batch_client() -> Any:
+    from .marketing_crew import _openai_client
+
+    return _openai_client()
+
+
+def submit_sanitize_batch_job(supabase: Any, *, max_leads: int = 5000, fast_path: bool = True) -> dict[str, Any]:
+    """
+    Offline mode: rule-settle the review queue now and submit what is left as
+    one OpenAI Batch API job (SANITIZE_BATCH_SIZE leads per request line).
+    """
+    from .model_routing import resolve_route
+
+    max_leads = max(1, min(int(max_leads), 50000))
+    now_iso = datetime.now(timezone.utc).isoformat()
+    rows = (
+        supabase.table("marketing_leads")
+        .select("*")
+        .eq("sanitization_status", "review")
+        .or_(NOT_BATCH_PENDING)
+        .order("updated_at", desc=False)
+        .limit(max_leads)
+        .execute()
+    ).data or []
+    patches, needs_ai = triage_review_leads(rows, now_iso=now_iso, trace_prefix="batch_sanitize")
+    failed = write_sanitize_patches(supabase, patches)
+    out: dict[str, Any] = {
+        "ok": True,
+        "loaded": len(rows),
+        "settled_by_rules": len(patches) - len(failed),
+        "errors": len(failed),
+        "submitted": 0,
+        "batch_id": None,
+    }
+    if not needs_ai:
+        return out
+
+    model = resolve_route("marketing_sanitize").model
+    chunks: dict[str, list[str]] = {}
+    lines: list[str] = []
+    for n, i in enumerate(range(0, len(needs_ai), SANITIZE_BATCH_SIZE)):
+        items = [(str(lead["id"]), raw) for lead, raw in needs_ai[i : i + SANITIZE_BATCH_SIZE]]
+        custom_id = f"sanitize-{n}"
+        chunks[custom_id] = [lid for lid, _ in items]
+        body = {"model": model, **sanitize_batch_request(items, fast_path=fast_path)}
+        lines.append(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}))
+
+    client = _openai_batch_client()
+    upload = client.files.create(file=("marketing_sanitize.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=upload.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"kind": "marketing_sanitize"},
+    )
+    lead_ids = [lid for ids in chunks.values() for lid in ids]
+    supabase.table(SANITIZE_BATCHES_TABLE).insert(
+        {
+            "id": batch.id,
+            "status": batch.status,
+            "model": model,
+            "lead_count": len(lead_ids),
+            "chunks": chunks,
+            "created_at": now_iso,
+        }
+    ).execute()
+    pending = f"{BATCH_PENDING_PREFIX}{batch.id}"
+    for i in range(0, len(lead_ids), 200):
+        supabase.table("marketing_leads").update({"crew_trace": pending, "updated_at": now_iso}).in_(
+            "id", lead_ids[i : i + 200]
+        ).execute()
+    logger.info("marketing sanitize: submitted batch %s (%s leads, %s requests)", batch.id, len(lead_ids), len(lines))
+    out.update(submitted=len(lead_ids), requests=len(lines), batch_id=batch.id)
+    return out
+
+
+def _batch_results(client: Any, batch: Any, chunks: dict[str, list[str]], model: str) -> dict[str, SanitizeResult]:
+    from .llm_usage import record_usage
+
+    results: dict[str, SanitizeResult] = {}
+    if not getattr(batch, "output_file_id", None):
+        return results
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            body = ((entry.get("response") or {}).get("body")) or {}
+            content = body["choices"][0]["message"]["content"] or "{}"
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+        usage = body.get("usage") or {}
+        record_usage(
+            "marketing_sanitize",
+            body.get("model") or model,
+            int(usage.get("prompt_tokens") or 0),
+            int(usage.get("completion_tokens") or 0),
+        )
+        results.update(parse_sanitize_batch_content(content, chunks.get(entry.get("custom_id"), [])))
+    return results
+
+
+def collect_sanitize_batch_jobs(supabase: Any) -> dict[str, Any]:
+    """Write back finished Batch API jobs; release the leads of failed / expired ones."""
+    jobs = (
+        supabase.table(SANITIZE_BATCHES_TABLE).select("*").in_("status", list(_OPEN_BATCH_STATES)).execute()
+    ).data or []
+    out = {"ok": True, "open": 0, "completed": 0, "failed": 0, "accepted": 0, "rejected": 0, "still_review": 0, "errors": 0}
+    if not jobs:
+        return out
+    client = _openai_batch_client()
+    for job in jobs:
+        batch = client.batches.retrieve(job["id"])
+        now_iso = datetime.now(timezone.utc).isoformat()
+        pending = f"{BATCH_PENDING_PREFIX}{job['id']}"
+        if batch.status in _OPEN_BATCH_STATES:
+            out["open"] += 1
+            if batch.status != job.get("status"):
+                supabase.table(SANITIZE_BATCHES_TABLE).update({"status": batch.status}).eq("id", job["id"]).execute()
+            continue
+        if batch.status in _DEAD_BATCH_STATES:
+            # Back into the queue for the next run.
+            supabase.table("marketing_leads").update({"crew_trace": f"batch_{batch.status}", "updated_at": now_iso}).eq(
+                "crew_trace", pending
+            ).execute()
+            supabase.table(SANITIZE_BATCHES_TABLE).update({"status": batch.status, "completed_at": now_iso}).eq(
+                "id", job["id"]
+            ).execute()
+            out["failed"] += 1
+            continue
+
+        chunks = job.get("chunks") or {}
+        results = _batch_results(client, batch, chunks, str(job.get("model") or ""))
+        lead_ids = [lid for ids in chunks.values() for lid in ids]
+        leads: list[dict[str, Any]] = []
+        for i in range(0, len(lead_ids), 200):
+            leads.extend(
+                (
+                    supabase.table("marketing_leads")
+                    .select("*")
+                    .in_("id", lead_ids[i : i + 200])
+                    .eq("crew_trace", pending)
+                    .execute()
+                ).data
+                or []
+            )
+        patches = []
+        for lead in leads:
+            result = results.get(str(lead["id"]))
+            if result is None:
+                patches.append(sanitize_patch(lead, now_iso=now_iso, crew_trace="batch_missing"))
+                continue
+            email = (lead.get("email") or "").strip().lower()
+            raw = {k: v for k, v in lead.items() if k not in ("sanitization_status",)}
+            result = finalize_sanitization_result(email=email, raw=raw, result=result)
+            patches.append(sanitize_patch(lead, now_iso=now_iso, result=result, status=result.sanitization_status))
+        failed = write_sanitize_patches(supabase, patches)
+        counts = {"accepted": 0, "rejected": 0, "review": 0}
+        for patch in patches:
+            if str(patch["id"]) not in failed:
+                counts[patch["sanitization_status"]] = counts.get(patch["sanitization_status"], 0) + 1
+        supabase.table(SANITIZE_BATCHES_TABLE).update(
+            {"status": batch.status, "completed_at": now_iso, "result_count": len(results), "summary": counts}
+        ).eq("id", job["id"]).execute()
+        out["completed"] += 1
+        out["accepted"] += counts["accepted"]
+        out["rejected"] += counts["rejected"]
+        out["still_review"] += counts["review"]
+        out["errors"] += len(failed)
+    return out
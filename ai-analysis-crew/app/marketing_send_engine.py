@@ -0,0 +1,205 @@
+"""
+Async marketing send engine used by run_marketing_send_cron.
+
+Each campaign gets a token bucket (run/day budget + min_delay_seconds spacing).
+Rendering (template, OpenAI or Crew) runs on a bounded thread pool so AI latency
+overlaps with SMTP dispatch, and dispatch itself is pipelined up to
+MARKETING_SEND_CONCURRENCY messages in flight.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+from .concurrency import MARKETING_RENDER_EXECUTOR
+
+logger = logging.getLogger(__name__)
+
+_SEND_CONCURRENCY = max(1, int(os.getenv("MARKETING_SEND_CONCURRENCY", "4")))
+
+# marketing_sends rows / lead status updates are written in batches of this size.
+SEND_FLUSH_EVERY = 25
+
+# Same ceiling the old per-lead sleep applied to min_delay_seconds.
+MAX_MIN_DELAY_SECONDS = 60
+
+
+class CampaignTokenBucket:
+    """
+    Per-campaign send permits: ``tokens`` sends in total (min of max_per_run and
+    what is left of max_per_day), each at least ``min_interval`` seconds apart.
+    """
+
+    def __init__(self, tokens: int, min_interval: float = 0.0) -> None:
+        self.tokens = max(0, int(tokens))
+        self.min_interval = max(0.0, min(float(min_interval), MAX_MIN_DELAY_SECONDS))
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> bool:
+        """Wait for the next slot; False once the budget is spent."""
+        async with self._lock:
+            if self.tokens <= 0:
+                return False
+            self.tokens -= 1
+            loop = asyncio.get_running_loop()
+            wait = self._next_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_at = loop.time() + self.min_interval
+            return True
+
+
+@dataclass
+class CampaignSendPlan:
+    """Leads selected for one campaign in this run (already budget-sliced)."""
+
+    campaign: dict[str, Any]
+    leads: list[dict[str, Any]]
+    suppressed: set[str] = field(default_factory=set)
+
+    @property
+    def campaign_id(self) -> str:
+        return str(self.campaign.get("id"))
+
+
+async def dispatch_campaign_sends(
+    supabase: Any,
+    plans: list[CampaignSendPlan],
+    *,
+    cron_run_id: str | None,
+    send_concurrency: int = _SEND_CONCURRENCY,
+) -> dict[str, int]:
+    """Render and send every planned lead; returns sent/failed/skipped counts."""
+    from .marketing_pipeline import (
+        build_send_record,
+        log_error,
+        mark_leads_sent,
+        record_sends,
+        render_message_for_lead,
+        send_tracked_marketing_and_record,
+    )
+
+    loop = asyncio.get_running_loop()
+    send_sem = asyncio.Semaphore(max(1, send_concurrency))
+    flush_lock = asyncio.Lock()
+    pending_records: list[dict[str, Any]] = []
+    sent_lead_ids: list[str] = []
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+
+    async def flush(force: bool = False) -> None:
+        async with flush_lock:
+            if not force and len(pending_records) < SEND_FLUSH_EVERY:
+                return
+            rows, ids = list(pending_records), list(sent_lead_ids)
+            pending_records.clear()
+            sent_lead_ids.clear()
+            if rows:
+                await asyncio.to_thread(record_sends, supabase, rows)
+            if ids:
+                await asyncio.to_thread(mark_leads_sent, supabase, ids)
+
+    async def process(plan: CampaignSendPlan, bucket: CampaignTokenBucket, lead: dict[str, Any]) -> None:
+        cid = plan.campaign_id
+        lead_id = str(lead["id"])
+        email = (lead.get("email") or "").strip().lower()
+
+        if email in plan.suppressed:
+            counts["skipped"] += 1
+            pending_records.append(
+                build_send_record(
+                    lead_id=lead_id,
+                    campaign_id=cid,
+                    cron_run_id=cron_run_id,
+                    status="skipped",
+                    error_message="suppressed",
+                    subject_snapshot=None,
+                    body_html_snapshot=None,
+                )
+            )
+            return
+
+        try:
+            subj, html, text = await loop.run_in_executor(
+                MARKETING_RENDER_EXECUTOR,
+                partial(
+                    render_message_for_lead,
+                    lead=lead,
+                    campaign=plan.campaign,
+                    use_ai=bool(plan.campaign.get("use_ai")),
+                    use_crew_ai=bool(plan.campaign.get("use_crew_ai")),
+                ),
+            )
+        except Exception as ge:
+            counts["failed"] += 1
+            pending_records.append(
+                build_send_record(
+                    lead_id=lead_id,
+                    campaign_id=cid,
+                    cron_run_id=cron_run_id,
+                    status="failed",
+                    error_message=f"render: {ge}"[:2000],
+                    subject_snapshot=None,
+                    body_html_snapshot=None,
+                )
+            )
+            await asyncio.to_thread(
+                log_error,
+                supabase,
+                severity="error",
+                message=str(ge)[:2000],
+                context={"lead_id": lead_id, "campaign_id": cid},
+            )
+            return
+
+        if not await bucket.acquire():
+            return
+        # The worker thread fills its own list; rows join pending_records back
+        # on the event loop so flush()'s copy-and-clear never races an append.
+        sent_rows: list[dict[str, Any]] = []
+        async with send_sem:
+            ok = await asyncio.to_thread(
+                send_tracked_marketing_and_record,
+                supabase,
+                to_email=email,
+                lead_id=lead_id,
+                campaign_id=cid,
+                cron_run_id=cron_run_id,
+                subj=subj,
+                html=html,
+                text=text,
+                pending_records=sent_rows,
+            )
+        pending_records.extend(sent_rows)
+        if ok:
+            counts["sent"] += 1
+            sent_lead_ids.append(lead_id)
+        else:
+            counts["failed"] += 1
+        # Flush periodically so a crashed run cannot re-mail a large batch.
+        await flush()
+
+    async def guarded(plan: CampaignSendPlan, bucket: CampaignTokenBucket, lead: dict[str, Any]) -> None:
+        try:
+            await process(plan, bucket, lead)
+        except Exception as e:
+            counts["failed"] += 1
+            logger.exception("marketing send engine: lead %s crashed: %s", lead.get("id"), e)
+
+    tasks = []
+    for plan in plans:
+        bucket = CampaignTokenBucket(
+            len(plan.leads),
+            int(plan.campaign.get("min_delay_seconds") or 0),
+        )
+        tasks.extend(guarded(plan, bucket, lead) for lead in plan.leads)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await flush(force=True)
+    return counts
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import logging
 import os
 import re
+import threading
 from typing import Any
 from urllib.parse import unquote, urlparse
 
@@ -166,49 +169,152 @@ def _email_domain_on_host(email: str, host: str) -> bool:
     return dom == h or dom.endswith("." + h)
 
 
-def _scrape_emails_chain(seed_url: str, host: str) -> str | None:
-    """Fetch ranking URL then a few same-site contact paths; stop early on a host-matched address."""
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+def _chain_urls(seed_url: str) -> list[str]:
     urls = [seed_url]
     for u in _contact_fallback_urls(seed_url):
         if u not in urls:
             urls.append(u)
         if len(urls) >= 4:
             break
-    accumulated: list[str] = []
-    for u in urls:
-        accumulated.extend(_try_emails_from_result_url(u))
-        best = _pick_best_email(accumulated, host)
-        if best and _email_domain_on_host(best, host):
-            return best
-    return _pick_best_email(accumulated, host)
+    return urls
 
 
-def _try_emails_from_result_url(url: str) -> list[str]:
+class _PageScraper:
     """
-    Fetch one URL and regex-scan HTML for addresses (used when page scraping is enabled).
-    Respect robots/terms of target sites. Disable all scraping with MARKETING_SERP_EMAIL_SCRAPE=0.
+    One discovery run's page fetcher: a single pooled AsyncClient, a global
+    in-flight cap, per-host concurrency limits and a politeness gap between
+    requests to the same host.
+
+    Env: MARKETING_SERP_SCRAPE_CONCURRENCY (default 8),
+    MARKETING_SERP_SCRAPE_PER_HOST (default 2),
+    MARKETING_SERP_SCRAPE_HOST_DELAY_MS (default 250).
     """
-    if not url.startswith(("http://", "https://")):
-        return []
-    try:
-        with httpx.Client(
-            timeout=httpx.Timeout(6.0, connect=4.0),
-            follow_redirects=True,
-            headers={
-                "User-Agent": _SCRAPE_UA,
-                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
-            },
-        ) as client:
-            r = client.get(url)
+
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+        self._global = asyncio.Semaphore(_env_int("MARKETING_SERP_SCRAPE_CONCURRENCY", 8, lo=1, hi=64))
+        self._per_host = _env_int("MARKETING_SERP_SCRAPE_PER_HOST", 2, lo=1, hi=8)
+        self._host_delay = _env_int("MARKETING_SERP_SCRAPE_HOST_DELAY_MS", 250, lo=0, hi=10_000) / 1000.0
+        self._host_sems: dict[str, asyncio.Semaphore] = {}
+        self._host_next_at: dict[str, float] = {}
+
+    async def _polite_wait(self, host: str) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._host_next_at.get(host, 0.0))
+        self._host_next_at[host] = slot + self._host_delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def fetch_emails(self, url: str) -> list[str]:
+        """
+        Fetch one URL and regex-scan HTML for addresses.
+        Respect robots/terms of target sites. Disable all scraping with MARKETING_SERP_EMAIL_SCRAPE=0.
+        """
+        if not url.startswith(("http://", "https://")):
+            return []
+        host = _host_from_url(url)
+        sem = self._host_sems.setdefault(host, asyncio.Semaphore(self._per_host))
+        try:
+            async with sem:
+                await self._polite_wait(host)
+                async with self._global:
+                    r = await self._client.get(url)
             if r.status_code >= 400:
                 return []
             ct = (r.headers.get("content-type") or "").lower()
             if "html" not in ct and "xhtml" not in ct:
                 return []
             return _extract_emails((r.text or "")[:400_000])
-    except Exception as e:
-        logger.debug("MARKETING_SERP_EMAIL_SCRAPE skip %s: %s", url[:96], e)
+        except Exception as e:
+            logger.debug("MARKETING_SERP_EMAIL_SCRAPE skip %s: %s", url[:96], e)
+            return []
+
+    async def scrape_chain(self, seed_url: str, host: str) -> str | None:
+        """
+        Fetch the ranking URL, then its same-site contact paths concurrently;
+        stop early (cancelling the rest) once a host-matched address turns up.
+        """
+        urls = _chain_urls(seed_url)
+        found: list[list[str] | None] = [None] * len(urls)
+
+        def best_so_far() -> str | None:
+            acc = [e for emails in found if emails for e in emails]
+            return _pick_best_email(acc, host)
+
+        found[0] = await self.fetch_emails(urls[0])
+        best = best_so_far()
+        if (best and _email_domain_on_host(best, host)) or len(urls) == 1:
+            return best
+
+        tasks = {asyncio.ensure_future(self.fetch_emails(u)): i for i, u in enumerate(urls) if i > 0}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    found[tasks[t]] = t.result()
+                best = best_so_far()
+                if best and _email_domain_on_host(best, host):
+                    return best
+        finally:
+            for t in pending:
+                t.cancel()
+        return best_so_far()
+
+
+async def _scrape_emails_for_results(targets: list[tuple[str, str]]) -> list[str | None]:
+    """Run every (seed_url, host) chain concurrently under the scraper's limits."""
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(6.0, connect=4.0),
+        follow_redirects=True,
+        headers={
+            "User-Agent": _SCRAPE_UA,
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+        },
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+    ) as client:
+        scraper = _PageScraper(client)
+        return list(await asyncio.gather(*(scraper.scrape_chain(u, h) for u, h in targets)))
+
+
+def scrape_emails_for_results(targets: list[tuple[str, str]]) -> list[str | None]:
+    """
+    Blocking entry point for the sync discovery path. Runs the async scraper on
+    its own loop (in a helper thread when the caller is already inside one).
+    """
+    if not targets:
         return []
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_scrape_emails_for_results(targets))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="serp-scrape") as pool:
+        return pool.submit(asyncio.run, _scrape_emails_for_results(targets)).result()
+
+
+_search_client_lock = threading.Lock()
+_search_client_instance: httpx.Client | None = None
+
+
+def _search_client() -> httpx.Client:
+    """Process-wide keep-alive client for SerpAPI / Serper calls."""
+    global _search_client_instance
+    with _search_client_lock:
+        if _search_client_instance is None:
+            _search_client_instance = httpx.Client(
+                timeout=45.0,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return _search_client_instance
 
 
 def _resolve_search_provider(explicit: str | None) -> str:
@@ -239,10 +345,9 @@ def _search_serpapi(
     if hl_u:
         params["hl"] = hl_u
 
-    with httpx.Client(timeout=45.0) as client:
-        r = client.get(_SERPAPI_URL, params=params)
-        r.raise_for_status()
-        data = r.json()
+    r = _search_client().get(_SERPAPI_URL, params=params)
+    r.raise_for_status()
+    data = r.json()
     err = data.get("error")
     if err:
         raise ValueError(str(err))
@@ -269,14 +374,13 @@ def _search_serper(
     if hl_u:
         body["hl"] = hl_u
 
-    with httpx.Client(timeout=45.0) as client:
-        r = client.post(
-            _SERPER_URL,
-            headers={"X-API-KEY": api_key, "Content-Type": "application/json"},
-            json=body,
-        )
-        r.raise_for_status()
-        data = r.json()
+    r = _search_client().post(
+        _SERPER_URL,
+        headers={"X-API-KEY": api_key, "Content-Type": "application/json"},
+        json=body,
+    )
+    r.raise_for_status()
+    data = r.json()
     err = data.get("error") or data.get("message")
     if err and isinstance(err, str):
         raise ValueError(err)
@@ -328,6 +432,8 @@ def organic_results_to_lead_candidates(resp: dict[str, Any], *, query: str) -> l
     organic = resp.get("organic_results") or resp.get("organic") or []
     scrape_pages = _email_scrape_from_pages_enabled()
     candidates: list[dict[str, Any]] = []
+    scrape_targets: list[tuple[str, str]] = []
+    scrape_slots: list[int] = []
     for item in organic:
         if not isinstance(item, dict):
             continue
@@ -339,7 +445,8 @@ def organic_results_to_lead_candidates(resp: dict[str, Any], *, query: str) -> l
         emails = _extract_emails(combined)
         email = _pick_best_email(emails, host)
         if not email and scrape_pages and link:
-            email = _scrape_emails_chain(link, host)
+            scrape_targets.append((link, host))
+            scrape_slots.append(len(candidates))
         company_guess = title.split("|")[0].split("-")[0].strip() if title else ""
 
         candidates.append(
@@ -359,4 +466,9 @@ def organic_results_to_lead_candidates(resp: dict[str, Any], *, query: str) -> l
                 "sanitization_status": "review" if not email else "accepted",
             }
         )
+    # Result pages are fetched together (pooled client, per-host limits) instead of one by one.
+    for slot, email in zip(scrape_slots, scrape_emails_for_results(scrape_targets)):
+        if email:
+            candidates[slot]["email"] = email
+            candidates[slot]["sanitization_status"] = "accepted"
     return candidates
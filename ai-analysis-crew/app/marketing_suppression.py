@@ -0,0 +1,127 @@
+"""Batch suppression checks for marketing sends (unsubscribes + all-marketing opt-outs)."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+from typing import Any, Iterable
+
+from .marketing_rules import EMAIL_LOOKUP_CHUNK
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = 1000
+
+
+class SuppressionBloom:
+    """
+    Bloom filter over suppressed emails. A miss means "definitely not
+    suppressed"; a hit still needs an exact lookup (false-positive rate ~1%).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(1, int(capacity))
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, email: str) -> Iterable[int]:
+        digest = hashlib.blake2b(email.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, email: str) -> None:
+        for pos in self._positions(email):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, email: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(email))
+
+
+def _page_emails(supabase: Any, table: str, column: str, **eq: Any) -> list[str]:
+    out: list[str] = []
+    offset = 0
+    while True:
+        q = supabase.table(table).select(column)
+        for key, value in eq.items():
+            q = q.eq(key, value)
+        rows = q.range(offset, offset + _PAGE_SIZE - 1).execute().data or []
+        out.extend(str(r.get(column) or "").strip().lower() for r in rows)
+        if len(rows) < _PAGE_SIZE:
+            return out
+        offset += _PAGE_SIZE
+
+
+def load_suppression_filter(supabase: Any) -> SuppressionBloom | None:
+    """
+    Build a fresh Bloom filter from marketing_unsubscribes and
+    email_unsubscribe_preferences. Called once per send run so new opt-outs are
+    picked up; returns None when either table cannot be read (callers then do
+    exact lookups for every email).
+    """
+    try:
+        emails = _page_emails(supabase, "marketing_unsubscribes", "email")
+        emails += _page_emails(
+            supabase,
+            "email_unsubscribe_preferences",
+            "user_email",
+            unsubscribed_from_all_marketing=True,
+        )
+    except Exception as e:
+        logger.warning("suppression filter load failed: %s", e)
+        return None
+    bloom = SuppressionBloom(capacity=max(len(emails), 1000))
+    for em in emails:
+        if em:
+            bloom.add(em)
+    return bloom
+
+
+def suppressed_emails(
+    supabase: Any,
+    emails: Iterable[str | None],
+    *,
+    bloom: SuppressionBloom | None = None,
+) -> set[str]:
+    """
+    Batch form of marketing_pipeline.is_suppressed. Returns the lowercased
+    emails that must not be mailed (including blank / malformed addresses).
+    Emails the Bloom filter rules out skip the database entirely; the rest are
+    confirmed with one in_() query per table per chunk.
+    """
+    out: set[str] = set()
+    check: list[str] = []
+    for raw in emails:
+        el = (raw or "").strip().lower()
+        if not el or "@" not in el:
+            out.add(el)
+            continue
+        if bloom is not None and el not in bloom:
+            continue
+        if el not in check:
+            check.append(el)
+
+    for i in range(0, len(check), EMAIL_LOOKUP_CHUNK):
+        chunk = check[i : i + EMAIL_LOOKUP_CHUNK]
+        try:
+            r = supabase.table("marketing_unsubscribes").select("email").in_("email", chunk).execute()
+            out.update(str(row.get("email") or "").strip().lower() for row in (r.data or []))
+        except Exception as e:
+            logger.warning("marketing_unsubscribes batch check failed: %s", e)
+        try:
+            r2 = (
+                supabase.table("email_unsubscribe_preferences")
+                .select("user_email")
+                .in_("user_email", chunk)
+                .eq("unsubscribed_from_all_marketing", True)
+                .execute()
+            )
+            out.update(str(row.get("user_email") or "").strip().lower() for row in (r2.data or []))
+        except Exception:
+            pass
+    return out
@@ -0,0 +1,279 @@
+"""
+Write-behind open / click counters for marketing_sends (docs/sql/marketing_tracking_events.sql).
+
+The tracking routes (/api/track/mopen, /api/track/mclk) only call
+``record_open`` / ``record_click``: an in-memory increment per tracking token,
+so the pixel or 302 goes out without a database round trip. A background loop
+(``start_tracking_flusher``) applies the pending counts every
+MARKETING_TRACKING_FLUSH_SEC with one call to the
+apply_marketing_tracking_events RPC, which adds them atomically
+(open_count = open_count + n) and sets first_opened_at / first_clicked_at only
+when still empty. Concurrent clicks and several API replicas therefore never
+lose an increment; unknown tokens and unsent rows are ignored by the RPC.
+
+Each RPC call carries a batch id that the function records, so a batch whose
+outcome is unknown (timeout after the commit) is resent unchanged and applied
+at most once. Until the RPC is deployed (re-probed every RPC_REPROBE_SEC),
+each token is applied with the old read-then-update (not atomic across
+replicas, at-least-once on retry). Counts still buffered when the process is
+killed without a shutdown are lost (at most one flush interval).
+
+Only tokens shaped like the ones the send path issues are buffered, and the
+flusher runs early once FLUSH_EARLY_TOKENS distinct tokens are pending, so a
+flood of made-up tokens is flushed (and ignored by the RPC) instead of
+filling the buffer. At most MAX_PENDING_TOKENS distinct tokens are buffered;
+events for new tokens beyond that are dropped and logged.
+
+Env:
+  MARKETING_TRACKING_FLUSH_SEC   seconds between flushes (default 5)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACKING_EVENTS_RPC = "apply_marketing_tracking_events"
+MAX_PENDING_TOKENS = 50000
+FLUSH_EARLY_TOKENS = 5000
+# RPC batches whose outcome is unknown, kept for resending with the same id.
+MAX_RETRY_BATCHES = 50
+RPC_REPROBE_SEC = 300.0
+_RPC_BATCH = 1000
+# secrets.token_urlsafe(24) in send_tracked_marketing_and_record (32 chars);
+# a little slack for tokens issued by older code.
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
+
+def _env_int(name: str, default: int, *, lo: int, hi: int) -> int:
+    try:
+        v = int((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+FLUSH_SEC = _env_int("MARKETING_TRACKING_FLUSH_SEC", 5, lo=1, hi=300)
+
+_lock = threading.Lock()
+# token -> {"opens", "clicks", "first_opened_at", "first_clicked_at"}
+_pending: dict[str, dict[str, Any]] = {}
+# (batch_id, events) resent as-is so the RPC can skip a batch it already applied
+_retry: deque[tuple[str, list[dict[str, Any]]]] = deque()
+_dropped = 0
+# While the RPC is reported missing, skip it until this monotonic time.
+_rpc_missing_until = 0.0
+_flusher_task: Optional[asyncio.Task] = None
+_flush_now: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _wake_flusher() -> None:
+    if _loop is not None and _flush_now is not None:
+        try:
+            _loop.call_soon_threadsafe(_flush_now.set)
+        except RuntimeError:
+            pass
+
+
+def _record(token: str, kind: str) -> None:
+    global _dropped
+    if not _TOKEN_RE.fullmatch(token):
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    with _lock:
+        entry = _pending.get(token)
+        if entry is None:
+            if len(_pending) >= MAX_PENDING_TOKENS:
+                _dropped += 1
+                return
+            entry = _pending[token] = {"opens": 0, "clicks": 0, "first_opened_at": None, "first_clicked_at": None}
+            if len(_pending) == FLUSH_EARLY_TOKENS:
+                _wake_flusher()
+        if kind == "open":
+            entry["opens"] += 1
+            entry["first_opened_at"] = entry["first_opened_at"] or now
+        else:
+            entry["clicks"] += 1
+            entry["first_clicked_at"] = entry["first_clicked_at"] or now
+
+
+def record_open(token: str) -> None:
+    _record(token, "open")
+
+
+def record_click(token: str) -> None:
+    _record(token, "click")
+
+
+def _merge_back(events: dict[str, dict[str, Any]]) -> None:
+    """Return unapplied counts to the buffer (older first-seen timestamps win)."""
+    with _lock:
+        for token, ev in events.items():
+            cur = _pending.get(token)
+            if cur is None:
+                _pending[token] = ev
+                continue
+            cur["opens"] += ev["opens"]
+            cur["clicks"] += ev["clicks"]
+            cur["first_opened_at"] = ev["first_opened_at"] or cur["first_opened_at"]
+            cur["first_clicked_at"] = ev["first_clicked_at"] or cur["first_clicked_at"]
+
+
+def _is_missing_rpc_error(exc: Exception) -> bool:
+    text = str(exc)
+    return "PGRST202" in text or "Could not find the function" in text
+
+
+def _apply_legacy(supabase: Any, token: str, ev: dict[str, Any]) -> None:
+    """Pre-RPC path: read the send row, then write the summed counters."""
+    r = (
+        supabase.table("marketing_sends")
+        .select("id,open_count,click_count,first_opened_at,first_clicked_at")
+        .eq("tracking_token", token)
+        .eq("status", "sent")
+        .limit(1)
+        .execute()
+    )
+    rows = r.data or []
+    if not rows:
+        return
+    row = rows[0]
+    patch: dict[str, Any] = {}
+    if ev["opens"]:
+        patch["open_count"] = int(row.get("open_count") or 0) + ev["opens"]
+        if not row.get("first_opened_at"):
+            patch["first_opened_at"] = ev["first_opened_at"]
+    if ev["clicks"]:
+        patch["click_count"] = int(row.get("click_count") or 0) + ev["clicks"]
+        if not row.get("first_clicked_at"):
+            patch["first_clicked_at"] = ev["first_clicked_at"]
+    if patch:
+        supabase.table("marketing_sends").update(patch).eq("id", row["id"]).execute()
+
+
+def _as_events(batches: list[tuple[str, list[dict[str, Any]]]]) -> dict[str, dict[str, Any]]:
+    """RPC payloads back to the token -> counts form (for the legacy path)."""
+    events: dict[str, dict[str, Any]] = {}
+    for _batch_id, payload in batches:
+        for ev in payload:
+            ev = dict(ev)
+            token = ev.pop("token")
+            cur = events.get(token)
+            if cur is None:
+                events[token] = ev
+                continue
+            cur["opens"] += ev["opens"]
+            cur["clicks"] += ev["clicks"]
+            cur["first_opened_at"] = cur["first_opened_at"] or ev["first_opened_at"]
+            cur["first_clicked_at"] = cur["first_clicked_at"] or ev["first_clicked_at"]
+    return events
+
+
+def _keep_for_retry(batches: list[tuple[str, list[dict[str, Any]]]]) -> None:
+    global _dropped
+    with _lock:
+        _retry.extend(batches)
+        while len(_retry) > MAX_RETRY_BATCHES:
+            _dropped += sum(ev["opens"] + ev["clicks"] for ev in _retry.popleft()[1])
+
+
+def flush_tracking_events(supabase: Any = None) -> int:
+    """Apply buffered counts; returns the number of token entries flushed (sync)."""
+    global _dropped, _rpc_missing_until
+    with _lock:
+        if not _pending and not _retry:
+            return 0
+        events = dict(_pending)
+        _pending.clear()
+        batches = list(_retry)
+        _retry.clear()
+        dropped, _dropped = _dropped, 0
+    if dropped:
+        logger.warning("Tracking buffer full: dropped %s open/click events", dropped)
+
+    tokens = list(events)
+    for i in range(0, len(tokens), _RPC_BATCH):
+        batches.append((str(uuid.uuid4()), [{"token": t, **events[t]} for t in tokens[i : i + _RPC_BATCH]]))
+    flushed = 0
+    try:
+        if supabase is None:
+            from .api.supabase_admin import get_supabase_admin
+
+            supabase = get_supabase_admin()
+    except Exception as e:
+        logger.warning("Tracking flush failed (no database client): %s", e)
+        _keep_for_retry(batches)
+        return 0
+
+    while batches and time.monotonic() >= _rpc_missing_until:
+        batch_id, payload = batches[0]
+        try:
+            supabase.rpc(TRACKING_EVENTS_RPC, {"p_events": payload, "p_batch_id": batch_id}).execute()
+        except Exception as exc:
+            if _is_missing_rpc_error(exc):
+                _rpc_missing_until = time.monotonic() + RPC_REPROBE_SEC
+                logger.warning(
+                    "%s RPC not deployed; using per-token tracking updates for %ss",
+                    TRACKING_EVENTS_RPC,
+                    int(RPC_REPROBE_SEC),
+                )
+                break
+            # The call may have committed before failing: resend the same batch
+            # id next time; the RPC skips ids it has already applied.
+            logger.warning("Tracking flush failed (%s batches kept for retry): %s", len(batches), exc)
+            _keep_for_retry(batches)
+            return flushed
+        batches.pop(0)
+        flushed += len(payload)
+
+    remaining = _as_events(batches)
+    try:
+        for token in list(remaining):
+            _apply_legacy(supabase, token, remaining[token])
+            remaining.pop(token)
+            flushed += 1
+    except Exception as e:
+        logger.warning("Tracking flush failed (%s tokens kept for retry): %s", len(remaining), e)
+        _merge_back(remaining)
+    return flushed
+
+
+async def tracking_flusher_loop() -> None:
+    while True:
+        try:
+            if _flush_now is None:
+                await asyncio.sleep(FLUSH_SEC)
+            else:
+                # Every FLUSH_SEC, or as soon as FLUSH_EARLY_TOKENS tokens are pending
+                try:
+                    await asyncio.wait_for(_flush_now.wait(), FLUSH_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                _flush_now.clear()
+            await asyncio.to_thread(flush_tracking_events)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(flush_tracking_events)
+            raise
+        except Exception as e:
+            logger.warning("Tracking flusher: %s", e)
+
+
+def start_tracking_flusher() -> None:
+    global _flusher_task, _flush_now, _loop
+    if _flusher_task is not None and not _flusher_task.done():
+        return
+    _loop = asyncio.get_running_loop()
+    _flush_now = asyncio.Event()
+    _flusher_task = asyncio.create_task(tracking_flusher_loop())
+    logger.info("Started marketing tracking flusher (every %ss)", FLUSH_SEC)
@@ -0,0 +1,269 @@
+"""
+Model routing: which OpenAI model serves each crew agent and LLM task.
+
+The policy is a JSON file (app/data/model_routing.json, or MODEL_ROUTING_PATH)
+reloaded when its mtime changes, like the currency rate table:
+
+  {
+    "steps": {
+      "research_agent": {"model": "gpt-4-turbo", "temperature": 0.7, "timeout": 240,
+                         "fallbacks": ["gpt-4o", "gpt-4o-mini"]},
+      "content_validation": {"model": "gpt-4o-mini", "env": "CONTENT_VALIDATION_MODEL"}
+    },
+    "tiers": {
+      "free": {"*": {"model": "gpt-4o-mini"}, "report_generator": {"model": "gpt-4o"}}
+    }
+  }
+
+A step is a crew stage key (part_identifier, research_agent, supplier_finder,
+report_generator, email_agent) or a task name (vision, content_validation,
+email_copy, marketing_*). Resolution order: the step entry, then the legacy
+env var named by "env" (the variables these call sites read before the policy
+existed keep working), then the tier's "*" entry, then the tier's step entry.
+Unset max_tokens / temperature leave the caller's own values in place.
+
+``fallbacks`` are tried in order when a call times out, cannot connect or gets
+a 5xx; 4xx errors (bad request, auth, content policy) are raised unchanged.
+``python -m app.model_routing --show [--tier pro]`` prints the resolved table.
+
+Env:
+  MODEL_ROUTING_PATH   policy file (default app/data/model_routing.json)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_POLICY_PATH = Path(__file__).resolve().parent / "data" / "model_routing.json"
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Crew stage keys in task order (crew_progress._STREAM_TASK_STAGES).
+CREW_STEPS = ("part_identifier", "research_agent", "supplier_finder", "report_generator", "email_agent")
+
+_ROUTE_KEYS = ("model", "max_tokens", "temperature", "timeout", "fallbacks")
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    step: str
+    model: str
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None
+    fallbacks: tuple[str, ...] = ()
+
+    @property
+    def chain(self) -> tuple[str, ...]:
+        """Primary model followed by its fallbacks, without repeats."""
+        return tuple(dict.fromkeys((self.model, *self.fallbacks)))
+
+    def next_model(self, after: str) -> Optional[str]:
+        chain = self.chain
+        if after not in chain:
+            return chain[0]
+        i = chain.index(after)
+        return chain[i + 1] if i + 1 < len(chain) else None
+
+
+def policy_path() -> Path:
+    override = (os.getenv("MODEL_ROUTING_PATH") or "").strip()
+    return Path(override) if override else BUNDLED_POLICY_PATH
+
+
+_lock = threading.Lock()
+_cached: Optional[tuple[str, float, dict[str, Any]]] = None
+
+
+def load_policy() -> dict[str, Any]:
+    """The routing policy, reloaded only when the file changes; empty if unreadable."""
+    global _cached
+    path = policy_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        mtime = -1.0
+    cached = _cached
+    if cached and cached[0] == str(path) and cached[1] == mtime:
+        return cached[2]
+    with _lock:
+        cached = _cached
+        if cached and cached[0] == str(path) and cached[1] == mtime:
+            return cached[2]
+        try:
+            policy = json.loads(path.read_text(encoding="utf-8"))
+            if not isinstance(policy, dict):
+                raise ValueError("policy must be a JSON object")
+        except (OSError, ValueError) as e:
+            logger.warning("Model routing policy unavailable at %s (%s); using %s everywhere", path, e, DEFAULT_MODEL)
+            policy = {}
+        _cached = (str(path), mtime, policy)
+        return policy
+
+
+def _merge(into: dict[str, Any], entry: Any) -> None:
+    if isinstance(entry, dict):
+        into.update({k: v for k, v in entry.items() if k in _ROUTE_KEYS and v is not None})
+
+
+def resolve_route(step: str, tier: Optional[str] = None) -> ModelRoute:
+    """Effective route for ``step`` (and the user's plan tier, if known)."""
+    policy = load_policy()
+    entry = (policy.get("steps") or {}).get(step) or {}
+    merged: dict[str, Any] = {"model": DEFAULT_MODEL}
+    _merge(merged, entry)
+    legacy_env = entry.get("env") if isinstance(entry, dict) else None
+    if legacy_env and (os.getenv(legacy_env) or "").strip():
+        merged["model"] = os.getenv(legacy_env, "").strip()
+    if tier:
+        from .admission import normalize_tier
+
+        overrides = (policy.get("tiers") or {}).get(normalize_tier(tier)) or {}
+        _merge(merged, overrides.get("*"))
+        _merge(merged, overrides.get(step))
+
+    def _num(key: str, cast: Any) -> Any:
+        try:
+            return cast(merged[key]) if merged.get(key) is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    fallbacks = merged.get("fallbacks") or ()
+    return ModelRoute(
+        step=step,
+        model=str(merged["model"]),
+        max_tokens=_num("max_tokens", int),
+        temperature=_num("temperature", float),
+        timeout=_num("timeout", float),
+        fallbacks=tuple(str(m) for m in fallbacks if m) if isinstance(fallbacks, (list, tuple)) else (),
+    )
+
+
+def is_fallback_error(exc: BaseException) -> bool:
+    """
+    Timeouts, connection failures and 5xx from the OpenAI SDK, httpx or litellm
+    (checked by attribute and class name so no SDK import is needed). Follows
+    __cause__ / __context__ because CrewAI wraps LLM errors.
+    """
+    seen: set[int] = set()
+    err: Optional[BaseException] = exc
+    while err is not None and id(err) not in seen:
+        seen.add(id(err))
+        if isinstance(err, (TimeoutError, ConnectionError)):
+            return True
+        name = type(err).__name__
+        if name in ("APITimeoutError", "APIConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout",
+                    "InternalServerError", "ServiceUnavailableError", "BadGatewayError"):
+            return True
+        status = getattr(err, "status_code", None)
+        if status is None:
+            status = getattr(getattr(err, "response", None), "status_code", None)
+        if isinstance(status, int):
+            return status >= 500
+        err = err.__cause__ or err.__context__
+    return False
+
+
+@dataclass
+class ModelTrace:
+    """Models that served each step of one job; stored as result_data["models"]."""
+
+    steps: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def record(self, step: str, model: str, *, fallback_from: Optional[str] = None,
+               latency_ms: Optional[float] = None) -> None:
+        entry: dict[str, Any] = {"model": model}
+        if fallback_from:
+            entry["fallback_from"] = fallback_from
+        if latency_ms is not None:
+            entry["latency_ms"] = round(latency_ms)
+        self.steps[step] = entry
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        return {k: dict(v) for k, v in self.steps.items()}
+
+
+def routed_chat_completion(
+    client: Any,
+    step: str,
+    *,
+    tier: Optional[str] = None,
+    trace: Optional[ModelTrace] = None,
+    **params: Any,
+) -> Any:
+    """
+    ``client.chat.completions.create`` with the step's routed model, falling
+    back along the route on timeout / 5xx. ``params`` are the call's own
+    arguments (messages, max_tokens, temperature, ...); the route's values
+    replace them only where the policy sets them.
+    """
+    route = resolve_route(step, tier)
+    if route.max_tokens is not None:
+        params["max_tokens"] = route.max_tokens
+    if route.temperature is not None:
+        params["temperature"] = route.temperature
+    if route.timeout is not None:
+        params.setdefault("timeout", route.timeout)
+    params.pop("model", None)
+
+    chain = route.chain
+    for i, model in enumerate(chain):
+        t0 = time.perf_counter()
+        try:
+            response = client.chat.completions.create(model=model, **params)
+        except Exception as e:
+            if i + 1 >= len(chain) or not is_fallback_error(e):
+                raise
+            logger.warning("%s: %s failed (%s); falling back to %s", step, model, e, chain[i + 1])
+            continue
+        latency_ms = (time.perf_counter() - t0) * 1000
+        if trace is not None:
+            trace.record(step, model, fallback_from=chain[0] if i else None, latency_ms=latency_ms)
+        from .llm_usage import record_openai_response
+
+        record_openai_response(step, model, response, latency_ms=latency_ms, fallback=bool(i))
+        return response
+    raise RuntimeError(f"No model configured for {step}")  # unreachable: chain is never empty
+
+
+def chat_llm(route: ModelRoute, model: Optional[str] = None) -> Any:
+    """LangChain ChatOpenAI for a crew agent on ``route`` (or one of its fallbacks)."""
+    from langchain_openai import ChatOpenAI
+
+    kwargs: dict[str, Any] = {"model": model or route.model}
+    if route.temperature is not None:
+        kwargs["temperature"] = route.temperature
+    if route.max_tokens is not None:
+        kwargs["max_tokens"] = route.max_tokens
+    if route.timeout is not None:
+        kwargs["timeout"] = route.timeout
+    return ChatOpenAI(**kwargs)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--show", action="store_true", help="print the resolved routes")
+    parser.add_argument("--tier", default=None, help="apply this plan tier's overrides")
+    args = parser.parse_args(argv)
+
+    steps = list(CREW_STEPS) + [s for s in (load_policy().get("steps") or {}) if s not in CREW_STEPS]
+    print(f"policy {policy_path()}" + (f" (tier {args.tier})" if args.tier else ""))
+    for step in steps:
+        r = resolve_route(step, args.tier)
+        print(
+            f"  {step:<20} {' -> '.join(r.chain):<40} max_tokens={r.max_tokens} "
+            f"temperature={r.temperature} timeout={r.timeout}"
+        )
+
+
+if __name__ == "__main__":
+    main()
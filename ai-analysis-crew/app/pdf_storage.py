@@ -138,6 +138,103 @@ def _upload_with_retries(
         raise last_error
 
 
+def _upload_pdf_bytes(
+    pdf_data: bytes,
+    filename: str,
+    bucket_name: str,
+) -> Optional[tuple[str, str]]:
+    """Upload to the first bucket that accepts it; returns (bucket, storage_path)."""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        logger.warning("Supabase not configured - PDF will not be uploaded to storage")
+        return None
+
+    storage_path = f"reports/{filename}"
+    file_size_mb = len(pdf_data) / (1024 * 1024)
+
+    buckets: list[str] = []
+    for candidate in (SUPABASE_PDF_BUCKET, bucket_name, "documents", "sparefinder"):
+        if candidate and candidate not in buckets:
+            buckets.append(candidate)
+
+    last_error: Optional[Exception] = None
+    for bucket in buckets:
+        try:
+            logger.info(
+                "Uploading PDF to Supabase Storage: %s/%s (%.2f MB)",
+                bucket,
+                storage_path,
+                file_size_mb,
+            )
+            _upload_with_retries(
+                bucket=bucket,
+                storage_path=storage_path,
+                pdf_data=pdf_data,
+            )
+            return bucket, storage_path
+        except Exception as bucket_error:
+            last_error = bucket_error
+            logger.warning(
+                "PDF upload failed for bucket %s: %s",
+                bucket,
+                bucket_error,
+            )
+
+    if last_error:
+        logger.error("Failed to upload PDF to Supabase Storage: %s", last_error)
+    return None
+
+
+def upload_pdf_bytes_to_supabase_storage(
+    pdf_data: bytes,
+    filename: str,
+    bucket_name: str = "sparefinder",
+) -> Optional[tuple[str, str]]:
+    """
+    Upload an in-memory PDF to Supabase Storage.
+
+    Returns:
+        (public_url, object_path) where object_path is "<bucket>/<storage_path>"
+        (input for create_signed_pdf_url), or None if upload failed
+    """
+    try:
+        uploaded = _upload_pdf_bytes(pdf_data, filename, bucket_name)
+    except Exception as e:
+        logger.error("Error uploading PDF to Supabase Storage: %s", e)
+        return None
+    if not uploaded:
+        return None
+    bucket, storage_path = uploaded
+    public_url = _public_url(bucket, storage_path)
+    logger.info("PDF uploaded successfully: %s", public_url)
+    return public_url, f"{bucket}/{storage_path}"
+
+
+def create_signed_pdf_url(object_path: str, expires_in: int) -> Optional[str]:
+    """
+    Signed, expiring URL for "<bucket>/<storage_path>" (works for private buckets).
+    Returns None if signing fails.
+    """
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        return None
+    try:
+        response = requests.post(
+            f"{SUPABASE_URL}/storage/v1/object/sign/{quote(object_path, safe='/')}",
+            json={"expiresIn": int(expires_in)},
+            headers=_storage_headers("application/json"),
+            timeout=15,
+        )
+        if response.status_code != 200:
+            logger.warning("PDF URL signing failed (HTTP %s): %s", response.status_code, response.text[:300])
+            return None
+        signed = (response.json() or {}).get("signedURL") or ""
+        if not signed:
+            return None
+        return f"{SUPABASE_URL}/storage/v1{signed}" if signed.startswith("/") else signed
+    except Exception as e:
+        logger.warning("PDF URL signing failed: %s", e)
+        return None
+
+
 def upload_pdf_to_supabase_storage(
     pdf_path: str,
     filename: Optional[str] = None,
@@ -154,61 +251,10 @@ def upload_pdf_to_supabase_storage(
     Returns:
         Public URL of uploaded PDF, or None if upload failed
     """
-    try:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            logger.warning("Supabase not configured - PDF will not be uploaded to storage")
-            return None
-
-        if not os.path.exists(pdf_path):
-            logger.error("PDF file not found: %s", pdf_path)
-            return None
-
-        if not filename:
-            filename = Path(pdf_path).name
-
-        storage_path = f"reports/{filename}"
-        file_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
-
-        with open(pdf_path, "rb") as pdf_file:
-            pdf_data = pdf_file.read()
-
-        buckets: list[str] = []
-        for candidate in (SUPABASE_PDF_BUCKET, bucket_name, "documents", "sparefinder"):
-            if candidate and candidate not in buckets:
-                buckets.append(candidate)
-
-        last_error: Optional[Exception] = None
-        for bucket in buckets:
-            try:
-                logger.info(
-                    "Uploading PDF to Supabase Storage: %s/%s (%.2f MB)",
-                    bucket,
-                    storage_path,
-                    file_size_mb,
-                )
-                _upload_with_retries(
-                    bucket=bucket,
-                    storage_path=storage_path,
-                    pdf_data=pdf_data,
-                )
-                public_url = _public_url(bucket, storage_path)
-                logger.info("PDF uploaded successfully: %s", public_url)
-                return public_url
-            except Exception as bucket_error:
-                last_error = bucket_error
-                logger.warning(
-                    "PDF upload failed for bucket %s: %s",
-                    bucket,
-                    bucket_error,
-                )
-
-        if last_error:
-            logger.error("Failed to upload PDF to Supabase Storage: %s", last_error)
-        return None
-
-    except Exception as e:
-        logger.error("Error uploading PDF to Supabase Storage: %s", e)
-        import traceback
-
-        logger.error(traceback.format_exc())
+    if not os.path.exists(pdf_path):
+        logger.error("PDF file not found: %s", pdf_path)
         return None
+    with open(pdf_path, "rb") as pdf_file:
+        pdf_data = pdf_file.read()
+    uploaded = upload_pdf_bytes_to_supabase_storage(pdf_data, filename or Path(pdf_path).name, bucket_name)
+    return uploaded[0] if uploaded else None
@@ -0,0 +1,121 @@
+"""
+How completion emails deliver the report PDF.
+
+REPORT_EMAIL_DELIVERY:
+- link (default): email carries only the Storage URL
+- attach_small: link, plus the PDF attached when it is at most REPORT_EMAIL_ATTACH_MAX_KB
+- signed_link: email carries a signed URL expiring after REPORT_SIGNED_URL_TTL_SEC
+  (for private buckets); the public URL is still what gets stored on the job
+
+The PDF stays in memory from generation through upload and email; when the
+standard fallback renderer writes a temp file it is removed as soon as it is read.
+If the Storage upload fails the PDF is written back to temp/ so the filename
+stored on the job still resolves through GET /pdf/{filename}.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_MODES = ("link", "attach_small", "signed_link")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int((os.getenv(name) or "").strip() or default))
+    except ValueError:
+        return default
+
+
+def report_delivery_mode() -> str:
+    mode = (os.getenv("REPORT_EMAIL_DELIVERY") or "link").strip().lower()
+    if mode not in DELIVERY_MODES:
+        logger.warning("Unknown REPORT_EMAIL_DELIVERY=%r; using 'link'", mode)
+        return "link"
+    return mode
+
+
+def attach_max_bytes() -> int:
+    return _env_int("REPORT_EMAIL_ATTACH_MAX_KB", 512) * 1024
+
+
+@dataclass
+class ReportPdf:
+    filename: str
+    data: bytes
+    public_url: Optional[str] = None
+    email_url: Optional[str] = None
+    # "<bucket>/<storage_path>" once uploaded (for signing)
+    object_path: Optional[str] = None
+
+    @property
+    def size_kb(self) -> float:
+        return len(self.data) / 1024
+
+    def should_attach(self) -> bool:
+        """Attach when there is no link to send, or the policy allows a small attachment."""
+        if not self.data:
+            # Resumed job whose PDF was uploaded before the restart: link only
+            return False
+        if not self.email_url:
+            return True
+        return report_delivery_mode() == "attach_small" and len(self.data) <= attach_max_bytes()
+
+
+def read_and_remove(pdf_path: str) -> ReportPdf:
+    """Load a rendered PDF into memory and delete the temp file."""
+    path = Path(pdf_path)
+    try:
+        return ReportPdf(filename=path.name, data=path.read_bytes())
+    finally:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not remove temp PDF %s: %s", path, e)
+
+
+def publish_report_pdf(report: ReportPdf) -> ReportPdf:
+    """Upload to Storage and fill public_url / email_url per the delivery mode."""
+    from .pdf_storage import upload_pdf_bytes_to_supabase_storage
+
+    try:
+        uploaded = upload_pdf_bytes_to_supabase_storage(report.data, report.filename)
+    except Exception:
+        keep_local_copy(report)
+        raise
+    if not uploaded:
+        keep_local_copy(report)
+        return report
+    report.public_url, report.object_path = uploaded
+    return refresh_email_url(report)
+
+
+def keep_local_copy(report: ReportPdf) -> None:
+    """Write the PDF to temp/ for the /pdf/{filename} fallback when it has no Storage URL."""
+    from .utils import get_temp_path
+
+    if not report.data:
+        return
+    try:
+        Path(get_temp_path(report.filename)).write_bytes(report.data)
+    except OSError as e:
+        logger.warning("Could not keep local PDF %s: %s", report.filename, e)
+
+
+def refresh_email_url(report: ReportPdf) -> ReportPdf:
+    """Set email_url for an uploaded PDF per the delivery mode (fresh signature each call)."""
+    from .pdf_storage import create_signed_pdf_url
+
+    report.email_url = report.public_url
+    if report_delivery_mode() == "signed_link" and report.object_path:
+        ttl = _env_int("REPORT_SIGNED_URL_TTL_SEC", 7 * 24 * 3600)
+        report.email_url = create_signed_pdf_url(report.object_path, ttl) or report.public_url
+    return report
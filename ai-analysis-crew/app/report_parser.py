@@ -0,0 +1,296 @@
+"""
+Single-pass parser for the crew's markdown report.
+
+``parse_report`` walks the report once and returns a ``ParsedReport``: an ordered
+list of blocks (numbered headings, subsections, bullets, tables, paragraphs)
+grouped into the report's numbered sections, with "Label: value" pairs and
+price-bearing lines recorded during the same scan. PDF rendering
+(report_generator_enhanced), database extraction (database_storage) and
+currency conversion (currency_utils) all consume it, and results are cached per
+report text so the same report is not re-parsed by each consumer.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterator, Optional
+
+# Numbered heading as rendered in the PDF: "✅ **1. SECTION**", "**2. Supplier (Type)**"
+NUMBERED_HEADING_RE = re.compile(r"^✅?\s*\*?\*?(\d+)\.\s+\*?\*?[A-Z]")
+_NUMBERED_PREFIX_RE = re.compile(r"^✅?\s*\*?\*?\d+\.\s+\*?\*?")
+# "## 4. TOP 3 SUPPLIERS" (not rendered, but still delimits a section)
+_HASH_SECTION_RE = re.compile(r"^#+\s*(\d+)\.\s*(.+)$")
+_BULLET_PREFIX_RE = re.compile(r"^[-•*]\s+")
+# Label part of "- **Label:** value" (everything before the first colon).
+_KV_LABEL_RE = re.compile(r"^(?:[-•*]\s*)?\**\s*([A-Za-z][\w /()&.,'-]{0,48}?)\s*\**\s*$")
+_KV_MAX_LABEL = 60
+_WS_RE = re.compile(r"\s+")
+# Lines convert_prices_in_report rewrites: a currency symbol, KSh or a common ISO code.
+PRICE_MARKER_RE = re.compile(r"[£$€₹]|KSh|\b(?:GBP|USD|EUR|KES)\b", re.IGNORECASE)
+_PRICE_SYMBOLS = ("£", "$", "€", "₹")
+_PRICE_CODES = ("GBP", "USD", "EUR", "KES", "KSH")
+
+
+def has_price_marker(line: str) -> bool:
+    """PRICE_MARKER_RE.search with substring pre-checks (most lines have no marker)."""
+    if any(sym in line for sym in _PRICE_SYMBOLS):
+        return True
+    upper = line.upper()
+    if not any(code in upper for code in _PRICE_CODES):
+        return False
+    return PRICE_MARKER_RE.search(line) is not None
+
+
+def _parse_table_row(line: str, num_cols: Optional[int] = None) -> list:
+    """Parse a single markdown table row. If num_cols is set, pad/truncate to that count."""
+    line = line.strip()
+    if not line or '|' not in line:
+        return []
+    parts = line.split('|')
+    # Strip outer empty cells from leading/trailing pipes: | A | B | C | -> ['', ' A ', ' B ', ' C ', '']
+    if len(parts) > 2:
+        cells = [p.strip() for p in parts[1:-1]]
+    else:
+        cells = [p.strip() for p in parts if p.strip()]
+    if num_cols is not None:
+        if len(cells) < num_cols:
+            cells.extend([''] * (num_cols - len(cells)))
+        elif len(cells) > num_cols:
+            cells = cells[:num_cols]
+    return cells
+
+
+def parse_markdown_table(lines_iter):
+    """Parse a markdown table from lines. Preserves column count and consistent structure."""
+    return _parse_markdown_table_span(lines_iter)[0]
+
+
+def _parse_markdown_table_span(lines_iter) -> tuple[Optional[list], int]:
+    """parse_markdown_table plus the number of source lines the table occupies."""
+    table_data = []
+    headers = []
+
+    # Get header row
+    header_line = next(lines_iter, None)
+    if not header_line:
+        return None, 0
+
+    # Parse headers (no padding; we use this to get num_cols)
+    headers = _parse_table_row(header_line)
+    if not headers:
+        return None, 0
+    num_cols = len(headers)
+    consumed = 1
+
+    # Skip separator line (e.g., |---|---|)
+    if next(lines_iter, None) is not None:
+        consumed += 1
+
+    # Get data rows with same column count as header; pipe lines that parse to
+    # no cells still belong to the table, so they count as consumed.
+    for line in lines_iter:
+        if not line.strip():
+            break
+        row = _parse_table_row(line, num_cols)
+        if not row and '|' not in line:
+            break
+        consumed += 1
+        if row:
+            table_data.append(row)
+
+    return [headers] + table_data, consumed
+
+
+@dataclass
+class Block:
+    """
+    One rendered unit. kind is one of: numbered (numbered heading), subsection
+    (**Text**), bullet, table, paragraph, pipe (stray table row), heading (# line).
+    """
+
+    kind: str
+    text: str
+    line: int
+    number: Optional[int] = None
+    title: str = ""
+    rows: Optional[list[list[str]]] = None
+    key: Optional[str] = None
+    value: Optional[str] = None
+
+
+@dataclass
+class Section:
+    """A top-level numbered section; blocks excludes the heading itself."""
+
+    number: Optional[int]
+    title: str
+    blocks: list[Block] = field(default_factory=list)
+
+    def text(self) -> str:
+        return "\n".join(b.text for b in self.blocks)
+
+
+@dataclass
+class ParsedReport:
+    text: str
+    blocks: list[Block]
+    sections: list[Section]
+    # First value seen for each normalised "Label:" anywhere in the report.
+    fields: dict[str, str]
+    # Indices (into text.split("\n")) of lines carrying a currency marker.
+    price_lines: list[int]
+
+    def section(self, number: int, keyword: str = "") -> Optional[Section]:
+        """Top-level section by number, falling back to the first whose title contains keyword."""
+        kw = keyword.lower()
+        for s in self.sections:
+            if s.number == number and (not kw or kw in s.title.lower()):
+                return s
+        if kw:
+            for s in self.sections:
+                if s.number is not None and kw in s.title.lower():
+                    return s
+        return None
+
+    def first_table(self, *header_hints: str) -> Optional[list[list[str]]]:
+        hints = [h.lower() for h in header_hints]
+        for b in self.blocks:
+            if b.kind == "table" and b.rows:
+                header = " ".join(b.rows[0]).lower()
+                if not hints or any(h in header for h in hints):
+                    return b.rows
+        return None
+
+
+def normalize_key(key: str) -> str:
+    return _WS_RE.sub(" ", key.strip().strip("*").strip()).lower()
+
+
+def _is_top_level(line_clean: str, title: str, number: int, last_number: int) -> bool:
+    """
+    Report sections ("✅ **4. TOP 3 SUPPLIERS**") vs numbered sub-items such as
+    supplier headings ("**1. Acme Parts (Distributor)**"): sections carry the
+    check mark or an all-caps title, and their numbers only increase.
+    """
+    if number <= last_number:
+        return False
+    if line_clean.startswith("✅"):
+        return True
+    letters = [c for c in title if c.isalpha()]
+    return bool(letters) and all(c.isupper() for c in letters)
+
+
+def _set_kv(block: Block, fields: dict[str, str]) -> None:
+    colon = block.text.find(":", 0, _KV_MAX_LABEL)
+    if colon < 0:
+        return
+    m = _KV_LABEL_RE.match(block.text, 0, colon)
+    if not m:
+        return
+    block.key = normalize_key(m.group(1))
+    block.value = block.text[colon + 1:].strip().strip("*").strip()
+    if block.value and block.key not in fields:
+        fields[block.key] = block.value
+
+
+def _parse(report_text: str) -> ParsedReport:
+    lines = report_text.split("\n")
+    blocks: list[Block] = []
+    sections: list[Section] = [Section(number=None, title="")]
+    fields: dict[str, str] = {}
+    price_lines: list[int] = []
+
+    def add(block: Block) -> None:
+        blocks.append(block)
+        sections[-1].blocks.append(block)
+
+    def open_section(block: Block) -> None:
+        blocks.append(block)
+        sections.append(Section(number=block.number, title=block.title))
+
+    n = len(lines)
+    i = 0
+    while i < n:
+        line = lines[i]
+        line_clean = line.strip()
+        if not line_clean:
+            i += 1
+            continue
+        if has_price_marker(line_clean):
+            price_lines.append(i)
+
+        next_line = lines[i + 1].strip() if i + 1 < n else ""
+
+        # Table header (current line has |, next line is separator ---)
+        if '|' in line_clean and next_line and '---' in next_line:
+            table_data, consumed = _parse_markdown_table_span(iter(lines[i:]))
+            if table_data:
+                add(Block(kind="table", text=line_clean, line=i, rows=table_data))
+                # Skip every source line of the table so pipe-delimited data is not repeated below
+                for j in range(i + 1, min(i + consumed, n)):
+                    if has_price_marker(lines[j]):
+                        price_lines.append(j)
+                i += consumed
+                continue
+
+        m = NUMBERED_HEADING_RE.match(line_clean)
+        if m:
+            title = _NUMBERED_PREFIX_RE.sub('', line_clean).strip('*#:')
+            number = int(m.group(1))
+            block = Block(kind="numbered", text=line_clean, line=i, number=number, title=title)
+            if _is_top_level(line_clean, title, number, sections[-1].number or 0):
+                open_section(block)
+            else:
+                add(block)
+            i += 1
+            continue
+
+        if line_clean.startswith('**') and line_clean.endswith('**') and len(line_clean) < 100:
+            block = Block(kind="subsection", text=line_clean, line=i, title=line_clean.strip('*'))
+        elif line_clean.startswith('-') or line_clean.startswith('•') or line_clean.startswith('*'):
+            block = Block(kind="bullet", text=line_clean, line=i, title=_BULLET_PREFIX_RE.sub('', line_clean))
+        elif line_clean.startswith('|') and line_clean.count('|') >= 2 and not line_clean.startswith('| **'):
+            block = Block(kind="pipe", text=line_clean, line=i)
+        elif line_clean.startswith('#'):
+            block = Block(kind="heading", text=line_clean, line=i)
+            hm = _HASH_SECTION_RE.match(line_clean)
+            if hm and int(hm.group(1)) > (sections[-1].number or 0):
+                block.number, block.title = int(hm.group(1)), hm.group(2).strip("*# ")
+                open_section(block)
+                i += 1
+                continue
+        else:
+            block = Block(kind="paragraph", text=line_clean, line=i)
+        if block.kind in ("subsection", "bullet", "paragraph"):
+            _set_kv(block, fields)
+        add(block)
+        i += 1
+
+    return ParsedReport(text=report_text, blocks=blocks, sections=sections, fields=fields, price_lines=price_lines)
+
+
+@lru_cache(maxsize=4)
+def parse_report(report_text: str) -> ParsedReport:
+    """Parse once per distinct report text (PDF, DB extraction and currency share the result)."""
+    return _parse(report_text or "")
+
+
+def iter_labelled(blocks: list[Block]) -> Iterator[tuple[str, str]]:
+    """
+    (key, value) for each "Label: value" block. A label with no inline value
+    ("**Price Range:**") takes the next paragraph/bullet text as its value.
+    """
+    pending: Optional[str] = None
+    for b in blocks:
+        if b.key is not None and b.value:
+            pending = None
+            yield b.key, b.value
+        elif b.key is not None:
+            pending = b.key
+        elif pending and b.kind in ("paragraph", "bullet"):
+            yield pending, b.text
+            pending = None
+        elif b.kind in ("numbered", "subsection", "table"):
+            pending = None
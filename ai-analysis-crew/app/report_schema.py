@@ -0,0 +1,153 @@
+"""
+Structured companion to the Report Compiler's markdown.
+
+The report task ends its answer with one fenced ```json block matching
+``StructuredReport`` (part, specs, suppliers, price ranges with currency).
+``split_structured_report`` removes that block from the markdown and validates
+it; storage, currency conversion and PDF layout then read fields from the model
+instead of recovering them from the prose. When the block is missing or fails
+validation the caller gets ``None`` and the markdown parser path is used as before.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import Optional
+
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+# Last ```json fence in the answer; the markdown report precedes it.
+_JSON_FENCE_RE = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+
+
+class PriceRange(BaseModel):
+    low: Optional[float] = Field(default=None, ge=0)
+    high: Optional[float] = Field(default=None, ge=0)
+    currency: Optional[str] = None
+    # Exact price text as written in the markdown (lets conversion rewrite it in place)
+    text: Optional[str] = None
+    # new / used / refurbished for part-level estimates
+    condition: Optional[str] = None
+
+    @field_validator("currency")
+    @classmethod
+    def _upper_code(cls, v: Optional[str]) -> Optional[str]:
+        v = (v or "").strip().upper()
+        return v or None
+
+    @field_validator("high")
+    @classmethod
+    def _high_not_below_low(cls, v: Optional[float], info: ValidationInfo) -> Optional[float]:
+        low = info.data.get("low")
+        if v is not None and low is not None and v < low:
+            raise ValueError("high must be >= low")
+        return v
+
+
+class PartDetails(BaseModel):
+    name: str
+    model_number: Optional[str] = None
+    part_numbers: list[str] = Field(default_factory=list)
+    serial_number: Optional[str] = None
+    category: Optional[str] = None
+    manufacturer: Optional[str] = None
+    # 0-100
+    confidence: Optional[float] = Field(default=None, ge=0, le=100)
+
+
+class Spec(BaseModel):
+    name: str
+    value: str
+
+
+class Supplier(BaseModel):
+    name: str
+    type: Optional[str] = None
+    analysis: Optional[str] = None
+    price: Optional[PriceRange] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    website: Optional[str] = None
+    address: Optional[str] = None
+
+
+class Alternative(BaseModel):
+    name: str
+    specs: Optional[str] = None
+    price: Optional[PriceRange] = None
+    compatibility: Optional[str] = None
+
+
+class StructuredReport(BaseModel):
+    schema_version: int = SCHEMA_VERSION
+    currency: Optional[str] = None
+    part: PartDetails
+    description: Optional[str] = None
+    specs: list[Spec] = Field(default_factory=list)
+    suppliers: list[Supplier] = Field(default_factory=list)
+    alternatives: list[Alternative] = Field(default_factory=list)
+    compatible_vehicles: list[str] = Field(default_factory=list)
+    price_estimates: list[PriceRange] = Field(default_factory=list)
+
+    @field_validator("currency")
+    @classmethod
+    def _upper_code(cls, v: Optional[str]) -> Optional[str]:
+        v = (v or "").strip().upper()
+        return v or None
+
+    def price_ranges(self) -> list[PriceRange]:
+        """Every price in the report, in report order."""
+        prices = [s.price for s in self.suppliers if s.price]
+        prices.extend(a.price for a in self.alternatives if a.price)
+        prices.extend(self.price_estimates)
+        return prices
+
+
+# Appended to the report task description; kept compact (it is sent with every run).
+REPORT_JSON_INSTRUCTIONS = """
+        **MACHINE-READABLE SUMMARY (REQUIRED):**
+        After the conclusion, end your answer with exactly one fenced ```json block and nothing after it.
+        It must be valid JSON with this shape (omit unknown values or use null; numbers without symbols or commas):
+        ```json
+        {"currency": "GBP",
+         "part": {"name": "", "model_number": "", "part_numbers": [""], "serial_number": null,
+                  "category": "", "manufacturer": "", "confidence": 95},
+         "description": "first 2-3 sentences of the full analysis",
+         "specs": [{"name": "", "value": ""}],
+         "suppliers": [{"name": "", "type": "", "analysis": "",
+                        "price": {"low": 1800, "high": 2600, "currency": "GBP", "text": "£1,800 - £2,600"},
+                        "phone": "", "email": "", "website": "", "address": ""}],
+         "alternatives": [{"name": "", "specs": "", "compatibility": "",
+                           "price": {"low": 0, "high": 0, "currency": "GBP", "text": ""}}],
+         "compatible_vehicles": [""],
+         "price_estimates": [{"condition": "new", "low": 0, "high": 0, "currency": "GBP", "text": ""}]}
+        ```
+        Every price "text" must be copied exactly as it appears in the markdown report above.
+        """
+
+
+def split_structured_report(answer: str) -> tuple[str, Optional[StructuredReport]]:
+    """
+    Separate the markdown report from its trailing JSON block.
+
+    Returns (markdown, report). The JSON block is always removed from the
+    markdown when present; report is None if it is absent or invalid.
+    """
+    if not answer or "```" not in answer:
+        return answer, None
+    matches = list(_JSON_FENCE_RE.finditer(answer))
+    if not matches:
+        return answer, None
+    match = matches[-1]
+    markdown = (answer[:match.start()] + answer[match.end():]).strip()
+    try:
+        structured = StructuredReport.model_validate_json(match.group(1))
+    except ValidationError as e:
+        logger.warning("Structured report failed validation (%d errors): %s", e.error_count(), e.errors()[:3])
+        return markdown, None
+    return markdown, structured
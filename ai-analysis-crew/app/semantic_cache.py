@@ -0,0 +1,464 @@
+"""Near-duplicate lookup for keyword analyses over past cached results.
+
+The exact result cache (analysis_cache) misses on queries that name the same
+part differently: "bosch 0 986 424 751 alternator" vs "Alternator BOSCH
+0986424751". This module keeps an embedding index of every query stored in
+crew_analysis_cache and is consulted by ``run_analysis_background`` when the
+exact lookup misses:
+
+- similarity >= SEMANTIC_CACHE_SERVE_THRESHOLD and the same content words
+  (``content_key``: canonical tokens minus filler, in any order): the prior
+  result is served exactly like an exact hit
+- similarity >= SEMANTIC_CACHE_SEED_THRESHOLD and no conflicting part number:
+  the crew runs, with the prior report passed to setup_crew as a starting
+  point to verify and refresh. The seed threshold may sit above the serve
+  one: with different content words only a very close match is worth seeding
+
+Only entries for the same country, region and currency are candidates, and
+a served entry must still pass the exact cache's staleness checks.
+
+Embedders (SEMANTIC_CACHE_EMBEDDER):
+- hashing (default): local signed feature hashing of word tokens and
+  character n-grams; no model download, deterministic, microseconds per query
+- openai: SEMANTIC_CACHE_OPENAI_MODEL embeddings (text-embedding-3-small),
+  computed once per query and kept in the index
+
+The index is a NumPy matrix of unit vectors plus metadata, persisted to
+SEMANTIC_CACHE_DIR and rebuilt from the cache table when missing or built
+with another embedder:
+
+  python -m app.semantic_cache --rebuild
+  python -m app.semantic_cache --stats
+
+Offline hit rate / precision: python -m app.bench.semantic_cache
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Protocol
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .analysis_cache import CachedAnalysis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = Path(__file__).resolve().parent.parent / "temp" / "semantic_cache"
+HASH_DIM = 512
+SERVE = "serve"
+SEED = "seed"
+
+_SPLIT_RE = re.compile(r"[^\w]+")
+_PART_SEPARATOR_RE = re.compile(r"(?<=[a-z0-9])[./-](?=[a-z0-9])")
+_DIGIT_RE = re.compile(r"\d")
+# Words that do not change which part is meant; ignored by content_key.
+FILLER_WORDS = frozenset(
+    "a an the for of and with to in on buy sale price prices cost cheap new genuine "
+    "original oem replacement supplier suppliers part parts".split()
+)
+
+
+def _env_float(name: str, default: float, *, lo: float, hi: float) -> float:
+    try:
+        v = float((os.getenv(name) or "").strip() or default)
+    except ValueError:
+        v = default
+    return max(lo, min(v, hi))
+
+
+def semantic_cache_enabled() -> bool:
+    flag = (os.getenv("SEMANTIC_CACHE_ENABLED") or "1").strip().lower()
+    return flag not in ("0", "false", "no", "off")
+
+
+def thresholds() -> tuple[float, float]:
+    """(serve, seed) cosine thresholds; seed applies to candidates that are not served."""
+    serve = _env_float("SEMANTIC_CACHE_SERVE_THRESHOLD", 0.85, lo=0.5, hi=1.0)
+    seed = _env_float("SEMANTIC_CACHE_SEED_THRESHOLD", 0.90, lo=0.3, hi=1.0)
+    return serve, seed
+
+
+def canonical_tokens(query: str) -> list[str]:
+    """
+    Casefolded tokens with part-number separators removed and adjacent
+    digit-bearing tokens joined ("0 986 424 751" -> "0986424751").
+    """
+    text = unicodedata.normalize("NFKC", query or "").casefold()
+    text = _PART_SEPARATOR_RE.sub("", text)
+    tokens: list[str] = []
+    prev_digits = False
+    for token in _SPLIT_RE.split(text):
+        if not token:
+            continue
+        has_digits = bool(_DIGIT_RE.search(token))
+        if has_digits and prev_digits:
+            tokens[-1] += token
+        else:
+            tokens.append(token)
+        prev_digits = has_digits
+    return tokens
+
+
+def content_key(query: str) -> str:
+    """
+    Canonical tokens without filler words, deduplicated and sorted. Only queries
+    with the same key may serve each other, so "pump seal kit" never gets the
+    "pump" report; similar queries with different keys are at most seeds.
+    """
+    return " ".join(sorted({t for t in canonical_tokens(query) if t not in FILLER_WORDS}))
+
+
+def part_numbers(query: str) -> frozenset[str]:
+    """Digit-bearing canonical tokens: the part, model or OEM numbers a query names."""
+    return frozenset(t for t in canonical_tokens(query) if _DIGIT_RE.search(t))
+
+
+class Embedder(Protocol):
+    name: str
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    """Signed feature hashing of tokens (weight 1) and char 3/4-grams (weight 0.5)."""
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def _features(self, text: str) -> dict[str, float]:
+        feats: dict[str, float] = {}
+        for token in sorted(set(canonical_tokens(text))):
+            feats["w:" + token] = feats.get("w:" + token, 0.0) + 1.0
+            padded = f"<{token}>"
+            for n in (3, 4):
+                for i in range(len(padded) - n + 1):
+                    key = "c:" + padded[i : i + n]
+                    feats[key] = feats.get(key, 0.0) + 0.5
+        return feats
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat, weight in self._features(text).items():
+                h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += weight if (h >> 63) & 1 else -weight
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class OpenAIEmbedder:
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or os.getenv("SEMANTIC_CACHE_OPENAI_MODEL") or "text-embedding-3-small"
+        self.name = f"openai-{self.model}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        from openai import OpenAI
+
+        # Canonical form so casing / separators do not cost separate embeddings
+        inputs = [" ".join(canonical_tokens(t)) or t for t in texts]
+        response = OpenAI().embeddings.create(model=self.model, input=inputs)
+        from .llm_usage import record_openai_response
+
+        record_openai_response("semantic_cache_embed", self.model, response)
+        out = np.array([d.embedding for d in response.data], dtype=np.float32)
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+
+def get_embedder(name: Optional[str] = None) -> Embedder:
+    name = (name or os.getenv("SEMANTIC_CACHE_EMBEDDER") or "hashing").strip().lower()
+    if name == "openai":
+        return OpenAIEmbedder()
+    return HashingEmbedder()
+
+
+@dataclass
+class IndexEntry:
+    fingerprint: str
+    query: str
+    user_country: str
+    user_region: str
+    user_currency: str
+    content_key: str
+
+
+@dataclass
+class SemanticMatch:
+    entry: IndexEntry
+    score: float
+    action: str  # SERVE or SEED
+
+
+def _scope(country: Optional[str], region: Optional[str], currency: Optional[str]) -> tuple[str, str, str]:
+    return ((country or "").strip().upper(), (region or "").strip().casefold(), (currency or "").strip().upper())
+
+
+class SemanticIndex:
+    """In-memory unit-vector matrix + metadata, persisted as <dir>/index.npz and <dir>/meta.json."""
+
+    def __init__(self, directory: Path, embedder: Embedder):
+        self.directory = directory
+        self.embedder = embedder
+        self.entries: list[IndexEntry] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> bool:
+        """False when there is no usable index on disk for this embedder."""
+        try:
+            meta = json.loads((self.directory / "meta.json").read_text(encoding="utf-8"))
+            if meta.get("embedder") != self.embedder.name:
+                return False
+            vectors = np.load(self.directory / "index.npz")["vectors"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug("Semantic index not loaded from %s: %s", self.directory, e)
+            return False
+        try:
+            entries = [IndexEntry(**e) for e in meta.get("entries") or []]
+        except TypeError:
+            # Index written before content_key: rebuild
+            return False
+        if len(entries) != len(vectors):
+            return False
+        with self._lock:
+            self.entries, self.vectors = entries, vectors.astype(np.float32)
+        return True
+
+    def save(self) -> None:
+        with self._lock:
+            entries, vectors = list(self.entries), self.vectors.copy()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_npz = self.directory / "index.tmp.npz"
+        np.savez(tmp_npz, vectors=vectors)
+        os.replace(tmp_npz, self.directory / "index.npz")
+        tmp_meta = self.directory / "meta.json.tmp"
+        tmp_meta.write_text(
+            json.dumps({"embedder": self.embedder.name, "entries": [asdict(e) for e in entries]}),
+            encoding="utf-8",
+        )
+        os.replace(tmp_meta, self.directory / "meta.json")
+
+    def add_many(self, entries: list[IndexEntry]) -> None:
+        if not entries:
+            return
+        vectors = self.embedder.embed([e.query for e in entries])
+        with self._lock:
+            replaced = {e.fingerprint for e in entries}
+            keep = [i for i, e in enumerate(self.entries) if e.fingerprint not in replaced]
+            old = self.vectors[keep] if len(self.entries) else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            self.entries = [self.entries[i] for i in keep] + list(entries)
+            self.vectors = np.vstack([old, vectors]) if len(old) else vectors
+
+    def search(
+        self,
+        query: str,
+        country: Optional[str],
+        region: Optional[str],
+        currency: Optional[str],
+        *,
+        exclude: Optional[str] = None,
+    ) -> Optional[tuple[IndexEntry, float]]:
+        """Best entry in the same country/region/currency and its cosine similarity."""
+        with self._lock:
+            entries, vectors = self.entries, self.vectors
+        if not entries:
+            return None
+        scope = _scope(country, region, currency)
+        mask = np.fromiter(
+            ((e.user_country, e.user_region, e.user_currency) == scope and e.fingerprint != exclude for e in entries),
+            dtype=bool,
+            count=len(entries),
+        )
+        if not mask.any():
+            return None
+        q = self.embedder.embed([query])[0]
+        scores = np.where(mask, vectors @ q, -1.0)
+        best = int(np.argmax(scores))
+        return entries[best], float(scores[best])
+
+
+def classify(query: str, entry: IndexEntry, score: float) -> Optional[str]:
+    """
+    SERVE, SEED or None for a candidate at this similarity. A seed must share
+    a part number with the query when either names one: the same brand and
+    part type with another number is a different part, however similar.
+    """
+    serve, seed = thresholds()
+    if score >= serve and content_key(query) == entry.content_key:
+        return SERVE
+    if score >= seed:
+        numbers, entry_numbers = part_numbers(query), part_numbers(entry.query)
+        if (numbers or entry_numbers) and not numbers & entry_numbers:
+            return None
+        return SEED
+    return None
+
+
+_index: Optional[SemanticIndex] = None
+_index_lock = threading.Lock()
+
+
+def index_dir() -> Path:
+    override = (os.getenv("SEMANTIC_CACHE_DIR") or "").strip()
+    return Path(override) if override else DEFAULT_DIR
+
+
+def get_index() -> SemanticIndex:
+    """Process-wide index: loaded from disk, else rebuilt from crew_analysis_cache."""
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            index = SemanticIndex(index_dir(), get_embedder())
+            if not index.load():
+                rebuild_index(index)
+            _index = index
+    return _index
+
+
+def _entry(fingerprint: str, keywords: str, country: Optional[str], region: Optional[str], currency: Optional[str]) -> IndexEntry:
+    c, r, cur = _scope(country, region, currency)
+    return IndexEntry(
+        fingerprint=fingerprint,
+        query=keywords,
+        user_country=c,
+        user_region=r,
+        user_currency=cur,
+        content_key=content_key(keywords),
+    )
+
+
+def rebuild_index(index: SemanticIndex) -> int:
+    """Re-embed every query in crew_analysis_cache (sync)."""
+    from .analysis_cache import CACHE_TABLE, _get_supabase
+
+    rows: list[dict[str, Any]] = []
+    try:
+        page, size = 0, 1000
+        while True:
+            res = (
+                _get_supabase()
+                .table(CACHE_TABLE)
+                .select("fingerprint,payload->>keywords,user_country,user_region,user_currency")
+                .range(page * size, page * size + size - 1)
+                .execute()
+            )
+            batch = res.data or []
+            rows.extend(batch)
+            if len(batch) < size:
+                break
+            page += 1
+    except Exception as e:
+        logger.warning("Semantic index rebuild skipped (%s); starting empty", e)
+        return 0
+    entries = [
+        _entry(r["fingerprint"], r.get("keywords") or "", r.get("user_country"), r.get("user_region"), r.get("user_currency"))
+        for r in rows
+        if r.get("fingerprint") and r.get("keywords")
+    ]
+    for start in range(0, len(entries), 256):
+        index.add_many(entries[start : start + 256])
+    try:
+        index.save()
+    except OSError as e:
+        logger.warning("Semantic index not persisted to %s: %s", index.directory, e)
+    logger.info("Semantic index rebuilt with %s entries (%s)", len(index), index.embedder.name)
+    return len(index)
+
+
+def semantic_lookup(
+    keywords: str,
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+) -> Optional[SemanticMatch]:
+    """Closest prior analysis worth serving or seeding from (sync; call via asyncio.to_thread)."""
+    if not keywords or not semantic_cache_enabled():
+        return None
+    try:
+        found = get_index().search(keywords, user_country, user_region, user_currency)
+    except Exception as e:
+        logger.warning("Semantic cache lookup failed: %s", e)
+        return None
+    if found is None:
+        return None
+    entry, score = found
+    action = classify(keywords, entry, score)
+    return SemanticMatch(entry=entry, score=score, action=action) if action else None
+
+
+def lookup_similar_analysis(
+    keywords: str,
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+) -> tuple[Optional["CachedAnalysis"], Optional[str]]:
+    """
+    (result to serve, None) on a SERVE match, (None, prior report text) on a
+    SEED match, else (None, None). Sync; call via asyncio.to_thread.
+    """
+    from .analysis_cache import fetch_cached_analysis
+
+    match = semantic_lookup(keywords, user_country, user_region, user_currency)
+    if match is None:
+        return None, None
+    if match.action == SERVE:
+        cached = fetch_cached_analysis(match.entry.fingerprint)
+        if cached is not None:
+            logger.info("Semantic cache hit %.3f: %r ~ %r", match.score, keywords, match.entry.query)
+            return cached, None
+    prior = fetch_cached_analysis(match.entry.fingerprint, fresh_only=False)
+    if prior is None:
+        return None, None
+    logger.info("Semantic cache seed %.3f: %r ~ %r", match.score, keywords, match.entry.query)
+    return None, (prior.payload.get("report") or {}).get("text")
+
+
+def index_analysis(
+    fingerprint: str,
+    keywords: str,
+    user_country: Optional[str],
+    user_region: Optional[str],
+    user_currency: Optional[str],
+) -> None:
+    """Add a newly cached analysis to the index and persist it (sync)."""
+    if not keywords or not semantic_cache_enabled():
+        return
+    try:
+        index = get_index()
+        index.add_many([_entry(fingerprint, keywords, user_country, user_region, user_currency)])
+        index.save()
+    except Exception as e:
+        logger.warning("Semantic index update failed: %s", e)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="re-embed all cached analyses")
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args(argv)
+
+    index = SemanticIndex(index_dir(), get_embedder())
+    if args.rebuild or not index.load():
+        rebuild_index(index)
+    print(f"{len(index)} entries, embedder {index.embedder.name}, dir {index.directory}")
+
+
+if __name__ == "__main__":
+    main()
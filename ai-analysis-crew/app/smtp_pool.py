@@ -0,0 +1,227 @@
+"""Pooled, authenticated SMTP sessions shared by every sender in email_sender.
+
+Opening a connection costs TCP + TLS + AUTH; bulk paths (billing/reminder crons,
+marketing sends, admin summaries) reuse sessions from here instead.
+
+Env:
+- SMTP_POOL_SIZE (default 3): max concurrent sessions per SMTP config
+- SMTP_POOL_IDLE_SEC (default 60): idle sessions older than this are closed, not reused
+- SMTP_POOL_MAX_MESSAGES (default 100): recycle a session after this many messages
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import smtplib
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int, *, lo: int) -> int:
+    try:
+        return max(lo, int((os.getenv(name) or "").strip() or default))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class SmtpConfig:
+    host: str
+    port: int
+    user: str
+    password: str
+    secure: bool
+
+
+@dataclass
+class _Session:
+    smtp: smtplib.SMTP
+    created_at: float
+    last_used_at: float
+    messages: int = 0
+
+
+def _is_reconnectable(exc: BaseException) -> bool:
+    """Server dropped us (or said 421 'closing channel'): a fresh session may succeed."""
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code == 421:
+        return True
+    return isinstance(exc, (ConnectionResetError, BrokenPipeError, socket.timeout))
+
+
+class SmtpConnectionPool:
+    """Bounded pool of logged-in SMTP sessions for one SmtpConfig."""
+
+    def __init__(
+        self,
+        config: SmtpConfig,
+        *,
+        max_size: int | None = None,
+        idle_timeout: float | None = None,
+        max_messages: int | None = None,
+    ) -> None:
+        self.config = config
+        self.max_size = max_size or _env_int("SMTP_POOL_SIZE", 3, lo=1)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else _env_int("SMTP_POOL_IDLE_SEC", 60, lo=1)
+        self.max_messages = max_messages or _env_int("SMTP_POOL_MAX_MESSAGES", 100, lo=1)
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._idle: deque[_Session] = deque()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _Session:
+        cfg = self.config
+        # Quick connectivity test so an unreachable host fails in 5s, not the 30s SMTP timeout.
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe.settimeout(5)
+        try:
+            if probe.connect_ex((cfg.host, cfg.port)) != 0:
+                raise ConnectionRefusedError(f"Cannot reach {cfg.host}:{cfg.port}")
+        finally:
+            probe.close()
+
+        if cfg.secure:
+            smtp: smtplib.SMTP = smtplib.SMTP_SSL(host=cfg.host, port=cfg.port, timeout=30)
+        else:
+            # Pass host/port into constructor so smtplib stores a non-empty internal hostname for TLS SNI.
+            smtp = smtplib.SMTP(host=cfg.host, port=cfg.port, timeout=30)
+            smtp._host = cfg.host  # type: ignore[attr-defined]
+            smtp.starttls()
+        try:
+            smtp.login(cfg.user, cfg.password)
+        except Exception:
+            self._close(smtp)
+            raise
+        now = time.monotonic()
+        logger.debug("SMTP session opened to %s:%s", cfg.host, cfg.port)
+        return _Session(smtp=smtp, created_at=now, last_used_at=now)
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> _Session:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                session = self._idle.pop()
+                if now - session.last_used_at <= self.idle_timeout:
+                    return session
+                self._close(session.smtp)
+        return self._connect()
+
+    def _checkin(self, session: _Session) -> None:
+        session.last_used_at = time.monotonic()
+        if session.messages >= self.max_messages:
+            self._close(session.smtp)
+            return
+        with self._lock:
+            self._idle.append(session)
+
+    @contextmanager
+    def session(self) -> Iterator[_Session]:
+        """Borrow a session; it is returned to the pool unless the body raised."""
+        self._slots.acquire()
+        try:
+            session = self._checkout()
+            try:
+                yield session
+            except BaseException:
+                self._close(session.smtp)
+                raise
+            self._checkin(session)
+        finally:
+            self._slots.release()
+
+    def _send_on(self, session: _Session, from_addr: str, to_addrs: list[str], message: str) -> None:
+        session.smtp.sendmail(from_addr, to_addrs, message)
+        session.messages += 1
+
+    def send(self, from_addr: str, to_addrs: list[str], message: str) -> None:
+        """Send one message, reconnecting once if the pooled session was dropped."""
+        for attempt in (1, 2):
+            try:
+                with self.session() as session:
+                    self._send_on(session, from_addr, to_addrs, message)
+                return
+            except Exception as exc:
+                if attempt == 2 or not _is_reconnectable(exc):
+                    raise
+                logger.info("SMTP session dropped (%s); reconnecting", exc)
+
+    def send_many(self, from_addr: str, messages: list[tuple[list[str], str]]) -> list[Exception | None]:
+        """
+        Pipeline messages over one session. Returns one entry per message:
+        None on success or the exception that message failed with. A dropped
+        session is replaced and the current message retried once.
+        """
+        results: list[Exception | None] = []
+        pending = list(messages)
+        retried = False
+        while pending:
+            connected = False
+            try:
+                with self.session() as session:
+                    connected = True
+                    while pending:
+                        to_addrs, message = pending[0]
+                        try:
+                            self._send_on(session, from_addr, to_addrs, message)
+                        except smtplib.SMTPRecipientsRefused as exc:
+                            # Session stays usable; only this recipient failed.
+                            results.append(exc)
+                        else:
+                            results.append(None)
+                        pending.pop(0)
+                        retried = False
+                        if session.messages >= self.max_messages:
+                            break
+            except Exception as exc:
+                if _is_reconnectable(exc) and not retried:
+                    retried = True
+                    logger.info("SMTP session dropped mid-batch (%s); reconnecting", exc)
+                    continue
+                if not connected:
+                    # Could not open a session at all (unreachable / auth): fail the rest.
+                    results.extend(exc for _ in pending)
+                    break
+                results.append(exc)
+                pending.pop(0)
+                retried = False
+        return results
+
+    def close_all(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop().smtp)
+
+
+_pools: dict[SmtpConfig, SmtpConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(config: SmtpConfig) -> SmtpConnectionPool:
+    """Process-wide pool per config; a changed config (env edit) gets a fresh pool."""
+    with _pools_lock:
+        pool = _pools.get(config)
+        if pool is None:
+            for stale in _pools.values():
+                stale.close_all()
+            _pools.clear()
+            pool = SmtpConnectionPool(config)
+            _pools[config] = pool
+        return pool
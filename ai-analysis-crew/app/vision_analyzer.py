@@ -6,6 +6,8 @@ import base64
 from openai import OpenAI
 from typing import Optional
 
+from .model_routing import ModelTrace, routed_chat_completion
+
 # Lines/sentences to drop before sending vision text to CrewAI agents
 _VISION_DISCLAIMER_FRAGMENTS = (
     "unable to identify",
@@ -19,12 +21,19 @@ _VISION_DISCLAIMER_FRAGMENTS = (
 )
 
 
-def analyze_image_with_gpt4o(image_data: bytes) -> str:
+def analyze_image_with_gpt4o(
+    image_data: bytes,
+    *,
+    tier: Optional[str] = None,
+    trace: Optional[ModelTrace] = None,
+) -> str:
     """
     Analyze an image using GPT-4o's vision capabilities directly.
     
     Args:
         image_data: Raw image bytes
+        tier: User's plan tier for model routing ("vision" step)
+        trace: Records the model that served the call
         
     Returns:
         Detailed description of the car part from the image
@@ -70,8 +79,11 @@ Focus on extracting ALL visible text and numbers on the part."""
 
     try:
         # Call GPT-4o with vision
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        response = routed_chat_completion(
+            client,
+            "vision",
+            tier=tier,
+            trace=trace,
             messages=[
                 {
                     "role": "user",
@@ -141,13 +153,21 @@ def sanitize_vision_description(text: str) -> str:
     return cleaned or text.strip()
 
 
-def get_image_description(image_data: Optional[bytes], keywords: Optional[str] = None) -> str:
+def get_image_description(
+    image_data: Optional[bytes],
+    keywords: Optional[str] = None,
+    *,
+    tier: Optional[str] = None,
+    trace: Optional[ModelTrace] = None,
+) -> str:
     """
     Get a comprehensive description combining image analysis and keywords.
     
     Args:
         image_data: Optional image bytes
         keywords: Optional text keywords
+        tier: User's plan tier for model routing
+        trace: Records the model that served the vision call
         
     Returns:
         Combined description for CrewAI agents
@@ -157,7 +177,7 @@ def get_image_description(image_data: Optional[bytes], keywords: Optional[str] =
     # Analyze image if provided
     if image_data:
         try:
-            image_analysis = analyze_image_with_gpt4o(image_data)
+            image_analysis = analyze_image_with_gpt4o(image_data, tier=tier, trace=trace)
             descriptions.append(f"**Image Analysis:**\n{image_analysis}")
         except Exception as e:
             print(f"Image analysis failed: {e}")
@@ -0,0 +1,97 @@
+-- Atomic credit ledger: one RPC deducts/refunds and writes credit_transactions.
+-- Run in Supabase SQL Editor. Backend (credit_service.py) calls it via
+-- supabase.rpc('apply_credit_delta', ...) and falls back to the legacy
+-- read-check-write path until this function exists.
+
+-- 1) Idempotency key on ledger rows (e.g. 'analysis_charge:<job_id>')
+ALTER TABLE credit_transactions ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS credit_transactions_idempotency_key_key
+  ON credit_transactions (idempotency_key)
+  WHERE idempotency_key IS NOT NULL;
+
+-- 2) Single-statement deduct / refund.
+--    p_delta < 0 deducts (fails with insufficient_credits), p_delta > 0 adds.
+--    The balance row (user_credits when present, else profiles.credits) is
+--    locked FOR UPDATE so concurrent analyses cannot lose an update.
+--    A repeated p_idempotency_key returns the original balance with applied=false.
+CREATE OR REPLACE FUNCTION public.apply_credit_delta(
+    p_user_id UUID,
+    p_delta INTEGER,
+    p_reason TEXT,
+    p_metadata JSONB DEFAULT '{}'::jsonb,
+    p_idempotency_key TEXT DEFAULT NULL
+) RETURNS JSONB AS $$
+DECLARE
+    v_has_user_credits BOOLEAN := FALSE;
+    v_rows INTEGER := 0;
+    v_before INTEGER;
+    v_after INTEGER;
+BEGIN
+    IF p_idempotency_key IS NOT NULL THEN
+        SELECT credits_after INTO v_after
+        FROM credit_transactions
+        WHERE idempotency_key = p_idempotency_key
+        LIMIT 1;
+        IF FOUND THEN
+            RETURN jsonb_build_object('ok', TRUE, 'applied', FALSE, 'balance', v_after, 'error', NULL);
+        END IF;
+    END IF;
+
+    IF to_regclass('public.user_credits') IS NOT NULL THEN
+        EXECUTE 'SELECT balance FROM user_credits WHERE user_id = $1 FOR UPDATE'
+            INTO v_before USING p_user_id;
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+        v_has_user_credits := v_rows > 0;
+    END IF;
+
+    IF NOT v_has_user_credits THEN
+        SELECT credits INTO v_before FROM profiles WHERE id = p_user_id FOR UPDATE;
+        IF NOT FOUND THEN
+            RETURN jsonb_build_object('ok', FALSE, 'applied', FALSE, 'balance', 0, 'error', 'user_not_found');
+        END IF;
+    END IF;
+
+    v_before := GREATEST(0, COALESCE(v_before, 0));
+    IF p_delta < 0 AND v_before < -p_delta THEN
+        RETURN jsonb_build_object('ok', FALSE, 'applied', FALSE, 'balance', v_before, 'error', 'insufficient_credits');
+    END IF;
+    v_after := GREATEST(0, v_before + p_delta);
+
+    IF v_has_user_credits THEN
+        EXECUTE 'UPDATE user_credits SET balance = $1 WHERE user_id = $2' USING v_after, p_user_id;
+    ELSE
+        UPDATE profiles SET credits = v_after WHERE id = p_user_id;
+    END IF;
+
+    INSERT INTO credit_transactions (
+        user_id, transaction_type, amount, credits_before, credits_after,
+        reason, metadata, idempotency_key
+    ) VALUES (
+        p_user_id,
+        CASE WHEN p_delta < 0 THEN 'deduct' ELSE 'add' END,
+        ABS(p_delta),
+        v_before,
+        v_after,
+        p_reason,
+        COALESCE(p_metadata, '{}'::jsonb),
+        p_idempotency_key
+    );
+
+    RETURN jsonb_build_object('ok', TRUE, 'applied', TRUE, 'balance', v_after, 'error', NULL);
+EXCEPTION
+    WHEN unique_violation THEN
+        -- A concurrent call with the same key committed first; this block's
+        -- balance update is rolled back with the exception.
+        SELECT credits_after INTO v_after
+        FROM credit_transactions
+        WHERE idempotency_key = p_idempotency_key
+        LIMIT 1;
+        RETURN jsonb_build_object('ok', TRUE, 'applied', FALSE, 'balance', COALESCE(v_after, 0), 'error', NULL);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.apply_credit_delta(UUID, INTEGER, TEXT, JSONB, TEXT) FROM PUBLIC, anon, authenticated;
+
+-- Refresh PostgREST schema cache (Supabase)
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,28 @@
+-- Result cache for keyword-only crew analyses (crew_analysis_cache).
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/analysis_cache.py stores the final report and uploaded PDF of a
+-- completed keyword analysis under a fingerprint of the normalized query,
+-- country, region and currency; a later job with the same fingerprint is
+-- completed from this row instead of running the crew.
+
+CREATE TABLE IF NOT EXISTS crew_analysis_cache (
+    fingerprint TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    user_country TEXT,
+    user_region TEXT,
+    user_currency TEXT,
+    rates_version INTEGER NOT NULL DEFAULT 0,
+    schema_version INTEGER NOT NULL DEFAULT 1,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    source_job_id UUID,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_hit_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_crew_analysis_cache_created_at
+  ON crew_analysis_cache (created_at);
+
+ALTER TABLE crew_analysis_cache ENABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
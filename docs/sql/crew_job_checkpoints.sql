@@ -0,0 +1,18 @@
+-- Per-stage checkpoints for crew analysis jobs (crew_job_checkpoints).
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/job_checkpoints.py writes one row per completed stage (vision text, each
+-- crew task output, final report, PDF, database store, email) so a restarted
+-- job resumes after the last completed stage. Rows are removed when the job
+-- completes.
+
+CREATE TABLE IF NOT EXISTS crew_job_checkpoints (
+    job_id UUID NOT NULL REFERENCES crew_analysis_jobs(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (job_id, stage)
+);
+
+ALTER TABLE crew_job_checkpoints ENABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
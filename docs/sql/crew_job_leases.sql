@@ -0,0 +1,15 @@
+-- Worker leases for crew analysis jobs.
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/job_leases.py: the run processing a job holds lease_owner and renews
+-- lease_expires_at with a heartbeat; stuck-job recovery reclaims only jobs
+-- whose lease has expired.
+
+ALTER TABLE crew_analysis_jobs
+    ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_crew_analysis_jobs_lease_expiry
+  ON crew_analysis_jobs (lease_expires_at)
+  WHERE status IN ('pending', 'processing') AND lease_expires_at IS NOT NULL;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,53 @@
+-- Durable outbound email queue (email_outbox) + dead letters.
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/email_outbox.py enqueues, a background worker drains with exponential
+-- backoff, and rows that exhaust retries are copied to email_dead_letters.
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT 'transactional',
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL DEFAULT '',
+    text_body TEXT,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'sending', 'sent', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    claimed_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    transport TEXT,
+    last_attempt_ms INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    sent_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+  ON email_outbox (next_attempt_at)
+  WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_email_outbox_claimed
+  ON email_outbox (claimed_at)
+  WHERE status = 'sending';
+CREATE INDEX IF NOT EXISTS idx_email_outbox_created ON email_outbox (created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_kind ON email_outbox (kind);
+
+CREATE TABLE IF NOT EXISTS email_dead_letters (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    outbox_id UUID REFERENCES email_outbox(id) ON DELETE SET NULL,
+    idempotency_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    requeued_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_dead_letters_created ON email_dead_letters (created_at DESC);
+
+ALTER TABLE email_outbox ENABLE ROW LEVEL SECURITY;
+ALTER TABLE email_dead_letters ENABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,57 @@
+-- LLM token and cost ledger (llm_usage_events) plus admin aggregate views.
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/llm_usage.py writes one row per OpenAI call or per crew agent per
+-- kickoff, in batches; GET /api/admin/llm-usage reads the views below.
+
+CREATE TABLE IF NOT EXISTS llm_usage_events (
+    id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    job_id UUID,
+    user_id UUID,
+    tier TEXT,
+    campaign_id UUID,
+    lead_id UUID,
+    step TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 1,
+    cost_usd NUMERIC(12, 6),
+    latency_ms INTEGER,
+    fallback BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_usage_events_created_at ON llm_usage_events (created_at);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_events_job_id ON llm_usage_events (job_id) WHERE job_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_llm_usage_events_campaign_id ON llm_usage_events (campaign_id) WHERE campaign_id IS NOT NULL;
+
+CREATE OR REPLACE VIEW llm_usage_daily AS
+SELECT
+    (created_at AT TIME ZONE 'UTC')::date AS day,
+    job_id IS NOT NULL AS analysis,
+    COALESCE(tier, 'unknown') AS tier,
+    step,
+    model,
+    SUM(requests)::BIGINT AS requests,
+    SUM(prompt_tokens)::BIGINT AS prompt_tokens,
+    SUM(completion_tokens)::BIGINT AS completion_tokens,
+    SUM(COALESCE(cost_usd, 0)) AS cost_usd
+FROM llm_usage_events
+GROUP BY 1, 2, 3, 4, 5;
+
+CREATE OR REPLACE VIEW llm_usage_by_job AS
+SELECT
+    job_id,
+    MAX(tier) AS tier,
+    MIN(created_at) AS first_at,
+    SUM(requests)::BIGINT AS requests,
+    SUM(prompt_tokens)::BIGINT AS prompt_tokens,
+    SUM(completion_tokens)::BIGINT AS completion_tokens,
+    SUM(COALESCE(cost_usd, 0)) AS cost_usd
+FROM llm_usage_events
+WHERE job_id IS NOT NULL
+GROUP BY job_id;
+
+ALTER TABLE llm_usage_events ENABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,26 @@
+-- Background CSV lead imports (POST /admin/marketing/leads/import with background=true).
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/marketing_import.py creates one row per import and updates rows_read and
+-- summary (imported / skipped_* counters, first errors) after every chunk;
+-- GET /admin/marketing/leads/import/{id} returns the row.
+
+CREATE TABLE IF NOT EXISTS marketing_lead_imports (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running'
+        CHECK (status IN ('running', 'completed', 'failed')),
+    filename TEXT,
+    delimiter TEXT,
+    rows_read INTEGER NOT NULL DEFAULT 0,
+    summary JSONB NOT NULL DEFAULT '{}'::jsonb,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_marketing_lead_imports_created
+  ON marketing_lead_imports (created_at DESC);
+
+ALTER TABLE marketing_lead_imports ENABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
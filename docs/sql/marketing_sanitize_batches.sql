@@ -0,0 +1,30 @@
+-- OpenAI Batch API jobs for the marketing sanitization review queue.
+-- Run in Supabase SQL Editor. Backend uses service_role (RLS bypass).
+-- app/marketing_sanitize.py (MARKETING_SANITIZE_MODE=batch_api) submits review
+-- leads as one batch job, tags them crew_trace='batch_pending:<id>', and writes
+-- results back when the job completes. chunks maps each request's custom_id
+-- to the lead ids it carries.
+
+CREATE TABLE IF NOT EXISTS marketing_sanitize_batches (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    model TEXT,
+    lead_count INTEGER NOT NULL DEFAULT 0,
+    result_count INTEGER,
+    chunks JSONB NOT NULL DEFAULT '{}'::jsonb,
+    summary JSONB,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_marketing_sanitize_batches_open
+  ON marketing_sanitize_batches (created_at)
+  WHERE status IN ('validating', 'in_progress', 'finalizing', 'cancelling');
+
+CREATE INDEX IF NOT EXISTS idx_marketing_leads_crew_trace_pending
+  ON marketing_leads (crew_trace)
+  WHERE crew_trace LIKE 'batch_pending:%';
+
+ALTER TABLE marketing_sanitize_batches ENABLE ROW LEVEL SECURITY;
+
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,75 @@
+-- Atomic open / click counters for marketing_sends (write-behind tracking).
+-- Run in Supabase SQL Editor after marketing_sends_tracking.sql. The API buffers
+-- pixel / redirect hits in memory (app/marketing_track_events.py) and applies
+-- them every few seconds via supabase.rpc('apply_marketing_tracking_events', ...);
+-- until this function exists it falls back to per-token read-then-update.
+--
+-- p_events: [{"token", "opens", "clicks", "first_opened_at", "first_clicked_at"}, ...]
+-- Counters are incremented in place (no lost updates across replicas); first_*_at
+-- are only set when still NULL. Unknown tokens and unsent rows are ignored.
+-- p_batch_id: the API resends a batch with the same id when a call's outcome
+-- is unknown (e.g. a timeout after commit); ids seen in the last day are
+-- skipped, so each batch is applied at most once.
+-- Returns the number of marketing_sends rows updated (0 for a repeated batch).
+
+CREATE TABLE IF NOT EXISTS marketing_tracking_batches (
+    batch_id UUID PRIMARY KEY,
+    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_marketing_tracking_batches_applied
+  ON marketing_tracking_batches (applied_at);
+
+ALTER TABLE marketing_tracking_batches ENABLE ROW LEVEL SECURITY;
+
+-- Earlier version without p_batch_id
+DROP FUNCTION IF EXISTS public.apply_marketing_tracking_events(JSONB);
+
+CREATE OR REPLACE FUNCTION public.apply_marketing_tracking_events(
+    p_events JSONB,
+    p_batch_id UUID DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER := 0;
+BEGIN
+    IF p_batch_id IS NOT NULL THEN
+        INSERT INTO marketing_tracking_batches (batch_id)
+        VALUES (p_batch_id)
+        ON CONFLICT (batch_id) DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN 0;
+        END IF;
+        DELETE FROM marketing_tracking_batches
+        WHERE applied_at < NOW() - INTERVAL '1 day';
+    END IF;
+
+    UPDATE marketing_sends s
+    SET open_count = s.open_count + COALESCE(e.opens, 0),
+        click_count = s.click_count + COALESCE(e.clicks, 0),
+        first_opened_at = CASE
+            WHEN COALESCE(e.opens, 0) > 0 THEN COALESCE(s.first_opened_at, e.first_opened_at)
+            ELSE s.first_opened_at
+        END,
+        first_clicked_at = CASE
+            WHEN COALESCE(e.clicks, 0) > 0 THEN COALESCE(s.first_clicked_at, e.first_clicked_at)
+            ELSE s.first_clicked_at
+        END
+    FROM jsonb_to_recordset(p_events) AS e(
+        token TEXT,
+        opens INTEGER,
+        clicks INTEGER,
+        first_opened_at TIMESTAMPTZ,
+        first_clicked_at TIMESTAMPTZ
+    )
+    WHERE s.tracking_token = e.token
+      AND s.status = 'sent';
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.apply_marketing_tracking_events(JSONB, UUID) FROM PUBLIC, anon, authenticated;
+
+-- Refresh PostgREST schema cache (Supabase)
+NOTIFY pgrst, 'reload schema';
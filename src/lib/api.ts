@@ -1263,17 +1263,22 @@ export const adminApi = {
   },
   importMarketingCsv: async (
     file: File,
-    options: { campaign_id?: string; run_sanitize?: boolean }
+    options: { campaign_id?: string; run_sanitize?: boolean; background?: boolean }
   ): Promise<ApiResponse> => {
     const formData = new FormData();
     formData.append("file", file);
     if (options.campaign_id) formData.append("campaign_id", options.campaign_id);
     formData.append("run_sanitize", String(options.run_sanitize ?? true));
+    if (options.background) formData.append("background", "true");
     const response = await apiClient.post("/admin/marketing/leads/import", formData, {
       timeout: 600000,
     });
     return response.data;
   },
+  getMarketingCsvImport: async (importId: string): Promise<ApiResponse> => {
+    const response = await apiClient.get(`/admin/marketing/leads/import/${encodeURIComponent(importId)}`);
+    return response.data;
+  },
   discoverMarketingSerp: async (payload: {
     queries?: string[];
     max_queries?: number;